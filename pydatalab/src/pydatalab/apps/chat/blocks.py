@@ -67,6 +67,8 @@ Be as concise as possible. When saying your name, type a bird emoji right after
         "available_models": AVAILABLE_MODELS,
     }
 
+    _supports_render_cache = False
+
     @property
     def plot_functions(self):
         return (self.render,)
@@ -1,4 +1,5 @@
 import os
+from functools import partial
 from pathlib import Path
 
 import bokeh.embed
@@ -12,6 +13,7 @@ from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
 from pydatalab.logger import LOGGER
+from pydatalab.parse_cache import cached_parse
 
 
 class CVBlock(DataBlock):
@@ -70,12 +72,16 @@ class CVBlock(DataBlock):
             return
 
         if ext == ".mpr":
-            cv_data = _split_by_cycle(parse_cv_mpr(Path(file_info["location"])))
+            parser = parse_cv_mpr
         elif ext == ".txt":
-            cv_data = _split_by_cycle(parse_chi_cv_txt(Path(file_info["location"])))
+            parser = parse_chi_cv_txt
         else:
             return
 
+        cv_data = _split_by_cycle(
+            cached_parse(file_info, parser.__name__, partial(parser, Path(file_info["location"])))
+        )
+
         if len(cv_data) == 0:
             raise RuntimeError("Parsed CV data contains no rows")
 
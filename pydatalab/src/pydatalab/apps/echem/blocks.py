@@ -1,5 +1,13 @@
+import atexit
 import hashlib
+import multiprocessing
+import shutil
+import threading
 import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from importlib.metadata import version
 from pathlib import Path
 from typing import Any
 
@@ -11,16 +19,135 @@ from navani.bdf import build_bdf_df, save_bdf
 
 from pydatalab import bokeh_plots
 from pydatalab.blocks.base import DataBlock
-from pydatalab.file_utils import get_file_info_by_id
+from pydatalab.config import CONFIG
+from pydatalab.file_utils import get_file_info_by_id, get_file_infos_by_ids
 from pydatalab.logger import LOGGER
 from pydatalab.mongo import flask_mongo
+from pydatalab.parse_cache import cached_parse, is_parse_cached
+from pydatalab.utils.downsampling import select_x_window
 
+from .incremental import LIVE_ECHEM_EXTENSIONS, load_live_echem_file
 from .utils import (
     compute_gpcl_differential,
     filter_df_by_cycle_index,
     reduce_echem_cycle_sampling,
+    stitch_echem_dataframes,
 )
 
+_PARSER = "CycleBlock._parse_echem_files"
+
+
+def _parser_version() -> str:
+    return f"navani-{version('navani')}"
+
+
+def _parse_echem_file(location: str) -> pd.DataFrame:
+    """Parse a single echem file with navani."""
+    try:
+        return ec.echem_file_loader(location)
+    except Exception as exc:
+        raise RuntimeError(f"Navani raised an error when parsing: {exc}") from exc
+
+
+def _parse_echem_file_in_worker(location: str) -> tuple[pd.DataFrame, list[str]]:
+    """Parse a single echem file in a worker process, returning the messages of any
+    warnings raised alongside the data, such that they can be raised again by the parent."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        df = _parse_echem_file(location)
+    return df, [str(warning.message) for warning in caught]
+
+
+_PARSE_POOL: ProcessPoolExecutor | None = None
+"""The pool of processes parsing echem files, shared by all cycle blocks of this
+process and created on first use."""
+
+_PARSE_POOL_LOCK = threading.Lock()
+
+_IN_FLIGHT_PARSES: dict[tuple[str, str | None], Future] = {}
+"""The parses submitted to the pool whose results have not yet been stored in the
+parse cache, keyed by the location and SHA-256 of the file, such that concurrent
+refreshes wait for the same parse rather than parsing the file again."""
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """Return the shared parse pool, creating it if needed.
+
+    Its processes are started with `forkserver` (or `spawn`) rather than `fork`, as
+    the pool is created from block worker threads and forking a multi-threaded
+    process can leave the child holding locks that it can never release.
+
+    """
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            method = (
+                "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            )
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=CONFIG.ECHEM_PARSE_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _PARSE_POOL
+
+
+def _shutdown_parse_pool(pool: ProcessPoolExecutor | None = None) -> None:
+    """Shut down the shared parse pool (or only the given pool, if it is still the
+    shared one), such that the next parse creates a new one."""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None or (pool is not None and pool is not _PARSE_POOL):
+            return
+        pool, _PARSE_POOL = _PARSE_POOL, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown_parse_pool)
+
+
+def _submit_parse(file_info: dict) -> tuple[tuple[str, str | None], Future, bool]:
+    """Submit a file to the shared parse pool, unless it is already being parsed.
+
+    Returns:
+        The key of the parse in `_IN_FLIGHT_PARSES`, its future, and whether it was
+        submitted by this call (in which case the caller must release it with
+        `_release_parses` once its result has been stored).
+
+    """
+    key = (str(file_info["location"]), (file_info.get("checksums") or {}).get("sha256"))
+    with _PARSE_POOL_LOCK:
+        future = _IN_FLIGHT_PARSES.get(key)
+        if future is not None:
+            return key, future, False
+    pool = _get_parse_pool()
+    with _PARSE_POOL_LOCK:
+        future = _IN_FLIGHT_PARSES.get(key)
+        if future is not None:
+            return key, future, False
+        future = pool.submit(_parse_echem_file_in_worker, key[0])
+        _IN_FLIGHT_PARSES[key] = future
+    return key, future, True
+
+
+def _release_parses(keys: list[tuple[str, str | None]]) -> None:
+    with _PARSE_POOL_LOCK:
+        for key in keys:
+            _IN_FLIGHT_PARSES.pop(key, None)
+
+
+def _worker_result(future: Future, location: str) -> pd.DataFrame:
+    try:
+        df, messages = future.result()
+    except BrokenProcessPool:
+        # A worker process died (e.g., killed for running out of memory); replace
+        # the pool for later parses and parse this file here instead
+        LOGGER.warning("Echem parse pool broke while parsing %s; parsing it in-process", location)
+        _shutdown_parse_pool()
+        return _parse_echem_file(location)
+    for message in messages:
+        warnings.warn(message)
+    return df
+
 
 class CycleBlock(DataBlock):
     """A data block for processing electrochemical cycling data.
@@ -36,7 +163,7 @@ class CycleBlock(DataBlock):
     description = """This block can plot data from electrochemical cycling experiments from many different cycler's file formats.
     The file formats currently supported are:
 
-    - Biologic (.mpr)
+    - Biologic (.mpr, .mpt)
     - Arbin (.res, .xls and .xlsx)
     - Neware (.nda, .ndax)
     - Ivium and Maccor text exports (.txt)
@@ -48,6 +175,7 @@ class CycleBlock(DataBlock):
 
     accepted_file_extensions = (
         ".mpr",
+        ".mpt",
         ".txt",
         ".xls",
         ".xlsx",
@@ -61,6 +189,8 @@ class CycleBlock(DataBlock):
         ".bdf.gz",
     )
 
+    render_cache_file_fields = (*DataBlock.render_cache_file_fields, "comparison_file_ids")
+
     defaults: dict[str, Any] = {
         "p_spline": 5,
         "s_spline": 5,
@@ -69,6 +199,9 @@ class CycleBlock(DataBlock):
         "derivative_mode": None,
     }
 
+    def _render_cache_inputs(self) -> dict[str, Any]:
+        return {"characteristic_mass_g": self._get_characteristic_mass_g()}
+
     def _get_characteristic_mass_g(self):
         doc = flask_mongo.db.items.find_one(
             {"item_id": self.data["item_id"]}, {"characteristic_mass": 1}
@@ -98,16 +231,28 @@ class CycleBlock(DataBlock):
             )
         return ext
 
-    def _parse_echem_files(self, location: Path, locations: list[Path] | None) -> pd.DataFrame:
+    def _parse_echem_files(
+        self,
+        location: Path,
+        locations: list[Path] | None,
+        file_infos: list[dict] | None = None,
+    ) -> pd.DataFrame:
         """Parse echem source file(s) via navani and return the raw DataFrame.
 
         Parameters:
             location: Path to the single source file.
             locations: For multi-file mode, all source paths to stitch together.
+            file_infos: For multi-file mode, the database entries of the source files; if
+                given, each file is parsed on its own through the shared parse cache (see
+                `_parse_each_echem_file`) before the parsed data is stitched together.
         """
         if locations is not None:
+            if file_infos:
+                dfs = self._parse_each_echem_file(file_infos)
+            else:
+                dfs = [_parse_echem_file(str(loc)) for loc in locations]
             try:
-                LOGGER.debug("Loading multiple echem files with navani: %s", locations)
+                LOGGER.debug("Stitching multiple echem files: %s", locations)
                 with warnings.catch_warnings():
                     warnings.filterwarnings(
                         "ignore",
@@ -118,16 +263,100 @@ class CycleBlock(DataBlock):
                         ),
                         category=UserWarning,
                     )
-                    return ec.multi_echem_file_loader([str(loc) for loc in locations])
-            except Exception as exc:
-                raise RuntimeError(
-                    f"Navani raised an error when parsing multiple files: {exc}"
-                ) from exc
-        else:
-            try:
-                return ec.echem_file_loader(str(location))
+                    return stitch_echem_dataframes(dfs, [Path(loc).name for loc in locations])
             except Exception as exc:
-                raise RuntimeError(f"Navani raised an error when parsing: {exc}") from exc
+                raise RuntimeError(f"Unable to stitch multiple files: {exc}") from exc
+
+        return _parse_echem_file(str(location))
+
+    def _parse_each_echem_file(self, file_infos: list[dict]) -> list[pd.DataFrame]:
+        """Parse each of the given echem files on its own, through the shared parse cache.
+
+        The files that miss the cache are parsed concurrently in the shared pool of up
+        to `CONFIG.ECHEM_PARSE_MAX_WORKERS` processes, while the cache itself is only
+        read and written from the calling thread. Files that are already being parsed
+        for another request are not parsed again.
+
+        Parameters:
+            file_infos: The database entries of the files to parse.
+
+        Returns:
+            The navani DataFrame of each file, in order.
+        """
+        misses = [
+            index
+            for index, file_info in enumerate(file_infos)
+            if not is_parse_cached([file_info], _PARSER, version=_parser_version())
+        ]
+        futures: dict[int, Future] = {}
+        submitted: list[tuple[str, str | None]] = []
+        try:
+            if len(misses) > 1 and CONFIG.ECHEM_PARSE_MAX_WORKERS > 1:
+                LOGGER.debug("Parsing %d echem files in the shared parse pool", len(misses))
+                for index in misses:
+                    key, futures[index], is_new = _submit_parse(file_infos[index])
+                    if is_new:
+                        submitted.append(key)
+            return [
+                cached_parse(
+                    [file_info],
+                    _PARSER,
+                    partial(_worker_result, futures[index], str(file_info["location"]))
+                    if index in futures
+                    else partial(_parse_echem_file, str(file_info["location"])),
+                    version=_parser_version(),
+                )
+                for index, file_info in enumerate(file_infos)
+            ]
+        finally:
+            _release_parses(submitted)
+
+    @staticmethod
+    def _parquet_cache_path(file_info: dict) -> Path:
+        """Return the path of the ``.bdf.parquet`` cache of a single source file."""
+        bare_stem = Path(file_info["name"]).stem.removesuffix(".bdf")
+        return Path(file_info["location"]).with_name(f"{bare_stem}_cached.bdf.parquet")
+
+    @staticmethod
+    def _is_parquet_cache_stale(parquet_path: Path, file_info: dict) -> bool:
+        return (
+            parquet_path.exists()
+            and file_info["last_modified"] is not None
+            and parquet_path.stat().st_mtime < file_info["last_modified"].timestamp()
+        )
+
+    def _requires_parse(self, file_info: dict) -> bool:
+        """Whether loading a single file with `_load_single` would have to parse it in full,
+        rather than read its ``.bdf.parquet`` cache or parse it incrementally."""
+        try:
+            ext = self._get_file_extension(file_info["name"])
+        except RuntimeError:
+            return False
+        if file_info.get("is_live"):
+            return ext not in LIVE_ECHEM_EXTENSIONS
+        parquet_path = self._parquet_cache_path(file_info)
+        return not parquet_path.exists() or self._is_parquet_cache_stale(parquet_path, file_info)
+
+    def _prefetch_echem_files(self, file_ids: list[ObjectId]) -> None:
+        """Concurrently parse those of the given files that are about to be loaded one by one
+        and would each have to be parsed, such that loading them then reads their parsed
+        data from the parse cache.
+
+        Any errors are left to be reported when each file is loaded.
+        """
+        try:
+            file_infos = get_file_infos_by_ids(file_ids, update_if_live=True)
+        except Exception as exc:
+            LOGGER.warning("Unable to prefetch echem files %s: %s", file_ids, exc)
+            return
+
+        to_parse = [file_info for file_info in file_infos if self._requires_parse(file_info)]
+        if len(to_parse) < 2:
+            return
+        try:
+            self._parse_each_echem_file(to_parse)
+        except Exception as exc:
+            LOGGER.warning("Unable to prefetch echem files %s: %s", file_ids, exc)
 
     def _load_echem_from_cache(self, parquet_path: Path) -> pd.DataFrame:
         """Load a previously cached echem DataFrame from a ``.bdf.parquet`` file."""
@@ -177,6 +406,7 @@ class CycleBlock(DataBlock):
         csv_path: Path | None,
         reload: bool,
         locations: list[Path] | None = None,
+        file_infos: list[dict] | None = None,
     ) -> tuple[pd.DataFrame, Path | None]:
         """Load echem data, using the ``.bdf.parquet`` cache when available.
 
@@ -191,6 +421,10 @@ class CycleBlock(DataBlock):
             csv_path: Path for the ``.bdf.csv`` download file, or None to skip writing CSV.
             reload: If True, bypass the cache and re-parse from source.
             locations: For multi-file mode, the list of all source file paths to stitch.
+            file_infos: The database entries of the source file(s); if given, each file is
+                parsed through the shared parse cache, so that unchanged files are not
+                re-parsed even when the ``.bdf.parquet`` cache is bypassed or missing, or
+                when other files are added to those being stitched.
         """
         if not reload and parquet_path is not None and parquet_path.exists():
             LOGGER.debug("Cache hit: loading parsed data from parquet %s", parquet_path)
@@ -220,7 +454,15 @@ class CycleBlock(DataBlock):
                 "Cache miss: no parquet cache found at %s, parsing from source", parquet_path
             )
 
-        raw_df = self._parse_echem_files(location, locations)
+        if locations is None and file_infos:
+            raw_df = cached_parse(
+                file_infos,
+                _PARSER,
+                partial(self._parse_echem_files, location, None),
+                version=_parser_version(),
+            )
+        else:
+            raw_df = self._parse_echem_files(location, locations, file_infos)
 
         if parquet_path is not None:
             csv_path = self._save_bdf(raw_df, parquet_path, csv_path)
@@ -229,26 +471,37 @@ class CycleBlock(DataBlock):
     def _load_single(self, file_id: ObjectId, reload: bool) -> tuple[pd.DataFrame, Path | None]:
         """Parse a single echem file using navani and cache to disk.
 
-        Returns the raw DataFrame and the BDF export path (or None if the source is already BDF
-        or export failed).
+        Returns the raw DataFrame and the BDF export path (or None if the source is already BDF,
+        is live and was parsed incrementally, or export failed).
         """
         file_info = get_file_info_by_id(file_id, update_if_live=True)
         filename = file_info["name"]
 
-        if file_info.get("is_live"):
-            LOGGER.debug("File %s is live, forcing reload=True", filename)
-            reload = True
-
         ext = self._get_file_extension(filename)
         location = Path(file_info["location"])
         bare_stem = Path(filename).stem.removesuffix(".bdf")
-        parquet_path = location.with_name(f"{bare_stem}_cached.bdf.parquet")
+        parquet_path = self._parquet_cache_path(file_info)
+        live_cache_path = location.with_name(f"{bare_stem}_live")
 
-        if (
-            parquet_path.exists()
-            and file_info["last_modified"] is not None
-            and parquet_path.stat().st_mtime < file_info["last_modified"].timestamp()
-        ):
+        if file_info.get("is_live"):
+            if ext in LIVE_ECHEM_EXTENSIONS:
+                # Only parse the rows appended since the last refresh; BDF exports are
+                # skipped until the file is no longer live, as they would have to be
+                # rewritten in full on every refresh
+                try:
+                    return load_live_echem_file(location, ext, live_cache_path), None
+                except Exception as exc:
+                    LOGGER.warning(
+                        "Unable to parse live file %s incrementally, re-parsing it in full: %s",
+                        filename,
+                        exc,
+                    )
+            LOGGER.debug("File %s is live, forcing reload=True", filename)
+            reload = True
+        elif live_cache_path.exists():
+            shutil.rmtree(live_cache_path, ignore_errors=True)
+
+        if self._is_parquet_cache_stale(parquet_path, file_info):
             LOGGER.debug("Cache is older than source file for %s, forcing reload=True", filename)
             reload = True
 
@@ -256,24 +509,32 @@ class CycleBlock(DataBlock):
             # Source is already parquet: generate a .bdf.csv for download alongside it.
             # The parquet cache uses a _cached suffix to avoid overwriting the source.
             csv_path = location.with_name(f"{bare_stem}.bdf.csv")
-            return self._load_and_cache_echem(location, parquet_path, csv_path, reload)
+            return self._load_and_cache_echem(
+                location, parquet_path, csv_path, reload, file_infos=[file_info]
+            )
         if ext.startswith(".bdf"):
             # Other BDF formats: cache to parquet but don't write a redundant .bdf.csv.
             # bdf_url will fall back to linking the source file directly.
-            return self._load_and_cache_echem(location, parquet_path, None, reload)
+            return self._load_and_cache_echem(
+                location, parquet_path, None, reload, file_infos=[file_info]
+            )
 
         csv_path = location.with_name(f"{bare_stem}.bdf.csv")
-        return self._load_and_cache_echem(location, parquet_path, csv_path, reload)
+        return self._load_and_cache_echem(
+            location, parquet_path, csv_path, reload, file_infos=[file_info]
+        )
 
     def _load_multi(
         self, file_ids: list[ObjectId], reload: bool
     ) -> tuple[pd.DataFrame, Path | None]:
-        """Parse and stitch multiple echem files using navani, with pickle caching.
+        """Parse multiple echem files using navani and stitch them, caching the result to disk.
 
+        Each file is parsed on its own through the shared parse cache (concurrently, for
+        those that miss it), such that only new or changed files are ever re-parsed.
         Cache paths are keyed by a hash of the file IDs so different combinations
         don't collide. Cache files are saved in the same directory as the first file.
         """
-        file_infos = [get_file_info_by_id(fid, update_if_live=True) for fid in file_ids]
+        file_infos = get_file_infos_by_ids(file_ids, update_if_live=True)
         for info in file_infos:
             self._get_file_extension(info["name"])
         locations = [Path(info["location"]) for info in file_infos]
@@ -298,7 +559,12 @@ class CycleBlock(DataBlock):
                 reload = True
 
         return self._load_and_cache_echem(
-            cache_location, parquet_path, csv_path, reload=reload, locations=locations
+            cache_location,
+            parquet_path,
+            csv_path,
+            reload=reload,
+            locations=locations,
+            file_infos=file_infos,
         )
 
     @staticmethod
@@ -437,7 +703,11 @@ class CycleBlock(DataBlock):
             )
             if bdf_path is not None and bdf_path.exists():
                 self.data["bdf_url"] = f"/files/{first_file_id}/{bdf_path.name}"
-            elif bdf_path is None and len(file_ids) == 1:
+            elif (
+                bdf_path is None
+                and len(file_ids) == 1
+                and self._get_file_extension(filename).startswith(".bdf")
+            ):
                 # Source is already a BDF file - link directly to it
                 self.data["bdf_url"] = f"/files/{first_file_id}/{filename}"
             else:
@@ -468,6 +738,7 @@ class CycleBlock(DataBlock):
         # Load comparison files if provided
         comparison_file_ids = self.data.get("comparison_file_ids", [])
         if comparison_file_ids and len(comparison_file_ids) > 0:
+            self._prefetch_echem_files(comparison_file_ids)
             # TODO (ben smith) Currently can't load in different masses for different files in comparison mode
             for file in comparison_file_ids:
                 try:
@@ -499,9 +770,20 @@ class CycleBlock(DataBlock):
                     window_size_2=int(self.data["win_size_2"]),
                     use_normalized_capacity=bool(characteristic_mass_g),
                 )
-            # Reduce df size to 100 points per cycle by default if there are more than a 100k points
+            # Only plot (and reduce) the data within the x-range the user has zoomed into
+            x_window = self.data.get("plot_x_range")
+            if x_window and x_window.get("axis") in df:
+                df = select_x_window(df, x_window["axis"], x_window["start"], x_window["end"])
+
+            # Reduce df size to 100 points per cycle by default if there are more than a 100k points,
+            # keeping the extrema of the voltage (and differential) within each half cycle
             if len(df) > 1e5:
-                df = reduce_echem_cycle_sampling(df, num_samples=100)
+                df = reduce_echem_cycle_sampling(
+                    df,
+                    num_samples=100,
+                    mode="minmax",
+                    columns=[c for c in ("voltage (V)", "dQ/dV (mA/V)", "dV/dQ (V/mA)") if c in df],
+                )
                 LOGGER.debug("Reduced df size, df length: %d", len(df))
             df["filename"] = filename
             cycle_summary_df["filename"] = filename
@@ -521,6 +803,7 @@ class CycleBlock(DataBlock):
             mode=mode,
             normalized=bool(characteristic_mass_g),
             plotting_mode=plotting_mode,
+            **self._plot_x_range_kwargs(),
         )
 
         if layout is not None:
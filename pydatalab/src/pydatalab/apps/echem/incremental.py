@@ -0,0 +1,319 @@
+"""Incremental parsing of live electrochemical cycling files.
+
+A cycling experiment that is still running is synced as a "live" file that
+keeps growing until the experiment ends. Re-parsing the whole file with navani
+on every refresh makes each refresh of a week-long test slower than the last,
+even though only the rows appended since the previous refresh are new.
+
+For the line-oriented text formats (`LIVE_ECHEM_EXTENSIONS`), navani's
+processing of a row only depends on the rows of the same half cycle and on the
+row just before it. [`load_live_echem_file`][pydatalab.apps.echem.incremental.load_live_echem_file]
+therefore keeps the processed rows of every completed half cycle in a
+directory of Parquet parts next to the file, and remembers the byte offset and
+row index at which the last (still growing) half cycle starts. A refresh only
+reads and processes the file from that offset onwards (plus one row of
+context), renumbers its half cycles to follow on from the stored ones, and
+replaces the stored tail. Only complete lines are ever parsed, such that a row
+that is being written while the file is read is picked up by the next refresh.
+
+If the header of the file changes, the file shrinks, or the bytes that were
+already parsed are no longer the same, the stored state is discarded and the
+file is parsed from the start. An exclusive lock on a file in the cache
+directory is held for the whole of each refresh, such that concurrent refreshes
+of the same file (from any thread or process) never interleave their reads and
+writes of the stored parts.
+
+"""
+
+import hashlib
+import io
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from navani.bdf import bdf_processing
+from navani.biologic import _read_mpt_header_lines
+from navani.echem import biologic_processing
+
+from pydatalab import __version__
+from pydatalab.logger import LOGGER
+from pydatalab.parse_cache import file_lock, read_entry, write_entry
+
+__all__ = ("LIVE_ECHEM_EXTENSIONS", "load_live_echem_file")
+
+LIVE_ECHEM_EXTENSIONS = (".mpt", ".csv", ".bdf", ".bdf.csv")
+"""The file extensions that can be parsed incrementally: Biologic EC-Lab text
+exports, navani-processed CSV files and Battery Data Format CSV files."""
+
+MAX_PARTS = 32
+"""The number of Parquet parts of completed half cycles above which they are
+merged back into a single part."""
+
+VERIFY_BLOCK_SIZE = 4096
+"""The number of bytes before the last parsed offset that must be unchanged for
+the stored rows to be reused."""
+
+_TAIL_NAME = "tail.parquet"
+_LOCK_NAME = ".lock"
+
+
+def _separator(ext: str) -> str:
+    return "\t" if ext == ".mpt" else ","
+
+
+def _encoding(ext: str) -> str:
+    return "latin1" if ext == ".mpt" else "utf-8"
+
+
+def _state_version() -> str:
+    return f"{__version__}-navani-{version('navani')}"
+
+
+def _read_header(location: Path, ext: str) -> tuple[bytes, list[str]]:
+    """Return the raw bytes of the header of the file, up to the first data row,
+    and the column names it declares."""
+    num_lines = _read_mpt_header_lines(location) if ext == ".mpt" else 1
+    with open(location, "rb") as f:
+        header = b"".join(f.readline() for _ in range(num_lines))
+    if not header.endswith(b"\n"):
+        raise ValueError(f"The header of {location} has not been fully written yet")
+    columns = pd.read_csv(
+        io.BytesIO(header),
+        sep=_separator(ext),
+        encoding=_encoding(ext),
+        skiprows=num_lines - 1,
+        nrows=0,
+    ).columns
+    return header, list(columns)
+
+
+def _row_offsets(data: bytes) -> np.ndarray:
+    """Return the offsets of the start of each non-blank line in `data`, which
+    must end with a newline."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if not len(buffer):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(buffer == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    blank = (lengths == 0) | ((lengths == 1) & (buffer[starts] == ord("\r")))
+    return starts[~blank]
+
+
+def _read_rows(
+    location: Path, start: int, columns: list[str], ext: str
+) -> tuple[pd.DataFrame | None, np.ndarray, int]:
+    """Read the complete lines of the file from the byte offset `start`.
+
+    Returns:
+        The rows as read (or None if there are none), the byte offset of each row
+        in the file, and the offset of the end of the last complete line.
+
+    """
+    with open(location, "rb") as f:
+        f.seek(start)
+        data = f.read()
+    data = data[: data.rfind(b"\n") + 1]
+    offsets = _row_offsets(data)
+    if not len(offsets):
+        return None, offsets, start + len(data)
+
+    df = pd.read_csv(
+        io.BytesIO(data),
+        sep=_separator(ext),
+        encoding=_encoding(ext),
+        header=None,
+        names=columns,
+        low_memory=False,
+    )
+    if len(df) != len(offsets):
+        raise ValueError(
+            f"Read {len(df)} rows from {len(offsets)} lines of {location}; the file cannot be parsed line by line"
+        )
+    return df, start + offsets, start + len(data)
+
+
+def _process(df: pd.DataFrame, ext: str) -> pd.DataFrame:
+    """Apply the same processing to the rows as `navani.echem.echem_file_loader`."""
+    if ext == ".mpt":
+        df = df.loc[:, ~df.columns.str.match(r"Unnamed: \d+$")]
+        df = biologic_processing(df)
+    elif ext == ".csv":
+        expected_columns = ["Capacity", "Voltage", "half cycle", "full cycle", "Current", "state"]
+        if not all(col in df.columns for col in expected_columns):
+            raise ValueError("Columns do not match expected columns for navani processed csv")
+        df["state"] = df["state"].replace("1", 1).replace("0", 0)
+        df[["Capacity", "Voltage", "Current"]] = df[["Capacity", "Voltage", "Current"]].astype(
+            float
+        )
+        df[["full cycle", "half cycle"]] = df[["full cycle", "half cycle"]].astype(int)
+    else:
+        df = bdf_processing(df)
+
+    if "half cycle" in df.columns:
+        df["full cycle"] = (df["half cycle"] / 2).apply(np.ceil)
+    return df
+
+
+def _digest(location: Path, start: int, end: int) -> str:
+    with open(location, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(end - start)).hexdigest()
+
+
+def _verify_offset(header_length: int, offset: int) -> int:
+    return max(header_length, offset - VERIFY_BLOCK_SIZE)
+
+
+def _load_state(
+    location: Path, ext: str, header: bytes, cache_path: Path
+) -> tuple[pd.DataFrame, dict[str, Any]] | None:
+    """Return the stored tail and state of the file, if they can still be used."""
+    try:
+        entry = read_entry(cache_path / _TAIL_NAME)
+    except Exception as exc:
+        LOGGER.warning("Unable to read incremental parse state at %s: %s", cache_path, exc)
+        return None
+    if not isinstance(entry, tuple):
+        return None
+
+    tail, state = entry
+    if (
+        not all(_part_path(cache_path, index).exists() for index in range(state["parts"]))
+        or state.get("version") != _state_version()
+        or state.get("ext") != ext
+        or state.get("header_sha256") != hashlib.sha256(header).hexdigest()
+        or location.stat().st_size < state["offset"]
+        or _digest(location, _verify_offset(len(header), state["offset"]), state["offset"])
+        != state["verify_sha256"]
+    ):
+        LOGGER.debug("Discarding incremental parse state of %s, as the file has changed", location)
+        return None
+    return tail, state
+
+
+def _part_path(cache_path: Path, index: int) -> Path:
+    return cache_path / f"part-{index:05d}.parquet"
+
+
+def _stored_rows(cache_path: Path, state: dict[str, Any], tail: pd.DataFrame) -> pd.DataFrame:
+    parts = []
+    for index in range(state["parts"]):
+        part = read_entry(_part_path(cache_path, index))
+        if part is None:
+            raise FileNotFoundError(
+                f"Incremental parse state at {cache_path} is missing part {index}"
+            )
+        parts.append(part)
+    return pd.concat([*parts, tail], ignore_index=True)
+
+
+def _clear_state(cache_path: Path) -> None:
+    for path in cache_path.glob("*.parquet"):
+        path.unlink(missing_ok=True)
+
+
+def load_live_echem_file(location: Path, ext: str, cache_path: Path) -> pd.DataFrame:
+    """Parse a live echem file, only processing the rows appended since it was last parsed.
+
+    Parameters:
+        location: The path to the file.
+        ext: The extension of the file, one of `LIVE_ECHEM_EXTENSIONS`.
+        cache_path: The directory in which to store the processed rows and the
+            state of the parse between calls.
+
+    Returns:
+        The same dataframe as `navani.echem.echem_file_loader` returns for the
+        complete lines of the file.
+
+    """
+    if ext not in LIVE_ECHEM_EXTENSIONS:
+        raise ValueError(f"Cannot parse {ext!r} files incrementally")
+
+    with file_lock(cache_path / _LOCK_NAME):
+        return _load_live_echem_file(location, ext, cache_path)
+
+
+def _load_live_echem_file(location: Path, ext: str, cache_path: Path) -> pd.DataFrame:
+    header, columns = _read_header(location, ext)
+    stored = _load_state(location, ext, header, cache_path)
+    if stored is None:
+        _clear_state(cache_path)
+        tail = None
+        state = {
+            "version": _state_version(),
+            "ext": ext,
+            "header_sha256": hashlib.sha256(header).hexdigest(),
+            "offset": len(header),
+            "rows": 0,
+            "parts": 0,
+            "window_offset": len(header),
+            "window_row": 0,
+            "start_row": 0,
+            "start_half_cycle": 0,
+        }
+    else:
+        tail, state = stored
+
+    rows, offsets, end = _read_rows(location, state["window_offset"], columns, ext)
+    if tail is not None and end == state["offset"]:
+        return _stored_rows(cache_path, state, tail)
+    if rows is None:
+        raise ValueError(f"No data has been written to {location} yet")
+
+    LOGGER.debug("Parsing %s incrementally from row %d", location, state["rows"])
+    processed = _process(rows, ext)
+
+    # The window starts with one row of context before the last half cycle, whose
+    # processed values are discarded; renumber the half cycles of the rest such
+    # that they follow on from those of the rows already stored
+    skip = state["start_row"] - state["window_row"]
+    if state["rows"] and "half cycle" in processed.columns:
+        processed["half cycle"] += state["start_half_cycle"] - processed["half cycle"].iloc[skip]
+        processed["full cycle"] = (processed["half cycle"] / 2).apply(np.ceil)
+    processed = processed.iloc[skip:]
+
+    # Rows before the start of the new last half cycle can no longer change
+    if "half cycle" in processed.columns:
+        half_cycles = processed["half cycle"].to_numpy()
+        completed = int(np.argmax(half_cycles == half_cycles[-1]))
+    else:
+        completed = len(processed)
+
+    if completed:
+        write_entry(
+            _part_path(cache_path, state["parts"]),
+            processed.iloc[:completed].reset_index(drop=True),
+        )
+        state["parts"] += 1
+        if state["parts"] > MAX_PARTS:
+            merged = _stored_rows(cache_path, state, processed.iloc[:0])
+            # Invalidate the stored state until the merge is complete, such that an
+            # interrupted merge leads to a full parse rather than duplicated rows
+            (cache_path / _TAIL_NAME).unlink(missing_ok=True)
+            write_entry(_part_path(cache_path, 0), merged)
+            for index in range(1, state["parts"]):
+                _part_path(cache_path, index).unlink(missing_ok=True)
+            state["parts"] = 1
+
+    tail = processed.iloc[completed:].reset_index(drop=True)
+    start_row = state["start_row"] + completed
+    window_row = max(start_row - 1, 0)
+    state.update(
+        {
+            "offset": end,
+            "verify_sha256": _digest(location, _verify_offset(len(header), end), end),
+            "rows": start_row + len(tail),
+            "window_offset": int(offsets[window_row - state["window_row"]]),
+            "window_row": window_row,
+            "start_row": start_row,
+            "start_half_cycle": (
+                int(tail["half cycle"].iloc[0]) if "half cycle" in tail.columns and len(tail) else 0
+            ),
+        }
+    )
+    write_entry(cache_path / _TAIL_NAME, (tail, state))
+
+    return _stored_rows(cache_path, state, tail)
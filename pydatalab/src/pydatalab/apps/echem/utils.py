@@ -1,12 +1,21 @@
+import warnings
+from collections.abc import Sequence
+from typing import Literal
+
 import navani.echem as ec
 import numpy as np
 import pandas as pd
 
 from pydatalab.logger import LOGGER
-from pydatalab.utils import reduce_df_size
+from pydatalab.utils.downsampling import minmax_indices
 
 
-def reduce_echem_cycle_sampling(df: pd.DataFrame, num_samples: int = 100) -> pd.DataFrame:
+def reduce_echem_cycle_sampling(
+    df: pd.DataFrame,
+    num_samples: int = 100,
+    mode: Literal["stride", "minmax"] = "stride",
+    columns: Sequence[str] = ("voltage (V)",),
+) -> pd.DataFrame:
     """Reduce number of cycles to at most `num_samples` points per half cycle. Will
     keep the endpoint values of each half cycle.
 
@@ -14,18 +23,65 @@ def reduce_echem_cycle_sampling(df: pd.DataFrame, num_samples: int = 100) -> pd.
         df: The echem dataframe to reduce, which must have cycling data stored
             under a `"half cycle"` column.
         num_samples: The maximum number of sample points to include per cycle.
+        mode: Either `"stride"`, to keep every n-th point of each half cycle, or
+            `"minmax"`, to keep the minimum and maximum of each of the given `columns`
+            within equally sized buckets of each half cycle, such that no peak is lost.
+        columns: The columns whose features are preserved in `"minmax"` mode.
 
     Returns:
         The output dataframe.
 
     """
+    starts, order = _group_boundaries(df["half cycle"].to_numpy(), sort=True)
+
+    if mode == "minmax":
+        budget = max(num_samples // len(columns), 4)
+        selected = np.unique(
+            np.concatenate(
+                [
+                    minmax_indices(df[column].to_numpy(dtype=float)[order], budget, starts)
+                    for column in columns
+                ]
+            )
+        )
+        return df.iloc[order[selected]].copy()
+
+    if mode != "stride":
+        raise ValueError(f"Unknown reduction mode {mode!r}, must be one of 'stride' or 'minmax'")
+
+    lengths = np.diff(starts)
+
+    # Replicate `reduce_df_size(..., endpoint=True)` for every half cycle at once:
+    # each group of length `n` keeps its first row, every `stride`-th row
+    # strictly before the last and then its last row.
+    strides = -(-lengths // num_samples)
+    counts = np.maximum((lengths - 2) // strides, 0) + 2
+    group = np.repeat(np.arange(len(lengths)), counts)
+    rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    offsets = np.where(rank == counts[group] - 1, lengths[group] - 1, rank * strides[group])
 
-    return_df = pd.DataFrame([])
+    return df.iloc[order[starts[group] + offsets]].copy()
 
-    for _, half_cycle in df.groupby("half cycle"):
-        return_df = pd.concat([return_df, reduce_df_size(half_cycle, num_samples, endpoint=True)])
 
-    return return_df
+def _group_boundaries(keys: np.ndarray, sort: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Group the row positions of an array of keys, ignoring missing keys.
+
+    Parameters:
+        keys: The group key of each row.
+        sort: Whether to order the groups by key (as in `DataFrame.groupby`) or by
+            the first appearance of each key (as in `Series.unique`).
+
+    Returns:
+        The boundaries of each group, i.e., an array of length `num_groups + 1` such
+        that the positions of the rows in group `i` are `order[starts[i]:starts[i + 1]]`,
+        and the row positions ordered by group (and by position within each group).
+
+    """
+    codes, uniques = pd.factorize(keys, sort=sort)
+    positions = np.flatnonzero(codes >= 0)
+    order = positions[np.argsort(codes[positions], kind="stable")]
+    starts = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return starts, order
 
 
 def compute_gpcl_differential(
@@ -84,17 +140,28 @@ def compute_gpcl_differential(
         "final_smooth": smoothing,
     }
 
-    differential_df = pd.DataFrame()
+    starts, order = _group_boundaries(df["half cycle"].to_numpy(), sort=False)
+    half_cycles = df["half cycle"].to_numpy()[order]
+    full_cycles = df["full cycle"].to_numpy()[order]
+    y_values = df[y_label].to_numpy()[order]
+    x_values = df[x_label].to_numpy()[order]
+
+    columns: dict[str, list[np.ndarray]] = {
+        x_label: [],
+        y_label: [],
+        yp_label: [],
+        "full cycle": [],
+        "half cycle": [],
+    }
 
-    # Loop over distinct half cycles
-    for cycle in df["half cycle"].unique():
-        # Extract all segments corresponding to this half cycle index
-        df_cycle = df[df["half cycle"] == cycle]
+    # Loop over distinct half cycles, in order of appearance
+    for start, end in zip(starts[:-1], starts[1:]):
+        cycle = half_cycles[start]
 
         # Compute the desired derivative
         try:
             x, yp, y = ec.dqdv_single_cycle(
-                df_cycle[y_label], df_cycle[x_label], **smoothing_parameters
+                y_values[start:end], x_values[start:end], **smoothing_parameters
             )
         except TypeError as e:
             LOGGER.debug(
@@ -105,27 +172,17 @@ def compute_gpcl_differential(
             )
             continue
 
-        # Set up an array per cycle segment that stores the cycle and half-cycle index
-        cycle_index = df_cycle["full cycle"].max()
-        cycle_index_array = np.full(len(x), int(cycle_index), dtype=int)
-        half_cycle_index_array = np.full(len(x), int(cycle), dtype=int)
-
-        differential_df = pd.concat(
-            [
-                differential_df,
-                pd.DataFrame(
-                    {
-                        x_label: x,
-                        y_label: y,
-                        yp_label: yp,
-                        "full cycle": cycle_index_array,
-                        "half cycle": half_cycle_index_array,
-                    }
-                ),
-            ]
-        )
+        # Store the cycle and half-cycle index of each point of this cycle segment
+        columns[x_label].append(x)
+        columns[y_label].append(y)
+        columns[yp_label].append(yp)
+        columns["full cycle"].append(np.full(len(x), int(full_cycles[start:end].max()), dtype=int))
+        columns["half cycle"].append(np.full(len(x), int(cycle), dtype=int))
 
-    return differential_df
+    if not columns["half cycle"]:
+        return pd.DataFrame()
+
+    return pd.DataFrame({label: np.concatenate(arrays) for label, arrays in columns.items()})
 
 
 def filter_df_by_cycle_index(df: pd.DataFrame, cycle_list: list[int] | None = None) -> pd.DataFrame:
@@ -169,3 +226,78 @@ def filter_df_by_cycle_index(df: pd.DataFrame, cycle_list: list[int] | None = No
             f"Unable to parse `cycle_list` as integers: {cycle_list}. Error: {exc}"
         ) from exc
     return df[df["half cycle"].isin(half_cycles)].copy()
+
+
+def stitch_echem_dataframes(dfs: Sequence[pd.DataFrame], names: Sequence[str]) -> pd.DataFrame:
+    """Stitch the dataframes of consecutive echem files, as each parsed on its own by
+    `navani.echem.echem_file_loader`, into a single experiment.
+
+    This performs the same steps as `navani.echem.multi_echem_file_loader` does after
+    parsing each file, such that the files can be parsed concurrently and through
+    the parse cache, rather than all at once and serially by navani.
+
+    Parameters:
+        dfs: The parsed dataframe of each file, in order. These are not modified.
+        names: The name of each file, stored in the `"Source File"` column.
+
+    Returns:
+        The stitched dataframe, with time offset such that it increases across files,
+        and half cycles (and, when the time allows it, capacities) recomputed over
+        the whole experiment.
+
+    """
+    time_warning_flag = False
+    df_list = []
+    final_time = 0
+    for i, (df, name) in enumerate(zip(dfs, names)):
+        df = df.copy()
+        df["Source File"] = name
+        if "Time" not in df.columns:
+            warnings.warn("Time column not found, using the original capacity column")
+            time_warning_flag = True
+            df["Time"] = np.arange(len(df))
+        if i == 0:
+            final_time = df["Time"].iloc[-1]
+        else:
+            start_time = df["Time"].iloc[0]
+            if np.isclose(start_time, 0):
+                df["Time"] += final_time
+            elif start_time <= final_time:
+                warnings.warn(
+                    "Time column for each file does not start at 0 or begin after previous file, "
+                    "this may cause issues with capacity calculations. Will default to using the old "
+                    "capacity column."
+                )
+                time_warning_flag = True
+            final_time = df["Time"].iloc[-1]
+        df_list.append(df)
+
+    combined_df = pd.concat(df_list, ignore_index=True)
+    not_rest_idx = combined_df[combined_df["state"] != "R"].index
+    combined_df["cycle change"] = False
+    combined_df.loc[not_rest_idx, "cycle change"] = combined_df.loc[not_rest_idx, "state"].ne(
+        combined_df.loc[not_rest_idx, "state"].shift()
+    )
+    combined_df["half cycle"] = (combined_df["cycle change"]).cumsum()
+    combined_df["full cycle"] = (combined_df["half cycle"] / 2).apply(np.ceil)
+
+    # Recompute the capacity of each half cycle by integrating the current over time,
+    # which is robust to files being split mid-cycle
+    if "Time" in combined_df.columns and "Current" in combined_df.columns and not time_warning_flag:
+        combined_df["dq"] = np.diff(combined_df["Time"], prepend=0) * combined_df["Current"]
+        combined_df["New Capacity"] = (
+            combined_df["dq"].abs().groupby(combined_df["half cycle"]).cumsum() / 3600
+        )
+        combined_df["equal"] = np.isclose(
+            combined_df["Capacity"], combined_df["New Capacity"], rtol=1e-5, atol=1e-8
+        )
+        if not combined_df["equal"].all():
+            combined_df.rename(
+                columns={"Capacity": "Old Capacity", "New Capacity": "Capacity"}, inplace=True
+            )
+            warnings.warn(
+                "Capacity columns are not equal, replacing with new capacity column calculated "
+                "from current and time columns and renaming the old capacity column to Old Capacity"
+            )
+
+    return combined_df
@@ -1,7 +1,9 @@
 import os
+from functools import partial
 from pathlib import Path
 
 import bokeh.embed
+import pandas as pd
 from bokeh.models import HoverTool, LogColorMapper
 
 from pydatalab.apps.eis.utils import (
@@ -15,6 +17,7 @@ from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
 from pydatalab.logger import LOGGER
+from pydatalab.parse_cache import cached_parse
 
 
 class EISBlock(DataBlock):
@@ -34,32 +37,25 @@ This block can plot electrochemical impedance spectroscopy (EIS) data from:
     def plot_functions(self):
         return (self.generate_eis_plot,)
 
-    def generate_eis_plot(self):
-        if "file_id" not in self.data:
-            LOGGER.warning("No file set in the DataBlock")
-            return
+    @classmethod
+    def parse_eis_file(cls, location: Path, ext: str) -> pd.DataFrame:
+        """Parse an EIS file with the parser(s) appropriate to its extension.
 
-        file_info = get_file_info_by_id(self.data["file_id"], update_if_live=True)
-        ext = os.path.splitext(file_info["location"].split("/")[-1])[-1].lower()
-        if ext not in self.accepted_file_extensions:
-            LOGGER.warning(
-                "Unsupported file extension (must be one of %s, not %s)",
-                self.accepted_file_extensions,
-                ext,
-            )
-            return
+        Raises:
+            RuntimeError: If none of the parsers could read the file.
 
+        """
         errors = []
         eis_data = None
 
         if ext == ".mpr":
             try:
-                eis_data = parse_biologic_mpr(Path(file_info["location"]))
+                eis_data = parse_biologic_mpr(location)
             except RuntimeError as exc:
                 errors = [exc]
         elif ext == ".pssession":
             try:
-                eis_data = parse_palmsens_pssession(Path(file_info["location"]))
+                eis_data = parse_palmsens_pssession(location)
             except RuntimeError as exc:
                 errors = [exc]
         elif ext == ".txt":
@@ -69,7 +65,7 @@ This block can plot electrochemical impedance spectroscopy (EIS) data from:
                 parse_ivium_eis_txt_no_header,
             ):
                 try:
-                    eis_data = parser(Path(file_info["location"]))
+                    eis_data = parser(location)
                     break
                 except RuntimeError as exc:
                     errors.append(exc)
@@ -79,6 +75,29 @@ This block can plot electrochemical impedance spectroscopy (EIS) data from:
                 f"Could not parse EIS data from uploaded file with implemented parsers. Errors: {errors}"
             )
 
+        return eis_data
+
+    def generate_eis_plot(self):
+        if "file_id" not in self.data:
+            LOGGER.warning("No file set in the DataBlock")
+            return
+
+        file_info = get_file_info_by_id(self.data["file_id"], update_if_live=True)
+        ext = os.path.splitext(file_info["location"].split("/")[-1])[-1].lower()
+        if ext not in self.accepted_file_extensions:
+            LOGGER.warning(
+                "Unsupported file extension (must be one of %s, not %s)",
+                self.accepted_file_extensions,
+                ext,
+            )
+            return
+
+        eis_data = cached_parse(
+            file_info,
+            "EISBlock.parse_eis_file",
+            partial(self.parse_eis_file, Path(file_info["location"]), ext),
+        )
+
         required = {"Re(Z) [Ω]", "-Im(Z) [Ω]", "Frequency [Hz]"}
         missing = required - set(eis_data.select_dtypes("number").columns)
         if missing:
@@ -97,7 +116,9 @@ This block can plot electrochemical impedance spectroscopy (EIS) data from:
             color_mapper=LogColorMapper("Cividis256"),
             plot_points=True,
             plot_line=False,
+            downsample=True,
             tools=HoverTool(tooltips=[("Frequency [Hz]", "@{Frequency [Hz]}")]),
+            **self._plot_x_range_kwargs(),
         )
 
         self.data["bokeh_plot_data"] = bokeh.embed.json_item(plot, theme=DATALAB_BOKEH_THEME)
@@ -1,5 +1,6 @@
 import os
 import warnings
+from functools import partial
 from pathlib import Path
 
 import bokeh.embed
@@ -10,6 +11,7 @@ from bokeh.models import HoverTool, LogColorMapper
 from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
+from pydatalab.parse_cache import cached_parse
 
 
 class FTIRBlock(DataBlock):
@@ -90,11 +92,12 @@ class FTIRBlock(DataBlock):
         return ftir
 
     @staticmethod
-    def _format_ftir_plot(ftir_data: pd.DataFrame) -> bokeh.layouts.layout:
+    def _format_ftir_plot(ftir_data: pd.DataFrame, **kwargs) -> bokeh.layouts.layout:
         """Formats FTIR data for plotting in Bokeh, inverted x-axis with a buffer of 50 cm^-1 on either side
 
         Args:
             ftir_data: FTIR dataframe with columns "Wavenumber (cm⁻¹)" and "Absorbance (%)"
+            **kwargs: Any additional arguments to pass to `selectable_axes_plot`.
 
         Returns:
             bokeh.layouts.layout: Bokeh layout with FTIR data plotted
@@ -110,6 +113,8 @@ class FTIRBlock(DataBlock):
             color_mapper=LogColorMapper("Cividis256"),
             plot_points=False,
             plot_line=True,
+            downsample=True,
+            **kwargs,
             tools=HoverTool(
                 tooltips=[
                     ("Wavenumber", "@{Wavenumber (cm⁻¹)}{0.00} cm⁻¹"),
@@ -136,10 +141,18 @@ class FTIRBlock(DataBlock):
             )
             return
         elif ext == ".asp":
-            ftir_data = self.parse_ftir_asp(Path(file_info["location"]))
+            ftir_data = cached_parse(
+                file_info,
+                "FTIRBlock.parse_ftir_asp",
+                partial(self.parse_ftir_asp, Path(file_info["location"])),
+            )
         elif ext == ".txt":
-            ftir_data = self.parse_ftir_txt(Path(file_info["location"]))
+            ftir_data = cached_parse(
+                file_info,
+                "FTIRBlock.parse_ftir_txt",
+                partial(self.parse_ftir_txt, Path(file_info["location"])),
+            )
 
         if ftir_data is not None:
-            layout = self._format_ftir_plot(ftir_data)
+            layout = self._format_ftir_plot(ftir_data, **self._plot_x_range_kwargs())
             self.data["bokeh_plot_data"] = bokeh.embed.json_item(layout, theme=DATALAB_BOKEH_THEME)
@@ -1,6 +1,7 @@
 import os
 import tempfile
 import warnings
+from functools import partial
 from pathlib import Path
 from typing import Any
 
@@ -17,10 +18,19 @@ from pydatalab.apps.nmr.utils import (
 from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
+from pydatalab.parse_cache import cached_parse
 
 BRUKER_FILE_EXTENSIONS = (".zip",)
 JCAMP_FILE_EXTENSIONS = (".jdx", ".dx")
 JEOL_FILE_EXTENSIONS = (".jdf",)
+NMR_PARSE_STATE_KEYS = (
+    "metadata",
+    "available_experiments",
+    "selected_experiment",
+    "available_processes",
+    "selected_process",
+)
+"""Block data fields set by the NMR readers, stored alongside their parsed output."""
 
 
 class NMRBlock(DataBlock):
@@ -32,6 +42,12 @@ class NMRBlock(DataBlock):
     accepted_file_extensions = BRUKER_FILE_EXTENSIONS + JCAMP_FILE_EXTENSIONS + JEOL_FILE_EXTENSIONS
     processed_data: dict | None = None
     _supports_collections = False
+    render_output_fields = (
+        *DataBlock.render_output_fields,
+        "metadata",
+        "available_experiments",
+        "available_processes",
+    )
 
     @property
     def plot_functions(self):
@@ -298,22 +314,40 @@ class NMRBlock(DataBlock):
         return serialized_df, metadata
 
     def load_nmr_data(self, file_info: dict):
+        """Parse the given NMR file via the parse cache, restoring any block state
+        that the readers set (metadata and Bruker experiment/process selections)
+        on a cache hit.
+
+        """
+        df, state = cached_parse(
+            file_info,
+            "NMRBlock.load_nmr_data",
+            partial(self._read_nmr_data, file_info),
+            options={
+                key: self.data.get(key) for key in ("selected_experiment", "selected_process")
+            },
+        )
+        self.data.update(state)
+        return df.to_dict() if not df.empty else None
+
+    def _read_nmr_data(self, file_info: dict) -> tuple[pd.DataFrame, dict]:
         location, name, ext = self._extract_file_info(file_info=file_info)
 
         if ext == ".zip":
-            df, metadata = self.read_bruker_nmr_data(file_info=file_info)
+            serialized_df, metadata = self.read_bruker_nmr_data(file_info=file_info)
 
         elif ext in (".jdx", ".dx"):
-            df, metadata = self.read_jcamp_nmr_data(file_info=file_info)
+            serialized_df, metadata = self.read_jcamp_nmr_data(file_info=file_info)
 
         elif ext in JEOL_FILE_EXTENSIONS:
-            df, metadata = self.read_jeol_nmr_data(file_info=file_info)
+            serialized_df, metadata = self.read_jeol_nmr_data(file_info=file_info)
         else:
             raise RuntimeError(
                 f"Unsupported file extension for NMR reader: {ext} (must be one of {self.accepted_file_extensions})"
             )
 
-        return df
+        state = {key: self.data[key] for key in NMR_PARSE_STATE_KEYS if key in self.data}
+        return pd.DataFrame(serialized_df or {}), state
 
     def generate_nmr_plot(self, parse: bool = True):
         """Generate an NMR plot and store processed data for the
@@ -1,5 +1,6 @@
 import os
 import warnings
+from functools import partial
 from pathlib import Path
 from typing import Any
 
@@ -13,6 +14,7 @@ from scipy.signal import medfilt
 from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
+from pydatalab.parse_cache import cached_parse
 
 
 class RamanBlock(DataBlock):
@@ -103,6 +105,13 @@ class RamanBlock(DataBlock):
 
         return df, metadata, y_options
 
+    @classmethod
+    def _load_for_cache(cls, location: str | Path) -> tuple[pd.DataFrame, dict]:
+        """Wraps `load` to return its extra outputs as a single dictionary,
+        as stored by the parse cache."""
+        df, metadata, y_options = cls.load(location)
+        return df, {"metadata": metadata, "y_options": y_options}
+
     @classmethod
     def _calc_baselines_and_normalize(
         cls,
@@ -224,7 +233,10 @@ class RamanBlock(DataBlock):
                     self.accepted_file_extensions,
                     ext,
                 )
-            pattern_dfs, metadata, y_options = self.load(file_info["location"])
+            pattern_dfs, parsed = cached_parse(
+                file_info, "RamanBlock.load", partial(self._load_for_cache, file_info["location"])
+            )
+            metadata, y_options = parsed["metadata"], parsed["y_options"]
             pattern_dfs = [pattern_dfs]
 
         wavenumber_unit = metadata.get("wavenumber_unit", "Unknown unit")
@@ -243,6 +255,8 @@ class RamanBlock(DataBlock):
                 plot_line=True,
                 plot_points=True,
                 point_size=3,
+                downsample=True,
+                **self._plot_x_range_kwargs(),
             )
 
             self.data["bokeh_plot_data"] = bokeh.embed.json_item(p, theme=DATALAB_BOKEH_THEME)
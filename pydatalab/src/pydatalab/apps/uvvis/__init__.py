@@ -1,4 +1,5 @@
 import warnings
+from functools import partial
 from pathlib import Path
 
 import bokeh.embed
@@ -7,7 +8,8 @@ from bokeh.models import HoverTool
 
 from pydatalab.blocks.base import DataBlock
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
-from pydatalab.file_utils import get_file_info_by_id
+from pydatalab.file_utils import get_file_infos_by_ids
+from pydatalab.parse_cache import cached_parse
 
 from .utils import find_absorbance, parse_uvvis_txt
 
@@ -15,6 +17,7 @@ from .utils import find_absorbance, parse_uvvis_txt
 class UVVisBlock(DataBlock):
     accepted_file_extensions = (".Raw8.txt", ".txt")
     blocktype = "uv-vis"
+    render_cache_file_fields = (*DataBlock.render_cache_file_fields, "selected_file_order")
     name = "UV-Vis"
     description = (
         "This block can plot UV-Vis data from a .txt file. "
@@ -108,9 +111,7 @@ class UVVisBlock(DataBlock):
             return
 
         else:
-            file_info = []
-            for file_id in self.data["selected_file_order"]:
-                file_info.append(get_file_info_by_id((file_id), update_if_live=True))
+            file_info = get_file_infos_by_ids(self.data["selected_file_order"], update_if_live=True)
 
             if len(file_info) < 2:
                 warnings.warn("Not enough files selected - at least 2 required")
@@ -124,10 +125,16 @@ class UVVisBlock(DataBlock):
                         f"Unsupported file extension (must be one of {self.accepted_file_extensions}, not {ext})"
                     )
 
-            reference_data = parse_uvvis_txt(Path(file_info[0]["location"]))
+            reference_data = cached_parse(
+                file_info[0],
+                "parse_uvvis_txt",
+                partial(parse_uvvis_txt, Path(file_info[0]["location"])),
+            )
             absorbance_data = []
             for file in file_info[1:]:
-                sample_data = parse_uvvis_txt(Path(file["location"]))
+                sample_data = cached_parse(
+                    file, "parse_uvvis_txt", partial(parse_uvvis_txt, Path(file["location"]))
+                )
                 if sample_data is None or reference_data is None:
                     warnings.warn("Could not parse the UV-Vis data files")
                     return
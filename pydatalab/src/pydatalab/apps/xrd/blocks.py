@@ -1,5 +1,6 @@
 import os
 import warnings
+from functools import partial
 from pathlib import Path
 
 import bokeh
@@ -11,6 +12,7 @@ from pydatalab.blocks.base import DataBlock, event, generate_js_callback_single_
 from pydatalab.bokeh_plots import DATALAB_BOKEH_THEME, selectable_axes_plot
 from pydatalab.file_utils import get_file_info_by_id
 from pydatalab.logger import LOGGER
+from pydatalab.parse_cache import cached_parse
 
 from .models import PeakInformation
 from .utils import (
@@ -172,6 +174,15 @@ class XRDBlock(DataBlock):
 
         return df, y_options, peak_data
 
+    @classmethod
+    def _load_pattern_for_cache(
+        cls, location: str | Path, wavelength: float
+    ) -> tuple[pd.DataFrame, dict]:
+        """Wraps `load_pattern` to return its extra outputs as a single dictionary,
+        as stored by the parse cache."""
+        df, y_options, peak_data = cls.load_pattern(location, wavelength=wavelength)
+        return df, {"y_options": y_options, "peak_data": peak_data}
+
     @classmethod
     def _calc_baselines_and_normalize(
         cls,
@@ -254,11 +265,14 @@ class XRDBlock(DataBlock):
         y_options: list[str] = []
         for ind, f in enumerate(all_files):
             try:
-                peak_data: dict = {}
-                pattern_df, y_options, peak_data = self.load_pattern(
-                    f["location"],
-                    wavelength=float(self.data.get("wavelength", self.defaults["wavelength"])),
+                wavelength = float(self.data.get("wavelength", self.defaults["wavelength"]))
+                pattern_df, parsed = cached_parse(
+                    f,
+                    "XRDBlock.load_pattern",
+                    partial(self._load_pattern_for_cache, f["location"], wavelength),
+                    options={"wavelength": wavelength},
                 )
+                y_options, peak_data = parsed["y_options"], parsed["peak_data"]
                 pattern_df.attrs["item_id"] = self.data.get("item_id", "unknown")
                 pattern_df.attrs["original_filename"] = f.get("name", "unknown")
                 pattern_df.attrs["wavelength"] = (
@@ -290,6 +304,7 @@ class XRDBlock(DataBlock):
             plot_line=True,
             plot_points=True,
             point_size=3,
+            downsample=True,
             parameters={
                 "wavelength": {
                     "label": "Wavelength (Å)",
@@ -299,4 +314,5 @@ class XRDBlock(DataBlock):
                     ),
                 }
             },
+            **self._plot_x_range_kwargs(),
         )
@@ -0,0 +1,218 @@
+"""Storage of the generated outputs of data blocks outside of their item document.
+
+The fields of a block that are written by its plot functions and analyses
+(`GENERATED_BLOCK_FIELDS`, e.g., the `computed` results of an XRD block) can be
+much larger than everything else in the block, yet they are only needed when
+the block itself is displayed or processed again. Stored inline in
+`items.blocks_obj`, they would be carried by every query of the item, and
+bring items with many blocks close to the BSON document size limit.
+
+When a block is saved with generated fields whose combined BSON encoding is
+larger than `CONFIG.BLOCK_OUTPUTS_INLINE_SIZE` bytes, they are instead stored in
+the `block_outputs` collection, keyed by the SHA-256 hash of that encoding (such
+that identical outputs, e.g., of repeated saves or copied items, are stored
+once), and replaced in the block by that hash under `BLOCK_OUTPUTS_FIELD` (see
+[`store_block_outputs`][pydatalab.block_outputs.store_block_outputs]). Item
+queries that do not need them, such as summaries, search, the item graph and
+version snapshots, therefore never load them, while the routes that do inline
+them again with [`load_block_outputs`][pydatalab.block_outputs.load_block_outputs].
+
+Outputs that are no longer referenced by any block are removed periodically by
+[`cleanup_block_outputs`][pydatalab.block_outputs.cleanup_block_outputs].
+
+"""
+
+import datetime
+import hashlib
+from collections.abc import Iterable
+
+import bson
+from pymongo.database import Database
+
+from pydatalab.logger import LOGGER
+from pydatalab.mongo import flask_mongo
+
+__all__ = (
+    "BLOCK_OUTPUTS_COLLECTION",
+    "BLOCK_OUTPUTS_FIELD",
+    "GENERATED_BLOCK_FIELDS",
+    "store_block_outputs",
+    "load_block_outputs",
+    "cleanup_block_outputs",
+    "offload_inline_block_outputs",
+)
+
+BLOCK_OUTPUTS_COLLECTION = "block_outputs"
+"""The name of the MongoDB collection holding the generated outputs of blocks."""
+
+BLOCK_OUTPUTS_FIELD = "outputs_ref"
+"""The block field holding the hash of its generated outputs, when they are stored
+in `BLOCK_OUTPUTS_COLLECTION`."""
+
+GENERATED_BLOCK_FIELDS = ("bokeh_plot_data", "b64_encoded_image", "computed")
+"""The fields of a block that are generated from its inputs and files, rather than
+set by the user."""
+
+CLEANUP_GRACE_HOURS = 1
+"""Unreferenced outputs are only removed once they have not been stored for this
+many hours, such that outputs stored just before the block referencing them is
+saved are never removed."""
+
+
+def _inline_size() -> int:
+    from pydatalab.config import CONFIG
+
+    return CONFIG.BLOCK_OUTPUTS_INLINE_SIZE
+
+
+def store_block_outputs(block: dict, db: Database | None = None) -> dict:
+    """Move the generated fields of a block, as about to be saved to its item, into
+    the `block_outputs` collection if they are too large to be stored inline.
+
+    Parameters:
+        block: The database representation of the block, e.g., from `DataBlock.to_db()`.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Returns:
+        The block to save, with its generated fields either left in place or
+        replaced by their hash under `BLOCK_OUTPUTS_FIELD`.
+
+    """
+    outputs = {key: block[key] for key in GENERATED_BLOCK_FIELDS if block.get(key) is not None}
+    if not outputs:
+        return block
+
+    encoded = bson.encode(outputs)
+    if len(encoded) <= _inline_size():
+        return {k: v for k, v in block.items() if k != BLOCK_OUTPUTS_FIELD}
+
+    if db is None:
+        db = flask_mongo.db
+
+    outputs_hash = hashlib.sha256(encoded).hexdigest()
+    db[BLOCK_OUTPUTS_COLLECTION].update_one(
+        {"_id": outputs_hash},
+        {
+            "$setOnInsert": {"outputs": outputs, "size": len(encoded)},
+            "$set": {"last_stored": datetime.datetime.now(tz=datetime.timezone.utc)},
+        },
+        upsert=True,
+    )
+
+    stored = {k: v for k, v in block.items() if k not in GENERATED_BLOCK_FIELDS}
+    stored[BLOCK_OUTPUTS_FIELD] = outputs_hash
+    return stored
+
+
+def load_block_outputs(blocks: Iterable[dict | None], db: Database | None = None) -> None:
+    """Inline the generated outputs of the given blocks (as stored in their item)
+    in place, with a single query for all of them.
+
+    Outputs that cannot be found are logged and dropped, such that the block is
+    shown without them until it is next rendered.
+
+    Parameters:
+        blocks: The blocks to update, e.g., the values of an item's `blocks_obj`.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    """
+    blocks = [
+        block for block in blocks if isinstance(block, dict) and block.get(BLOCK_OUTPUTS_FIELD)
+    ]
+    if not blocks:
+        return
+
+    if db is None:
+        db = flask_mongo.db
+
+    hashes = list({block[BLOCK_OUTPUTS_FIELD] for block in blocks})
+    outputs = {
+        doc["_id"]: doc["outputs"]
+        for doc in db[BLOCK_OUTPUTS_COLLECTION].find({"_id": {"$in": hashes}})
+    }
+    for block in blocks:
+        outputs_hash = block.pop(BLOCK_OUTPUTS_FIELD)
+        if outputs_hash in outputs:
+            block.update(outputs[outputs_hash])
+        else:
+            LOGGER.warning(
+                "Generated outputs %s of block %s are missing", outputs_hash, block.get("block_id")
+            )
+
+
+def cleanup_block_outputs(db: Database | None = None) -> int:
+    """Remove stored outputs that are no longer referenced by the block of any item.
+
+    Parameters:
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Returns:
+        The number of outputs removed.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+
+    referenced = [
+        doc["_id"]
+        for doc in db.items.aggregate(
+            [
+                {
+                    "$project": {
+                        "refs": {
+                            "$map": {
+                                "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
+                                "as": "b",
+                                "in": f"$$b.v.{BLOCK_OUTPUTS_FIELD}",
+                            }
+                        }
+                    }
+                },
+                {"$unwind": "$refs"},
+                {"$group": {"_id": "$refs"}},
+            ]
+        )
+        if doc["_id"]
+    ]
+    cutoff = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        hours=CLEANUP_GRACE_HOURS
+    )
+    deleted = (
+        db[BLOCK_OUTPUTS_COLLECTION]
+        .delete_many({"_id": {"$nin": referenced}, "last_stored": {"$lt": cutoff}})
+        .deleted_count
+    )
+    if deleted:
+        LOGGER.info("Removed %d unreferenced block outputs", deleted)
+    return deleted
+
+
+def offload_inline_block_outputs(db: Database | None = None) -> int:
+    """Move the generated outputs of blocks saved before they were stored separately
+    out of their items, wherever they are larger than `CONFIG.BLOCK_OUTPUTS_INLINE_SIZE`.
+
+    Parameters:
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Returns:
+        The number of blocks updated.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+
+    count = 0
+    for item in db.items.find({"blocks_obj": {"$exists": True}}, {"blocks_obj": 1}):
+        update = {}
+        for block_id, block in (item.get("blocks_obj") or {}).items():
+            if not isinstance(block, dict):
+                continue
+            if not any(key in block for key in GENERATED_BLOCK_FIELDS):
+                continue
+            stored = store_block_outputs(block, db=db)
+            if BLOCK_OUTPUTS_FIELD in stored:
+                update[f"blocks_obj.{block_id}"] = stored
+        if update:
+            db.items.update_one({"_id": item["_id"]}, {"$set": update})
+            count += len(update)
+    return count
@@ -1,4 +1,5 @@
 import functools
+import math
 import pprint
 import random
 import traceback
@@ -10,7 +11,12 @@ from pydatalab import __version__
 from pydatalab.logger import LOGGER
 from pydatalab.models.blocks import DataBlockResponse
 
-__all__ = ("generate_random_id", "DataBlock", "generate_js_callback_single_float_parameter")
+__all__ = (
+    "generate_random_id",
+    "DataBlock",
+    "generate_js_callback_single_float_parameter",
+    "generate_js_callback_x_range",
+)
 
 
 def generate_js_callback_single_float_parameter(
@@ -52,6 +58,54 @@ document.dispatchEvent(block_event);
     return code.strip()
 
 
+def generate_js_callback_x_range(
+    event_name: str, parameter: str, block_id: str, debounce_ms: int = 250
+) -> str:
+    """Generates a Bokeh JS callback that can be attached to the `RangesUpdate`
+    and `DoubleTap` events of a plot and used to trigger datalab block events with
+    the visible x-range of the plot, as `{"axis": <x-axis label>, "start": x0, "end": x1}`,
+    or `null` on double tap to return to the full extent of the data.
+
+    Successive range updates (e.g., while scrolling to zoom) are debounced, and
+    updates matching the range the plot was rendered with are ignored. The callback
+    must be given the `xaxis` of the plot and the `current` x-range (or `None`) as args.
+
+    Parameters:
+        event_name: The name of the block method to call.
+        parameter: The name of the parameter to update.
+        block_id: The ID of the block to target for the event.
+        debounce_ms: The time to wait for further range updates before dispatching the event.
+
+    """
+
+    code = (
+        r"""
+const x_range = (cb_obj.x0 === undefined) ? null : {axis: xaxis.axis_label, start: cb_obj.x0, end: cb_obj.x1};
+const tolerance = current ? 1e-6 * Math.abs(current.end - current.start) : 0;
+if (x_range === null ? current === null : (current !== null && x_range.axis === (current.axis ?? x_range.axis)
+        && Math.abs(x_range.start - current.start) <= tolerance && Math.abs(x_range.end - current.end) <= tolerance)) {
+    return;
+}
+window.datalab_range_timers = window.datalab_range_timers ?? {};
+clearTimeout(window.datalab_range_timers['$block_id']);
+window.datalab_range_timers['$block_id'] = setTimeout(() => {
+    const block_event = new CustomEvent('block-event', {
+        detail: {
+            block_id: '$block_id',
+            event_name: '$event_name',
+            $parameter: x_range,
+        }, bubbles: true
+    });
+    document.dispatchEvent(block_event);
+}, $debounce_ms);
+""".replace("$event_name", event_name)
+        .replace("$parameter", parameter)
+        .replace("$debounce_ms", str(int(debounce_ms)))
+        .replace("$block_id", block_id)
+    )
+    return code.strip()
+
+
 def event(func: Callable | None = None) -> Callable:
     """Decorator to register an event with a block."""
 
@@ -136,6 +190,29 @@ class DataBlock:
     version: str = __version__
     """The implementation version of this particular block."""
 
+    render_output_fields: tuple[str, ...] = ("bokeh_plot_data", "computed", "errors", "warnings")
+    """The fields of the block data that are written by its plot functions, rather than
+    set by the user; these are excluded from the render cache key and always stored
+    in the render cache.
+    """
+
+    render_cache_file_fields: tuple[str, ...] = ("file_id", "file_ids")
+    """The fields of the block data that hold the IDs of the files read by the plot
+    functions, whose content hashes form part of the render cache key.
+    """
+
+    view_event_names: tuple[str, ...] = ("set_plot_x_range",)
+    """The names of events that only change how the block is displayed (e.g., the
+    visible range of a plot); processing them re-renders the block without saving it
+    to the database, and the new state is persisted with the next save of the item.
+    """
+
+    _supports_render_cache: bool = True
+    """Whether the output of the plot functions is fully determined by the render
+    cache key, and can therefore be cached; blocks whose rendering has other side
+    effects or inputs (e.g., calls to external services) should set this to `False`.
+    """
+
     def __init__(
         self,
         item_id: str | None = None,
@@ -204,41 +281,67 @@ class DataBlock:
             exclude_none=True,
         )
 
-    def to_web(self) -> dict[str, Any]:
-        """Returns a JSON serializable dictionary to render the data block on the web."""
+    def _render_cache_inputs(self) -> dict[str, Any]:
+        """Return any inputs to the plot functions that are not stored in the block
+        data or the attached files (e.g., properties of the parent item), to be
+        included in the render cache key.
+        """
+        return {}
+
+    def _run_plot_functions(self) -> tuple[list[str], list[str]]:
+        """Run all plot functions, returning any errors and warnings they raised."""
         block_errors = []
         block_warnings = []
-        if self.plot_functions:
-            for plot in self.plot_functions:
-                with warnings.catch_warnings(record=True) as captured_warnings:
-                    try:
-                        plot()
-                    except Exception as e:
-                        tb_list = traceback.extract_tb(e.__traceback__)
-                        last = tb_list[-1]
-                        block_errors.append(f"{self.__class__.__name__} raised error: {e}")
-                        LOGGER.warning(
-                            "Could not create plot for %s due to error at %s:%s in %s → %r:\n\t%s: %s",
-                            self.__class__.__name__,
-                            last.filename,
-                            last.lineno,
-                            last.name,
-                            last.line,
-                            type(e).__name__,
-                            e,
-                        )
-                        LOGGER.debug(
-                            "The full data for the errored block is:\n%s",
-                            pprint.pformat(self.data),
+        for plot in self.plot_functions or ():
+            with warnings.catch_warnings(record=True) as captured_warnings:
+                try:
+                    plot()
+                except Exception as e:
+                    tb_list = traceback.extract_tb(e.__traceback__)
+                    last = tb_list[-1]
+                    block_errors.append(f"{self.__class__.__name__} raised error: {e}")
+                    LOGGER.warning(
+                        "Could not create plot for %s due to error at %s:%s in %s → %r:\n\t%s: %s",
+                        self.__class__.__name__,
+                        last.filename,
+                        last.lineno,
+                        last.name,
+                        last.line,
+                        type(e).__name__,
+                        e,
+                    )
+                    LOGGER.debug(
+                        "The full data for the errored block is:\n%s",
+                        pprint.pformat(self.data),
+                    )
+                finally:
+                    if captured_warnings:
+                        block_warnings.extend(
+                            [
+                                f"{self.__class__.__name__} raised warning: {w.message}"
+                                for w in captured_warnings
+                            ]
                         )
-                    finally:
-                        if captured_warnings:
-                            block_warnings.extend(
-                                [
-                                    f"{self.__class__.__name__} raised warning: {w.message}"
-                                    for w in captured_warnings
-                                ]
-                            )
+        return block_errors, block_warnings
+
+    def to_web(self) -> dict[str, Any]:
+        """Returns a JSON serializable dictionary to render the data block on the web.
+
+        The output of the plot functions is taken from the
+        [render cache][pydatalab.render_cache] if the block has been rendered
+        before with the same data and files.
+
+        """
+        from pydatalab.render_cache import load_rendered, store_rendered
+
+        cache_key, file_hashes, cached = load_rendered(self)
+        if cached is not None:
+            self.data.update(cached)
+            block_errors = cached.get("errors") or []
+            block_warnings = cached.get("warnings") or []
+        else:
+            data_before = dict(self.data)
+            block_errors, block_warnings = self._run_plot_functions()
 
         # Opportunistically convert the data to a dict if it is already a pydantic model
         if not isinstance(self.data, dict):
@@ -254,6 +357,14 @@ class DataBlock:
         else:
             self.data.pop("warnings", None)
 
+        if cached is None and cache_key is not None and not block_errors:
+            output = {
+                key: value
+                for key, value in self.data.items()
+                if key in self.render_output_fields or value is not data_before.get(key)
+            }
+            store_rendered(self, cache_key, file_hashes, output)
+
         return self.block_db_model(**self.data).dict(exclude_unset=True, exclude_none=True)
 
     def process_events(self, events: list[dict] | dict):
@@ -290,6 +401,53 @@ class DataBlock:
         )
         self.data["kwargs"] = kwargs["kwargs"]
 
+    @event()
+    def set_plot_x_range(self, plot_x_range: dict[str, Any] | None = None):
+        """Set the visible x-range of the block's plot, e.g., after the user zoomed in,
+        such that it is re-rendered with the full-resolution data within that range.
+        Passing `None` returns to the full extent of the data.
+
+        Only used by blocks that pass `_plot_x_range_kwargs()` to their plotting function.
+
+        """
+        if not plot_x_range:
+            self.data.pop("plot_x_range", None)
+            return
+
+        try:
+            start, end = float(plot_x_range["start"]), float(plot_x_range["end"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid plot x-range: {plot_x_range}")
+
+        if not (math.isfinite(start) and math.isfinite(end)) or start == end:
+            raise ValueError(f"Invalid plot x-range: {plot_x_range}")
+
+        axis = plot_x_range.get("axis")
+        self.data["plot_x_range"] = {
+            "axis": str(axis) if axis else None,
+            "start": start,
+            "end": end,
+        }
+
+    def _plot_x_range_kwargs(self) -> dict[str, Any]:
+        """Returns the arguments that make a plot re-render the data within its visible
+        x-range on zoom, to be passed to the plotting functions in `pydatalab.bokeh_plots`."""
+        return {
+            "x_window": self.data.get("plot_x_range"),
+            "x_range_event": generate_js_callback_x_range(
+                "set_plot_x_range", "plot_x_range", self.block_id
+            ),
+        }
+
+    def is_view_event(self, events: list[dict] | dict | None) -> bool:
+        """Whether the given events only change how the block is displayed,
+        see [`view_event_names`][pydatalab.blocks.base.DataBlock.view_event_names]."""
+        if not events:
+            return False
+        if isinstance(events, dict):
+            events = [events]
+        return all(event.get("event_name") in self.view_event_names for event in events)
+
     @classmethod
     def _get_events(cls) -> dict[str, Callable]:
         events = {}
@@ -46,6 +46,7 @@ class MediaBlock(DataBlock):
         ".svg",
     )
     _supports_collections = False
+    render_output_fields = (*DataBlock.render_output_fields, "b64_encoded_image")
 
     @property
     def plot_functions(self):
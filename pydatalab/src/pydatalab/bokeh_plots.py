@@ -1,3 +1,5 @@
+import base64
+import sys
 import warnings
 from collections.abc import Sequence
 
@@ -5,7 +7,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from bokeh.events import DoubleTap
+from bokeh.events import DoubleTap, RangesUpdate
 from bokeh.layouts import column, gridplot
 from bokeh.models import (
     Button,
@@ -28,6 +30,8 @@ from bokeh.plotting import figure
 from bokeh.themes import Theme
 from scipy.signal import find_peaks
 
+from .config import CONFIG
+from .utils.downsampling import downsample_df, select_x_window
 from .utils.plotting import generate_unique_labels
 
 FONTSIZE = "12pt"
@@ -228,6 +232,9 @@ def selectable_axes_plot(
     show_table: bool = False,
     use_unique_labels: bool = True,
     parameters: dict | None = None,
+    downsample: bool = False,
+    x_window: dict | None = None,
+    x_range_event: str | None = None,
     **kwargs,
 ):
     """
@@ -272,6 +279,13 @@ def selectable_axes_plot(
         use_unique_labels: Whether to shorten labels via generate_unique_labels. Set to False
             when dict keys are already clean human-readable labels (e.g. "Cycle 0") and should
             be used verbatim. Defaults to True for backwards compatibility with filename-based labels.
+        downsample: Whether to downsample each series to at most `CONFIG.PLOT_MAX_POINTS`
+            points (preserving the features of every numeric y option) before embedding it in
+            the plot; the exported .csv then also only contains the plotted points.
+        x_window: The x-range selected by the user, as `{"axis": ..., "start": ..., "end": ...}`,
+            to which the plot is restricted (and within which the data is downsampled) initially.
+        x_range_event: A JS callback (see `generate_js_callback_x_range`) to call when the user
+            changes the x-range of the plot, to request the data within the new range.
 
     Returns:
         Bokeh layout
@@ -318,6 +332,11 @@ def selectable_axes_plot(
     else:
         y_label = y_default
 
+    x_window = _resolve_x_window(x_window, x_options)
+    if x_window:
+        x_default = x_window["axis"] or x_default
+        kwargs["x_range"] = (x_window["start"], x_window["end"])
+
     x_axis_label = x_default if label_x else ""
     y_axis_label = y_label if label_y else ""
 
@@ -420,6 +439,18 @@ def selectable_axes_plot(
 
         label = legend_labels[ind] if legend_labels else ""
 
+        if x_window:
+            df_ = select_x_window(df_, x_default, x_window["start"], x_window["end"])
+
+        if downsample and CONFIG.PLOT_MAX_POINTS:
+            df_ = downsample_df(
+                df_,
+                CONFIG.PLOT_MAX_POINTS,
+                x=x_default,
+                y=[c for c in y_options if c in df_ and pd.api.types.is_numeric_dtype(df_[c])],
+                mode=CONFIG.PLOT_DOWNSAMPLING_MODE,
+            )
+
         if hasattr(df_, "attrs"):
             for attr in ["item_id", "original_filename", "wavelength"]:
                 if attr in df_.attrs:
@@ -628,9 +659,25 @@ def selectable_axes_plot(
     layout = column(*plot_columns, sizing_mode="scale_width")
 
     p.js_on_event(DoubleTap, CustomJS(args=dict(p=p), code="p.reset.emit()"))
+    if x_range_event:
+        _add_x_range_callback(p, x_window, x_range_event)
     return layout
 
 
+def _resolve_x_window(x_window: dict | None, x_options: Sequence[str]) -> dict | None:
+    """Return the given x-window if it applies to one of the x-axis options of a plot."""
+    if not x_window or (x_window.get("axis") and x_window["axis"] not in x_options):
+        return None
+    return x_window
+
+
+def _add_x_range_callback(p, x_window: dict | None, x_range_event: str) -> None:
+    """Dispatch the given block event when the user changes the x-range of the figure."""
+    callback = CustomJS(args=dict(xaxis=p.xaxis[0], current=x_window), code=x_range_event)
+    p.js_on_event(RangesUpdate, callback)
+    p.js_on_event(DoubleTap, callback)
+
+
 def double_axes_echem_plot(
     dfs: pd.DataFrame | list[pd.DataFrame],
     mode: str | None = None,
@@ -639,6 +686,8 @@ def double_axes_echem_plot(
     pick_peaks: bool = True,
     normalized: bool = False,
     plotting_mode: str | None = None,
+    x_window: dict | None = None,
+    x_range_event: str | None = None,
     **kwargs,
 ) -> gridplot:
     """Creates a Bokeh plot for electrochemistry data.
@@ -655,6 +704,10 @@ def double_axes_echem_plot(
         pick_peaks: Whether or not to pick and plot the peaks in dV/dQ mode.
         normalized: Whether or not the dataframes contain data normalised by mass
         plotting_mode: Single, multi, or comparison mode to control legends and colors.
+        x_window: The x-range selected by the user, as `{"axis": ..., "start": ..., "end": ...}`,
+            to which the voltage plot is restricted initially.
+        x_range_event: A JS callback (see `generate_js_callback_x_range`) to call when the user
+            changes the x-range of the voltage plot, to request the data within the new range.
 
     Returns: The Bokeh layout.
     """
@@ -686,13 +739,27 @@ def double_axes_echem_plot(
 
     x_options = list(x_options)
 
+    x_window = _resolve_x_window(x_window, x_options)
+    x_range_options = {}
+    if x_window:
+        x_default = x_window["axis"] or x_default
+        x_range_options["x_range"] = (x_window["start"], x_window["end"])
+        dfs = [
+            select_x_window(df, x_default, x_window["start"], x_window["end"])
+            if x_default in df
+            else df
+            for df in dfs
+        ]
+
     cmap = plt.get_cmap("inferno")
 
     plots = []
     # normal plot
     # x_label = "Capacity (mAh/g)" if x_default == "Capacity normalized" else x_default
     x_label = x_default
-    p1 = figure(x_axis_label=x_label, y_axis_label="voltage (V)", **common_options)
+    p1 = figure(
+        x_axis_label=x_label, y_axis_label="voltage (V)", **x_range_options, **common_options
+    )
     p1.xaxis.ticker.desired_num_ticks = 5
     plots.append(p1)
 
@@ -981,6 +1048,8 @@ def double_axes_echem_plot(
         if mode:
             p.add_tools(crosshair)
         p.js_on_event(DoubleTap, CustomJS(args=dict(p=p), code="p.reset.emit()"))
+    if x_range_event:
+        _add_x_range_callback(p1, x_window, x_range_event)
 
     if mode == "dQ/dV":
         save_data = Button(label="Download .csv", button_type="primary", width_policy="min")
@@ -1016,3 +1085,48 @@ def double_axes_echem_plot(
         grid = [[p1], [xaxis_select], [yaxis_select]]
 
     return gridplot(grid, sizing_mode="scale_width", toolbar_location="below")
+
+
+def encode_column_data(plot_data: dict, min_length: int = 64) -> dict:
+    """Re-encode the numeric column data of a serialized Bokeh plot (as returned by
+    `bokeh.embed.json_item`) that Bokeh left as plain JSON lists (e.g., integer and
+    index columns) with Bokeh's typed base64 array encoding, which BokehJS decodes
+    straight into typed arrays.
+
+    Parameters:
+        plot_data: The serialized plot, modified in place.
+        min_length: The minimum length of a column for it to be re-encoded.
+
+    Returns:
+        The modified plot data.
+
+    """
+    for reference in plot_data.get("doc", {}).get("roots", {}).get("references", []):
+        if reference.get("type") != "ColumnDataSource":
+            continue
+        data = reference.get("attributes", {}).get("data", {})
+        for name, values in data.items():
+            if not isinstance(values, list) or len(values) < min_length:
+                continue
+            if isinstance(values[0], (bool, str)) or not isinstance(values[0], (int, float)):
+                continue
+            try:
+                array = np.asarray(values)
+            except (ValueError, TypeError):
+                continue
+            if array.ndim != 1:
+                continue
+            if array.dtype.kind not in "iuf":
+                continue
+            int32 = np.iinfo(np.int32)
+            if array.dtype.kind in "iu" and int32.min <= array.min() and array.max() <= int32.max:
+                array = array.astype(np.int32)
+            else:
+                array = array.astype(np.float64)
+            data[name] = {
+                "__ndarray__": base64.b64encode(array.tobytes()).decode("ascii"),
+                "dtype": array.dtype.name,
+                "order": sys.byteorder,
+                "shape": list(array.shape),
+            }
+    return plot_data
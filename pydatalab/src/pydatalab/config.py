@@ -4,7 +4,7 @@ import logging
 import os
 import platform
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import (
     AnyUrl,
@@ -193,6 +193,61 @@ class ServerConfig(BaseSettings):
         description="The minimum age, in minutes, of the remote filesystem cache, below which the cache will not be invalidated if an update is manually requested.",
     )
 
+    REMOTE_CACHE_RELIST_AGE: int = Field(
+        1440,
+        ge=0,
+        description="The maximum age, in minutes, of the listing of a remote directory, after which it is listed again when the remote filesystem cache is updated, even if the directory itself has not been modified. This picks up files modified in place, which do not change the modification time of their directory. Set to 0 to re-list every directory on every update.",
+    )
+
+    REMOTE_SSH_CONTROL_PERSIST: int = Field(
+        300,
+        ge=0,
+        description="The time, in seconds, for which an SSH connection to a remote filesystem is kept open after its last use, such that subsequent commands (e.g., syncing live files) reuse it rather than opening a new connection. Set to 0 to disable connection sharing.",
+    )
+
+    REMOTE_SYNC_MAX_WORKERS: int = Field(
+        4,
+        ge=1,
+        description="The maximum number of live files to sync with their remote filesystems concurrently.",
+    )
+
+    PARSE_CACHE_DIRECTORY: str | Path | None = Field(
+        None,
+        description="The directory in which to cache parsed instrument data, keyed by file content. Defaults to a `datalab-parse-cache` directory in the system temporary directory.",
+    )
+
+    PARSE_CACHE_MAX_SIZE_MB: int = Field(
+        1024,
+        description="The maximum total size, in megabytes, of the parsed data cache, above which the least recently used entries are evicted. Set to `0` to disable the cache.",
+    )
+
+    BLOCK_RENDER_CACHE_TTL: int = Field(
+        24 * 7,
+        description="The time, in hours, for which the rendered output (e.g., plots) of each data block is cached after it was last used. Set to `0` to disable the cache.",
+    )
+
+    BLOCK_OUTPUTS_INLINE_SIZE: int = Field(
+        16 * 1024,
+        ge=0,
+        description="The maximum size, in bytes, of the generated outputs of a block (e.g., `computed` data) that are stored within its item; larger outputs are stored in a separate collection and only loaded when the block is shown or processed.",
+    )
+
+    PLOT_MAX_POINTS: int = Field(
+        2000,
+        ge=0,
+        description="The maximum number of points per data series embedded in the interactive plots of blocks that support downsampling; larger series are reduced with `PLOT_DOWNSAMPLING_MODE`. Set to `0` to always embed every point.",
+    )
+
+    PLOT_DOWNSAMPLING_MODE: Literal["lttb", "minmax"] = Field(
+        "lttb",
+        description="The algorithm used to downsample plotted data series: either `'lttb'` (Largest-Triangle-Three-Buckets, which best preserves the visual shape of the curve) or `'minmax'` (which keeps the minimum and maximum of each bucket of points).",
+    )
+
+    PERMISSIONS_CACHE_TTL: int = Field(
+        30,
+        description="The time, in seconds, for which each server process caches the users managed by each user when computing permissions. Changes made via the admin routes are applied immediately within the process that made them. Set to `0` to disable caching.",
+    )
+
     BEHIND_REVERSE_PROXY: bool = Field(
         False,
         description="Whether the Flask app is being deployed behind a reverse proxy. If `True`, the reverse proxy middleware described in the [Flask docs](https://flask.palletsprojects.com/en/2.2.x/deploying/proxy_fix/) will be attached to the app.",
@@ -203,6 +258,16 @@ class ServerConfig(BaseSettings):
         description="Whether to offload large file/export downloads to the reverse proxy via the `X-Accel-Redirect` header rather than streaming them through a Flask worker. Requires an **nginx** proxy with a matching `internal` location; leave `False` for other proxies (Caddy, traefik) or when running without a proxy.",
     )
 
+    USE_X_ACCEL_REDIRECT_FILES: bool = Field(
+        False,
+        description="Whether to offload downloads of stored files to the reverse proxy via the `X-Accel-Redirect` header, as `USE_X_ACCEL_REDIRECT` does for exports. Requires an **nginx** proxy with an `internal` `/_protected_files/` location aliasing `FILE_DIRECTORY`, in addition to the `/_protected_exports/` location used for exports.",
+    )
+
+    USE_X_SENDFILE: bool = Field(
+        False,
+        description="Direct mapping to the equivalent Flask setting. Whether to offload file/export downloads to a front-end server that supports the `X-Sendfile` header (e.g., Apache with `mod_xsendfile`, or lighttpd) rather than streaming them through a Flask worker. For nginx, use `USE_X_ACCEL_REDIRECT` instead.",
+    )
+
     GITHUB_ORG_ALLOW_LIST: list[str] | None = Field(
         [],
         description="A list of GitHub organization IDs (available from `https://api.github.com/orgs/<org_name>`, and are immutable) or organisation names (which can change, so be warned), that the membership of which will be required to register a new datalab account. Setting the value to `None` will allow any GitHub user to register an account.",
@@ -246,16 +311,58 @@ Warning: this value will overwrite any other values passed to `FLASK_MAX_CONTENT
 its importance when deploying a datalab instance.""",
     )
 
+    UPLOAD_CHUNK_SIZE: int = Field(
+        16 * 1024**2,
+        gt=0,
+        description="""The chunk size (in bytes) suggested to clients for resumable uploads via `/uploads/`.
+Each chunk is sent in its own request, so this must be smaller than `MAX_CONTENT_LENGTH`.""",
+    )
+
+    UPLOAD_SESSION_MAX_AGE: int = Field(
+        24,
+        ge=1,
+        description="The number of hours after which unfinished resumable uploads are removed.",
+    )
+
+    EXPORT_MAX_WORKERS: int = Field(
+        4,
+        ge=1,
+        description="The maximum number of threads reading and compressing files concurrently when writing a `.eln` export archive.",
+    )
+
+    ECHEM_PARSE_MAX_WORKERS: int = Field(
+        4,
+        ge=1,
+        description="The maximum number of processes parsing echem files concurrently when a cycle block stitches or compares several files that are not yet in the parse cache.",
+    )
+
     MAX_BATCH_CREATE_SIZE: int = Field(
         10_000,
         description="Maximum number of items that can be created in a single batch operation.",
     )
 
+    ITEM_SUMMARY_SYNC_INTERVAL: int = Field(
+        60,
+        ge=0,
+        description="The minimum interval, in seconds, between checks (per server process) for items that were inserted or deleted outside of the API and whose summaries are therefore missing from, or orphaned in, the item tables. The check is made when items are listed. Set to 0 to check on every listing.",
+    )
+
     ASYNC_BLOCK_TYPES: list[str] = Field(
         [],
         description="A list of block type slugs (e.g. ['cycle', 'xrd']) that should be processed asynchronously via the task queue. Defaults to no blocks.",
     )
 
+    TASK_WORKERS: int = Field(
+        4,
+        ge=1,
+        description="The number of worker threads (per server process) used to run asynchronous block processing and export tasks.",
+    )
+
+    ASYNC_BLOCK_CONCURRENCY: dict[str, int] = Field(
+        {},
+        description="A mapping from block type slug to the maximum number of blocks of that type that may be processed concurrently (per server process), e.g., `{'cycle': 1}` to stop large echem parses from occupying every task worker.",
+    )
+
     BACKUP_STRATEGIES: dict[str, BackupStrategy] | None = Field(
         {
             "daily-snapshots": BackupStrategy(
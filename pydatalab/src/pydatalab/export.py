@@ -1,14 +1,30 @@
 """This module implements methods for exporting datalab data
 to other formats, such as .eln files.
+
+Archives are written with a [`ZipStreamWriter`][pydatalab.utils.zip_stream.ZipStreamWriter]:
+files are read and deflated ahead of the writer by a pool of up to
+`CONFIG.EXPORT_MAX_WORKERS` threads (or stored as-is, for formats that are
+already compressed, see [`STORED_EXTENSIONS`][pydatalab.export.STORED_EXTENSIONS]),
+and the archive is written sequentially, such that it can be streamed to a
+client as it is produced (see [`stream_eln_file`][pydatalab.export.stream_eln_file]).
+
 """
 
 import json
+import os
+import queue
+import stat
+import threading
 import zipfile
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import IO, NamedTuple
 
 from pydatalab import __version__
+from pydatalab.block_outputs import load_block_outputs
 from pydatalab.config import CONFIG
 from pydatalab.logger import LOGGER
 from pydatalab.models import ITEM_MODELS
@@ -18,8 +34,15 @@ from pydatalab.routes.v0_1.items import (
     files_lookup,
     groups_lookup,
 )
-
-__all__ = ("generate_ro_crate_metadata", "create_eln_file")
+from pydatalab.utils.zip_stream import ZipStreamWriter, deflate_file
+
+__all__ = (
+    "generate_ro_crate_metadata",
+    "create_eln_file",
+    "stream_eln_file",
+    "write_eln_file",
+    "compression_type",
+)
 
 StageCallback = Callable[..., None]
 """A callback invoked with progress messages as the export proceeds.
@@ -40,6 +63,71 @@ described as a file in its own right. Extend this tuple to capture further
 representation formats.
 """
 
+STORED_EXTENSIONS: tuple[str, ...] = (
+    ".zip",
+    ".eln",
+    ".gz",
+    ".tgz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".7z",
+    ".rar",
+    ".parquet",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".mp4",
+    ".mov",
+    ".docx",
+    ".xlsx",
+    ".pptx",
+    ".odt",
+    ".ods",
+)
+"""File extensions of formats that are already compressed, which are stored in
+export archives as-is rather than deflated again for (next to) no gain.
+
+All other files, including text formats such as `.csv`, `.txt` or `.json` and
+uncompressed binary instrument data, are deflated; any that turn out not to
+compress are also stored as-is.
+"""
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+"""The approximate size, in bytes, of the chunks in which a streamed archive is sent."""
+
+STREAM_QUEUE_SIZE = 8
+"""The number of chunks of a streamed archive that may be produced ahead of the
+client receiving them."""
+
+
+def compression_type(filename: str) -> int:
+    """Return the compression method with which a file is written to export archives:
+    `zipfile.ZIP_STORED` if it has one of the [`STORED_EXTENSIONS`][pydatalab.export.STORED_EXTENSIONS],
+    otherwise `zipfile.ZIP_DEFLATED`."""
+    if filename.lower().endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _stat_alternative_representations(source_path: Path) -> list[tuple[Path, os.stat_result]]:
+    file_dir = source_path.parent
+    matches: dict[Path, os.stat_result] = {}
+    for pattern in ALTERNATIVE_REPRESENTATION_PATTERNS:
+        for match in file_dir.glob(pattern):
+            if match == source_path or match in matches:
+                continue
+            try:
+                match_stat = match.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(match_stat.st_mode):
+                matches[match] = match_stat
+
+    return sorted(matches.items())
+
 
 def find_alternative_representations(source_path: Path) -> list[Path]:
     """Find alternative representation files stored alongside ``source_path``.
@@ -55,34 +143,84 @@ def find_alternative_representations(source_path: Path) -> list[Path]:
         A sorted, de-duplicated list of matching sibling paths.
 
     """
-    file_dir = source_path.parent
-    matches: list[Path] = []
-    seen: set[Path] = set()
-    for pattern in ALTERNATIVE_REPRESENTATION_PATTERNS:
-        for match in file_dir.glob(pattern):
-            if match == source_path or match in seen or not match.is_file():
-                continue
-            seen.add(match)
-            matches.append(match)
+    return [path for path, _ in _stat_alternative_representations(source_path)]
+
+
+class _FileEntry(NamedTuple):
+    """A file on disk to be written to an export archive."""
 
-    return sorted(matches)
+    path: Path
+    arcname: str
+    mtime: float
+    compress_type: int
+
+
+def _stat_export_files(items: list[dict]) -> dict[str, list[tuple[Path, os.stat_result]]]:
+    """Stat every file of the given items, and their alternative representations, once.
+
+    Returns:
+        A dictionary mapping the location of each file found on disk to a list of
+        the paths and stats of the file itself followed by those of its
+        alternative representations.
+
+    """
+    file_stats: dict[str, list[tuple[Path, os.stat_result]]] = {}
+    for item in items:
+        for file in item.get("files", []):
+            location = file.get("location")
+            if not location or location in file_stats:
+                continue
+            source_path = Path(location)
+            try:
+                file_stats[location] = [(source_path, source_path.stat())]
+            except OSError:
+                continue
+            file_stats[location].extend(_stat_alternative_representations(source_path))
+    return file_stats
+
+
+def _prefetch(
+    func: Callable[[Path], object], paths: Sequence[Path], pool: ThreadPoolExecutor, window: int
+) -> Iterator[Future]:
+    """Yield the futures of `func` called on each of `paths` in order, keeping at
+    most `window` calls submitted to the pool ahead of the consumer."""
+    pending: deque[Future] = deque()
+    remaining = iter(paths)
+    try:
+        for path in remaining:
+            pending.append(pool.submit(func, path))
+            if len(pending) >= window:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
 
 
 def write_eln_file(
-    root_folder_name, items, info, output_path, on_stage=None, primary_key="item_id"
+    root_folder_name,
+    items,
+    info,
+    output_path: "str | os.PathLike | IO[bytes]",
+    on_stage=None,
+    primary_key="item_id",
 ) -> None:
-    """Write an ELN file to disk containing the given items and collection metadata.
+    """Write an ELN file containing the given items and collection metadata.
 
     Each entry is streamed directly into the output zip archive as it is
     processed, rather than first being staged in an intermediate directory.
-    This avoids copying every uploaded file twice and keeping a second full copy
-    of the export on disk.
+    Files are read and deflated ahead of the writer by a pool of up to
+    `CONFIG.EXPORT_MAX_WORKERS` threads, except for those stored as-is (see
+    [`compression_type`][pydatalab.export.compression_type]). Every file is only
+    stat'ed once, both to describe it in the RO-Crate metadata and to archive it.
 
     Parameters:
         root_folder_name: The name of the root folder in the ELN file.
         items: List of items to include in the ELN file, with all metadata and file info included.
         info: Metadata for the collection (or item) being exported.
-        output_path: Path where the .eln file should be saved.
+        output_path: Path where the .eln file should be saved, or a binary stream
+            to write it to (which need not be seekable).
         on_stage: Optional `StageCallback` invoked with a progress message
             as each entry is archived.
         primary_key: The item field used to key item folders in the archive
@@ -94,54 +232,185 @@ def write_eln_file(
     total = len(items)
     root_folder = Path(root_folder_name)
 
-    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as zipf:
-        ro_crate_metadata = generate_ro_crate_metadata(info, items, primary_key=primary_key)
-        zipf.writestr(
-            str(root_folder / "ro-crate-metadata.json"),
-            json.dumps(ro_crate_metadata, ensure_ascii=False, indent=2),
-        )
-
-        # Emit ~10 progress stages across the whole export regardless of size, so
-        # the stored `stages` list stays small (and well clear of MongoDB's 16MB
-        # document limit) for large collections.
-        stage_interval = max(1, total // 10)
-
-        for ind, item in enumerate(items):
-            if on_stage is not None and (ind % stage_interval == 0 or ind == total - 1):
-                on_stage(f"Archiving entry {ind + 1}/{total}: {item[primary_key]}")
-
-            item_folder = root_folder / item[primary_key]
-
-            item_metadata = ITEM_MODELS[item.get("type")](**item).json(indent=2)
-            zipf.writestr(str(item_folder / "metadata.json"), item_metadata)
-
-            for file in item.get("files", []):
-                source_path = Path(file["location"])
-                if source_path.exists():
-                    zipf.write(source_path, str(item_folder / file["name"]))
-
-                    # Include any alternative representations stored alongside the file.
-                    for alt in find_alternative_representations(source_path):
-                        zipf.write(alt, str(item_folder / alt.name))
-                else:
-                    LOGGER.warning("ELN export: File not found on disk: %s", file["location"])
-                    if on_stage is not None:
-                        on_stage(
-                            f"File not found on disk, skipping: {file['name']}", level="warning"
+    file_stats = _stat_export_files(items)
+    item_files: list[list[_FileEntry]] = []
+    for item in items:
+        entries = []
+        for file in item.get("files", []):
+            representations = file_stats.get(file.get("location"), [])
+            for index, (path, path_stat) in enumerate(representations):
+                # The original file is archived under its uploaded name, and its
+                # alternative representations under their names on disk
+                name = path.name if index else file["name"]
+                entries.append(
+                    _FileEntry(
+                        path,
+                        str(root_folder / item[primary_key] / name),
+                        path_stat.st_mtime,
+                        compression_type(name),
+                    )
+                )
+        item_files.append(entries)
+
+    if isinstance(output_path, (str, os.PathLike)):
+        output = open(output_path, "wb")  # noqa: SIM115
+    else:
+        output = output_path
+
+    try:
+        with (
+            ThreadPoolExecutor(
+                max_workers=CONFIG.EXPORT_MAX_WORKERS, thread_name_prefix="eln-export"
+            ) as pool,
+            ZipStreamWriter(output) as writer,
+        ):
+            deflated_files = _prefetch(
+                deflate_file,
+                [
+                    entry.path
+                    for entries in item_files
+                    for entry in entries
+                    if entry.compress_type == zipfile.ZIP_DEFLATED
+                ],
+                pool,
+                window=2 * CONFIG.EXPORT_MAX_WORKERS,
+            )
+
+            ro_crate_metadata = generate_ro_crate_metadata(
+                info, items, primary_key=primary_key, file_stats=file_stats
+            )
+            writer.write_bytes(
+                str(root_folder / "ro-crate-metadata.json"),
+                json.dumps(ro_crate_metadata, ensure_ascii=False, indent=2).encode("utf-8"),
+            )
+
+            # Emit ~10 progress stages across the whole export regardless of size, so
+            # the stored `stages` list stays small (and well clear of MongoDB's 16MB
+            # document limit) for large collections.
+            stage_interval = max(1, total // 10)
+
+            for ind, item in enumerate(items):
+                if on_stage is not None and (ind % stage_interval == 0 or ind == total - 1):
+                    on_stage(f"Archiving entry {ind + 1}/{total}: {item[primary_key]}")
+
+                item_folder = root_folder / item[primary_key]
+
+                item_metadata = ITEM_MODELS[item.get("type")](**item).json(indent=2)
+                writer.write_bytes(
+                    str(item_folder / "metadata.json"), item_metadata.encode("utf-8")
+                )
+
+                for file in item.get("files", []):
+                    if file.get("location") not in file_stats:
+                        LOGGER.warning(
+                            "ELN export: File not found on disk: %s", file.get("location")
                         )
-
-        if on_stage is not None:
-            on_stage(f"Finished archiving {total} entries")
+                        if on_stage is not None:
+                            on_stage(
+                                f"File not found on disk, skipping: {file['name']}",
+                                level="warning",
+                            )
+
+                for entry in item_files[ind]:
+                    if entry.compress_type == zipfile.ZIP_STORED:
+                        writer.write_file(entry.arcname, entry.path, timestamp=entry.mtime)
+                        continue
+
+                    deflated = next(deflated_files).result()
+                    with deflated.data:
+                        if deflated.compressed_size < deflated.size:
+                            writer.write_deflated(entry.arcname, deflated, timestamp=entry.mtime)
+                        else:
+                            writer.write_file(entry.arcname, entry.path, timestamp=entry.mtime)
+
+            if on_stage is not None:
+                on_stage(f"Finished archiving {total} entries")
+    finally:
+        if output is not output_path:
+            output.close()
+
+
+class _ExportCancelled(Exception):
+    """Raised in the thread writing a streamed archive once its client has gone."""
+
+
+class _ChunkQueueWriter:
+    """A write-only stream that hands the data written to it on to a queue in
+    chunks of about `STREAM_CHUNK_SIZE` bytes, blocking while the queue is full."""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def put(self, chunk: object) -> None:
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                pass
+        raise _ExportCancelled
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        if len(self.buffer) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+
+def _stream_archive(
+    root_folder_name: str, items: list[dict], info: dict, primary_key: str
+) -> Iterator[bytes]:
+    chunks: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+    writer = _ChunkQueueWriter(chunks, cancelled)
+
+    def produce():
+        try:
+            write_eln_file(root_folder_name, items, info, writer, primary_key=primary_key)
+            writer.flush()
+            writer.put(None)
+        except _ExportCancelled:
+            pass
+        except Exception as exc:
+            try:
+                writer.put(exc)
+            except _ExportCancelled:
+                pass
+
+    thread = threading.Thread(target=produce, name="eln-export-stream", daemon=True)
+    thread.start()
+    try:
+        while (chunk := chunks.get()) is not None:
+            if isinstance(chunk, Exception):
+                LOGGER.error("ELN export stream of %s failed: %r", root_folder_name, chunk)
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
 
 
 def generate_ro_crate_metadata(
-    collection_data: dict, child_items: list[dict], primary_key: str = "item_id"
+    collection_data: dict,
+    child_items: list[dict],
+    primary_key: str = "item_id",
+    file_stats: dict[str, list[tuple[Path, os.stat_result]]] | None = None,
 ) -> dict:
     """Generate RO-Crate metadata for the .eln file.
 
     Parameters:
         collection_data: The collection metadata
         child_items: List of items in the collection
+        primary_key: The item field used to key item folders in the archive.
+        file_stats: The paths and stats of each file (by location) followed by those of
+            its alternative representations, as already gathered when writing the
+            archive; if not provided, alternative representations are looked up on disk.
 
     Returns:
         RO-Crate metadata as a dictionary
@@ -247,19 +516,23 @@ def generate_ro_crate_metadata(
 
             # Describe any alternative representations stored alongside the file.
             if file.get("location"):
-                for alt in find_alternative_representations(Path(file["location"])):
+                if file_stats is not None:
+                    alternatives = file_stats.get(file["location"], [])[1:]
+                else:
+                    alternatives = _stat_alternative_representations(Path(file["location"]))
+                for alt, alt_stat in alternatives:
                     alt_id = f"./{item[primary_key]}/{alt.name}"
                     files.append({"@id": alt_id})
 
                     alt_metadata = {
                         "@id": alt_id,
                         "@type": "File",
-                        "contentSize": alt.stat().st_size,
+                        "contentSize": alt_stat.st_size,
                         "name": alt.name,
                         "description": f"Alternative representation of {file['name']}",
                     }
 
-                    alt_mtime = datetime.fromtimestamp(alt.stat().st_mtime, tz=timezone.utc)
+                    alt_mtime = datetime.fromtimestamp(alt_stat.st_mtime, tz=timezone.utc)
                     alt_metadata["dateCreated"] = alt_mtime.isoformat()
 
                     files_metadata.append(alt_metadata)
@@ -308,25 +581,16 @@ def generate_ro_crate_metadata(
     return metadata
 
 
-def create_eln_file(
-    output_path: str,
+def _resolve_export(
     collection_id: str | None = None,
     item_id: str | None = None,
     related_item_ids: list[str] | None = None,
-    on_stage: "StageCallback | None" = None,
-    primary_key: str = "item_id",
-) -> None:
-    """Create a .eln file for a collection, item, or set of items.
+) -> tuple[str, list[dict], dict]:
+    """Load the items to export for a collection, item, or set of items.
 
-    Parameters:
-        collection_id: ID of the collection to export
-        output_path: Path where the .eln file should be saved
-        item_id: ID of the item to export
-        related_item_ids: List of related item IDs to include in the export.
-        on_stage: Optional `StageCallback` invoked with progress messages
-            as the export proceeds.
-        primary_key: The item field used to key item folders in the archive
-            (`"item_id"` by default, or `"refcode"` for stable identifiers).
+    Returns:
+        The name of the root folder of the archive, the items (with their
+        creators, groups and files) and the metadata of the export as a whole.
 
     """
     if not collection_id and not item_id:
@@ -418,12 +682,44 @@ def create_eln_file(
 
     _all_items = []
 
+    all_items = list(all_items)
+    load_block_outputs(
+        block for item in all_items for block in (item.get("blocks_obj") or {}).values()
+    )
     for ind, item in enumerate(all_items):
         ItemModel = ITEM_MODELS[item["type"]]
         _all_items.append(ItemModel(**item).dict())
 
     all_items = _all_items
 
+    return root_folder_name, all_items, collection_data
+
+
+def create_eln_file(
+    output_path: "str | os.PathLike | IO[bytes]",
+    collection_id: str | None = None,
+    item_id: str | None = None,
+    related_item_ids: list[str] | None = None,
+    on_stage: "StageCallback | None" = None,
+    primary_key: str = "item_id",
+) -> None:
+    """Create a .eln file for a collection, item, or set of items.
+
+    Parameters:
+        collection_id: ID of the collection to export
+        output_path: Path where the .eln file should be saved, or a binary stream to write it to
+        item_id: ID of the item to export
+        related_item_ids: List of related item IDs to include in the export.
+        on_stage: Optional `StageCallback` invoked with progress messages
+            as the export proceeds.
+        primary_key: The item field used to key item folders in the archive
+            (`"item_id"` by default, or `"refcode"` for stable identifiers).
+
+    """
+    root_folder_name, all_items, collection_data = _resolve_export(
+        collection_id, item_id, related_item_ids
+    )
+
     if on_stage is not None:
         on_stage(f"Resolved {len(all_items)} entries for export")
 
@@ -435,3 +731,34 @@ def create_eln_file(
         on_stage=on_stage,
         primary_key=primary_key,
     )
+
+
+def stream_eln_file(
+    collection_id: str | None = None,
+    item_id: str | None = None,
+    related_item_ids: list[str] | None = None,
+    primary_key: str = "item_id",
+) -> Iterator[bytes]:
+    """Export a collection, item, or set of items as a .eln file that is produced
+    while it is being sent, rather than written to disk first.
+
+    The items to export are loaded before this function returns (raising a
+    `ValueError` if they cannot be found); the archive is then written by a
+    background thread as the returned iterator is consumed, at most
+    `STREAM_QUEUE_SIZE` chunks ahead of it, and abandoned if the iterator is
+    closed early (e.g., when the client disconnects).
+
+    Parameters:
+        collection_id: ID of the collection to export
+        item_id: ID of the item to export
+        related_item_ids: List of related item IDs to include in the export.
+        primary_key: The item field used to key item folders in the archive.
+
+    Returns:
+        An iterator over the bytes of the archive.
+
+    """
+    root_folder_name, all_items, collection_data = _resolve_export(
+        collection_id, item_id, related_item_ids
+    )
+    return _stream_archive(root_folder_name, all_items, collection_data, primary_key)
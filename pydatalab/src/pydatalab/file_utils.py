@@ -1,26 +1,55 @@
 import datetime
 import hashlib
+import io
 import os
 import pathlib
-import re
+import secrets
 import shutil
-import subprocess
-from typing import Any
+from typing import IO, Any, NamedTuple
 
 from bson.objectid import ObjectId
 from pymongo import ReturnDocument
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
+from pydatalab import remote_sync
 from pydatalab.config import CONFIG, RemoteFilesystem
 from pydatalab.logger import LOGGER
 from pydatalab.models import File
 from pydatalab.models.utils import PyObjectId
 from pydatalab.mongo import _get_active_mongo_client, flask_mongo
 from pydatalab.permissions import get_default_permissions
+from pydatalab.summaries import refresh_item_summaries
 
 LIVE_FILE_CUTOFF = datetime.timedelta(days=31)
 
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+"""The size of the chunks in which files are read when copying and hashing them."""
+
+
+class StagedUpload(NamedTuple):
+    """A file that has already been uploaded to local disk in full, e.g., by a
+    resumable upload, along with its hashes and size.
+
+    Passing one to [`save_uploaded_file`][pydatalab.file_utils.save_uploaded_file]
+    or [`update_uploaded_file`][pydatalab.file_utils.update_uploaded_file] moves the
+    file into place instead of copying it. The staged file must be on the same
+    filesystem as `CONFIG.FILE_DIRECTORY`.
+
+    """
+
+    filename: str
+    """The original name of the uploaded file."""
+
+    path: pathlib.Path
+    """The location of the staged file."""
+
+    checksums: dict[str, str]
+    """The MD5 and SHA-256 hex digests of the file."""
+
+    size: int
+    """The size of the file in bytes."""
+
 
 class NotModified(RuntimeError):
     """Raised when an update operation is attempted on a file,
@@ -67,7 +96,7 @@ def compute_file_hashes_and_sizes(
         else:
             file_path = pathlib.Path(file_path)
             fp = open(file_path, "rb")
-        for chunk in iter(lambda: fp.read(65536), b""):
+        for chunk in iter(lambda: fp.read(COPY_BUFFER_SIZE), b""):
             md5.update(chunk)
             sha256.update(chunk)
 
@@ -81,6 +110,89 @@ def compute_file_hashes_and_sizes(
     return ({"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}, size)
 
 
+def _write_all(fd: int, data: memoryview) -> None:
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def copy_and_hash_file(
+    source: str | pathlib.Path | IO[bytes] | FileStorage, destination: str | pathlib.Path
+) -> tuple[dict[str, str], int]:
+    """Copy a file to `destination`, computing its MD5 and SHA-256 hashes and size
+    in the same single pass over the data.
+
+    The source is read in chunks of `COPY_BUFFER_SIZE` bytes into a single reused
+    buffer, from which each chunk is fed to both hashes and written to the
+    destination, such that the data is only read once.
+
+    The data is written to a temporary file next to `destination`, which is only
+    moved into place once fully written, so that an existing file at `destination`
+    is replaced atomically and a failed copy leaves no partial file behind.
+
+    Args:
+        source: The path to a file on disk, or a byte stream (e.g., an uploaded file)
+            to copy from its current position.
+        destination: The path to copy the file to.
+
+    Returns:
+        A dictionary with 'md5' and 'sha256' hex digest strings, and the size of the
+        file in bytes.
+
+    """
+    md5 = hashlib.md5()  # noqa: S324
+    sha256 = hashlib.sha256()
+    size = 0
+
+    if isinstance(source, FileStorage):
+        source = source.stream
+    owns_source = isinstance(source, (str, pathlib.Path))
+    stream: IO[bytes] = open(source, "rb") if owns_source else source  # type: ignore[arg-type]
+
+    destination = pathlib.Path(destination)
+    tmp_path = destination.with_name(f".{destination.name}.{secrets.token_hex(8)}.partial")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        buffer = memoryview(bytearray(COPY_BUFFER_SIZE))
+        while True:
+            if hasattr(stream, "readinto"):
+                chunk = buffer[: stream.readinto(buffer)]
+            else:
+                chunk = memoryview(stream.read(COPY_BUFFER_SIZE))
+            if not chunk:
+                break
+            md5.update(chunk)
+            sha256.update(chunk)
+            _write_all(fd, chunk)
+            size += len(chunk)
+        os.close(fd)
+        fd = -1
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if fd >= 0:
+            os.close(fd)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if owns_source:
+            stream.close()
+
+    return {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}, size
+
+
+def _stream_size(file: FileStorage | StagedUpload) -> int | None:
+    """Return the size in bytes of the remainder of an uploaded file, without reading it."""
+    if isinstance(file, StagedUpload):
+        return file.size
+    stream = file.stream
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END) - position
+        stream.seek(position)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return file.content_length or None
+    return size
+
+
 def _escape_spaces_scp_path(remote_path: str) -> str:
     r"""Takes a remote path prefixed by 'ssh://' and encloses
     the filename in quotes and escapes spaces to allow for
@@ -100,143 +212,183 @@ def _escape_spaces_scp_path(remote_path: str) -> str:
     return f'{protocol}:{host}:"{path}"'
 
 
-def _sync_file_with_remote(remote_path: str, src: str) -> None:
+def _sync_file_with_remote(remote_path: str, src: str) -> tuple[dict[str, str], int]:
     """Copy a file from a mounted volume or ssh-able remote to the
     local file store.
 
+    For ssh-able remotes, only the bytes appended to the remote file since the
+    local copy was last synced are transferred, where possible (see
+    [`fetch_remote_file`][pydatalab.remote_sync.fetch_remote_file]).
+
     Arguments:
         remote_path: The original location of the file.
         src: The local location of the file.
+
+    Returns:
+        The hashes and size of the copied file, as returned by
+        `compute_file_hashes_and_sizes`.
+
     """
     if os.path.isfile(remote_path):
-        shutil.copy(remote_path, src)
+        return copy_and_hash_file(remote_path, src)
     elif remote_path.startswith("ssh://"):
-        # Unescape spaces are we are now quoting the whole path
-        remote_path = _escape_spaces_scp_path(remote_path)
-        scp_command = f"scp {re.sub('^ssh://', '', remote_path)} {src}"
-
         pathlib.Path(src).parent.mkdir(parents=False, exist_ok=True)
+        LOGGER.debug("Syncing file %s with %s", src, remote_path)
+        return remote_sync.fetch_remote_file(remote_path, src)
 
-        LOGGER.debug("Syncing file with '%s'", scp_command)
-        proc = subprocess.Popen(  # noqa: S602
-            scp_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        _, stderr = proc.communicate()
-        if stderr:
-            raise RuntimeError(
-                f"scp command {scp_command} raised the the following errors: {stderr!r}"
-            )
-
-    if not os.path.isfile(src):
-        raise RuntimeError("Something went wrong copying {remote_path} to {src}.")
-
+    raise RuntimeError(f"Something went wrong copying {remote_path} to {src}.")
 
-def _call_remote_stat(path: str):
-    """Call `stat` on a remote file.
 
-    Args:
-        path: The full remote path.
+def _full_remote_path(file_info: File) -> str | None:
+    """Return the location of a file on its remote filesystem, if the remote is configured."""
+    directories_dict = {fs.name: fs for fs in CONFIG.REMOTE_FILESYSTEMS}
+    remote: RemoteFilesystem | None = directories_dict.get(file_info.source_server_name, None)
+    if not remote:
+        LOGGER.warning(
+            "Could not find desired remote for %r in %s, cannot sync file",
+            file_info.source_server_name,
+            directories_dict,
+        )
+        return None
 
-    Returns:
-        A dictionary of the `tree` output.
+    full_remote_path = os.path.join(remote.path, file_info.source_path)
+    if remote.hostname:
+        full_remote_path = f"{remote.hostname}:{full_remote_path}"
+    return full_remote_path
+
+
+def _get_remote_timestamps(remote_paths: list[str]) -> dict[str, datetime.datetime | None]:
+    """Return the last modification time of each of the given remote files (or `None`
+    if it cannot be accessed), with a single remote `stat` command per ssh-able host,
+    querying different hosts concurrently."""
+    timestamps: dict[str, datetime.datetime | None] = {}
+    paths_by_host: dict[str, dict[str, str]] = {}
+    for full_remote_path in remote_paths:
+        if full_remote_path.startswith("ssh://"):
+            hostname, path = remote_sync.split_remote_path(full_remote_path)
+            paths_by_host.setdefault(hostname, {})[path] = full_remote_path
+            continue
+        try:
+            timestamps[full_remote_path] = datetime.datetime.fromtimestamp(
+                os.stat(full_remote_path).st_mtime, tz=datetime.timezone.utc
+            )
+        except FileNotFoundError:
+            timestamps[full_remote_path] = None
 
-    """
+    hosts = list(paths_by_host)
+    results = remote_sync.run_concurrently(
+        lambda host: remote_sync.stat_remote_files(host, list(paths_by_host[host])), hosts
+    )
+    for host, stats in zip(hosts, results):
+        if isinstance(stats, Exception):
+            raise stats
+        for path, full_remote_path in paths_by_host[host].items():
+            stat_result = stats.get(path)
+            timestamps[full_remote_path] = stat_result.last_modified if stat_result else None
 
-    path = path.strip("ssh://")
-    path = path.replace(r"\ ", " ").replace(" ", r"\ ")
-    hostname, file_path = path.split(":", 1)
-    command = f"ssh {hostname} 'stat -c %Y {file_path}'"
-    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)  # noqa: S602
-    LOGGER.debug("Calling %s", command)
-    try:
-        stdout, stderr = process.communicate(timeout=20)
-        timestamp = int(stdout.decode("utf-8"))
-    except Exception as exc:
-        raise RuntimeError(f"Remote stat process {command!r} returned: {exc!r}")
-    if stderr:
-        raise RuntimeError(f"Remote statprocess {command!r} returned: {stderr!r}")
+    return timestamps
 
-    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
 
+def _check_and_sync_files(files: list[tuple[File, ObjectId]]) -> list[File]:
+    """For the given files, check if the remote versions are newer
+    than the stored versions and sync them if so.
 
-def _check_and_sync_file(file_info: File, file_id: ObjectId) -> File:
-    """For a given file, check if the remote version is newer
-    than the stored version and sync them if so.
+    The remote files are stat'ed with one command per remote host, and
+    any outdated files are then synced concurrently.
 
     Args:
-        file_info: The `File` metadata object.
-        file_id: The `bson.ObjectId` of the file stored in the database
+        files: Pairs of the `File` metadata object of each file and the
+            `bson.ObjectId` of the file stored in the database
             (used to update the file collection).
 
     Returns:
-        The updated file info, if an update was required,
+        For each file, the updated file info, if an update was required,
         otherwise the old file info.
 
     """
-    directories_dict = {fs.name: fs for fs in CONFIG.REMOTE_FILESYSTEMS}
-    file_collection = flask_mongo.db.files
-    if not file_info.source_server_name or not file_info.source_path:
-        raise RuntimeError("Attempted to sync file %s with no known remote", file_info)
+    remote_paths: dict[int, str] = {}
+    for index, (file_info, _) in enumerate(files):
+        if not file_info.source_server_name or not file_info.source_path:
+            raise RuntimeError("Attempted to sync file %s with no known remote", file_info)
 
-    if not file_info.last_modified_remote:
-        LOGGER.warning(
-            "Unable to sync file %s, no last modified timestamp. Will use saved version.",
-            file_info.source_path,
-        )
-        return file_info
+        if not file_info.last_modified_remote:
+            LOGGER.warning(
+                "Unable to sync file %s, no last modified timestamp. Will use saved version.",
+                file_info.source_path,
+            )
+            continue
 
-    cached_timestamp = file_info.last_modified_remote
-    remote: RemoteFilesystem | None = directories_dict.get(file_info.source_server_name, None)
-    if not remote:
-        LOGGER.warning(
-            "Could not find desired remote for %r in %s, cannot sync file",
-            file_info.source_server_name,
-            directories_dict,
-        )
-        return file_info
+        full_remote_path = _full_remote_path(file_info)
+        if full_remote_path:
+            remote_paths[index] = full_remote_path
 
-    full_remote_path = os.path.join(remote.path, file_info.source_path)
-    if remote.hostname:
-        full_remote_path = f"{remote.hostname}:{full_remote_path}"
+    remote_timestamps = _get_remote_timestamps(list(remote_paths.values()))
+
+    to_sync: dict[int, datetime.datetime] = {}
+    for index, full_remote_path in remote_paths.items():
+        file_info = files[index][0]
+        remote_timestamp = remote_timestamps[full_remote_path]
+        if remote_timestamp is None:
+            LOGGER.debug(
+                "Could not access remote file when checking for latest version: %s",
+                full_remote_path,
+            )
+            continue
 
-    if full_remote_path.startswith("ssh://"):
-        # For ssh-able remotes, check age of the local file, rather than the last time the remote file was modified
-        remote_timestamp = _call_remote_stat(full_remote_path)
         LOGGER.debug(
             "File %s was last edited at timestamp %s, %s ago",
             full_remote_path,
             remote_timestamp,
             datetime.datetime.now(tz=datetime.timezone.utc) - remote_timestamp,
         )
+        to_sync[index] = remote_timestamp
+
+    outdated = [
+        index
+        for index, remote_timestamp in to_sync.items()
+        if remote_timestamp
+        > files[index][0].last_modified_remote  # type: ignore[operator]
+        + datetime.timedelta(minutes=CONFIG.REMOTE_CACHE_MAX_AGE)
+    ]
+    synced = dict(
+        zip(
+            outdated,
+            remote_sync.sync_remote_files(
+                [(remote_paths[index], files[index][0].location) for index in outdated]  # type: ignore[misc]
+            ),
+        )
+    )
 
-    else:
-        try:
-            stat_results = os.stat(full_remote_path)
-            remote_timestamp = datetime.datetime.fromtimestamp(
-                stat_results.st_mtime, tz=datetime.timezone.utc
-            )
-        except FileNotFoundError:
-            LOGGER.debug(
-                "Could not access remote file when checking for latest version: %s",
-                full_remote_path,
+    updated = [file_info for file_info, _ in files]
+    for index, remote_timestamp in to_sync.items():
+        file_info, file_id = files[index]
+        result = synced.get(index)
+        if isinstance(result, Exception):
+            LOGGER.warning(
+                "Unable to sync file %s with %s on server: %r",
+                file_info.location,
+                remote_paths[index],
+                result,
             )
-            return file_info
+            continue
+        if result is None:
+            LOGGER.debug("File %s is recent enough, not updating", file_info.source_path)
+        else:
+            LOGGER.debug("Updated file %s to latest version", file_info.source_path)
+        updated[index] = _record_sync(file_info, file_id, remote_timestamp, result)
 
-    if remote_timestamp > cached_timestamp + datetime.timedelta(
-        minutes=CONFIG.REMOTE_CACHE_MAX_AGE
-    ):
-        LOGGER.debug("Updating file %s to latest version", file_info.source_path)
+    return updated
 
-        try:
-            _sync_file_with_remote(full_remote_path, file_info.location)  # type: ignore[arg-type]
-        except RuntimeError:
-            LOGGER.warning(
-                "Unable to sync file %s with %s on server.", file_info.location, full_remote_path
-            )
-            return file_info
 
-    else:
-        LOGGER.debug("File %s is recent enough, not updating", file_info.source_path)
+def _record_sync(
+    file_info: File,
+    file_id: ObjectId,
+    remote_timestamp: datetime.datetime,
+    synced: tuple[dict[str, str], int] | None,
+) -> File:
+    """Update the database entry of a live file after checking its remote version,
+    given the hashes and size of the local copy if it was just synced."""
+    file_collection = flask_mongo.db.files
 
     if file_info.location is not None:
         local_stat_results = os.stat(file_info.location)
@@ -246,7 +398,14 @@ def _check_and_sync_file(file_info: File, file_id: ObjectId) -> File:
         if datetime.datetime.now(tz=datetime.timezone.utc) - remote_timestamp > LIVE_FILE_CUTOFF:
             is_live = False
 
-        hashes, size_bytes = compute_file_hashes_and_sizes(file_info.location)
+        # The local copy only changes when synced (which also hashes it), so the stored
+        # checksums can be reused unless they are missing or stale
+        if synced is not None:
+            hashes, size_bytes = synced
+        elif file_info.checksums and file_info.size == local_stat_results.st_size:
+            hashes, size_bytes = file_info.checksums.dict(), file_info.size
+        else:
+            hashes, size_bytes = compute_file_hashes_and_sizes(file_info.location)
         updated_file_info = file_collection.find_one_and_update(
             {"_id": file_id, **get_default_permissions(user_only=False)},
             {
@@ -277,6 +436,23 @@ def _check_and_sync_file(file_info: File, file_id: ObjectId) -> File:
     return file_info
 
 
+def _check_and_sync_file(file_info: File, file_id: ObjectId) -> File:
+    """For a given file, check if the remote version is newer
+    than the stored version and sync them if so.
+
+    Args:
+        file_info: The `File` metadata object.
+        file_id: The `bson.ObjectId` of the file stored in the database
+            (used to update the file collection).
+
+    Returns:
+        The updated file info, if an update was required,
+        otherwise the old file info.
+
+    """
+    return _check_and_sync_files([(file_info, file_id)])[0]
+
+
 def get_file_info_by_id(file_id: str | ObjectId, update_if_live: bool = True) -> dict[str, Any]:
     """Query the files collection for the given ID.
 
@@ -296,54 +472,105 @@ def get_file_info_by_id(file_id: str | ObjectId, update_if_live: bool = True) ->
         The stored file information as a dictonary. Will be empty if the
             corresponding file does not exist on disk.
 
+    """
+    return get_file_infos_by_ids([file_id], update_if_live=update_if_live)[0]
+
+
+def get_file_infos_by_ids(
+    file_ids: list[str | ObjectId], update_if_live: bool = True
+) -> list[dict[str, Any]]:
+    """Query the files collection for several file IDs at once, as in
+    [`get_file_info_by_id`][pydatalab.file_utils.get_file_info_by_id].
+
+    Any live files that have been updated on their remotes are synced
+    concurrently, with one `stat` command per remote host.
+
+    Arguments:
+        file_ids: The string or ObjectID representations of the file IDs.
+        update_if_live: Whether or not to update the stored files to newer
+            versions, if they exist.
+
+    Raises:
+        OSError: If any of the given file IDs does not exist in the database.
+
+    Returns:
+        The stored file information of each file as a dictionary, in order.
+
     """
     item_collection = flask_mongo.db.items
-    file_id = ObjectId(file_id)
+    object_ids = [ObjectId(file_id) for file_id in file_ids]
+
+    file_infos: list[File] = []
+    for file_id in object_ids:
+        # Instead of directly querying for a file, we try to find it
+        # via attachment to an item, so that we can check that the user
+        # has the appropriate permissions for it
+        result = item_collection.aggregate(
+            [
+                {
+                    "$match": {
+                        "file_ObjectIds": {"$in": [file_id]},
+                        **get_default_permissions(user_only=False),
+                    }
+                },
+                {"$limit": 1},
+                {
+                    "$lookup": {
+                        "from": "files",
+                        "localField": "file_ObjectIds",
+                        "foreignField": "_id",
+                        "as": "files",
+                    }
+                },
+                {"$project": {"files": 1}},
+            ]
+        )
 
-    # Instead of directly querying for a file, we try to find it
-    # via attachment to an item, so that we can check that the user
-    # has the appropriate permissions for it
-    result = item_collection.aggregate(
-        [
-            {
-                "$match": {
-                    "file_ObjectIds": {"$in": [file_id]},
-                    **get_default_permissions(user_only=False),
-                }
-            },
-            {"$limit": 1},
-            {
-                "$lookup": {
-                    "from": "files",
-                    "localField": "file_ObjectIds",
-                    "foreignField": "_id",
-                    "as": "files",
-                }
-            },
-            {"$project": {"files": 1}},
-        ]
-    )
+        file_info = (
+            [d for d in next(result)["files"] if str(d["_id"]) == str(file_id)][0]
+            if result
+            else None
+        )
 
-    file_info = (
-        [d for d in next(result)["files"] if str(d["_id"]) == str(file_id)][0] if result else None
-    )
+        if not file_info:
+            raise OSError(f"could not find file with id: {file_id} in db")
 
-    if not file_info:
-        raise OSError(f"could not find file with id: {file_id} in db")
+        file_infos.append(File(**file_info))
 
-    file_info = File(**file_info)
+    if update_if_live:
+        live = [index for index, file_info in enumerate(file_infos) if file_info.is_live]
+        if live:
+            synced = _check_and_sync_files([(file_infos[i], object_ids[i]) for i in live])
+            for index, file_info in zip(live, synced):
+                file_infos[index] = file_info
 
-    if update_if_live and file_info.is_live:
-        file_info = _check_and_sync_file(file_info, file_id)
+    return [file_info.dict() for file_info in file_infos]
 
-    return file_info.dict()
 
+def _place_staged_upload(file: StagedUpload, location: str | pathlib.Path) -> None:
+    """Atomically place a copy of a staged upload at `location`, leaving the staged file
+    itself in place such that the upload can be finalized again if saving it fails."""
+    location = pathlib.Path(location)
+    temporary = location.with_name(f".{location.name}.{secrets.token_hex(8)}.upload")
+    try:
+        # The staging directory is on the same filesystem as the stored files
+        os.link(file.path, temporary)
+    except OSError:
+        shutil.copyfile(file.path, temporary)
+    try:
+        os.replace(temporary, location)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
 
-def update_uploaded_file(file: FileStorage, file_id: ObjectId, size_bytes: int | None = None):
+
+def update_uploaded_file(
+    file: FileStorage | StagedUpload, file_id: ObjectId, size_bytes: int | None = None
+):
     """Replace the file with the given `file_id` with the new file object from the request.
 
     Parameters:
-        file: The Flask file object in the request.
+        file: The Flask file object in the request, or a fully staged upload.
         file_id: The database ID of the file to update.
         size_bytes: A hint for the file size in bytes, will be used to verify ahead of time whether
 
@@ -355,30 +582,58 @@ def update_uploaded_file(file: FileStorage, file_id: ObjectId, size_bytes: int |
     last_modified = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
     file_collection = flask_mongo.db.files
 
-    hashes, size_bytes = compute_file_hashes_and_sizes(file)
-
-    if file_collection.find_one(
-        {"_id": file_id, **get_default_permissions(user_only=False), "checksums": hashes}
-    ):
-        # Hashes already match, return no-op
-        raise NotModified(
-            f"File with id {file_id} has not been modified, hashes match existing version."
+    existing_file_entry = file_collection.find_one(
+        {"_id": file_id, **get_default_permissions(user_only=False)}
+    )
+    if not existing_file_entry:
+        raise OSError(f"Issue with db update uploaded file {file.filename} id {file_id}")
+    location = existing_file_entry.get("location")
+    if location is None:
+        raise RuntimeError("Cannot update file with no location set: %s", existing_file_entry)
+
+    staged = isinstance(file, StagedUpload)
+    if staged:
+        staging_location, hashes, size_bytes = file.path, file.checksums, file.size
+    else:
+        # Stream the upload into a staging file next to the old version, hashing it on the way
+        staging_location = pathlib.Path(location).with_name(
+            f".{pathlib.Path(location).name}.{secrets.token_hex(8)}.upload"
         )
+        hashes, size_bytes = copy_and_hash_file(file, staging_location)
 
-    updated_file_entry = file_collection.find_one_and_update(
-        {"_id": file_id, **get_default_permissions(user_only=False)},
-        {
-            "$set": {
-                "last_modified": last_modified,
-                "source": "remote",
-                "is_live": False,
-                "size": size_bytes,
-                "checksums": hashes,
+    try:
+        if existing_file_entry.get("checksums") == hashes:
+            # Hashes already match, return no-op
+            raise NotModified(
+                f"File with id {file_id} has not been modified, hashes match existing version."
+            )
+
+        updated_file_entry = file_collection.find_one_and_update(
+            {"_id": file_id, **get_default_permissions(user_only=False)},
+            {
+                "$set": {
+                    "last_modified": last_modified,
+                    "source": "remote",
+                    "is_live": False,
+                    "size": size_bytes,
+                    "checksums": hashes,
+                },
+                "$inc": {"revision": 1},
             },
-            "$inc": {"revision": 1},
-        },
-        return_document=ReturnDocument.AFTER,
-    )
+            return_document=ReturnDocument.AFTER,
+        )
+        if not updated_file_entry:
+            raise OSError(f"Issue with db update uploaded file {file.filename} id {file_id}")
+
+        # overwrite the old file with the new version
+        if staged:
+            _place_staged_upload(file, location)
+        else:
+            os.replace(staging_location, location)
+    finally:
+        # Staged uploads are removed with their session once saved
+        if not staged:
+            staging_location.unlink(missing_ok=True)
 
     # Also update any items and blocks that have this file attached
     item_collection = flask_mongo.db.items
@@ -393,25 +648,15 @@ def update_uploaded_file(file: FileStorage, file_id: ObjectId, size_bytes: int |
             }
         },
     )
+    refresh_item_summaries({"file_ObjectIds": {"$in": [file_id]}})
 
-    if not updated_file_entry:
-        raise OSError(f"Issue with db update uploaded file {file.name} id {file_id}")
-
-    updated_file_entry = File(**updated_file_entry)
-
-    # overwrite the old file with the new location
-    if updated_file_entry.location is None:
-        raise RuntimeError("Cannot update file with no location set: %s", updated_file_entry)
-
-    file.save(updated_file_entry.location)
-
-    ret = updated_file_entry.dict()
+    ret = File(**updated_file_entry).dict()
     ret.update({"_id": file_id})
     return ret
 
 
 def save_uploaded_file(
-    file: FileStorage,
+    file: FileStorage | StagedUpload,
     item_ids: list[str] | None = None,
     block_ids: list[str] | None = None,
     last_modified: datetime.datetime | str | None = None,
@@ -422,7 +667,7 @@ def save_uploaded_file(
     add its metadata to the database.
 
     Parameters:
-        file: The flask file object in the request.
+        file: The flask file object in the request, or a fully staged upload.
         item_ids: The item IDs to attempt to attach the file to.
         block_ids: The block IDs to attempt to attach the file to.
         last_modified: An isoformat datetime for to track as the last time the filed was modified
@@ -463,33 +708,17 @@ def save_uploaded_file(
     if not last_modified:
         last_modified = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
 
-    hashes, size_bytes = compute_file_hashes_and_sizes(file)
+    if size_bytes is None:
+        size_bytes = _stream_size(file)
 
-    new_file_document = File(
-        name=filename,
-        original_name=file.filename,  # not escaped
-        checksums=hashes,
-        location=None,  # file storage location in datalab. Important! will be filled in below
-        url_path=None,  # the url used to access this file. Important! will be filled in below
-        extension=extension,
-        source="uploaded",
-        size=size_bytes,
-        item_ids=item_ids,
-        blocks=block_ids,
-        last_modified=last_modified,
-        time_added=last_modified,
-        metadata={},
-        representation=None,
-        source_server_name=None,  # not used for source=uploaded
-        source_path=None,  # not used for source=uploaded
-        last_modified_remote=None,  # not used for source=uploaded
-        is_live=False,  # not available for source=uploaded
-        revision=1,  # increment with each update
-        creator_ids=creator_ids if creator_ids is not None else [],
-    )
+    # The ID of the new file is chosen up front, such that the file can be saved
+    # (and hashed) into its directory before its database entry is inserted
+    inserted_id = ObjectId()
+    new_directory = os.path.join(CONFIG.FILE_DIRECTORY, str(inserted_id))
+    file_location = os.path.join(new_directory, filename)
 
-    # In one transaction, check if we can save the file, insert it into the database
-    # and save it, then release the lock
+    # In one transaction, check if we can save the file, save it and insert it into
+    # the database, then release the lock
     client = _get_active_mongo_client()
     with client.start_session(causal_consistency=True) as session:
         space = get_space_available_bytes()
@@ -497,31 +726,51 @@ def save_uploaded_file(
             raise RuntimeError(
                 f"Cannot store file: insufficient space available on disk (required: {size_bytes // 1024**3} GB). Please contact your datalab administrator."
             )
-        file_collection = client.get_database().files
-        result = file_collection.insert_one(new_file_document.dict(), session=session)
-        if not result.acknowledged:
-            raise RuntimeError(
-                f"db operation failed when trying to insert new file. Result: {result}"
-            )
-
-        inserted_id = result.inserted_id
 
-        new_directory = os.path.join(CONFIG.FILE_DIRECTORY, str(inserted_id))
-        file_location = os.path.join(new_directory, filename)
         pathlib.Path(new_directory).mkdir(exist_ok=False)
-        file.save(file_location)
+        try:
+            if isinstance(file, StagedUpload):
+                _place_staged_upload(file, file_location)
+                hashes, size_bytes = file.checksums, file.size
+            else:
+                hashes, size_bytes = copy_and_hash_file(file, file_location)
+
+            new_file_document = File(
+                name=filename,
+                original_name=file.filename,  # not escaped
+                checksums=hashes,
+                location=file_location,  # file storage location in datalab
+                url_path=None,  # not used for source=uploaded
+                extension=extension,
+                source="uploaded",
+                size=size_bytes,
+                item_ids=item_ids,
+                blocks=block_ids,
+                last_modified=last_modified,
+                time_added=last_modified,
+                metadata={},
+                representation=None,
+                source_server_name=None,  # not used for source=uploaded
+                source_path=None,  # not used for source=uploaded
+                last_modified_remote=None,  # not used for source=uploaded
+                is_live=False,  # not available for source=uploaded
+                revision=1,  # increment with each update
+                creator_ids=creator_ids if creator_ids is not None else [],
+            )
 
-    updated_file_entry = flask_mongo.db.files.find_one_and_update(
-        {"_id": inserted_id, **get_default_permissions(user_only=False)},
-        {
-            "$set": {
-                "location": file_location,
-            }
-        },
-        return_document=ReturnDocument.AFTER,
-    )
+            file_collection = client.get_database().files
+            result = file_collection.insert_one(
+                {**new_file_document.dict(), "_id": inserted_id}, session=session
+            )
+            if not result.acknowledged:
+                raise RuntimeError(
+                    f"db operation failed when trying to insert new file. Result: {result}"
+                )
+        except BaseException:
+            shutil.rmtree(new_directory, ignore_errors=True)
+            raise
 
-    updated_file_entry = File(**updated_file_entry)
+    updated_file_entry = File(**{**new_file_document.dict(), "_id": inserted_id})
 
     # update any referenced item_ids
     for item_id in item_ids:
@@ -534,6 +783,9 @@ def save_uploaded_file(
                 f"db operation failed when trying to insert new file ObjectId into sample: {item_id}"
             )
 
+    if item_ids:
+        refresh_item_summaries({"item_id": {"$in": list(item_ids)}})
+
     ret = updated_file_entry.dict()
     ret.update({"_id": inserted_id})
     return ret
@@ -581,16 +833,28 @@ def add_file_from_remote_directory(
             int(os.path.getmtime(full_remote_path)), tz=datetime.timezone.utc
         )
 
+    # The ID of the new file is chosen up front, such that the file can be synced
+    # (and hashed) into its directory before its database entry is inserted
+    inserted_id = ObjectId()
+    new_directory = os.path.join(CONFIG.FILE_DIRECTORY, str(inserted_id))
+    new_file_location = os.path.join(new_directory, filename)
+    pathlib.Path(new_directory).mkdir(exist_ok=True)
+    try:
+        hashes, size_bytes = _sync_file_with_remote(full_remote_path, new_file_location)
+    except BaseException:
+        shutil.rmtree(new_directory, ignore_errors=True)
+        raise
+
     new_file_document = File(
         name=filename,
         original_name=file_entry["name"],  # not escaped
-        # file storage location in datalab. Important! will be filled in below
-        location=None,
-        # the URL used to access this file. Important! will be filled in below
-        url_path=None,
+        # file storage location in datalab
+        location=new_file_location,
+        url_path=new_file_location,
+        checksums=hashes,
         extension=extension,
         source="remote",
-        size=file_entry["size"],
+        size=size_bytes,
         item_ids=[item_id],
         blocks=block_ids,
         # last_modified is the last modified time of the db entry in isoformat. For last modified file timestamp, see last_modified_remote_timestamp
@@ -610,30 +874,14 @@ def add_file_from_remote_directory(
         creator_ids=creator_ids if creator_ids is not None else [],
     )
 
-    result = file_collection.insert_one(new_file_document.dict())
-    if not result.acknowledged:
-        raise OSError(f"db operation failed when trying to insert new file. Result: {result}")
-
-    inserted_id = result.inserted_id
-
-    new_directory = os.path.join(CONFIG.FILE_DIRECTORY, str(inserted_id))
-    new_file_location = os.path.join(new_directory, filename)
-    pathlib.Path(new_directory).mkdir(exist_ok=True)
-    _sync_file_with_remote(full_remote_path, new_file_location)
-    hashes, size_bytes = compute_file_hashes_and_sizes(new_file_location)
-
-    updated_file_entry = file_collection.find_one_and_update(
-        {"_id": inserted_id, **get_default_permissions(user_only=False)},
-        {
-            "$set": {
-                "location": new_file_location,
-                "url_path": new_file_location,
-                "checksums": hashes,
-                "size": size_bytes,
-            }
-        },
-        return_document=ReturnDocument.AFTER,
-    )
+    updated_file_entry = {**new_file_document.dict(), "_id": inserted_id}
+    try:
+        result = file_collection.insert_one(updated_file_entry)
+        if not result.acknowledged:
+            raise OSError(f"db operation failed when trying to insert new file. Result: {result}")
+    except BaseException:
+        shutil.rmtree(new_directory, ignore_errors=True)
+        raise
 
     sample_update_result = sample_collection.update_one(
         {"item_id": item_id, **get_default_permissions(user_only=True)},
@@ -647,6 +895,8 @@ def add_file_from_remote_directory(
             f"db operation failed when trying to insert new file ObjectId into sample: {item_id}"
         )
 
+    refresh_item_summaries({"item_id": item_id})
+
     return updated_file_entry
 
 
@@ -692,6 +942,8 @@ def remove_file_from_sample(item_id: str | ObjectId, file_id: str | ObjectId) ->
             f"Failed to remove {file_id!r} from item {item_id!r}. Result: {sample_result.raw_result}"
         )
 
+    refresh_item_summaries({"item_id": item_id})
+
     file_collection.update_one(
         {"_id": file_id},
         {"$pull": {"item_ids": item_id}},
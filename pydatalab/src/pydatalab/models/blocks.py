@@ -55,12 +55,18 @@ class DataBlockResponse(BaseModel):
     """Any processed or computed data associated with the block, small enough to store and filter directly in the database,
     i.e., strings or a few hundred numbers not exceeding 16KB in size.
     Examples could include peak positions, and widths, but not the full spectrum.
+    Outputs larger than `CONFIG.BLOCK_OUTPUTS_INLINE_SIZE` are stored outside of the
+    item document (see [`pydatalab.block_outputs`][pydatalab.block_outputs]).
     """
 
     metadata: dict | None = Field(default=None, datalab_exclude_from_load=True)
     """Any structured metadata associated with the block, for example,
     experimental acquisition parameters."""
 
+    plot_x_range: dict | None = None
+    """The x-range of the block's plot selected by the user (by zooming), within which the
+    data is plotted at full resolution, as `{"axis": ..., "start": ..., "end": ...}`."""
+
     class Config:
         allow_population_by_field_name = True
         json_encoders = JSON_ENCODERS
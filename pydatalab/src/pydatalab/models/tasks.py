@@ -59,7 +59,17 @@ class Task(BaseModel):
         default_factory=lambda: datetime.now(tz=timezone.utc),
         description="When the task was created",
     )
+    started_at: datetime | None = Field(None, description="When a worker started the task")
     completed_at: datetime | None = Field(None, description="When completed")
+    priority: int | None = Field(
+        None, description="The scheduling priority of the task (lower runs first)"
+    )
+    queue_depth: int | None = Field(
+        None, description="The number of pending/processing tasks when this task was queued"
+    )
+    wait_seconds: float | None = Field(
+        None, description="How long the task waited in the queue before starting"
+    )
     error_message: str | None = Field(None, description="Error message if status is ERROR")
     spec: ExportTaskSpec | BlockProcessingTaskSpec = Field(..., description="Task-specific data")
 
@@ -24,7 +24,9 @@ class ItemVersion(BaseModel):
 
     This model represents a version entry in the `item_versions` collection.
     Each version captures the complete state of an item, allowing users to
-    view history and restore previous states.
+    view history and restore previous states. In the database, the `data` of a
+    version is stored as content-addressed chunks shared between versions (see
+    [`pydatalab.versioning`][pydatalab.versioning]).
     """
 
     refcode: Refcode = Field(..., description="The refcode of the item this version belongs to")
@@ -5,6 +5,7 @@ from functools import lru_cache
 from typing import Any
 
 import pymongo
+from bson import ObjectId
 from flask_pymongo import PyMongo
 from pydantic import BaseModel
 from pymongo.errors import ConnectionFailure
@@ -24,8 +25,13 @@ __all__ = (
     "USERS_FTS_FIELDS",
     "COLLECTIONS_FTS_FIELDS",
     "GROUPS_FTS_FIELDS",
+    "ITEMS_SEARCH_NGRAMS_FIELD",
     "generate_heuristic_regex_search",
+    "generate_search_ngrams",
+    "refresh_item_search_ngrams",
+    "generate_ngram_search_filter",
     "build_search_pipeline",
+    "explain_query_shapes",
 )
 
 flask_mongo = PyMongo()
@@ -58,6 +64,19 @@ COLLECTIONS_FTS_FIELDS: set[str] = {"collection_id", "title", "description"}
 GROUPS_FTS_FIELDS: set[str] = {"group_id", "display_name", "description"}
 """Fields to search for groups."""
 
+ITEMS_SEARCH_NGRAMS_FIELD: str = "search_ngrams"
+"""Field on each item document that stores the precomputed search tokens
+(see `generate_search_ngrams`), backed by an ordinary multikey index.
+"""
+
+SEARCH_NGRAM_LENGTH: int = 3
+"""The length of the n-grams used to index query parts that are long enough."""
+
+SEARCH_PREFIX_MARKER: str = "^"
+"""Marker prepended to tokens that index the start of a word, used for query
+parts that are too short to be split into n-grams.
+"""
+
 
 def generate_heuristic_regex_search(
     query: str, fields: set[str], part_length: int = 4
@@ -89,10 +108,108 @@ def generate_heuristic_regex_search(
     return match_obj
 
 
+def generate_search_ngrams(
+    doc: dict, fields: set[str], ngram_length: int = SEARCH_NGRAM_LENGTH
+) -> list[str]:
+    """Generate the search tokens to store alongside a document, such that the
+    filter returned by `generate_ngram_search_filter` selects (at least) every
+    document that the heuristic regex search would match.
+
+    Two kinds of token are generated from the lowercased value of each string field:
+
+    - every n-gram that does not contain a space (query parts never do),
+    - every one- and two-character prefix starting at a word boundary, marked
+      with `SEARCH_PREFIX_MARKER`, to serve short query parts that are anchored
+      with `\\b` by the heuristic search. Word boundaries are taken from both the
+      ASCII and Unicode definitions of a word character, so the tokens remain a
+      superset whichever the database uses.
+
+    Parameters:
+        doc: The document (or partial document) to tokenize.
+        fields: Set of field names to tokenize.
+        ngram_length: The length of the n-grams to generate.
+
+    Returns:
+        A sorted list of unique tokens.
+
+    """
+    tokens: set[str] = set()
+    for field in fields:
+        value = doc.get(field)
+        if not isinstance(value, str) or not value:
+            continue
+
+        value = value.lower()
+        tokens.update(
+            gram
+            for gram in (value[i : i + ngram_length] for i in range(len(value) - ngram_length + 1))
+            if " " not in gram
+        )
+
+        boundaries = {
+            match.start() for flags in (0, re.ASCII) for match in re.finditer(r"\b", value, flags)
+        }
+        for ind in boundaries:
+            for prefix in (value[ind : ind + 1], value[ind : ind + 2]):
+                if prefix and " " not in prefix:
+                    tokens.add(SEARCH_PREFIX_MARKER + prefix)
+
+    return sorted(tokens)
+
+
+def generate_ngram_search_filter(
+    query: str,
+    ngram_field: str,
+    part_length: int = 4,
+    ngram_length: int = SEARCH_NGRAM_LENGTH,
+) -> dict[str, Any] | None:
+    """Generate a MongoDB filter over the precomputed search tokens that narrows down
+    the candidates for a heuristic regex search (see `generate_heuristic_regex_search`)
+    with the same `query` and `part_length`.
+
+    Documents that have not (yet) been tokenized are always included as candidates,
+    so the regex that is applied afterwards still sees every possible match.
+
+    Parameters:
+        query: The full search query string.
+        ngram_field: The field holding the tokens generated by `generate_search_ngrams`.
+        part_length: The length below which the heuristic search adds a word boundary
+            to the start of a part.
+        ngram_length: The length of the n-grams stored in `ngram_field`.
+
+    Returns:
+        A MongoDB query object, or `None` if no part of the query can be served
+        by the tokens.
+
+    """
+    tokens: set[str] = set()
+    for part in query.split(" "):
+        if not part.strip():
+            continue
+        lowered = part.lower()
+        if len(lowered) >= ngram_length:
+            tokens.update(
+                lowered[i : i + ngram_length] for i in range(len(lowered) - ngram_length + 1)
+            )
+        elif len(re.escape(part)) <= part_length:
+            tokens.add(SEARCH_PREFIX_MARKER + lowered)
+
+    if not tokens:
+        return None
+
+    return {
+        "$or": [
+            {ngram_field: {"$all": sorted(tokens)}},
+            {ngram_field: {"$exists": False}},
+        ]
+    }
+
+
 def build_search_pipeline(
     query: str,
     fields: set[str],
     permissions: dict | None,
+    ngram_field: str | None = None,
 ) -> list[dict]:
     """Build a MongoDB aggregation pipeline for search with support for FTS, regex, and heuristic modes.
 
@@ -100,6 +217,9 @@ def build_search_pipeline(
         query: The search query string.
         fields: Set of field names to search across.
         permissions: Optional permissions filter to apply.
+        ngram_field: Optional field holding precomputed search tokens for the collection
+            (see `generate_search_ngrams`). If provided, heuristic searches will first
+            select candidates via an index over this field and only apply the regex to those.
 
     Returns:
         A list of pipeline stages for MongoDB aggregation.
@@ -135,9 +255,13 @@ def build_search_pipeline(
 
     else:
         # Heuristic + regex search, splitting the query into parts and adding word boundaries
-        match_obj = generate_heuristic_regex_search(query, fields)
+        clauses = [generate_heuristic_regex_search(query, fields)]
+        if ngram_field and (ngram_filter := generate_ngram_search_filter(query, ngram_field)):
+            clauses.insert(0, ngram_filter)
         if permissions:
-            match_obj = {"$and": [permissions, match_obj]}
+            clauses.insert(0, permissions)
+
+        match_obj = {"$and": clauses} if len(clauses) > 1 else clauses[0]
 
         pipeline.append({"$match": match_obj})
 
@@ -220,7 +344,16 @@ def create_default_indices(
         - A text index over all string fields in item models,
         - An index over item type,
         - A unique index over `item_id` and `refcode`.
+        - A multikey index over the precomputed item search tokens.
+        - Compound indexes over item type, date and ID, for paginated item lists.
+        - Multikey indexes over item relationships (by item ID, refcode, and
+          immutable ID with type), attached files, creators and groups.
+        - Indexes over collection IDs, creators and groups, and user managers.
+        - Indexes over the date, type, creators, groups and collections of the
+          materialized item summaries.
         - A text index over user names and identities.
+        - Indexes over upload session IDs and creation times.
+        - A unique index over the remote and path of indexed remote directories.
         - Version control indexes:
             - Index on item_versions.refcode for fast version history lookup
             - Index on item_versions.user_id for fast user contribution queries
@@ -280,6 +413,62 @@ def create_default_indices(
 
     ret += db.items.create_index("date", name="date", background=background)
 
+    ret += db.items.create_index(
+        ITEMS_SEARCH_NGRAMS_FIELD, name="item search ngrams", background=background
+    )
+
+    ret += db.items.create_index(
+        [("type", pymongo.ASCENDING), ("date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+        name="item type and page order",
+        background=background,
+    )
+
+    # Relationship, attachment and ownership lookups
+    ret += db.items.create_index(
+        "relationships.item_id", name="related item IDs", background=background
+    )
+    ret += db.items.create_index(
+        "relationships.refcode", name="related item refcodes", background=background
+    )
+    ret += db.items.create_index(
+        [
+            ("relationships.immutable_id", pymongo.ASCENDING),
+            ("relationships.type", pymongo.ASCENDING),
+        ],
+        name="related immutable IDs and type",
+        background=background,
+    )
+    ret += db.items.create_index("file_ObjectIds", name="attached files", background=background)
+    ret += db.items.create_index("creator_ids", name="item creators", background=background)
+    ret += db.items.create_index("group_ids", name="item groups", background=background)
+
+    ret += db.collections.create_index("collection_id", name="collection ID", background=background)
+    ret += db.collections.create_index(
+        "creator_ids", name="collection creators", background=background
+    )
+    ret += db.collections.create_index("group_ids", name="collection groups", background=background)
+
+    ret += db.users.create_index("managers", name="user managers", background=background)
+
+    ret += db.item_summaries.create_index(
+        [("date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+        name="summary page order",
+        background=background,
+    )
+    ret += db.item_summaries.create_index(
+        [("type", pymongo.ASCENDING), ("date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+        name="summary type and page order",
+        background=background,
+    )
+    ret += db.item_summaries.create_index("item_id", name="summary item ID", background=background)
+    ret += db.item_summaries.create_index(
+        "creator_ids", name="summary creators", background=background
+    )
+    ret += db.item_summaries.create_index("group_ids", name="summary groups", background=background)
+    ret += db.item_summaries.create_index(
+        "relationships.immutable_id", name="summary collections", background=background
+    )
+
     user_fts_fields = {"identities.name", "display_name"}
 
     user_index_name = "unique user identifiers"
@@ -362,6 +551,27 @@ def create_default_indices(
         background=background,
     )
 
+    ret += db.block_render_cache.create_index(
+        "keys", name="render cache keys", background=background
+    )
+    ret += db.block_render_cache.create_index(
+        "expires_at", expireAfterSeconds=0, name="render cache expiry", background=background
+    )
+
+    ret += db.upload_sessions.create_index(
+        "upload_id", unique=True, name="unique upload ID", background=background
+    )
+    ret += db.upload_sessions.create_index(
+        "created_at", name="upload session created at", background=background
+    )
+
+    ret += db.remoteDirectories.create_index(
+        [("remote", pymongo.ASCENDING), ("path", pymongo.ASCENDING)],
+        unique=True,
+        name="unique remote directory path",
+        background=background,
+    )
+
     # Version control indexes
     ret += db.item_versions.create_index("refcode", name="version refcode", background=background)
     ret += db.item_versions.create_index("user_id", name="version user_id", background=background)
@@ -377,6 +587,92 @@ def create_default_indices(
     return ret
 
 
+PLACEHOLDER_ID = ObjectId(24 * "f")
+"""An arbitrary ObjectId used to fill in the query shapes in `QUERY_SHAPES`."""
+
+QUERY_SHAPES: tuple[tuple[str, dict[str, Any], list[tuple[str, int]] | None], ...] = (
+    ("items", {"item_id": "example"}, None),
+    ("items", {"refcode": "example:ABCDEF"}, None),
+    ("items", {"type": "equipment"}, [("date", -1), ("_id", -1)]),
+    ("items", {"relationships.item_id": "example"}, None),
+    ("items", {"relationships.refcode": "example:ABCDEF"}, None),
+    ("items", {"relationships.immutable_id": PLACEHOLDER_ID}, None),
+    (
+        "items",
+        {"relationships.immutable_id": PLACEHOLDER_ID, "relationships.type": "collections"},
+        None,
+    ),
+    (
+        "items",
+        {"relationships": {"$elemMatch": {"type": "collections", "immutable_id": PLACEHOLDER_ID}}},
+        None,
+    ),
+    ("items", {"file_ObjectIds": {"$in": [PLACEHOLDER_ID]}}, None),
+    ("items", {"creator_ids": {"$in": [PLACEHOLDER_ID]}}, None),
+    ("items", {"group_ids": {"$in": [PLACEHOLDER_ID]}}, None),
+    ("items", {ITEMS_SEARCH_NGRAMS_FIELD: {"$all": ["exa", "xam"]}}, None),
+    ("item_summaries", {"type": {"$in": ["samples", "cells"]}}, [("date", -1), ("_id", -1)]),
+    ("item_summaries", {"relationships.immutable_id": PLACEHOLDER_ID}, None),
+    ("collections", {"collection_id": "example"}, None),
+    ("collections", {"creator_ids": {"$in": [PLACEHOLDER_ID]}}, None),
+    ("users", {"managers": {"$in": [PLACEHOLDER_ID]}}, None),
+    ("item_versions", {"refcode": "example:ABCDEF"}, [("version", -1)]),
+    ("tasks", {"task_id": "example"}, None),
+)
+"""A catalogue of the query shapes issued by the app, as `(collection, filter, sort)`
+tuples, that are checked against the available indexes by `explain_query_shapes`."""
+
+
+def _plan_stages(plan: Any):
+    """Recursively yield every stage of a MongoDB query plan, as given by `explain()`."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def explain_query_shapes(client: pymongo.MongoClient | None = None) -> list[dict[str, Any]]:
+    """Run `explain()` on each query shape in `QUERY_SHAPES` and report the
+    winning plan chosen by MongoDB, to identify queries that would scan the
+    whole collection.
+
+    Parameters:
+        client: The client to use, defaulting to the configured MongoDB.
+
+    Returns:
+        A list of reports per query shape, containing the `collection`, `filter`
+        and `sort` of the query, whether its winning plan includes a `collscan`,
+        and the names of any `indexes` it uses.
+
+    """
+    if client is None:
+        client = _get_active_mongo_client()
+    db = client.get_database()
+
+    reports = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning_plan))
+        reports.append(
+            {
+                "collection": collection,
+                "filter": query,
+                "sort": sort,
+                "collscan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+                "indexes": sorted({stage["indexName"] for stage in stages if "indexName" in stage}),
+            }
+        )
+
+    return reports
+
+
 def gravatar_hash_for(email: str | None, display_name: str | None = None) -> str | None:
     """Return the MD5 hash used by the frontend to look up a Gravatar avatar.
 
@@ -416,7 +712,52 @@ def _backfill_user_gravatar_hashes(db) -> int:
     return len(updates)
 
 
-STARTUP_MIGRATIONS = (_backfill_user_gravatar_hashes,)
+def refresh_item_search_ngrams(
+    match: dict[str, Any], db: pymongo.database.Database | None = None, batch_size: int = 1000
+) -> int:
+    """Recompute the search tokens of the items matching the given query, e.g.,
+    after an update that did not go through `/save-item/`, writing only those
+    that have changed.
+
+    Parameters:
+        match: A MongoDB query on the `items` collection.
+        db: The database to use, defaulting to that of the current Flask app.
+        batch_size: The number of updates to send per bulk write.
+
+    Returns:
+        The number of items whose tokens were updated.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+    projection = {field: 1 for field in ITEMS_FTS_FIELDS} | {ITEMS_SEARCH_NGRAMS_FIELD: 1}
+    updates: list[pymongo.UpdateOne] = []
+    count = 0
+    for item in db.items.find(match, projection):
+        ngrams = generate_search_ngrams(item, ITEMS_FTS_FIELDS)
+        if item.get(ITEMS_SEARCH_NGRAMS_FIELD) == ngrams:
+            continue
+        updates.append(
+            pymongo.UpdateOne({"_id": item["_id"]}, {"$set": {ITEMS_SEARCH_NGRAMS_FIELD: ngrams}})
+        )
+        if len(updates) >= batch_size:
+            db.items.bulk_write(updates, ordered=False)
+            count += len(updates)
+            updates = []
+    if updates:
+        db.items.bulk_write(updates, ordered=False)
+        count += len(updates)
+    return count
+
+
+def _backfill_item_search_ngrams(db, batch_size: int = 1000) -> int:
+    """Populate the search tokens on any item doc that lacks them."""
+    return refresh_item_search_ngrams(
+        {ITEMS_SEARCH_NGRAMS_FIELD: {"$exists": False}}, db=db, batch_size=batch_size
+    )
+
+
+STARTUP_MIGRATIONS = (_backfill_user_gravatar_hashes, _backfill_item_search_ngrams)
 """Idempotent one-shot DB fixups run at app startup, after index creation.
 
 Each entry takes a pymongo database handle and returns the number of documents
@@ -0,0 +1,370 @@
+"""A content-addressed, on-disk cache of parsed instrument data shared by all blocks.
+
+Parsing raw instrument files (echem cycler exports, XRD patterns, NMR
+experiments and so on) is usually the most expensive part of rendering a block,
+yet the result only depends on the bytes of the input files, the parser that
+was used and any options passed to it. Blocks can therefore wrap their parsing
+step in [`cached_parse`][pydatalab.parse_cache.cached_parse], which keys the
+parsed `pandas.DataFrame` (and an optional dictionary of JSON-serializable
+metadata) by the SHA-256 of each input file, the parser name and version and the
+parser options, and stores it as a Parquet file under
+`CONFIG.PARSE_CACHE_DIRECTORY`.
+
+Because entries are keyed by file content, the same file attached to several
+items (or re-uploaded) is only parsed once, and an updated file simply misses
+the cache. A file lock is held while an entry is parsed, such that concurrent
+requests for the same entry (from any thread or worker process) wait for the
+first to write it rather than parsing the file again. Entries are evicted least-recently-used first once the total size of
+the cache exceeds `CONFIG.PARSE_CACHE_MAX_SIZE_MB`.
+
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import warnings
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pydatalab import __version__
+from pydatalab.logger import LOGGER
+from pydatalab.utils import CustomJSONEncoder
+
+__all__ = (
+    "cached_parse",
+    "is_parse_cached",
+    "clear_parse_cache",
+    "file_lock",
+    "read_entry",
+    "write_entry",
+)
+
+ParsedData = pd.DataFrame | tuple[pd.DataFrame, dict[str, Any]]
+
+_METADATA_KEY = b"datalab"
+_WARNINGS_ATTR = "_datalab_warnings"
+_EVICTION_LOCK = threading.Lock()
+
+
+class _ParseCacheEncoder(CustomJSONEncoder):
+    """Additionally serializes the numpy scalars and arrays that parsers tend to
+    leave in their metadata."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, np.generic):
+            return o.item()
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        return CustomJSONEncoder.default(o)
+
+
+def _get_cache_directory() -> Path | None:
+    from pydatalab.config import CONFIG
+
+    if not CONFIG.PARSE_CACHE_MAX_SIZE_MB:
+        return None
+    if CONFIG.PARSE_CACHE_DIRECTORY:
+        return Path(CONFIG.PARSE_CACHE_DIRECTORY)
+    return Path(tempfile.gettempdir()) / "datalab-parse-cache"
+
+
+def _max_size_bytes() -> int:
+    from pydatalab.config import CONFIG
+
+    return CONFIG.PARSE_CACHE_MAX_SIZE_MB * 1024 * 1024
+
+
+def _file_sha256(file_info: dict[str, Any]) -> str:
+    """Return the SHA-256 of a file, preferring the checksum stored in the database
+    (as computed on upload or on update of a live file) over re-hashing it."""
+    sha256 = (file_info.get("checksums") or {}).get("sha256")
+    if sha256:
+        return sha256
+
+    digest = hashlib.sha256()
+    with open(file_info["location"], "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(
+    file_infos: Sequence[dict[str, Any]], parser: str, version: str, options: dict | None
+) -> str:
+    key = {
+        "files": [_file_sha256(file_info) for file_info in file_infos],
+        "parser": parser,
+        "version": version,
+        "datalab_version": __version__,
+        "options": options or {},
+    }
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True, cls=_ParseCacheEncoder).encode()
+    ).hexdigest()
+
+
+def _frame(parsed: ParsedData) -> pd.DataFrame:
+    return parsed[0] if isinstance(parsed, tuple) else parsed
+
+
+def _mixed_object_columns(df: pd.DataFrame) -> list[str]:
+    """Return the object columns holding values other than strings (e.g., navani's
+    `state` column, which mixes `"R"` with integers), which Arrow cannot store as-is."""
+    return [
+        column
+        for column in df.columns
+        if df[column].dtype == object
+        and not df[column].dropna().map(lambda value: isinstance(value, str)).all()
+    ]
+
+
+def read_entry(path: Path) -> ParsedData | None:
+    """Read parsed data stored with [`write_entry`][pydatalab.parse_cache.write_entry],
+    returning None if there is no file at `path`."""
+    if not path.exists():
+        return None
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[_METADATA_KEY])
+    df = table.to_pandas()
+    for column in meta["json_columns"]:
+        df[column] = df[column].map({value: json.loads(value) for value in df[column].unique()})
+    df.attrs.update(meta["attrs"])
+    if meta["metadata"] is None:
+        return df
+    return df, meta["metadata"]
+
+
+def write_entry(path: Path, parsed: ParsedData) -> None:
+    """Atomically store parsed data (a `DataFrame` with optional JSON-serializable
+    metadata) as a Parquet file at `path`."""
+    df, metadata = parsed if isinstance(parsed, tuple) else (parsed, None)
+    json_columns = _mixed_object_columns(df)
+    if json_columns:
+        df = df.assign(
+            **{
+                column: df[column].map(lambda value: json.dumps(value, cls=_ParseCacheEncoder))
+                for column in json_columns
+            }
+        )
+    table = pa.Table.from_pandas(df)
+    meta = json.dumps(
+        {"attrs": df.attrs, "metadata": metadata, "json_columns": json_columns},
+        cls=_ParseCacheEncoder,
+    )
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _METADATA_KEY: meta.encode()}
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and move it into place so that concurrent
+    # readers never see a partially written entry
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pq.write_table(table, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the given lock file (created if needed), which
+    excludes other threads as well as other processes holding the same lock."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _evict(directory: Path, max_size_bytes: int) -> None:
+    """Remove the least recently used entries until the cache fits within the size limit."""
+    with _EVICTION_LOCK:
+        entries = []
+        for path in directory.glob("*/*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= max_size_bytes:
+            return
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            path.unlink(missing_ok=True)
+            total -= size
+            if total <= max_size_bytes:
+                break
+        LOGGER.debug("Evicted parse cache entries down to %d bytes", total)
+
+
+def cached_parse(
+    files: dict[str, Any] | Sequence[dict[str, Any]],
+    parser: str,
+    parse: Callable[[], ParsedData],
+    version: str = "1",
+    options: dict[str, Any] | None = None,
+) -> ParsedData:
+    """Return the parsed data for the given file(s), calling `parse` only if no
+    matching entry exists in the cache.
+
+    Any warnings raised by `parse` are stored alongside the entry and re-raised on
+    every cache hit, so that they are still reported by the block.
+
+    Parameters:
+        files: The file information (as returned by
+            [`get_file_info_by_id`][pydatalab.file_utils.get_file_info_by_id]) of the
+            input file, or a list of them if the data is parsed from several files.
+            Only the `checksums` and `location` fields are used.
+        parser: A name for the parser that is unique across the application, e.g.,
+            `"XRDBlock.load_pattern"`.
+        parse: A callable that parses the file(s) and returns a `DataFrame`, or a
+            tuple of a `DataFrame` and a JSON-serializable dictionary of metadata.
+        version: The version of the parser; should be bumped whenever its output changes.
+            Entries are also invalidated by any change of the datalab version.
+        options: Any options passed to the parser that affect its output.
+
+    Returns:
+        The value returned by `parse` (or its cached copy).
+
+    """
+    file_infos = [files] if isinstance(files, dict) else list(files)
+    directory = _get_cache_directory()
+
+    path = None
+    if directory is not None:
+        try:
+            key = _cache_key(file_infos, parser, version, options)
+            path = directory / key[:2] / f"{key}.parquet"
+        except Exception as exc:
+            LOGGER.warning("Unable to compute parse cache key for %s: %s", parser, exc)
+
+    if path is None:
+        return _parse(parse, parser, None, directory)
+
+    cached = _read_cached(path, parser)
+    if cached is not None:
+        return cached
+    with contextlib.ExitStack() as stack:
+        # Entries are locked in stripes by the first byte of their key, such that
+        # the number of lock files stays bounded
+        try:
+            stack.enter_context(file_lock(directory / ".locks" / f"{key[:2]}.lock"))
+        except OSError as exc:
+            LOGGER.warning("Unable to lock parse cache entry for %s: %s", parser, exc)
+        # The entry may have been written while waiting for the lock
+        cached = _read_cached(path, parser)
+        if cached is not None:
+            return cached
+        return _parse(parse, parser, path, directory)
+
+
+def _read_cached(path: Path, parser: str) -> ParsedData | None:
+    """Read a cache entry, re-raising its stored warnings, if it exists and can be read."""
+    try:
+        cached = read_entry(path)
+    except Exception as exc:
+        LOGGER.warning("Ignoring unreadable parse cache entry for %s: %s", parser, exc)
+        return None
+    if cached is None:
+        return None
+
+    LOGGER.debug("Parse cache hit for %s (%s)", parser, path.stem)
+    # Mark the entry as recently used for the LRU eviction, unless it has just
+    # been evicted by another process (in which case it was still read in full)
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(path)
+    for message in _frame(cached).attrs.pop(_WARNINGS_ATTR, []):
+        warnings.warn(message)
+    return cached
+
+
+def _parse(
+    parse: Callable[[], ParsedData], parser: str, path: Path | None, directory: Path | None
+) -> ParsedData:
+    """Call `parse`, storing its output (and any warnings it raised) at `path`, if given."""
+    with warnings.catch_warnings(record=True) as caught:
+        parsed = parse()
+    for warning in caught:
+        warnings.warn(warning.message)
+
+    if path is not None and directory is not None:
+        df = _frame(parsed)
+        try:
+            df.attrs[_WARNINGS_ATTR] = [str(warning.message) for warning in caught]
+            write_entry(path, parsed)
+            _evict(directory, _max_size_bytes())
+        except Exception as exc:
+            LOGGER.warning("Unable to store %s output in parse cache: %s", parser, exc)
+        finally:
+            df.attrs.pop(_WARNINGS_ATTR, None)
+
+    return parsed
+
+
+def is_parse_cached(
+    files: dict[str, Any] | Sequence[dict[str, Any]],
+    parser: str,
+    version: str = "1",
+    options: dict[str, Any] | None = None,
+) -> bool:
+    """Return whether [`cached_parse`][pydatalab.parse_cache.cached_parse] would
+    currently find an entry for the given arguments, without reading it.
+
+    As the entry may be written (or evicted) at any time, this is only a hint;
+    `cached_parse` should still be used to read or create the entry.
+
+    Parameters:
+        files: The file information of the input file(s), as for `cached_parse`.
+        parser: The name of the parser.
+        version: The version of the parser.
+        options: Any options passed to the parser that affect its output.
+
+    Returns:
+        Whether a matching entry exists in the cache.
+
+    """
+    directory = _get_cache_directory()
+    if directory is None:
+        return False
+    file_infos = [files] if isinstance(files, dict) else list(files)
+    try:
+        key = _cache_key(file_infos, parser, version, options)
+    except Exception:
+        return False
+    return (directory / key[:2] / f"{key}.parquet").exists()
+
+
+def clear_parse_cache() -> int:
+    """Remove every entry from the parse cache.
+
+    Returns:
+        The number of entries removed.
+
+    """
+    directory = _get_cache_directory()
+    if directory is None or not directory.exists():
+        return 0
+    removed = 0
+    with _EVICTION_LOCK:
+        for path in directory.glob("*/*.parquet"):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -1,10 +1,13 @@
+import copy
 import datetime
+import threading
+import time
 from functools import wraps
 from hashlib import sha512
 from typing import Any
 
 from bson import ObjectId
-from flask import g, request
+from flask import g, has_app_context, request
 from flask_login import current_user
 from werkzeug.exceptions import Forbidden, Unauthorized
 
@@ -17,6 +20,15 @@ from pydatalab.mongo import flask_mongo, get_database
 
 PUBLIC_USER_ID = ObjectId(24 * "0")
 
+_MANAGED_USERS_CACHE: dict[ObjectId, tuple[float, list[ObjectId]]] = {}
+"""A per-process cache of the users managed by each user, keyed by the manager's ID,
+with values of the (monotonic) time at which they were cached and the managed user IDs.
+Entries expire after `CONFIG.PERMISSIONS_CACHE_TTL` seconds, or when cleared by
+`invalidate_permissions_cache`.
+"""
+
+_MANAGED_USERS_CACHE_LOCK = threading.Lock()
+
 
 class Key(BaseModel):
     user: PyObjectId
@@ -138,6 +150,22 @@ def access_token_or_active_users(func):
     return wrapped_route
 
 
+def active_users_only(func):
+    """Decorator to ensure that only active user accounts can access a route,
+    whatever its method."""
+
+    @wraps(func)
+    def wrapped_route(*args, **kwargs):
+        if (
+            current_user.is_authenticated and current_user.account_status == AccountStatus.ACTIVE
+        ) or request.method in ("OPTIONS",):
+            return func(*args, **kwargs)
+
+        return {"error": "Unauthorized"}, 401
+
+    return wrapped_route
+
+
 def admin_only(func):
     """Decorator to ensure that only admin user accounts can access a route."""
 
@@ -219,6 +247,41 @@ def check_access_token(refcode: str, token: str | None = None) -> bool:
         return False
 
 
+def invalidate_permissions_cache() -> None:
+    """Clear any cached permission filters, in this process and in the current request.
+
+    Should be called whenever the manager or group assignments of any user change.
+    Other worker processes will pick up the change once their cache entries expire
+    after `CONFIG.PERMISSIONS_CACHE_TTL` seconds.
+
+    """
+    with _MANAGED_USERS_CACHE_LOCK:
+        _MANAGED_USERS_CACHE.clear()
+    if has_app_context():
+        g.pop("permissions_cache", None)
+
+
+def _get_managed_user_ids(user_id: ObjectId) -> list[ObjectId]:
+    """Return the IDs of the users managed by the given user, cached across
+    requests for up to `CONFIG.PERMISSIONS_CACHE_TTL` seconds.
+
+    """
+    now = time.monotonic()
+    with _MANAGED_USERS_CACHE_LOCK:
+        cached = _MANAGED_USERS_CACHE.get(user_id)
+    if cached and now - cached[0] < CONFIG.PERMISSIONS_CACHE_TTL:
+        return list(cached[1])
+
+    managed_users = [
+        u["_id"]
+        for u in get_database().users.find({"managers": {"$in": [user_id]}}, projection={"_id": 1})
+    ]
+    if CONFIG.PERMISSIONS_CACHE_TTL > 0:
+        with _MANAGED_USERS_CACHE_LOCK:
+            _MANAGED_USERS_CACHE[user_id] = (now, managed_users)
+    return list(managed_users)
+
+
 def _get_base_permissions(
     user_only: bool = True, deleting: bool = False, elevate_permissions: bool = False
 ) -> dict[str, Any]:
@@ -260,13 +323,8 @@ def _get_base_permissions(
     }
     if current_user.is_authenticated and current_user.person is not None:
         # find managed users under the given user (can later be expanded to groups)
-        managed_users = list(
-            get_database().users.find(
-                {"managers": {"$in": [current_user.person.immutable_id]}}, projection={"_id": 1}
-            )
-        )
+        managed_users = _get_managed_user_ids(current_user.person.immutable_id)
         if managed_users:
-            managed_users = [u["_id"] for u in managed_users]
             LOGGER.debug("Found managed users %s for user %s", managed_users, current_user.person)
 
         # Create user permissions conditions related to their ownership of items and managed users
@@ -337,7 +395,43 @@ def get_default_permissions(
             collection-shared items by navigating into the collection. Has
             no effect when `user_only=True`.
 
+    The computed filter is memoized on `flask.g` for the remainder of the request,
+    as it is typically needed several times per request.
+
     """
+    cache: dict | None = None
+    if has_app_context():
+        cache = g.setdefault("permissions_cache", {})
+        cache_key = (
+            current_user.get_id() if current_user.is_authenticated else None,
+            user_only,
+            deleting,
+            elevate_permissions,
+            inherit_from_collections,
+        )
+        if cache_key in cache:
+            return copy.deepcopy(cache[cache_key])
+
+    permissions = _build_default_permissions(
+        user_only=user_only,
+        deleting=deleting,
+        elevate_permissions=elevate_permissions,
+        inherit_from_collections=inherit_from_collections,
+    )
+
+    if cache is not None:
+        cache[cache_key] = copy.deepcopy(permissions)
+
+    return permissions
+
+
+def _build_default_permissions(
+    user_only: bool,
+    deleting: bool,
+    elevate_permissions: bool,
+    inherit_from_collections: bool,
+) -> dict[str, Any]:
+    """Compute the filter returned by `get_default_permissions`, without memoization."""
     base = _get_base_permissions(
         user_only=user_only, deleting=deleting, elevate_permissions=elevate_permissions
     )
@@ -1,15 +1,63 @@
+"""Listings of the directories of the configured remote filesystems.
+
+Each remote is indexed with one document per directory in the
+`remoteDirectories` collection, holding the entries of the directory and the
+modification time of the directory when they were listed. Updating the index
+of a remote lists the modification times of all of its directories in a single
+pass (without stat'ing any files) and then only re-lists the directories that
+have changed, as a directory's modification time changes whenever an entry is
+added to, removed from or renamed within it. As a file that is modified in place
+does not change the modification time of its directory, directories whose
+listing is older than `CONFIG.REMOTE_CACHE_RELIST_AGE` are also re-listed, and
+an update that was explicitly requested (`invalidate_cache=True`) re-lists every
+directory (live files are additionally re-checked individually when accessed,
+see [`get_file_info_by_id`][pydatalab.file_utils.get_file_info_by_id]).
+
+The full tree of a remote is assembled from its directory documents (see
+[`get_directory_structure`][pydatalab.remote_filesystems.get_directory_structure]),
+while [`get_remote_subtree`][pydatalab.remote_filesystems.get_remote_subtree]
+returns one subtree to a given depth, re-listing only the directories it needs.
+
+The `remoteFilesystems` collection holds one document per remote with the time
+its index was last updated, and a lock to stop several processes from updating
+it at once.
+
+"""
+
 import datetime
 import functools
-import json
 import multiprocessing
 import os
+import posixpath
+import shlex
+import stat
 import subprocess
 import time
-from typing import Any, Union
+from typing import Any
+
+from pymongo import ReplaceOne
 
 import pydatalab.mongo
 from pydatalab.config import CONFIG, RemoteFilesystem
 from pydatalab.logger import LOGGER
+from pydatalab.remote_sync import ssh_command
+
+__all__ = (
+    "REMOTE_DIRECTORIES_COLLECTION",
+    "get_directory_structures",
+    "get_directory_structure",
+    "get_remote_subtree",
+    "update_directory_index",
+)
+
+REMOTE_DIRECTORIES_COLLECTION = "remoteDirectories"
+"""The name of the MongoDB collection holding one document per indexed remote directory."""
+
+SCAN_BATCH_SIZE = 200
+"""The maximum number of directories listed by a single remote command."""
+
+REMOTE_INDEX_TIMEOUT = 600
+"""The timeout, in seconds, of the remote command listing every directory of a remote."""
 
 
 def get_directory_structures(
@@ -53,9 +101,9 @@ def get_directory_structure(
     invalidate_cache: bool | None = False,
     max_retries: int = 5,
 ) -> dict[str, Any]:
-    """For the given remote directory, either reconstruct the directory
-    structure in full, or access the cached version if is it recent
-    enough.
+    """For the given remote directory, either update its directory index
+    (re-listing only the directories that have changed) or use the cached
+    index if it is recent enough, and return its full directory structure.
 
     Any errors will be returned in the `contents` key for a given
     directory.
@@ -68,7 +116,8 @@ def get_directory_structure(
             the cache will not be reset, even if it is older than the maximum configured
             age.
         max_retries: Used when called recursively to limit the number of attempts each PID
-            will make to acquire the lock on the directory structure before returning an error.
+            will make to acquire the lock on the directory structure before returning an error,
+            when no earlier version of the index is available to return instead.
 
     Returns:
         A dictionary with keys "name", "type" and "contents" for the
@@ -82,7 +131,8 @@ def get_directory_structure(
         cached_dir_structure = _get_cached_directory_structure(directory)
         cache_last_updated = None
         if cached_dir_structure:
-            cache_last_updated = cached_dir_structure["last_updated"]
+            cache_last_updated = cached_dir_structure.get("last_updated")
+        if cache_last_updated is not None:
             if cache_last_updated.tzinfo is None:
                 cache_last_updated = cache_last_updated.replace(tzinfo=datetime.timezone.utc)
             cache_age = datetime.datetime.now(tz=datetime.timezone.utc) - cache_last_updated
@@ -102,9 +152,9 @@ def get_directory_structure(
         #     3) the `invalidate_cache` parameter is true, and the cache
         #        is older than the min age,
         # AND, if no other processes is updating the cache,
-        # then rebuild the cache.
+        # then update the cache.
         if (
-            (not cached_dir_structure)
+            (cache_last_updated is None)
             or (
                 invalidate_cache is not False
                 and cache_age > datetime.timedelta(minutes=CONFIG.REMOTE_CACHE_MAX_AGE)
@@ -116,25 +166,32 @@ def get_directory_structure(
         ):
             owns_lock = _acquire_lock_dir_structure(directory)
             if owns_lock:
-                dir_structure = _get_latest_directory_structure(directory.path, directory.hostname)
-                # Save the directory structure to the database, which also releases the lock
-                last_updated = _save_directory_structure(
-                    directory,
-                    dir_structure,
-                )
+                # Update the index in the database, which also releases the lock; an
+                # explicitly requested update re-lists every directory
+                last_updated = update_directory_index(directory, relist_all=bool(invalidate_cache))
                 LOGGER.debug(
                     "Remote filesystems cache miss for '%s': last updated %s",
                     directory.name,
                     cache_last_updated,
                 )
                 status = "updated"
+            elif cache_last_updated is not None:
+                # Another process is updating the index: return the previous version
+                # rather than waiting for it
+                LOGGER.debug(
+                    "PID %s using previous index of FS %s while it is updated",
+                    os.getpid(),
+                    directory.name,
+                )
+                last_updated = cache_last_updated
+                status = "cached"
             else:
                 if max_retries <= 0:
                     raise RuntimeError(
                         f"Failed to acquire lock for {directory.name} after the max number of attempts. This may indicate something wrong with the filesystem; please try again later."
                     )
                 LOGGER.debug(
-                    "PID %s waiting 5 seconds until FS %s is updated", os.getpid(), directory.name
+                    "PID %s waiting 5 seconds until FS %s is indexed", os.getpid(), directory.name
                 )
                 time.sleep(5)
                 return get_directory_structure(
@@ -142,10 +199,7 @@ def get_directory_structure(
                 )
 
         else:
-            last_updated = cached_dir_structure["last_updated"]
-            if last_updated.tzinfo is None:
-                last_updated = last_updated.replace(tzinfo=datetime.timezone.utc)
-            dir_structure = cached_dir_structure["contents"]
+            last_updated = cache_last_updated
             LOGGER.debug(
                 "Remote filesystems cache hit for '%s': last updated %s",
                 directory.name,
@@ -153,6 +207,8 @@ def get_directory_structure(
             )
             status = "cached"
 
+        dir_structure = _assemble_directory_structure(directory)
+
     except Exception as exc:
         dir_structure = [{"type": "error", "name": directory.name, "details": str(exc)}]
         last_updated = datetime.datetime.now(tz=datetime.timezone.utc)
@@ -170,181 +226,400 @@ def get_directory_structure(
     }
 
 
-def _get_latest_directory_structure(
-    directory_path: Union[str, "os.PathLike[str]"], hostname: str | None = None
-) -> list[dict[str, str]]:
-    """Call `tree` on the remote or mounted filesystem.
+def get_remote_subtree(
+    directory: RemoteFilesystem,
+    path: str = "",
+    depth: int = 1,
+    invalidate_cache: bool | None = None,
+) -> dict[str, Any]:
+    """Return the entries of one directory of a remote filesystem, and of its
+    subdirectories down to the given depth, for lazily expanding a directory tree.
 
-    If `directory_path` exists locally, then call tree directly,
-    otherwise interpret the path as a remote.
+    The directories are listed from the index, and only those missing from it, or
+    listed longer ago than the configured cache ages allow (following the same rules
+    as [`get_directory_structure`][pydatalab.remote_filesystems.get_directory_structure]),
+    are re-listed on the filesystem.
 
     Args:
-        directory_path: The path to the directory.
-        hostname: The hostname of the remote server, if the path is remote.
+        directory: The remote filesystem.
+        path: The path of the directory to list, relative to the root of the remote.
+        depth: The number of levels of subdirectories to list; subdirectories beyond
+            this depth are returned without a `contents` key.
+        invalidate_cache: As for `get_directory_structure`.
+
+    Raises:
+        ValueError: If the path is not within the remote.
+        FileNotFoundError: If the directory does not exist.
 
     Returns:
-        A dictionary of the `tree` output.
+        A dictionary with keys "name", "type", "relative_path", "contents", "last_updated"
+        and "status" for the requested directory.
 
     """
+    path = _normalize_relative_path(path)
+    depth = max(depth, 1)
+    collection = pydatalab.mongo.get_database()[REMOTE_DIRECTORIES_COLLECTION]
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    def is_fresh(doc: dict | None) -> bool:
+        if doc is None:
+            return False
+        scanned_at = doc["scanned_at"]
+        if scanned_at.tzinfo is None:
+            scanned_at = scanned_at.replace(tzinfo=datetime.timezone.utc)
+        age = now - scanned_at
+        if invalidate_cache:
+            return age < datetime.timedelta(minutes=CONFIG.REMOTE_CACHE_MIN_AGE)
+        return invalidate_cache is False or age < datetime.timedelta(
+            minutes=CONFIG.REMOTE_CACHE_MAX_AGE
+        )
 
-    tree_command = ["tree", "-Jsf"]
-    tree_timefmt = "%s"
+    listings: dict[str, dict] = {}
+    level = [path]
+    status = "cached"
+    for _ in range(depth):
+        docs = {
+            doc["path"]: doc
+            for doc in collection.find({"remote": directory.name, "path": {"$in": level}})
+        }
+        stale = [p for p in level if not is_fresh(docs.get(p))]
+        if stale:
+            status = "updated"
+            scanned = _scan_directories(directory, stale)
+            if path in stale and path not in scanned:
+                raise FileNotFoundError(f"Directory {path!r} not found in {directory.name!r}")
+            _store_listings(directory, scanned)
+            docs.update(scanned)
+        listings.update(docs)
+        level = [
+            _join(p, entry["name"])
+            for p in level
+            if p in docs
+            for entry in docs[p]["entries"]
+            if entry["type"] == "directory"
+        ]
+        if not level:
+            break
+
+    last_updated = listings[path]["scanned_at"]
+    if last_updated.tzinfo is None:
+        last_updated = last_updated.replace(tzinfo=datetime.timezone.utc)
+
+    return {
+        "name": posixpath.basename(path) or directory.name,
+        "type": "directory" if path else "toplevel",
+        "relative_path": _relative_path_field(posixpath.dirname(path)) if path else "/",
+        "contents": _build_tree(listings, path),
+        "last_updated": last_updated,
+        "status": status,
+    }
 
-    def _call_local_tree(directory_path: Union[str, "os.PathLike[str]"]) -> list[dict[str, Any]]:
-        """Call `tree` in a local directory.
 
-        Args:
-            directory_path: The path to the folder on the local filesystem.
+def update_directory_index(
+    directory: RemoteFilesystem, relist_all: bool = False
+) -> datetime.datetime:
+    """Bring the directory index of a remote filesystem up to date.
 
-        Returns:
-            A dictionary of the `tree` output.
+    The modification times of all directories are listed in a single pass, and
+    only the directories that are new, whose modification time has changed or
+    whose listing is older than `CONFIG.REMOTE_CACHE_RELIST_AGE` are re-listed.
+    Directories that no longer exist are removed from the index.
 
-        """
-        command = tree_command + [str(directory_path), "--timefmt", tree_timefmt]
-        process = subprocess.Popen(  # noqa: S603
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        stdout, stderr = process.communicate()
-        if stderr:
-            raise RuntimeError(f"Local process {command!r} returned {stderr!r}.")
+    Args:
+        directory: The remote filesystem to index.
+        relist_all: Whether to re-list every directory, e.g., to pick up files
+            that have been modified in place.
 
-        return json.loads(stdout)
+    Returns:
+        The time at which the index was updated.
 
-    def _call_remote_tree(
-        directory_path: Union[str, "os.PathLike[str]"], hostname: str
-    ) -> list[dict[str, Any]]:
-        """Call `tree` on a remote system.
+    """
+    collection = pydatalab.mongo.get_database()[REMOTE_DIRECTORIES_COLLECTION]
 
-        Args:
-            directory_path: The path to the folder on the remote filesystem.
-            hostname: The hostname of the remote server.
+    mtimes = _list_directory_mtimes(directory)
+    indexed = {
+        doc["path"]: doc
+        for doc in collection.find(
+            {"remote": directory.name}, {"path": 1, "mtime": 1, "scanned_at": 1}
+        )
+    }
+    relist_before = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        minutes=CONFIG.REMOTE_CACHE_RELIST_AGE
+    )
 
-        Returns:
-            A dictionary of the `tree` output.
+    def is_current(path: str, mtime: float) -> bool:
+        doc = indexed.get(path)
+        if relist_all or doc is None or doc.get("mtime") != mtime:
+            return False
+        scanned_at = doc.get("scanned_at")
+        if scanned_at is None:
+            return False
+        if scanned_at.tzinfo is None:
+            scanned_at = scanned_at.replace(tzinfo=datetime.timezone.utc)
+        return scanned_at > relist_before
+
+    changed = [path for path, mtime in mtimes.items() if not is_current(path, mtime)]
+    removed = [path for path in indexed if path not in mtimes]
+    LOGGER.debug(
+        "Indexing %s: %d directories, %d changed, %d removed",
+        directory.name,
+        len(mtimes),
+        len(changed),
+        len(removed),
+    )
 
-        """
-        command = f"ssh {hostname} 'PATH=$PATH:~/ {' '.join(tree_command)} \"{directory_path}\" --timefmt {tree_timefmt}'"
-        process = subprocess.Popen(  # noqa: S602,S607
-            command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    for start in range(0, len(changed), SCAN_BATCH_SIZE):
+        batch = changed[start : start + SCAN_BATCH_SIZE]
+        scanned = _scan_directories(directory, batch)
+        # Record the modification times from before the directories were listed,
+        # so that any change made in between is picked up by the next update
+        for path, listing in scanned.items():
+            listing["mtime"] = mtimes[path]
+        _store_listings(directory, scanned)
+
+    for start in range(0, len(removed), 1000):
+        collection.delete_many(
+            {"remote": directory.name, "path": {"$in": removed[start : start + 1000]}}
         )
-        LOGGER.debug("Calling %s", command)
-        try:
-            stdout, stderr = process.communicate(timeout=20)
-        except Exception as exc:
-            raise RuntimeError(f"Remote tree process {command!r} returned: {exc!r}")
-        if stderr:
-            # Do not return the bare stderr, but instead specialise the error message to common errors
-            if "WARNING: REMOTE HOST IDENTIFICATION HAS CHANGED!" in stderr.decode("utf-8"):
-                msg = f"Remote host identification has changed for {hostname}: please contact the administrator of this datalab deployment."
-                LOGGER.error(
-                    "Remote host identification for %s has changed, failed to update remote directories",
-                    hostname,
-                )
-            else:
-                msg = "Remote tree process returned an error: please contact the administrator of this datalab deployment."
-                LOGGER.error(
-                    "Remote tree process on %s returned an error: %s",
-                    hostname,
-                    stderr.decode("utf-8"),
-                )
-            raise RuntimeError(msg)
 
-        try:
-            return json.loads(stdout)
-        except Exception:
-            if "error opening dir" in stdout.decode("utf-8"):
-                msg = "Can no longer access the configured directory on the remote system; please contact the administrator of this datalab deployment."
-                LOGGER.error(
-                    "Remote directory %s on %s no longer accessible. Response: %s",
-                    directory_path,
-                    hostname,
-                    stdout.decode("utf-8"),
-                )
-            else:
-                msg = "Remote tree process failed with an unhandled error; please contact the administrator of this datalab deployment."
-                LOGGER.error(
-                    "Remote directory syncing for  %s on %s failed. Response: %s",
-                    directory_path,
-                    hostname,
-                    stdout.decode("utf-8"),
-                )
+    return _save_index_update(directory)
 
-            raise RuntimeError(msg)
 
-    if hostname:
-        LOGGER.debug("Calling remote %s on %s", tree_command, directory_path)
-        dir_structure = _call_remote_tree(directory_path, hostname)
+def _normalize_relative_path(path: str) -> str:
+    """Normalize a path relative to the root of a remote, as stored in the index
+    (without leading or trailing slashes, and with unescaped spaces)."""
+    path = path.replace(r"\ ", " ").strip("/")
+    parts = [part for part in path.split("/") if part not in ("", ".")]
+    if ".." in parts:
+        raise ValueError(f"Invalid path {path!r}: must be within the remote")
+    return "/".join(parts)
 
-    elif os.path.isdir(directory_path):
-        dir_structure = _call_local_tree(directory_path)
 
-    else:
-        raise RuntimeError(f"Unable to find directory {directory_path!r} locally or remotely.")
-
-    # `tree` returned [{"type": "unknown", "contents": [{"error": "opening dir"}]}] for errors
-    # which needs to be handled here
-    if dir_structure[0]["type"] == "unknown" and len(dir_structure[0].get("contents", [])) == 1:
-        if "error" in dir_structure[0]["contents"][0]:
-            raise RuntimeError(
-                f"`tree` returned error for dir {dir_structure[0]['name']!r}: {dir_structure[0]['contents'][0]['error']!r}"
-            )
+def _join(path: str, name: str) -> str:
+    return f"{path}/{name}" if path else name
 
-    # because we used tree -f, the name: fields all contain full paths. We want to do a little re-arranging
-    # so we get both a name, and a relative path field
-    _fix_tree_paths(dir_structure[0]["contents"], directory_path)
-    dir_tree = dir_structure[0]["contents"]
 
-    return dir_tree
+def _relative_path_field(path: str) -> str:
+    """The `relative_path` of the entries of a directory, in the format of `tree`
+    output used by the rest of the API (with escaped spaces)."""
+    if not path:
+        return "/"
+    return "/" + path.replace(" ", r"\ ") + "/"
 
 
-def _fix_tree_paths(
-    subtree_list: list[dict[str, Any]], root_path: Union[str, "os.PathLike[str]"]
-) -> None:
-    """Adjusts in-place the output from `tree` to provide relative
-    paths and names of each directory, rather than just the
-    full path.
+def _absolute_path(directory: RemoteFilesystem, path: str) -> str:
+    return posixpath.join(str(directory.path), path) if path else str(directory.path)
 
-    Will be called recursively to descend into the `'contents'`
-    key of each directory's info.
 
-    Args:
-        subtree_list: A list of `tree` outputs for directories.
-        root_path: The path to use as the root of the relative paths.
+def _run_remote_command(hostname: str, command: str, timeout: float) -> bytes:
+    """Run a command on a remote filesystem host over ssh and return its output.
+
+    Errors are only raised if the command produced no output, as `find` also exits
+    with an error if some directories could not be read.
 
     """
-    for subtree in subtree_list:
-        if "error" in subtree:
-            continue
+    args = ssh_command(hostname, command)
+    LOGGER.debug("Calling %s", args)
+    try:
+        process = subprocess.run(args, capture_output=True, timeout=timeout, check=False)  # noqa: S603
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise RuntimeError(f"Remote process {command!r} returned: {exc!r}")
+
+    if process.returncode and not process.stdout:
+        stderr = process.stderr.decode("utf-8", errors="replace")
+        # Do not return the bare stderr, but instead specialise the error message to common errors
+        if "WARNING: REMOTE HOST IDENTIFICATION HAS CHANGED!" in stderr:
+            msg = f"Remote host identification has changed for {hostname}: please contact the administrator of this datalab deployment."
+            LOGGER.error(
+                "Remote host identification for %s has changed, failed to update remote directories",
+                hostname,
+            )
+        elif "No such file or directory" in stderr:
+            msg = "Can no longer access the configured directory on the remote system; please contact the administrator of this datalab deployment."
+            LOGGER.error("Remote directory on %s no longer accessible: %s", hostname, stderr)
+        else:
+            msg = "Remote directory listing returned an error: please contact the administrator of this datalab deployment."
+            LOGGER.error("Remote directory listing on %s returned an error: %s", hostname, stderr)
+        raise RuntimeError(msg)
 
-        full_path = subtree["name"]
+    return process.stdout
 
-        path, filename = os.path.split(full_path)
 
-        escaped_path = path.replace(" ", r"\ ")
-        relative_path = os.path.relpath(escaped_path, start=root_path)
-        if relative_path == ".":
-            relative_path = "/"
-        else:
-            relative_path = "/" + relative_path + "/"
+def _list_directory_mtimes(directory: RemoteFilesystem) -> dict[str, float]:
+    """List the modification time of every (non-hidden) directory of a remote
+    filesystem, keyed by its path relative to the root of the remote."""
+    root = str(directory.path)
 
-        subtree["relative_path"] = relative_path
-        subtree["name"] = filename
-        if "contents" in subtree:
-            _fix_tree_paths(subtree["contents"], root_path)
+    if directory.hostname:
+        quoted = shlex.quote(root)
+        output = _run_remote_command(
+            directory.hostname,
+            f"find {quoted} -maxdepth 0 -type d -printf '%T@ %P\\0'"
+            f" && find {quoted} -mindepth 1 -name '.*' -prune -o -type d -printf '%T@ %P\\0'",
+            timeout=REMOTE_INDEX_TIMEOUT,
+        )
+        mtimes = {}
+        for record in output.split(b"\0"):
+            if record:
+                mtime, _, path = record.decode("utf-8", errors="surrogateescape").partition(" ")
+                mtimes[path] = float(mtime)
+        if "" not in mtimes:
+            raise RuntimeError(f"Unable to find directory {root!r} on {directory.hostname}.")
+        return mtimes
+
+    if not os.path.isdir(root):
+        raise RuntimeError(f"Unable to find directory {root!r} locally or remotely.")
+
+    mtimes = {"": os.stat(root).st_mtime}
+    pending = [""]
+    while pending:
+        path = pending.pop()
+        try:
+            with os.scandir(_absolute_path(directory, path)) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                        continue
+                    child = _join(path, entry.name)
+                    mtimes[child] = entry.stat(follow_symlinks=False).st_mtime
+                    pending.append(child)
+        except OSError as exc:
+            LOGGER.warning("Unable to list directory %s: %s", path, exc)
+    return mtimes
 
 
-def _save_directory_structure(
-    directory: RemoteFilesystem,
-    dir_structure: list[dict[str, Any]],
-) -> datetime.datetime:
-    """Upserts the tree structure of each directory to the `remoteFilesystems`
-    collection in the database.
+def _entry(name: str, mode_type: str, size: int, mtime: float) -> dict[str, Any]:
+    return {"type": mode_type, "name": name, "size": size, "time": int(mtime)}
+
+
+def _scan_directories(directory: RemoteFilesystem, paths: list[str]) -> dict[str, dict]:
+    """List the (non-hidden) entries of the given directories of a remote filesystem.
+
+    Returns:
+        For each directory that could be listed, a dictionary with its `entries`,
+        `mtime` and the time it was `scanned_at`.
+
+    """
+    scanned_at = datetime.datetime.now(tz=datetime.timezone.utc)
+    listings: dict[str, dict] = {}
+
+    if directory.hostname:
+        types = {"d": "directory", "l": "link"}
+        for start in range(0, len(paths), SCAN_BATCH_SIZE):
+            batch = paths[start : start + SCAN_BATCH_SIZE]
+            by_absolute_path = {_absolute_path(directory, p): p for p in batch}
+            output = _run_remote_command(
+                directory.hostname,
+                "find "
+                + " ".join(shlex.quote(p) for p in by_absolute_path)
+                + " -maxdepth 1 -printf '%d\\0%y\\0%s\\0%T@\\0%p\\0%h\\0%f\\0'"
+                # Directories that no longer exist are simply missing from the output
+                + "; true",
+                timeout=REMOTE_INDEX_TIMEOUT,
+            )
+            fields = output.decode("utf-8", errors="surrogateescape").split("\0")
+            entries: dict[str, list[dict[str, Any]]] = {}
+            for index in range(0, len(fields) - 6, 7):
+                depth, mode_type, size, mtime, full_path, parent, name = fields[index : index + 7]
+                if depth == "0":
+                    if mode_type == "d" and full_path in by_absolute_path:
+                        path = by_absolute_path[full_path]
+                        entries[path] = []
+                        listings[path] = {
+                            "entries": entries[path],
+                            "mtime": float(mtime),
+                            "scanned_at": scanned_at,
+                        }
+                elif not name.startswith(".") and parent in by_absolute_path:
+                    entries.setdefault(by_absolute_path[parent], []).append(
+                        _entry(name, types.get(mode_type, "file"), int(size), float(mtime))
+                    )
+        return listings
+
+    for path in paths:
+        absolute_path = _absolute_path(directory, path)
+        try:
+            mtime = os.stat(absolute_path).st_mtime
+            entries = []
+            with os.scandir(absolute_path) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    if stat.S_ISLNK(entry_stat.st_mode):
+                        mode_type = "link"
+                    elif stat.S_ISDIR(entry_stat.st_mode):
+                        mode_type = "directory"
+                    else:
+                        mode_type = "file"
+                    entries.append(
+                        _entry(entry.name, mode_type, entry_stat.st_size, entry_stat.st_mtime)
+                    )
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        except OSError as exc:
+            LOGGER.warning("Unable to list directory %s: %s", absolute_path, exc)
+            continue
+        listings[path] = {"entries": entries, "mtime": mtime, "scanned_at": scanned_at}
+
+    return listings
+
+
+def _store_listings(directory: RemoteFilesystem, listings: dict[str, dict]) -> None:
+    """Replace the index documents of the given directories."""
+    if not listings:
+        return
+    collection = pydatalab.mongo.get_database()[REMOTE_DIRECTORIES_COLLECTION]
+    collection.bulk_write(
+        [
+            ReplaceOne(
+                {"remote": directory.name, "path": path},
+                {
+                    "remote": directory.name,
+                    "path": path,
+                    "mtime": listing["mtime"],
+                    "scanned_at": listing["scanned_at"],
+                    "entries": listing["entries"],
+                },
+                upsert=True,
+            )
+            for path, listing in listings.items()
+        ],
+        ordered=False,
+    )
+
+
+def _build_tree(listings: dict[str, dict], path: str) -> list[dict[str, Any]]:
+    """Assemble the nested `contents` of a directory from the index documents of it
+    and its subdirectories, in the format of the `tree` output previously used."""
+    contents = []
+    for entry in sorted(listings[path]["entries"], key=lambda entry: entry["name"]):
+        entry = {**entry, "relative_path": _relative_path_field(path)}
+        if entry["type"] == "directory":
+            child = _join(path, entry["name"])
+            if child in listings:
+                entry["contents"] = _build_tree(listings, child)
+        contents.append(entry)
+    return contents
+
+
+def _assemble_directory_structure(directory: RemoteFilesystem) -> list[dict[str, Any]]:
+    """Assemble the full directory structure of a remote from its index."""
+    collection = pydatalab.mongo.get_database()[REMOTE_DIRECTORIES_COLLECTION]
+    listings = {
+        doc["path"]: doc
+        for doc in collection.find({"remote": directory.name}, {"path": 1, "entries": 1})
+    }
+    if "" not in listings:
+        raise RuntimeError(f"No index found for remote filesystem {directory.name!r}.")
+    return _build_tree(listings, "")
+
+
+def _save_index_update(directory: RemoteFilesystem) -> datetime.datetime:
+    """Record the time the index of a remote was updated in the `remoteFilesystems`
+    collection, releasing the lock on it.
 
     Args:
         directory: The remote filesystem object to update.
-        dir_structure: The directory structure info.
 
     Returns:
         The last updated timestamp.
@@ -359,16 +634,17 @@ def _save_directory_structure(
         {"name": directory.name},
         {
             "$set": {
-                "contents": dir_structure,
                 "last_updated": last_updated,
                 "type": "toplevel",
                 "_lock": None,
-            }
+            },
+            # Directory structures were previously stored in full in this document
+            "$unset": {"contents": ""},
         },
         upsert=True,
     )
     LOGGER.debug(
-        "Result of saving directory %s structure to the db: %s %s",
+        "Result of saving directory %s index update to the db: %s %s",
         directory.name,
         last_updated,
         result.raw_result,
@@ -456,8 +732,8 @@ def _release_lock_dir_structure(directory) -> bool:
                     )
                     return False
 
-            if doc.get("contents") is None:
-                # If the lock is held by this process, but the directory structure has not been updated, then delete it
+            if doc.get("last_updated") is None:
+                # If the lock is held by this process, but the directory index has never been built, then delete it
                 collection.delete_one({"name": directory.name}, session=session)
                 LOGGER.debug(
                     "PID %s is removed dir_structure stub %s",
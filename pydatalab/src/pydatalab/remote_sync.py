@@ -0,0 +1,308 @@
+"""Synchronisation of live files with ssh-able remote filesystems.
+
+Keeping the local copies of live files up to date previously cost a new SSH
+connection for every remote `stat`, and another for every `scp` of the whole
+file, one file after the other. This module instead:
+
+- reuses a single SSH connection per host across commands, via OpenSSH
+  connection multiplexing (`ControlMaster`), kept open for
+  `CONFIG.REMOTE_SSH_CONTROL_PERSIST` seconds after its last use;
+- stats many files on the same host with a single remote command
+  (see [`stat_remote_files`][pydatalab.remote_sync.stat_remote_files]);
+- transfers only the bytes appended to a file since it was last synced, as is
+  typical of the growing output files of cyclers and other instruments, after
+  checking that the start and end of the existing local copy still match the
+  remote file (see [`fetch_remote_file`][pydatalab.remote_sync.fetch_remote_file]);
+- syncs several files concurrently, with up to `CONFIG.REMOTE_SYNC_MAX_WORKERS`
+  transfers at once (see [`sync_remote_files`][pydatalab.remote_sync.sync_remote_files]).
+
+"""
+
+import datetime
+import hashlib
+import io
+import os
+import pathlib
+import shlex
+import subprocess
+import tempfile
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, NamedTuple, TypeVar
+
+from pydatalab.config import CONFIG
+from pydatalab.logger import LOGGER
+
+__all__ = (
+    "RemoteStat",
+    "split_remote_path",
+    "ssh_command",
+    "stat_remote_files",
+    "fetch_remote_file",
+    "sync_remote_files",
+    "run_concurrently",
+)
+
+VERIFY_BLOCK_SIZE = 64 * 1024
+"""The number of bytes at the start and at the end of an existing local copy that
+must match the remote file for only the appended bytes to be transferred."""
+
+STAT_BATCH_SIZE = 500
+"""The maximum number of paths passed to a single remote `stat` command."""
+
+REMOTE_COMMAND_TIMEOUT = 20
+"""The timeout, in seconds, of remote commands that do not transfer file contents."""
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+class RemoteStat(NamedTuple):
+    """The result of `stat` on a remote file."""
+
+    last_modified: datetime.datetime
+    """The last modification time of the file."""
+
+    size: int
+    """The size of the file in bytes."""
+
+
+def split_remote_path(remote_path: str) -> tuple[str, str]:
+    r"""Split a remote path of the form `ssh://hostname:/path/to/file` into its
+    hostname and (unescaped) path, e.g., `ssh://host:/path\ to/file` gives
+    `("host", "/path to/file")`."""
+    if remote_path.startswith("ssh://"):
+        remote_path = remote_path[len("ssh://") :]
+    hostname, path = remote_path.split(":", 1)
+    if len(path) > 1 and path[0] == path[-1] == '"':
+        path = path[1:-1]
+    return hostname, path.replace(r"\ ", " ")
+
+
+def _control_directory() -> pathlib.Path:
+    directory = pathlib.Path(tempfile.gettempdir()) / f"datalab-ssh-{os.getuid()}"
+    directory.mkdir(mode=0o700, exist_ok=True)
+    return directory
+
+
+def ssh_command(hostname: str, remote_command: str) -> list[str]:
+    """Build the arguments of an `ssh` call running `remote_command` on `hostname`,
+    sharing a multiplexed connection with other calls to the same host unless
+    `CONFIG.REMOTE_SSH_CONTROL_PERSIST` is 0."""
+    options = []
+    if CONFIG.REMOTE_SSH_CONTROL_PERSIST:
+        options = [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={_control_directory() / '%C'}",
+            "-o",
+            f"ControlPersist={CONFIG.REMOTE_SSH_CONTROL_PERSIST}",
+        ]
+    return ["ssh", *options, hostname, remote_command]
+
+
+def stat_remote_files(hostname: str, paths: Sequence[str]) -> dict[str, RemoteStat | None]:
+    """Stat several files on a remote host in a single remote command.
+
+    Parameters:
+        hostname: The hostname of the remote server.
+        paths: The paths of the files on the remote server.
+
+    Raises:
+        RuntimeError: If the remote command could not be run at all.
+
+    Returns:
+        A dictionary mapping each path to its modification time and size, or to `None`
+        if the file could not be accessed.
+
+    """
+    results: dict[str, RemoteStat | None] = dict.fromkeys(paths)
+    unique_paths = list(results)
+    for start in range(0, len(unique_paths), STAT_BATCH_SIZE):
+        batch = unique_paths[start : start + STAT_BATCH_SIZE]
+        command = ssh_command(
+            hostname, "stat -c '%Y %s %n' -- " + " ".join(shlex.quote(p) for p in batch)
+        )
+        LOGGER.debug("Calling %s", command)
+        try:
+            process = subprocess.run(  # noqa: S603
+                command, capture_output=True, timeout=REMOTE_COMMAND_TIMEOUT, check=False
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            raise RuntimeError(f"Remote stat process {command!r} returned: {exc!r}")
+
+        for line in process.stdout.decode("utf-8", errors="surrogateescape").splitlines():
+            timestamp, size, path = line.split(" ", 2)
+            if path in results:
+                results[path] = RemoteStat(
+                    datetime.datetime.fromtimestamp(int(timestamp), tz=datetime.timezone.utc),
+                    int(size),
+                )
+
+        # `stat` exits with an error if any file is missing, but only a failure to
+        # connect leaves every file of the batch without output
+        if process.returncode and all(results[p] is None for p in batch):
+            raise RuntimeError(f"Remote stat process {command!r} returned: {process.stderr!r}")
+
+    return results
+
+
+class _ProcessOutput(io.RawIOBase):
+    """The standard output of a remote command as a readable stream, which raises
+    once exhausted if the command failed, so that a partial transfer is discarded."""
+
+    def __init__(self, process: subprocess.Popen, description: str):
+        self.process = process
+        self.description = description
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.process.stdout.readinto(buffer)  # type: ignore[union-attr]
+        if not n:
+            _, stderr = self.process.communicate()
+            if self.process.returncode:
+                raise RuntimeError(f"{self.description} returned: {stderr!r}")
+        return n
+
+
+class _ConcatenatedStream(io.RawIOBase):
+    """Reads from several streams in turn."""
+
+    def __init__(self, *streams: IO[bytes]):
+        self.streams = list(streams)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.streams:
+            n = self.streams[0].readinto(buffer)  # type: ignore[attr-defined]
+            if n:
+                return n
+            self.streams.pop(0)
+        return 0
+
+
+def _verification_digest(path: pathlib.Path, size: int) -> str:
+    block = min(VERIFY_BLOCK_SIZE, size)
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        sha256.update(f.read(block))
+        f.seek(size - block)
+        sha256.update(f.read(block))
+    return sha256.hexdigest()
+
+
+def fetch_remote_file(
+    remote_path: str, destination: str | os.PathLike
+) -> tuple[dict[str, str], int]:
+    """Copy a file from an ssh-able remote to `destination`, transferring only the
+    bytes appended to the remote file if `destination` holds an earlier version of it.
+
+    An existing local copy of `n` bytes is treated as an earlier version if its first
+    and last `VERIFY_BLOCK_SIZE` bytes match the same byte ranges of the remote file;
+    these are hashed on the remote in the same command that sends every byte after
+    the first `n`. Otherwise, the whole file is transferred.
+
+    The new version is assembled in a temporary file and only moved into place once
+    complete, as in [`copy_and_hash_file`][pydatalab.file_utils.copy_and_hash_file].
+
+    Parameters:
+        remote_path: The location of the file, of the form `ssh://hostname:/path`.
+        destination: The local path to copy the file to.
+
+    Raises:
+        RuntimeError: If the file could not be transferred.
+
+    Returns:
+        The MD5 and SHA-256 hashes and the size of the new local copy.
+
+    """
+    from pydatalab.file_utils import copy_and_hash_file
+
+    hostname, path = split_remote_path(remote_path)
+    destination = pathlib.Path(destination)
+    quoted = shlex.quote(path)
+    local_size = destination.stat().st_size if destination.is_file() else 0
+
+    if local_size:
+        block = min(VERIFY_BLOCK_SIZE, local_size)
+        command = ssh_command(
+            hostname,
+            f"{{ head -c {block} -- {quoted}; head -c {local_size} -- {quoted} | tail -c {block}; }}"
+            f" | sha256sum; tail -c +{local_size + 1} -- {quoted}",
+        )
+        LOGGER.debug("Fetching appended bytes with %s", command)
+        process = subprocess.Popen(  # noqa: S603
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            remote_digest = process.stdout.readline().split(b" ", 1)[0].decode()  # type: ignore[union-attr]
+            if remote_digest == _verification_digest(destination, local_size):
+                with open(destination, "rb") as local:
+                    return copy_and_hash_file(
+                        _ConcatenatedStream(local, _ProcessOutput(process, f"{command!r}")),
+                        destination,
+                    )
+            LOGGER.debug("Local copy of %s has diverged, fetching whole file", remote_path)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.communicate()
+
+    command = ssh_command(hostname, f"cat -- {quoted}")
+    LOGGER.debug("Fetching file with %s", command)
+    process = subprocess.Popen(  # noqa: S603
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        return copy_and_hash_file(_ProcessOutput(process, f"{command!r}"), destination)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.communicate()
+
+
+def run_concurrently(
+    func: Callable[[_T], _R], arguments: Sequence[_T], max_workers: int | None = None
+) -> list[_R | Exception]:
+    """Call `func` on each of `arguments` in a pool of up to `max_workers` threads
+    (by default, `CONFIG.REMOTE_SYNC_MAX_WORKERS`).
+
+    Returns:
+        The result of each call, in order, or the exception it raised.
+
+    """
+
+    def call(argument: _T) -> _R | Exception:
+        try:
+            return func(argument)
+        except Exception as exc:
+            return exc
+
+    max_workers = min(max_workers or CONFIG.REMOTE_SYNC_MAX_WORKERS, len(arguments))
+    if max_workers <= 1:
+        return [call(argument) for argument in arguments]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="remote-sync") as pool:
+        return list(pool.map(call, arguments))
+
+
+def sync_remote_files(
+    transfers: Sequence[tuple[str, str | os.PathLike]],
+) -> list[tuple[dict[str, str], int] | Exception]:
+    """Copy several files from ssh-able remotes (or locally mounted filesystems) concurrently.
+
+    Parameters:
+        transfers: Pairs of the remote path of a file and the local path to copy it to.
+
+    Returns:
+        For each transfer, in order, the hashes and size of the copied file, or the
+        exception raised when copying it.
+
+    """
+    from pydatalab.file_utils import _sync_file_with_remote
+
+    return run_concurrently(lambda transfer: _sync_file_with_remote(*transfer), transfers)
@@ -0,0 +1,197 @@
+"""A cache of the rendered output (e.g., Bokeh plots) of data blocks.
+
+Rendering a block via [`DataBlock.to_web`][pydatalab.blocks.base.DataBlock.to_web]
+runs all of its plot functions, which for most techniques means parsing the
+attached files and regenerating a full Bokeh document with embedded data, even
+when nothing about the block has changed since it was last rendered. The
+rendered fields of each block are therefore stored in the
+`block_render_cache` collection, keyed by a hash of the block type and
+version, the user-controllable block data (i.e., everything except the
+block's `render_output_fields`), the content hashes of the attached files and
+any further inputs declared by the block via `_render_cache_inputs`.
+
+Each entry is stored under the keys of both the block data it was rendered
+from and the block data that resulted from rendering, so that the block, as
+saved to the database after rendering, hits the cache on its next load.
+Entries expire `CONFIG.BLOCK_RENDER_CACHE_TTL` hours after they were last used.
+
+"""
+
+import datetime
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any
+
+from bson import ObjectId
+from flask import has_app_context
+
+from pydatalab.logger import LOGGER
+from pydatalab.mongo import flask_mongo
+from pydatalab.utils import CustomJSONEncoder
+
+if TYPE_CHECKING:
+    from pydatalab.blocks.base import DataBlock
+
+__all__ = (
+    "RENDER_CACHE_COLLECTION",
+    "render_cache_key",
+    "load_rendered",
+    "store_rendered",
+    "clear_render_cache",
+)
+
+RENDER_CACHE_COLLECTION = "block_render_cache"
+"""The name of the MongoDB collection holding the rendered block output."""
+
+
+def _ttl_hours() -> int:
+    from pydatalab.config import CONFIG
+
+    return CONFIG.BLOCK_RENDER_CACHE_TTL
+
+
+def _file_hashes(block: "DataBlock") -> list[str] | None:
+    """Return the content hashes of the files used by the block, or `None` if any of
+    them is live (i.e., may be updated from its remote when the block is rendered)."""
+    file_ids: list[ObjectId] = []
+    for field in block.render_cache_file_fields:
+        value = block.data.get(field)
+        values = value if isinstance(value, list) else [value]
+        file_ids.extend(ObjectId(v) for v in values if v and ObjectId.is_valid(v))
+
+    if not file_ids:
+        return []
+
+    files = {
+        doc["_id"]: doc
+        for doc in flask_mongo.db.files.find(
+            {"_id": {"$in": file_ids}}, {"checksums": 1, "last_modified": 1, "is_live": 1}
+        )
+    }
+    hashes = []
+    for file_id in file_ids:
+        doc = files.get(file_id)
+        if doc is None:
+            hashes.append(f"missing:{file_id}")
+        elif doc.get("is_live"):
+            return None
+        elif (doc.get("checksums") or {}).get("sha256"):
+            hashes.append(doc["checksums"]["sha256"])
+        else:
+            hashes.append(f"{file_id}:{doc.get('last_modified')}")
+    return hashes
+
+
+def _json_default(o: Any) -> Any:
+    try:
+        return CustomJSONEncoder.default(o)
+    except RuntimeError:
+        return repr(o)
+
+
+def render_cache_key(block: "DataBlock", file_hashes: list[str]) -> str:
+    """Compute the cache key for the current state of the given block.
+
+    Parameters:
+        block: The block to compute the key for.
+        file_hashes: The content hashes of the files used by the block.
+
+    Returns:
+        A hex digest identifying the inputs of the block's plot functions.
+
+    """
+    inputs = {
+        "blocktype": block.blocktype,
+        "version": block.version,
+        "data": {k: v for k, v in block.data.items() if k not in block.render_output_fields},
+        "files": file_hashes,
+        "extra": block._render_cache_inputs(),
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True, default=_json_default).encode()
+    ).hexdigest()
+
+
+def load_rendered(block: "DataBlock") -> tuple[str | None, list[str] | None, dict | None]:
+    """Look up the rendered output for the current state of the given block.
+
+    Parameters:
+        block: The block to look up.
+
+    Returns:
+        A tuple of the cache key (or `None` if the block cannot be cached), the file
+        hashes it was computed from, and the cached output fields (or `None` on a miss).
+
+    """
+    if (
+        not _ttl_hours()
+        or not block.plot_functions
+        or not block._supports_render_cache
+        or not has_app_context()
+    ):
+        return None, None, None
+
+    try:
+        file_hashes = _file_hashes(block)
+        if file_hashes is None:
+            return None, None, None
+        key = render_cache_key(block, file_hashes)
+        entry = flask_mongo.db[RENDER_CACHE_COLLECTION].find_one_and_update(
+            {"keys": key},
+            {"$set": {"expires_at": _expiry()}},
+            projection={"output": 1},
+        )
+    except Exception as exc:
+        LOGGER.warning("Unable to query render cache for block %s: %s", block.block_id, exc)
+        return None, None, None
+
+    if entry is None:
+        return key, file_hashes, None
+
+    LOGGER.debug("Render cache hit for block %s (%s)", block.block_id, key)
+    return key, file_hashes, entry["output"]
+
+
+def store_rendered(block: "DataBlock", key: str, file_hashes: list[str], output: dict) -> None:
+    """Store the rendered output of the given block under its pre-render key and
+    the key of its current (post-render) state.
+
+    Parameters:
+        block: The rendered block.
+        key: The cache key computed before rendering, as returned by `load_rendered`.
+        file_hashes: The file hashes returned by `load_rendered`.
+        output: The block data fields written by rendering.
+
+    """
+    try:
+        keys = sorted({key, render_cache_key(block, file_hashes)})
+        flask_mongo.db[RENDER_CACHE_COLLECTION].replace_one(
+            {"keys": key},
+            {
+                "keys": keys,
+                "blocktype": block.blocktype,
+                "output": output,
+                "expires_at": _expiry(),
+            },
+            upsert=True,
+        )
+    except Exception as exc:
+        LOGGER.warning("Unable to store rendered output of block %s: %s", block.block_id, exc)
+
+
+def _expiry() -> datetime.datetime:
+    return datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=_ttl_hours())
+
+
+def clear_render_cache(match: dict[str, Any] | None = None) -> int:
+    """Remove entries from the render cache, e.g., after changing a plotting routine
+    without bumping the block version.
+
+    Parameters:
+        match: An optional query selecting the entries to remove, e.g., `{"blocktype": "xrd"}`.
+
+    Returns:
+        The number of entries removed.
+
+    """
+    return flask_mongo.db[RENDER_CACHE_COLLECTION].delete_many(match or {}).deleted_count
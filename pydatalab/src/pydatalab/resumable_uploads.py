@@ -0,0 +1,309 @@
+"""Resumable, chunked uploads of large files.
+
+Uploading a multi-GB instrument dataset in a single multipart request means
+starting over whenever the connection drops, and ties up a server worker for
+the whole transfer. Instead, clients can create an upload session (see
+[`create_upload_session`][pydatalab.resumable_uploads.create_upload_session]),
+send the file in chunks of at most `CONFIG.UPLOAD_CHUNK_SIZE` bytes, each
+written at its byte offset into a staging file under
+`<CONFIG.FILE_DIRECTORY>/.uploads/`, query which byte ranges have been received
+so far in order to resume an interrupted upload, and finally attach the
+completed file to an item through the usual
+[`save_uploaded_file`][pydatalab.file_utils.save_uploaded_file] (or
+[`update_uploaded_file`][pydatalab.file_utils.update_uploaded_file]) bookkeeping.
+
+Sessions are stored in the `upload_sessions` collection, with every received
+chunk recorded as a `[start, end)` byte range. The MD5 and SHA-256 hashes of the
+file are computed incrementally over its contiguous prefix as chunks arrive,
+such that finalizing an upload does not need to re-read the file (unless its
+chunks were received by different server processes).
+
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import IO, Any
+
+from pymongo import ReturnDocument
+
+from pydatalab.config import CONFIG
+from pydatalab.file_utils import COPY_BUFFER_SIZE, StagedUpload
+from pydatalab.logger import LOGGER
+from pydatalab.mongo import flask_mongo
+
+__all__ = (
+    "UPLOAD_SESSIONS_COLLECTION",
+    "IncompleteUpload",
+    "create_upload_session",
+    "get_upload_session",
+    "received_ranges",
+    "write_upload_chunk",
+    "finalize_upload_session",
+    "delete_upload_session",
+    "cleanup_stale_upload_sessions",
+)
+
+UPLOAD_SESSIONS_COLLECTION = "upload_sessions"
+"""The name of the MongoDB collection holding the state of resumable uploads."""
+
+
+class IncompleteUpload(RuntimeError):
+    """Raised when an upload is finalized before all of its bytes have been received."""
+
+
+class _HashState:
+    """The hashes of the first `offset` bytes of a staged upload."""
+
+    def __init__(self):
+        self.md5 = hashlib.md5()  # noqa: S324
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+
+_HASH_STATES: dict[str, _HashState] = {}
+_HASH_STATES_LOCK = threading.Lock()
+
+
+def _staging_directory() -> Path:
+    return Path(CONFIG.FILE_DIRECTORY) / ".uploads"
+
+
+def _staging_path(upload_id: str) -> Path:
+    return _staging_directory() / f"{upload_id}.part"
+
+
+def create_upload_session(
+    filename: str,
+    size: int,
+    item_id: str,
+    creator_id: Any,
+    replace_file_id: str | None = None,
+    last_modified: str | None = None,
+) -> dict:
+    """Create a new resumable upload session and its (empty) staging file.
+
+    Parameters:
+        filename: The name of the file being uploaded.
+        size: The total size of the file in bytes.
+        item_id: The ID of the item to attach the file to.
+        creator_id: The ID of the user creating the upload, who will be the only
+            user able to add to it.
+        replace_file_id: The database ID of an existing file to replace, if any.
+        last_modified: An isoformat datetime to track as the last time the file was modified.
+
+    Returns:
+        The session document.
+
+    """
+    session = {
+        "upload_id": uuid.uuid4().hex,
+        "filename": filename,
+        "size": size,
+        "item_id": item_id,
+        "replace_file_id": replace_file_id,
+        "last_modified": last_modified,
+        "creator_id": creator_id,
+        "received": [],
+        "created_at": datetime.datetime.now(tz=datetime.timezone.utc),
+    }
+
+    flask_mongo.db[UPLOAD_SESSIONS_COLLECTION].insert_one(session)
+
+    staging_path = _staging_path(session["upload_id"])
+    staging_path.parent.mkdir(exist_ok=True)
+    with open(staging_path, "xb") as f:
+        f.truncate(size)
+
+    return session
+
+
+def get_upload_session(upload_id: str, creator_id: Any) -> dict | None:
+    """Return the upload session with the given ID, if it was created by the given user."""
+    return flask_mongo.db[UPLOAD_SESSIONS_COLLECTION].find_one(
+        {"upload_id": upload_id, "creator_id": creator_id}
+    )
+
+
+def received_ranges(session: dict) -> list[list[int]]:
+    """Merge the byte ranges received for an upload into a sorted list of disjoint
+    `[start, end)` ranges."""
+    merged: list[list[int]] = []
+    for start, end in sorted(session.get("received") or []):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        elif end > start:
+            merged.append([start, end])
+    return merged
+
+
+def _advance_hashes(upload_id: str, contiguous_end: int, create: bool) -> _HashState | None:
+    """Feed the bytes of the staging file up to `contiguous_end` that have not yet
+    been hashed into the hash state of the upload.
+
+    The hash state only exists in the process that created it; a new one (hashing
+    from the start of the file) is only created if `create` is true.
+
+    """
+    with _HASH_STATES_LOCK:
+        state = _HASH_STATES.get(upload_id)
+        if state is None:
+            if not create:
+                return None
+            state = _HASH_STATES[upload_id] = _HashState()
+
+    with state.lock:
+        if state.offset < contiguous_end:
+            with open(_staging_path(upload_id), "rb") as f:
+                f.seek(state.offset)
+                while state.offset < contiguous_end:
+                    chunk = f.read(min(COPY_BUFFER_SIZE, contiguous_end - state.offset))
+                    if not chunk:
+                        break
+                    state.md5.update(chunk)
+                    state.sha256.update(chunk)
+                    state.offset += len(chunk)
+    return state
+
+
+def write_upload_chunk(
+    session: dict, offset: int, stream: IO[bytes], length: int
+) -> list[list[int]]:
+    """Write a chunk of an upload at the given byte offset of its staging file.
+
+    The chunk is streamed from `stream`; if the stream ends early (e.g., the client
+    disconnected), the bytes received so far are kept, so that the client can resume
+    from the end of the received ranges.
+
+    Parameters:
+        session: The upload session.
+        offset: The byte offset of the chunk within the file.
+        stream: The stream to read the chunk from.
+        length: The length of the chunk in bytes.
+
+    Raises:
+        ValueError: If the chunk does not fit within the declared size of the file.
+        FileNotFoundError: If the upload was finalized or removed in the meantime.
+
+    Returns:
+        The merged byte ranges received so far.
+
+    """
+    if offset < 0 or length < 0 or offset + length > session["size"]:
+        raise ValueError(
+            f"Chunk of {length} bytes at offset {offset} does not fit in a file of {session['size']} bytes"
+        )
+
+    upload_id = session["upload_id"]
+    written = 0
+    fd = os.open(_staging_path(upload_id), os.O_WRONLY)
+    try:
+        while written < length:
+            chunk = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not chunk:
+                break
+            view = memoryview(chunk)
+            while view:
+                n = os.pwrite(fd, view, offset + written)
+                view = view[n:]
+                written += n
+    finally:
+        os.close(fd)
+        if written:
+            session = flask_mongo.db[UPLOAD_SESSIONS_COLLECTION].find_one_and_update(
+                {"upload_id": upload_id},
+                {"$push": {"received": [offset, offset + written]}},
+                return_document=ReturnDocument.AFTER,
+            )
+
+    if session is None:
+        raise FileNotFoundError(f"Upload {upload_id} was finalized or removed during the upload")
+
+    if written < length:
+        LOGGER.debug("Upload %s: received %d of %d bytes at %d", upload_id, written, length, offset)
+
+    ranges = received_ranges(session)
+    # Keep hashing the contiguous prefix of the file in this process, while it is in the page cache
+    if ranges and ranges[0][0] == 0:
+        _advance_hashes(upload_id, ranges[0][1], create=offset == 0)
+    return ranges
+
+
+def finalize_upload_session(session: dict) -> StagedUpload:
+    """Complete the hashes of a fully received upload.
+
+    The session and its staging file are left in place, such that finalizing can
+    be retried if saving the staged file fails; they should be removed with
+    [`delete_upload_session`][pydatalab.resumable_uploads.delete_upload_session]
+    once it has been saved.
+
+    Raises:
+        IncompleteUpload: If some bytes of the file have not been received.
+
+    Returns:
+        The staged file, to be passed on to
+        [`save_uploaded_file`][pydatalab.file_utils.save_uploaded_file] or
+        [`update_uploaded_file`][pydatalab.file_utils.update_uploaded_file].
+
+    """
+    upload_id = session["upload_id"]
+    ranges = received_ranges(session)
+    if session["size"] and ranges != [[0, session["size"]]]:
+        raise IncompleteUpload(
+            f"Upload {upload_id} is incomplete: received byte ranges {ranges} of {session['size']}"
+        )
+
+    state = _advance_hashes(upload_id, session["size"], create=True)
+
+    return StagedUpload(
+        filename=session["filename"],
+        path=_staging_path(upload_id),
+        checksums={"md5": state.md5.hexdigest(), "sha256": state.sha256.hexdigest()},
+        size=session["size"],
+    )
+
+
+def delete_upload_session(session: dict) -> None:
+    """Abort an upload, removing its session and staging file."""
+    upload_id = session["upload_id"]
+    with _HASH_STATES_LOCK:
+        _HASH_STATES.pop(upload_id, None)
+    flask_mongo.db[UPLOAD_SESSIONS_COLLECTION].delete_one({"upload_id": upload_id})
+    _staging_path(upload_id).unlink(missing_ok=True)
+
+
+def cleanup_stale_upload_sessions() -> int:
+    """Remove upload sessions (and their staging files) that were started more than
+    `CONFIG.UPLOAD_SESSION_MAX_AGE` hours ago.
+
+    Returns:
+        The number of sessions removed.
+
+    """
+    cutoff = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        hours=CONFIG.UPLOAD_SESSION_MAX_AGE
+    )
+    stale = list(
+        flask_mongo.db[UPLOAD_SESSIONS_COLLECTION].find(
+            {"created_at": {"$lt": cutoff}}, {"upload_id": 1}
+        )
+    )
+    for session in stale:
+        delete_upload_session(session)
+
+    # Also remove any old staging files left behind without a session
+    directory = _staging_directory()
+    if directory.exists():
+        for path in directory.glob("*.part"):
+            if path.stat().st_mtime < cutoff.timestamp() and not flask_mongo.db[
+                UPLOAD_SESSIONS_COLLECTION
+            ].find_one({"upload_id": path.stem}, {"_id": 1}):
+                path.unlink(missing_ok=True)
+
+    if stale:
+        LOGGER.info("Removed %d stale upload sessions", len(stale))
+    return len(stale)
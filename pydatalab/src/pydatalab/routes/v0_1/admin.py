@@ -9,7 +9,8 @@ from werkzeug.exceptions import BadRequest, NotFound
 from pydatalab.config import CONFIG
 from pydatalab.models.people import Group, Person
 from pydatalab.mongo import flask_mongo
-from pydatalab.permissions import admin_only
+from pydatalab.permissions import admin_only, invalidate_permissions_cache
+from pydatalab.summaries import refresh_item_summaries
 
 
 def check_manager_cycle(user_id: ObjectId, new_manager_id: ObjectId) -> bool:
@@ -225,6 +226,7 @@ def update_user_managers(user_id):
     update_result = flask_mongo.db.users.update_one(
         {"_id": ObjectId(user_id)}, {"$set": {"managers": manager_object_ids}}
     )
+    invalidate_permissions_cache()
 
     if update_result.matched_count != 1:
         return jsonify({"status": "error", "message": "Unable to update user managers"}), 400
@@ -411,6 +413,8 @@ def delete_group(group_immutable_id: str):
         result = flask_mongo.db.groups.delete_one({"_id": ObjectId(group_immutable_id)})
 
         if result.deleted_count == 1:
+            invalidate_permissions_cache()
+            refresh_item_summaries({"group_ids": ObjectId(group_immutable_id)})
             return jsonify({"status": "success"}), 200
 
     return jsonify({"status": "error", "message": "Unable to delete group."}), 400
@@ -463,6 +467,8 @@ def update_group(group_immutable_id: str):
         if result.modified_count == 0:
             return jsonify({"status": "success", "message": "No changes were made."}), 200
 
+        refresh_item_summaries({"group_ids": ObjectId(group_immutable_id)})
+
         return jsonify({"status": "success", "message": "Group updated successfully."}), 200
 
     except Exception as e:
@@ -488,6 +494,7 @@ def add_user_to_group(group_immutable_id: str):
         {"_id": ObjectId(user_id)},
         {"$addToSet": {"groups": {"immutable_id": ObjectId(group_immutable_id)}}},
     )
+    invalidate_permissions_cache()
 
     if update_user.matched_count == 0:
         raise BadRequest("Unable to add user to group: user does not exist.")
@@ -510,6 +517,7 @@ def remove_user_from_group(group_immutable_id: str, user_id: str):
         {"_id": ObjectId(user_id)},
         {"$pull": {"groups": {"immutable_id": ObjectId(group_immutable_id)}}},
     )
+    invalidate_permissions_cache()
 
     if update_user.matched_count == 0:
         raise BadRequest("Unable to remove user from group: user does not exist.")
@@ -28,6 +28,7 @@ from pydatalab.models.people import AccountStatus, Identity, IdentityType, Perso
 from pydatalab.mongo import flask_mongo, insert_pydantic_model_fork_safe
 from pydatalab.permissions import ApiKey, authenticate, exclude_api_key
 from pydatalab.send_email import send_mail
+from pydatalab.summaries import refresh_item_summaries
 
 KEY_LENGTH: int = 32
 LINK_EXPIRATION: datetime.timedelta = datetime.timedelta(hours=1)
@@ -573,6 +574,9 @@ def find_create_or_modify_user(
                 f"Attempted to modify user {user_id} but performed {result.matched_count} updates. Results:\n{result.raw_result}"
             )
 
+        if "display_name" in update.get("$set", {}):
+            refresh_item_summaries({"creator_ids": ObjectId(user_id)})
+
     user = find_user_with_identity(identifier, identity_type, verify=True)
 
     # If no user was found in the database with the OAuth ID, make or modify one:
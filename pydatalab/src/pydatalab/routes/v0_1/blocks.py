@@ -1,22 +1,36 @@
 import contextlib
+import gzip
 import json
 import traceback
 import uuid
+import zlib
 from datetime import datetime, timedelta, timezone
 
 import gridfs
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_login import current_user, login_user
 from werkzeug.exceptions import BadRequest, NotFound, NotImplemented
 
 from pydatalab.apps import BLOCK_TYPES
+from pydatalab.block_outputs import cleanup_block_outputs, load_block_outputs, store_block_outputs
 from pydatalab.blocks.base import DataBlock
+from pydatalab.bokeh_plots import encode_column_data
 from pydatalab.logger import LOGGER
 from pydatalab.login import get_by_id
 from pydatalab.models.tasks import BlockProcessingTaskSpec, Task, TaskStage, TaskStatus, TaskType
 from pydatalab.mongo import flask_mongo, get_database
 from pydatalab.permissions import active_users_or_get_only, get_default_permissions
-from pydatalab.scheduler import task_scheduler
+from pydatalab.scheduler import JobPriority, task_scheduler
+from pydatalab.summaries import ITEM_SUMMARIES_COLLECTION, refresh_item_summaries
+from pydatalab.task_events import (
+    TASK_EVENT_STREAM_MIMETYPE,
+    last_event_id,
+    parse_long_poll_args,
+    task_event_stream,
+    task_notifier,
+    task_watcher,
+    wait_for_task_update,
+)
 from pydatalab.utils import CustomJSONEncoder
 
 _app = None
@@ -25,6 +39,44 @@ Used by background tasks that need an app/request context but run outside of
 a real HTTP request (e.g. APScheduler jobs).
 """
 
+BLOCK_DATA_BUCKET = "block_data"
+"""The GridFS bucket used as a transfer buffer for asynchronously generated block data."""
+
+_BLOCK_DATA_CHUNK_SIZE = 256 * 1024
+
+
+def _store_block_data(task_id: str, web_data: dict) -> None:
+    """Write the generated block data to the GridFS transfer buffer.
+
+    The numeric columns of any Bokeh plot are stored with Bokeh's typed base64
+    array encoding, and the JSON document is gzip-compressed once here, such that
+    it can be streamed to the client as-is by `get_block_task_data`.
+
+    """
+    if isinstance(web_data.get("bokeh_plot_data"), dict):
+        encode_column_data(web_data["bokeh_plot_data"])
+
+    payload = gzip.compress(json.dumps(web_data, cls=CustomJSONEncoder).encode("utf-8"))
+    bucket = gridfs.GridFSBucket(get_database(), bucket_name=BLOCK_DATA_BUCKET)
+    bucket.upload_from_stream(
+        task_id,
+        payload,
+        metadata={"content_type": "application/json", "content_encoding": "gzip"},
+    )
+
+
+def _iter_block_data(stream, decompress: bool):
+    """Yield the chunks of a stored block data file, decompressing them if requested."""
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16) if decompress else None
+    for chunk in iter(lambda: stream.read(_BLOCK_DATA_CHUNK_SIZE), b""):
+        yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        yield decompressor.flush()
+
+
+def _is_gzipped(stream) -> bool:
+    return (stream.metadata or {}).get("content_encoding") == "gzip"
+
 
 def _process_block_async(
     task_id: str, block_data: dict, event_data: dict | None, creator_id: str | None = None
@@ -38,9 +90,9 @@ def _process_block_async(
 
     The generated block data (which can be very large, e.g. full bokeh plots
     with embedded datasets) is written to a GridFS transfer buffer keyed by
-    ``task_id``. The status endpoint reads this buffer once and deletes it on
-    delivery — the GridFS data is ephemeral and only exists to bridge the async
-    worker and the client's next status poll.
+    ``task_id``. The status (or data) endpoint reads this buffer once and deletes
+    it on delivery — the GridFS data is ephemeral and only exists to bridge the
+    async worker and the client's next status poll.
 
     Block state is also persisted to the item's ``blocks_obj`` in the normal
     way via ``_save_block_to_db``, so the GridFS data is not the source of
@@ -56,6 +108,7 @@ def _process_block_async(
         flask_mongo.db.tasks.update_one(
             {"task_id": task_id}, {"$push": {"spec.stages": stage.dict()}}
         )
+        task_notifier.notify(task_id)
 
     with app_ctx, req_ctx:
         if creator_id:
@@ -68,6 +121,7 @@ def _process_block_async(
             flask_mongo.db.tasks.update_one(
                 {"task_id": task_id}, {"$set": {"status": TaskStatus.PROCESSING}}
             )
+            task_notifier.notify(task_id)
             add_stage("Processing started")
 
             block_type = block_data["blocktype"]
@@ -80,9 +134,14 @@ def _process_block_async(
             stored_block_data = (
                 (stored_item or {}).get("blocks_obj", {}).get(block_data["block_id"])
             )
+            load_block_outputs([stored_block_data])
 
             block = BLOCK_TYPES[block_type].from_web(block_data, stored_data=stored_block_data)
 
+            # Events that only change the view (e.g., zooming a plot) are not
+            # worth a database write each; they are persisted on the next item save
+            view_only = block.is_view_event(event_data)
+
             if event_data:
                 add_stage("Processing block events")
                 try:
@@ -90,18 +149,18 @@ def _process_block_async(
                 except NotImplementedError:
                     pass
 
-            add_stage("Saving block state to database")
-            _save_block_to_db(block)
+            if not view_only:
+                add_stage("Saving block state to database")
+                _save_block_to_db(block)
 
             add_stage("Generating visualization data")
             web_data = block.to_web()
 
-            bucket = gridfs.GridFSBucket(get_database(), bucket_name="block_data")
-            block_data_bytes = json.dumps(web_data, cls=CustomJSONEncoder).encode("utf-8")
-            bucket.upload_from_stream(task_id, block_data_bytes)
+            _store_block_data(task_id, web_data)
 
-            add_stage("Saving final results to database")
-            _save_block_to_db(block)
+            if not view_only:
+                add_stage("Saving final results to database")
+                _save_block_to_db(block)
 
             LOGGER.info("Task %s: completed successfully", task_id)
             add_stage("Processing completed successfully", level="info")
@@ -114,6 +173,7 @@ def _process_block_async(
                     }
                 },
             )
+            task_notifier.notify(task_id)
 
         except Exception as e:
             LOGGER.exception("Task %s: failed with error: %s", task_id, e)
@@ -132,6 +192,7 @@ def _process_block_async(
                     }
                 },
             )
+            task_notifier.notify(task_id)
 
 
 TASK_MAX_AGE_HOURS = 6
@@ -186,7 +247,7 @@ def _cleanup_stale_tasks():
             return
 
         # Delete associated GridFS files
-        bucket = gridfs.GridFSBucket(get_database(), bucket_name="block_data")
+        bucket = gridfs.GridFSBucket(get_database(), bucket_name=BLOCK_DATA_BUCKET)
         deleted_files = 0
         for task_id in task_ids:
             for grid_file in bucket.find({"filename": task_id}):
@@ -208,6 +269,13 @@ def _cleanup_stale_tasks():
         )
 
 
+def _cleanup_block_outputs():
+    """Periodic removal of the stored block outputs that are no longer referenced."""
+    app_ctx = _app.app_context() if _app else contextlib.nullcontext()
+    with app_ctx:
+        cleanup_block_outputs()
+
+
 BLOCKS = Blueprint("blocks", __name__)
 
 
@@ -223,6 +291,12 @@ def _register_cleanup_job(state):
     )
     LOGGER.info("Registered block task cleanup job (every %d hours)", TASK_MAX_AGE_HOURS)
 
+    task_scheduler.add_periodic_job(
+        func=_cleanup_block_outputs,
+        job_id="block_outputs_cleanup",
+        hours=TASK_MAX_AGE_HOURS,
+    )
+
 
 @BLOCKS.before_request
 @active_users_or_get_only
@@ -273,6 +347,8 @@ def add_data_block():
             400,
         )
 
+    refresh_item_summaries({"item_id": item_id})
+
     # get the new display_order:
     display_order_result = flask_mongo.db.items.find_one(
         {"item_id": item_id, **get_default_permissions(user_only=True)}, {"display_order": 1}
@@ -290,13 +366,14 @@ def add_data_block():
 
 def _save_block_to_db(block: DataBlock):
     """Save data for a single block within an item to the database,
-    overwriting previous data saved there.
+    overwriting previous data saved there. Large generated outputs are
+    stored separately, see [`pydatalab.block_outputs`][pydatalab.block_outputs].
 
     Parameters:
         block: The instance of DataBlock to save.
 
     """
-    updated_block = block.to_db()
+    updated_block = store_block_outputs(block.to_db())
     update = {"$set": {f"blocks_obj.{block.block_id}": updated_block}}
 
     match = {
@@ -311,6 +388,12 @@ def _save_block_to_db(block: DataBlock):
             f"Failed to save block, likely because item_id ({block.data.get('item_id')}), and/or block_id ({block.block_id}) wasn't found"
         )
 
+    # Only the block title is summarized, so it can be updated in place
+    flask_mongo.db[ITEM_SUMMARIES_COLLECTION].update_one(
+        {"item_id": block.data["item_id"], "blocks.block_id": block.block_id},
+        {"$set": {"blocks.$.title": updated_block.get("title")}},
+    )
+
 
 @BLOCKS.route("/update-block/", methods=["POST"])
 @BLOCKS.route("/blocks/", methods=["POST"])
@@ -342,9 +425,9 @@ def update_block():
     if not item:
         raise NotFound(f"Item with item_id {item_id} not found or not accessible")
 
-    block = BLOCK_TYPES[block_type].from_web(
-        block_data, stored_data=item.get("blocks_obj", {}).get(block_data["block_id"])
-    )
+    stored_block_data = item.get("blocks_obj", {}).get(block_data["block_id"])
+    load_block_outputs([stored_block_data])
+    block = BLOCK_TYPES[block_type].from_web(block_data, stored_data=stored_block_data)
 
     from pydatalab.config import CONFIG
 
@@ -383,10 +466,17 @@ def update_block():
 
         flask_mongo.db.tasks.insert_one(block_task.dict())
 
+        # Events come from a user interacting with the block, so should not
+        # have to wait behind bulk (re)processing
         task_scheduler.add_job(
             func=_process_block_async,
             args=[task_id, block_data, event_data, creator_id],
             job_id=task_id,
+            task_id=task_id,
+            priority=JobPriority.INTERACTIVE if event_data else JobPriority.NORMAL,
+            limit_key=block_type,
+            # Updates of the same block must not race to write its data
+            serial_key=f"{block_data['item_id']}:{block_data['block_id']}",
         )
 
         return (
@@ -399,6 +489,8 @@ def update_block():
             202,
         )
     else:
+        view_only = block.is_view_event(event_data)
+
         if event_data:
             try:
                 block.process_events(event_data)
@@ -406,13 +498,15 @@ def update_block():
                 pass
 
         # Save state from UI
-        _save_block_to_db(block)
+        if not view_only:
+            _save_block_to_db(block)
 
         # Reload the block with new UI state
         new_block_data = block.to_web()
 
         # Save results to DB
-        _save_block_to_db(block)
+        if not view_only:
+            _save_block_to_db(block)
 
         return (
             jsonify(status="success", saved_successfully=True, new_block_data=new_block_data),
@@ -451,15 +545,59 @@ def delete_block():
             ),
             400,
         )
+
+    refresh_item_summaries({"item_id": item_id})
+
     return (
         jsonify({"status": "success"}),
         200,
     )  # could try to switch to http 204 is "No Content" success with no json
 
 
+def _find_block_task(task_id: str) -> dict | None:
+    return flask_mongo.db.tasks.find_one({"task_id": task_id, "type": TaskType.BLOCK_PROCESSING})
+
+
+def _is_block_task_deliverable(task: dict) -> bool:
+    """Whether the results of a block processing task can be delivered, i.e., the
+    task is ready and the block is accessible to the user."""
+    if task["status"] != TaskStatus.READY:
+        return False
+
+    item_id = task["spec"]["item_id"]
+    block_id = task["spec"]["block_id"]
+    item = flask_mongo.db.items.find_one(
+        {"item_id": item_id, **get_default_permissions(user_only=False)},
+        {f"blocks_obj.{block_id}": 1},
+    )
+    return bool(item and "blocks_obj" in item and block_id in item["blocks_obj"])
+
+
+def _get_ready_block_task(task_id: str) -> tuple[dict | None, bool]:
+    """Return the block processing task with the given ID, and whether its results
+    can be delivered."""
+    task = _find_block_task(task_id)
+    return task, bool(task) and _is_block_task_deliverable(task)
+
+
 @BLOCKS.route("/blocks/<string:task_id>/status", methods=["GET"])
 def get_block_task_status(task_id: str):
-    task = flask_mongo.db.tasks.find_one({"task_id": task_id, "type": TaskType.BLOCK_PROCESSING})
+    """Return the status of a block processing task.
+
+    Once the task is ready, the generated block data is included under `block_data`
+    (and then deleted from the transfer buffer), unless `inline=false` is passed, in
+    which case it should instead be fetched from the returned `block_data_url`.
+
+    Passing `wait=<seconds>` (and optionally `since=<number of stages seen>`) turns
+    the request into a long-poll that only returns once the task has progressed.
+
+    """
+    wait, since = parse_long_poll_args(request.args)
+    if wait:
+        wait_for_task_update(
+            task_id, lambda: _find_block_task(task_id), since, wait, watcher=task_watcher
+        )
+    task, deliverable = _get_ready_block_task(task_id)
 
     if not task:
         return jsonify({"status": "error", "message": "Task not found"}), 404
@@ -472,28 +610,109 @@ def get_block_task_status(task_id: str):
 
     if task.get("spec", {}).get("stages"):
         response["stages"] = task["spec"]["stages"]
-    if task.get("completed_at"):
-        response["completed_at"] = task["completed_at"]
+    for key in ("started_at", "completed_at", "queue_depth", "wait_seconds"):
+        if task.get(key) is not None:
+            response[key] = task[key]
     if task.get("error_message"):
         response["error_message"] = task["error_message"]
 
-    if task["status"] == TaskStatus.READY:
-        item_id = task["spec"]["item_id"]
-        block_id = task["spec"]["block_id"]
+    if not deliverable:
+        return jsonify(response), 200
+
+    response["block_data_url"] = f"/blocks/{task_id}/data"
+    if request.args.get("inline", "true").lower() == "false":
+        return jsonify(response), 200
+
+    bucket = gridfs.GridFSBucket(get_database(), bucket_name=BLOCK_DATA_BUCKET)
+    try:
+        stream = bucket.open_download_stream_by_name(task_id)
+    except gridfs.errors.NoFile:
+        response["block_data"] = None
+        return jsonify(response), 200
+
+    # Splice the stored JSON into the response as-is, rather than decoding and re-encoding it
+    block_data = b"".join(_iter_block_data(stream, decompress=_is_gzipped(stream)))
+    # Clean up: delete the GridFS file now that the client has the data
+    bucket.delete(stream._id)
+    body = current_app.json.dumps(response).encode("utf-8")
+    body = body[:-1] + b', "block_data": ' + block_data + b"}"
+    return Response(body, status=200, mimetype="application/json")
+
+
+@BLOCKS.route("/blocks/<string:task_id>/data", methods=["GET"])
+def get_block_task_data(task_id: str):
+    """Stream the block data generated by a ready block processing task straight from
+    the GridFS transfer buffer, without decoding it, and delete it once delivered.
+
+    The data is sent gzip-compressed (as stored) to clients that accept it.
 
-        item = flask_mongo.db.items.find_one(
-            {"item_id": item_id, **get_default_permissions(user_only=False)},
-            {f"blocks_obj.{block_id}": 1},
+    """
+    task, deliverable = _get_ready_block_task(task_id)
+
+    if not task:
+        return jsonify({"status": "error", "message": "Task not found"}), 404
+    if not deliverable:
+        return jsonify({"status": "error", "message": "Task results are not available"}), 409
+
+    bucket = gridfs.GridFSBucket(get_database(), bucket_name=BLOCK_DATA_BUCKET)
+    try:
+        stream = bucket.open_download_stream_by_name(task_id)
+    except gridfs.errors.NoFile:
+        return (
+            jsonify({"status": "error", "message": "Block data already delivered or expired"}),
+            404,
         )
 
-        if item and "blocks_obj" in item and block_id in item["blocks_obj"]:
-            bucket = gridfs.GridFSBucket(get_database(), bucket_name="block_data")
-            try:
-                stream = bucket.open_download_stream_by_name(task_id)
-                response["block_data"] = json.loads(stream.read())
-                # Clean up: delete the GridFS file now that the client has the data
-                bucket.delete(stream._id)
-            except gridfs.errors.NoFile:
-                response["block_data"] = None
-
-    return jsonify(response), 200
+    passthrough = not _is_gzipped(stream) or "gzip" in request.accept_encodings
+    headers = {}
+    if passthrough:
+        headers["Content-Length"] = str(stream.length)
+        if _is_gzipped(stream):
+            headers["Content-Encoding"] = "gzip"
+
+    def generate():
+        yield from _iter_block_data(stream, decompress=not passthrough)
+        # Only delete the data once it has been fully sent, so that an interrupted
+        # download can be retried (stale files are removed by `_cleanup_stale_tasks`)
+        bucket.delete(stream._id)
+
+    response = Response(
+        stream_with_context(generate()), status=200, mimetype="application/json", headers=headers
+    )
+    response.direct_passthrough = True
+    return response
+
+
+@BLOCKS.route("/blocks/<string:task_id>/events", methods=["GET"])
+def get_block_task_events(task_id: str):
+    """Stream the progress of a block processing task as Server-Sent Events.
+
+    A `stage` event is sent for each processing stage, a `status` event for each
+    change of status and, once the task has finished, a `complete` event holding
+    the final status along with either the `block_data_url` to fetch the results
+    from or the `error_message`.
+
+    """
+    if not _find_block_task(task_id):
+        return jsonify({"status": "error", "message": "Task not found"}), 404
+
+    def completion(task: dict) -> dict:
+        data = {"status": task["status"], "task_id": task_id}
+        if task.get("error_message"):
+            data["error_message"] = task["error_message"]
+        if _is_block_task_deliverable(task):
+            data["block_data_url"] = f"/blocks/{task_id}/data"
+        return data
+
+    events = task_event_stream(
+        task_id,
+        load_task=lambda: _find_block_task(task_id),
+        completion=completion,
+        since=last_event_id(request),
+        watcher=task_watcher,
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype=TASK_EVENT_STREAM_MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -13,6 +13,7 @@ from pydatalab.models.collections import Collection
 from pydatalab.mongo import COLLECTIONS_FTS_FIELDS, build_search_pipeline, flask_mongo
 from pydatalab.permissions import active_users_or_get_only, get_default_permissions
 from pydatalab.routes.v0_1.items import creators_lookup, get_items_summary, groups_lookup
+from pydatalab.summaries import refresh_collection_item_summaries
 
 COLLECTIONS = Blueprint("collections", __name__)
 
@@ -205,6 +206,7 @@ def create_collection():
         )
 
         data_model.num_items = results.modified_count
+        refresh_collection_item_summaries(data_model.immutable_id)
 
         if results.modified_count < len(starting_members):
             errors = [
@@ -492,6 +494,9 @@ def delete_collection(collection_id: str):
                 },
             )
 
+    # Aggregations with `$merge` cannot run inside a transaction
+    refresh_collection_item_summaries(collection_immutable_id)
+
     return (
         jsonify(
             {
@@ -582,6 +587,8 @@ def add_items_to_collection(collection_id):
     if update_result.matched_count == 0:
         return (jsonify({"status": "error", "message": "Unable to add to collection."}), 400)
 
+    refresh_collection_item_summaries(collection["_id"])
+
     if update_result.modified_count == 0:
         return (
             jsonify(
@@ -623,6 +630,8 @@ def remove_items_from_collection(collection_id):
         },
     )
 
+    refresh_collection_item_summaries(collection["_id"])
+
     if update_result.matched_count == 0:
         return jsonify({"status": "error", "message": "No matching items found."}), 404
 
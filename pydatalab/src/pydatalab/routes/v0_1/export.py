@@ -5,16 +5,38 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from flask import Blueprint, jsonify, make_response, request, send_file
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    make_response,
+    request,
+    send_file,
+    stream_with_context,
+)
 from flask_login import current_user
 
 from pydatalab.config import CONFIG
-from pydatalab.export import create_eln_file
+from pydatalab.export import create_eln_file, stream_eln_file
 from pydatalab.logger import LOGGER
 from pydatalab.models.tasks import ExportTaskSpec, Task, TaskStage, TaskStatus, TaskType
 from pydatalab.mongo import flask_mongo
-from pydatalab.permissions import PUBLIC_USER_ID, active_users_or_get_only
-from pydatalab.scheduler import task_scheduler
+from pydatalab.permissions import (
+    PUBLIC_USER_ID,
+    active_users_only,
+    active_users_or_get_only,
+    get_default_permissions,
+)
+from pydatalab.scheduler import JobPriority, task_scheduler
+from pydatalab.task_events import (
+    TASK_EVENT_STREAM_MIMETYPE,
+    last_event_id,
+    parse_long_poll_args,
+    task_event_stream,
+    task_notifier,
+    task_watcher,
+    wait_for_task_update,
+)
 
 EXPORT = Blueprint("export", __name__)
 
@@ -136,11 +158,13 @@ def _do_export(
         flask_mongo.db.tasks.update_one(
             {"task_id": task_id}, {"$push": {"spec.stages": stage.dict()}}
         )
+        task_notifier.notify(task_id)
 
     try:
         flask_mongo.db.tasks.update_one(
             {"task_id": task_id}, {"$set": {"status": TaskStatus.PROCESSING}}
         )
+        task_notifier.notify(task_id)
 
         export_dir = _export_dir()
         export_dir.mkdir(exist_ok=True, parents=True)
@@ -167,6 +191,7 @@ def _do_export(
                 }
             },
         )
+        task_notifier.notify(task_id)
 
     except Exception as e:
         flask_mongo.db.tasks.update_one(
@@ -179,6 +204,7 @@ def _do_export(
                 }
             },
         )
+        task_notifier.notify(task_id)
 
 
 def _generate_export_in_background(
@@ -195,8 +221,6 @@ def _generate_export_in_background(
 
 @EXPORT.route("/collections/<string:collection_id>/export", methods=["POST"])
 def start_collection_export(collection_id: str):
-    from pydatalab.permissions import get_default_permissions
-
     collection_with_perms = flask_mongo.db.collections.find_one(
         {"collection_id": collection_id, **get_default_permissions(user_only=False)}
     )
@@ -227,6 +251,8 @@ def start_collection_export(collection_id: str):
         func=_generate_export_in_background,
         args=[task_id, collection_id, None, "collection", None],
         job_id=f"export_{task_id}",
+        task_id=task_id,
+        priority=JobPriority.BULK,
     )
 
     return jsonify(
@@ -234,9 +260,8 @@ def start_collection_export(collection_id: str):
     ), 202
 
 
-@EXPORT.route("/exports/<string:task_id>/status", methods=["GET"])
-def get_export_status(task_id: str):
-    task = flask_mongo.db.tasks.find_one(
+def _find_export_task(task_id: str) -> dict | None:
+    return flask_mongo.db.tasks.find_one(
         {
             "task_id": task_id,
             "creator_id": current_user.person.immutable_id,
@@ -244,6 +269,23 @@ def get_export_status(task_id: str):
         }
     )
 
+
+@EXPORT.route("/exports/<string:task_id>/status", methods=["GET"])
+def get_export_status(task_id: str):
+    """Return the status of an export task.
+
+    Passing `wait=<seconds>` (and optionally `since=<number of stages seen>`) turns
+    the request into a long-poll that only returns once the task has progressed.
+
+    """
+    wait, since = parse_long_poll_args(request.args)
+    if wait:
+        task = wait_for_task_update(
+            task_id, lambda: _find_export_task(task_id), since, wait, watcher=task_watcher
+        )
+    else:
+        task = _find_export_task(task_id)
+
     if not task:
         return jsonify({"status": "error", "message": "Export task not found"}), 404
 
@@ -255,6 +297,10 @@ def get_export_status(task_id: str):
     if task.get("spec", {}).get("stages"):
         response["stages"] = task["spec"]["stages"]
 
+    for key in ("queue_depth", "wait_seconds"):
+        if task.get(key) is not None:
+            response[key] = task[key]
+
     if task["status"] == TaskStatus.READY:
         response["download_url"] = f"/exports/{task_id}/download"
         response["completed_at"] = (
@@ -270,6 +316,41 @@ def get_export_status(task_id: str):
     return jsonify(response), 200
 
 
+def _export_completion(task: dict) -> dict:
+    data = {"status": task["status"], "completed_at": task.get("completed_at")}
+    if task["status"] == TaskStatus.READY:
+        data["download_url"] = f"/exports/{task['task_id']}/download"
+    if task["status"] == TaskStatus.ERROR:
+        data["error_message"] = task.get("error_message")
+    return data
+
+
+@EXPORT.route("/exports/<string:task_id>/events", methods=["GET"])
+def get_export_events(task_id: str):
+    """Stream the progress of an export task as Server-Sent Events.
+
+    A `stage` event is sent for each export stage, a `status` event for each
+    change of status and, once the export has finished, a `complete` event holding
+    the final status along with either the `download_url` or the `error_message`.
+
+    """
+    if not _find_export_task(task_id):
+        return jsonify({"status": "error", "message": "Export task not found"}), 404
+
+    events = task_event_stream(
+        task_id,
+        load_task=lambda: _find_export_task(task_id),
+        completion=_export_completion,
+        since=last_event_id(request),
+        watcher=task_watcher,
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype=TASK_EVENT_STREAM_MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Internal nginx location that aliases the on-disk export directory (see
 # `_do_export`, which writes to `<tempdir>/eln-exports/`). The matching nginx
 # config marks this location `internal;` so clients cannot request it directly:
@@ -315,6 +396,68 @@ def _serve_export_file(file_path: str, filename: str):
     )
 
 
+def _permitted_item_ids(item_ids: list[str]) -> list[str]:
+    """Return those of the given item IDs that the current user can read, as the
+    export itself runs without the permissions of the user."""
+    permitted = flask_mongo.db.items.distinct(
+        "item_id", {"item_id": {"$in": item_ids}, **get_default_permissions(user_only=False)}
+    )
+    return [item_id for item_id in item_ids if item_id in set(permitted)]
+
+
+def _stream_export_response(chunks, filename: str) -> Response:
+    """Return a response that sends an export archive to the client as it is produced."""
+    return Response(
+        chunks,
+        mimetype=EXPORT_MIMETYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # Ask nginx to pass the archive on as it arrives rather than buffering it
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@EXPORT.route("/collections/<string:collection_id>/export/stream", methods=["GET"])
+@active_users_only
+def stream_collection_export(collection_id: str):
+    """Stream a `.eln` export of a collection to the client as it is produced, such
+    that the download starts immediately rather than once the whole archive has
+    been written by an export task.
+
+    The response holds a worker thread for as long as the archive is being sent,
+    so this requires the threaded workers described in the deployment docs, whose
+    `--timeout` does not apply to requests that are still being served.
+
+    """
+    collection_with_perms = flask_mongo.db.collections.find_one(
+        {"collection_id": collection_id, **get_default_permissions(user_only=False)}
+    )
+    if not collection_with_perms:
+        return jsonify({"status": "error", "message": "Collection not found"}), 404
+
+    chunks = stream_eln_file(collection_id=collection_id)
+    return _stream_export_response(chunks, f"{collection_id}.eln.zip")
+
+
+@EXPORT.route("/items/<string:item_id>/export/stream", methods=["GET"])
+@active_users_only
+def stream_item_export(item_id: str):
+    """Stream a `.eln` export of an item to the client as it is produced, along
+    with any related items given by (repeated) `related_item_ids` query parameters
+    that the user can read. See `stream_collection_export` for the deployment
+    requirements."""
+    item_data = flask_mongo.db.items.find_one(
+        {"item_id": item_id, **get_default_permissions(user_only=False)}
+    )
+    if not item_data:
+        return jsonify({"status": "error", "message": "Item not found"}), 404
+
+    related_item_ids = _permitted_item_ids(request.args.getlist("related_item_ids"))
+    chunks = stream_eln_file(item_id=item_id, related_item_ids=related_item_ids or None)
+    return _stream_export_response(chunks, f"{item_id}.eln.zip")
+
+
 @EXPORT.route("/exports/<string:task_id>/download", methods=["GET"])
 def download_export(task_id: str):
     if not CONFIG.TESTING:
@@ -349,8 +492,6 @@ def download_export(task_id: str):
 
 @EXPORT.route("/items/<string:item_id>/export", methods=["POST"])
 def start_item_export(item_id: str):
-    from pydatalab.permissions import get_default_permissions
-
     item_data = flask_mongo.db.items.find_one(
         {"item_id": item_id, **get_default_permissions(user_only=False)}
     )
@@ -377,6 +518,7 @@ def start_item_export(item_id: str):
                     "message": "related_item_ids required when include_related is true",
                 }
             ), 400
+        related_item_ids = _permitted_item_ids(related_item_ids)
         export_type = "graph"
 
     export_task = Task(
@@ -396,6 +538,8 @@ def start_item_export(item_id: str):
         func=_generate_export_in_background,
         args=[task_id, None, item_id, export_type, related_item_ids],
         job_id=f"export_{task_id}",
+        task_id=task_id,
+        priority=JobPriority.BULK,
     )
 
     return jsonify(
@@ -1,30 +1,213 @@
+import contextlib
+import datetime
+import mimetypes
 import os
+import secrets
+from urllib.parse import quote
 
 from bson import ObjectId
 from bson.errors import InvalidId
-from flask import Blueprint, jsonify, request, send_from_directory
+from flask import Blueprint, Response, jsonify, make_response, request, send_file
 from flask_login import current_user
 from pymongo import ReturnDocument
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable, RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
 import pydatalab.mongo
-from pydatalab import file_utils
+from pydatalab import file_utils, resumable_uploads
 from pydatalab.config import CONFIG
+from pydatalab.logger import LOGGER
 from pydatalab.permissions import PUBLIC_USER_ID, active_users_or_get_only, get_default_permissions
+from pydatalab.scheduler import task_scheduler
+from pydatalab.summaries import refresh_item_summaries
 
 FILES = Blueprint("files", __name__)
 
+_app = None
+
+UPLOAD_CLEANUP_INTERVAL_HOURS = 6
+
+
+@FILES.record_once
+def _register_upload_cleanup_job(state):
+    global _app
+    _app = state.app
+
+    task_scheduler.add_periodic_job(
+        func=_cleanup_stale_uploads,
+        job_id="upload_session_cleanup",
+        hours=UPLOAD_CLEANUP_INTERVAL_HOURS,
+    )
+    LOGGER.info(
+        "Registered upload session cleanup job (every %d hours)", UPLOAD_CLEANUP_INTERVAL_HOURS
+    )
+
+
+def _cleanup_stale_uploads():
+    """Periodic removal of unfinished resumable uploads, via APScheduler."""
+    app_ctx = _app.app_context() if _app else contextlib.nullcontext()
+    with app_ctx:
+        resumable_uploads.cleanup_stale_upload_sessions()
+
 
 @FILES.before_request
 @active_users_or_get_only
 def _(): ...
 
 
+# Internal nginx location that aliases `CONFIG.FILE_DIRECTORY`, used to hand file
+# downloads off to nginx when `CONFIG.USE_X_ACCEL_REDIRECT_FILES` is enabled. This is
+# separate from the `/_protected_exports/` location used for exports, so must be added
+# to the nginx config (marked `internal;` so clients cannot request it directly):
+#
+#     location /_protected_files/ {
+#         internal;
+#         alias /app/files/;   # must match CONFIG.FILE_DIRECTORY
+#     }
+X_ACCEL_FILES_LOCATION = "/_protected_files"
+
+MAX_BYTE_RANGES = 64
+"""Requests for more byte ranges than this are answered with the full file instead."""
+
+
+def _parse_byte_ranges(header: str | None) -> list[tuple[int, int | None]] | None:
+    """Parse the ranges of a `Range: bytes=...` header.
+
+    Unlike werkzeug's parser, overlapping and out-of-order ranges are accepted, as
+    allowed by RFC 9110 (they are merged before being served).
+
+    Returns:
+        A list of `(start, stop)` ranges, with `stop` exclusive, `None` for open-ended
+        ranges and a negative `start` for suffix ranges, or `None` if the header is
+        missing or malformed.
+
+    """
+    if not header:
+        return None
+    units, _, specs = header.partition("=")
+    if units.strip().lower() != "bytes":
+        return None
+    ranges: list[tuple[int, int | None]] = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash or not (first.isdigit() or last.isdigit()):
+            return None
+        if not first:
+            # A zero-length suffix can never be satisfied
+            ranges.append((-int(last), None) if int(last) else (0, 0))
+        elif not last:
+            ranges.append((int(first), None))
+        elif not last.isdigit() or int(last) < int(first):
+            return None
+        else:
+            ranges.append((int(first), int(last) + 1))
+    return ranges
+
+
+def _merge_byte_ranges(ranges: list[tuple[int, int | None]], size: int) -> list[tuple[int, int]]:
+    """Resolve the requested byte ranges of a file of the given size into a sorted
+    list of disjoint `[start, stop)` ranges, dropping unsatisfiable ranges and merging
+    overlapping or adjacent ones.
+
+    Parameters:
+        ranges: The ranges parsed by
+            [`_parse_byte_ranges`][pydatalab.routes.v0_1.files._parse_byte_ranges].
+        size: The size of the file in bytes.
+
+    Raises:
+        RequestedRangeNotSatisfiable: If none of the ranges can be satisfied.
+
+    """
+    resolved = []
+    for start, stop in ranges:
+        if stop is None:
+            stop = size
+            if start < 0:
+                start = max(size + start, 0)
+        stop = min(stop, size)
+        if 0 <= start < stop:
+            resolved.append((start, stop))
+    if not resolved:
+        raise RequestedRangeNotSatisfiable(length=size)
+
+    merged: list[tuple[int, int]] = []
+    for start, stop in sorted(resolved):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _byte_ranges_response(
+    path: str, ranges: list[tuple[int, int]], size: int, etag: str | None
+) -> Response:
+    """Build a `206 Partial Content` response streaming the given byte ranges of a
+    file, as a `multipart/byteranges` body if there is more than one range."""
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = Response(status=206, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        parts = [(b"", *ranges[0])]
+        closing = b""
+        response.content_type = mimetype
+        response.headers["Content-Range"] = f"bytes {ranges[0][0]}-{ranges[0][1] - 1}/{size}"
+    else:
+        boundary = secrets.token_hex(16)
+        parts = [
+            (
+                (b"\r\n" if index else b"")
+                + (
+                    f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                    f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+                ).encode(),
+                start,
+                stop,
+            )
+            for index, (start, stop) in enumerate(ranges)
+        ]
+        closing = f"\r\n--{boundary}--\r\n".encode()
+        response.content_type = f"multipart/byteranges; boundary={boundary}"
+
+    def generate():
+        with open(path, "rb") as f:
+            for header, start, stop in parts:
+                if header:
+                    yield header
+                f.seek(start)
+                remaining = stop - start
+                while remaining > 0:
+                    chunk = f.read(min(file_utils.COPY_BUFFER_SIZE, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+        if closing:
+            yield closing
+
+    response.response = generate()
+    response.content_length = sum(len(header) + stop - start for header, start, stop in parts)
+    response.content_length += len(closing)
+    response.accept_ranges = "bytes"
+    response.last_modified = os.path.getmtime(path)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
 @FILES.route("/files/<string:file_id>/<string:filename>", methods=["GET"])
 def get_file(file_id: str, filename: str):
     """If this user has the appropriate permissions, return the file with the
     given database ID and filename.
 
+    The SHA-256 of the file is used as a strong `ETag`, such that clients can
+    revalidate their copy with `If-None-Match`, and (multi-)range requests are
+    supported for partial reads. When `CONFIG.USE_X_ACCEL_REDIRECT_FILES` (nginx) or
+    `CONFIG.USE_X_SENDFILE` is enabled, the bytes are served by the front-end
+    server rather than by Python.
+
     Parameters:
         file_id: The file ID in the database.
         filename: The filename in the database.
@@ -50,8 +233,58 @@ def get_file(file_id: str, filename: str):
             401,
         )
 
-    path = os.path.join(CONFIG.FILE_DIRECTORY, secure_filename(file_id))
-    return send_from_directory(path, filename)
+    directory = os.path.join(CONFIG.FILE_DIRECTORY, secure_filename(file_id))
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    file_info = pydatalab.mongo.flask_mongo.db.files.find_one(
+        {"_id": _file_id}, {"checksums": 1, "location": 1}
+    )
+    etag = None
+    if file_info and os.path.basename(file_info.get("location") or "") == filename:
+        etag = (file_info.get("checksums") or {}).get("sha256")
+
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    if CONFIG.USE_X_ACCEL_REDIRECT_FILES:
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = (
+            f"{X_ACCEL_FILES_LOCATION}/{quote(secure_filename(file_id))}/{quote(filename)}"
+        )
+        response.headers["Content-Type"] = (
+            mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        if etag:
+            response.set_etag(etag)
+        # nginx sets the length and handles any range requests for the file it serves
+        return response
+
+    # werkzeug only handles single ranges (and ignores unsatisfiable suffixes such as
+    # `bytes=-0`), so ranges are checked and multi-range requests are served here,
+    # unless they are too numerous or the file has changed since the client's copy (`If-Range`)
+    requested_ranges = _parse_byte_ranges(request.headers.get("Range"))
+    if requested_ranges is not None and not CONFIG.USE_X_SENDFILE:
+        size = os.path.getsize(path)
+        if "HTTP_IF_RANGE" not in request.environ or not is_resource_modified(
+            request.environ,
+            etag=etag,
+            last_modified=datetime.datetime.fromtimestamp(
+                os.path.getmtime(path), tz=datetime.timezone.utc
+            ),
+            ignore_if_range=False,
+        ):
+            # Raises a 416 if none of the ranges can be satisfied
+            ranges = _merge_byte_ranges(requested_ranges, size)
+            if 1 < len(requested_ranges) <= MAX_BYTE_RANGES:
+                return _byte_ranges_response(path, ranges, size, etag)
+    if requested_ranges is not None and len(requested_ranges) > 1:
+        return send_file(path, conditional=False, etag=etag if etag else True)
+
+    return send_file(path, conditional=True, etag=etag if etag else True)
 
 
 @FILES.route("/upload-file/", methods=["POST"])
@@ -88,13 +321,22 @@ def upload():
     item_id = request.form["item_id"]
     replace_file_id = request.form["replace_file"]
 
+    file = request.files[next(iter(request.files))]
+    return _save_file(file, item_id, replace_file_id, _upload_creator_id())
+
+
+def _upload_creator_id():
     if not CONFIG.TESTING:
-        creator_id = current_user.person.immutable_id
-    else:
-        creator_id = PUBLIC_USER_ID
+        return current_user.person.immutable_id
+    return PUBLIC_USER_ID
+
 
+def _save_file(
+    file, item_id: str, replace_file_id: str | None, creator_id, last_modified: str | None = None
+):
+    """Save (or replace) an uploaded file and attach it to the given item, returning
+    the response for the upload."""
     is_update = replace_file_id and replace_file_id != "null"
-    file = request.files[next(iter(request.files))]
     if is_update:
         try:
             file_information = file_utils.update_uploaded_file(file, ObjectId(replace_file_id))
@@ -112,7 +354,7 @@ def upload():
             )
     else:
         file_information = file_utils.save_uploaded_file(
-            file, item_ids=[item_id], creator_ids=[creator_id]
+            file, item_ids=[item_id], creator_ids=[creator_id], last_modified=last_modified
         )
 
     return (
@@ -128,6 +370,186 @@ def upload():
     )
 
 
+def _upload_session_response(session: dict, status: int = 200):
+    return (
+        jsonify(
+            {
+                "status": "success",
+                "upload_id": session["upload_id"],
+                "upload_url": f"/uploads/{session['upload_id']}",
+                "filename": session["filename"],
+                "size": session["size"],
+                "chunk_size": CONFIG.UPLOAD_CHUNK_SIZE,
+                "received": resumable_uploads.received_ranges(session),
+            }
+        ),
+        status,
+    )
+
+
+def _get_upload_session_or_404(upload_id: str):
+    session = resumable_uploads.get_upload_session(upload_id, _upload_creator_id())
+    if not session:
+        return None, (
+            jsonify({"status": "error", "message": f"Upload {upload_id} not found"}),
+            404,
+        )
+    return session, None
+
+
+@FILES.route("/uploads/", methods=["POST"])
+def create_upload():
+    """Start a resumable, chunked upload of a file.
+
+    Expects a JSON body with the `filename` and total `size` (in bytes) of the file,
+    the `item_id` to attach it to, and optionally the ID of a file to replace
+    (`replace_file`) and its `last_modified` isoformat datetime.
+
+    The file is then sent in chunks of at most `chunk_size` bytes to the returned
+    `upload_url` with `PUT` requests whose body is the raw chunk, with its byte offset
+    within the file given by the `offset` query parameter. The byte ranges received
+    so far are returned by each `PUT`, and by a `GET` on the `upload_url`, so that an
+    interrupted upload can be resumed. Once every byte has been received, a `POST` to
+    `<upload_url>/finalize` attaches the file to the item, and responds as
+    `/upload-file/` would.
+
+    """
+    if not current_user.is_authenticated and not CONFIG.TESTING:
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "title": "Not Authorized",
+                    "detail": "File upload requires login.",
+                }
+            ),
+            401,
+        )
+
+    request_json = request.get_json()
+    filename = request_json.get("filename")
+    size = request_json.get("size")
+    item_id = request_json.get("item_id")
+    if not filename or not item_id:
+        return jsonify(status="error", message="`filename` and `item_id` are required"), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return jsonify(status="error", message="`size` must be a non-negative integer"), 400
+
+    if size > CONFIG.MAX_CONTENT_LENGTH:
+        raise RequestEntityTooLarge()
+    if size > file_utils.get_space_available_bytes():
+        return (
+            jsonify(
+                status="error",
+                message=f"Cannot store file: insufficient space available on disk (required: {size // 1024**3} GB). Please contact your datalab administrator.",
+            ),
+            507,
+        )
+
+    if not pydatalab.mongo.flask_mongo.db.items.find_one(
+        {"item_id": item_id, **get_default_permissions(user_only=True)}
+    ):
+        return jsonify(status="error", message=f"item_id is invalid: {item_id}"), 400
+
+    session = resumable_uploads.create_upload_session(
+        filename,
+        size,
+        item_id,
+        creator_id=_upload_creator_id(),
+        replace_file_id=request_json.get("replace_file"),
+        last_modified=request_json.get("last_modified"),
+    )
+    return _upload_session_response(session, 201)
+
+
+@FILES.route("/uploads/<string:upload_id>", methods=["GET"])
+def get_upload(upload_id: str):
+    """Return the state of a resumable upload, including the byte ranges received so far."""
+    session, error = _get_upload_session_or_404(upload_id)
+    if error:
+        return error
+    return _upload_session_response(session)
+
+
+@FILES.route("/uploads/<string:upload_id>", methods=["PUT"])
+def put_upload_chunk(upload_id: str):
+    """Write the request body at the byte `offset` (a query parameter) of a resumable upload."""
+    session, error = _get_upload_session_or_404(upload_id)
+    if error:
+        return error
+
+    try:
+        offset = int(request.args["offset"])
+    except (KeyError, ValueError):
+        return jsonify(status="error", message="An integer `offset` is required"), 400
+    if request.content_length is None:
+        return jsonify(status="error", message="A `Content-Length` is required"), 411
+
+    try:
+        received = resumable_uploads.write_upload_chunk(
+            session, offset, request.stream, request.content_length
+        )
+    except ValueError as exc:
+        return jsonify(status="error", message=str(exc)), 416
+    except FileNotFoundError as exc:
+        return jsonify(status="error", message=str(exc)), 404
+
+    return jsonify({"status": "success", "upload_id": upload_id, "received": received}), 200
+
+
+@FILES.route("/uploads/<string:upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id: str):
+    """Attach a fully received resumable upload to its item."""
+    session, error = _get_upload_session_or_404(upload_id)
+    if error:
+        return error
+
+    try:
+        staged = resumable_uploads.finalize_upload_session(session)
+    except resumable_uploads.IncompleteUpload as exc:
+        return (
+            jsonify(
+                status="error",
+                message=str(exc),
+                received=resumable_uploads.received_ranges(session),
+            ),
+            409,
+        )
+
+    # The session and the staged file are kept until the file has been saved,
+    # such that finalizing can be retried if saving fails
+    if not pydatalab.mongo.flask_mongo.db.items.find_one(
+        {"item_id": session["item_id"], **get_default_permissions(user_only=True)}
+    ):
+        return (
+            jsonify(
+                status="error",
+                message=f"Not authorized to attach files to item {session['item_id']!r}",
+            ),
+            401,
+        )
+
+    response = _save_file(
+        staged,
+        session["item_id"],
+        session.get("replace_file_id"),
+        session["creator_id"],
+        last_modified=session.get("last_modified"),
+    )
+    resumable_uploads.delete_upload_session(session)
+    return response
+
+
+@FILES.route("/uploads/<string:upload_id>", methods=["DELETE"])
+def delete_upload(upload_id: str):
+    """Abort a resumable upload."""
+    session, error = _get_upload_session_or_404(upload_id)
+    if error:
+        return error
+    resumable_uploads.delete_upload_session(session)
+    return jsonify({"status": "success"}), 200
+
+
 @FILES.route("/add-remote-file-to-sample/", methods=["POST"])
 def add_remote_file_to_sample():
     if not current_user.is_authenticated and not CONFIG.TESTING:
@@ -200,6 +622,8 @@ def delete_file_from_sample():
             ),
             401,
         )
+    refresh_item_summaries({"item_id": item_id})
+
     updated_file_entry = pydatalab.mongo.flask_mongo.db.files.find_one_and_update(
         {"_id": file_id},
         {"$pull": {"item_ids": item_id}},
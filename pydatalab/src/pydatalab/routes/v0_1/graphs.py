@@ -5,12 +5,104 @@ from pydatalab.permissions import active_users_or_get_only, get_default_permissi
 
 GRAPHS = Blueprint("graphs", __name__)
 
+MAX_GRAPH_DEPTH: int = 10
+"""The maximum depth of relationships that will be traversed from a single item."""
+
+MAX_GRAPH_NODES: int = 1000
+"""The maximum number of items that will be added to the graph of a single item,
+after which the traversal will stop and the graph will be marked as truncated."""
+
+_GRAPH_PROJECTION = {
+    "item_id": 1,
+    "name": 1,
+    "type": 1,
+    "relationships": 1,
+    # Only the type of each block is drawn, so none of the block data is loaded
+    "blocks_obj": {
+        "$arrayToObject": {
+            "$map": {
+                "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
+                "as": "b",
+                "in": {"k": "$$b.k", "v": {"blocktype": "$$b.v.blocktype"}},
+            }
+        }
+    },
+}
+
 
 @GRAPHS.before_request
 @active_users_or_get_only
 def _(): ...
 
 
+def _add_related_items(
+    root: dict, node_ids: set[str], all_documents: list[dict], max_depth: int
+) -> bool:
+    """Traverse the relationships of the root item breadth-first, adding every
+    accessible item within `max_depth` steps to the graph.
+
+    Each level of the traversal is fetched with a single query for both the items
+    referenced by the current frontier (outgoing edges) and those that reference
+    it (incoming edges).
+
+    Parameters:
+        root: The item to start from, which should already be in the graph.
+        node_ids: The IDs of the items already in the graph, updated in place.
+        all_documents: The items already in the graph, updated in place.
+        max_depth: The number of levels of relationships to traverse.
+
+    Returns:
+        Whether the traversal was cut short by `MAX_GRAPH_NODES`.
+
+    """
+    permissions = get_default_permissions(user_only=False)
+    frontier = [root]
+
+    for _ in range(max_depth):
+        frontier_ids = [doc["item_id"] for doc in frontier]
+        outgoing_ids = {
+            relationship["item_id"]
+            for doc in frontier
+            for relationship in doc.get("relationships") or []
+            if relationship.get("item_id") and relationship["item_id"] not in node_ids
+        }
+
+        remaining = MAX_GRAPH_NODES - len(node_ids)
+        if remaining <= 0:
+            return True
+
+        # At most `len(node_ids)` of the results can already be in the graph
+        query: dict = {
+            "$or": [
+                {"item_id": {"$in": list(outgoing_ids)}},
+                {"relationships.item_id": {"$in": frontier_ids}},
+            ]
+        }
+        if permissions:
+            query = {"$and": [query, permissions]}
+
+        related_items = flask_mongo.db.items.find(
+            query,
+            projection=_GRAPH_PROJECTION,
+            limit=remaining + len(node_ids),
+        )
+
+        frontier = []
+        for related_item in related_items:
+            if related_item["item_id"] in node_ids:
+                continue
+            if len(node_ids) >= MAX_GRAPH_NODES:
+                return True
+            node_ids.add(related_item["item_id"])
+            all_documents.append(related_item)
+            frontier.append(related_item)
+
+        if not frontier:
+            break
+
+    return False
+
+
 @GRAPHS.route("/item-graph", methods=["GET"])
 @GRAPHS.route("/item-graph/<item_id>", methods=["GET"])
 def get_graph_cy_format(
@@ -23,7 +115,8 @@ def get_graph_cy_format(
     hide_collections = request.args.get(
         "hide_collections", default=True, type=lambda v: v.lower() == "true"
     )
-    max_depth = request.args.get("max_depth", default=1, type=int)
+    max_depth = min(request.args.get("max_depth", default=1, type=int), MAX_GRAPH_DEPTH)
+    truncated = False
 
     if item_id is None:
         if collection_id is not None:
@@ -47,12 +140,13 @@ def get_graph_cy_format(
             }
         else:
             query = {}
-        all_documents = flask_mongo.db.items.find(
-            {**query, **get_default_permissions(user_only=False)},
-            projection={"item_id": 1, "name": 1, "type": 1, "relationships": 1, "blocks_obj": 1},
+        all_documents = list(
+            flask_mongo.db.items.find(
+                {**query, **get_default_permissions(user_only=False)},
+                projection=_GRAPH_PROJECTION,
+            )
         )
         node_ids: set[str] = {document["item_id"] for document in all_documents}
-        all_documents.rewind()
 
     else:
         main_item = flask_mongo.db.items.find_one(
@@ -60,7 +154,7 @@ def get_graph_cy_format(
                 "item_id": item_id,
                 **get_default_permissions(user_only=False),
             },
-            projection={"item_id": 1, "name": 1, "type": 1, "relationships": 1, "blocks_obj": 1},
+            projection=_GRAPH_PROJECTION,
         )
 
         if not main_item:
@@ -71,76 +165,36 @@ def get_graph_cy_format(
 
         node_ids = {item_id}
         all_documents = [main_item]
+        truncated = _add_related_items(main_item, node_ids, all_documents, max_depth)
 
-        def add_related_items(current_item_id: str, current_depth: int):
-            if current_depth > max_depth:
-                return
+    nodes = []
+    edges = []
 
-            current_item = flask_mongo.db.items.find_one(
-                {
-                    "item_id": current_item_id,
-                    **get_default_permissions(user_only=False),
-                },
-                projection={"item_id": 1, "name": 1, "type": 1, "relationships": 1},
-            )
+    # Collect the elements that have already been added to the graph, to avoid duplication
+    drawn_elements = set()
+    node_collections: set[str] = set()
 
-            if not current_item:
-                return
-
-            for relationship in current_item.get("relationships", []) or []:
-                if relationship.get("item_id") and relationship["item_id"] not in node_ids:
-                    node_ids.add(relationship["item_id"])
-                    related_item = flask_mongo.db.items.find_one(
-                        {
-                            "item_id": relationship["item_id"],
-                            **get_default_permissions(user_only=False),
-                        },
-                        projection={
-                            "item_id": 1,
-                            "name": 1,
-                            "type": 1,
-                            "relationships": 1,
-                            "blocks_obj": 1,
-                        },
-                    )
-                    if related_item:
-                        all_documents.append(related_item)
-                        add_related_items(relationship["item_id"], current_depth + 1)
-
-            incoming_items = list(
-                flask_mongo.db.items.find(
+    # Fetch all linked collections up front, rather than once per relationship
+    collections_data: dict = {}
+    if not collection_id and not hide_collections:
+        linked_collection_ids = {
+            relationship["immutable_id"]
+            for document in all_documents
+            for relationship in document.get("relationships") or []
+            if relationship.get("type") == "collections"
+        }
+        if linked_collection_ids:
+            collections_data = {
+                doc["_id"]: doc
+                for doc in flask_mongo.db.collections.find(
                     {
-                        "relationships": {
-                            "$elemMatch": {
-                                "item_id": current_item_id,
-                            }
-                        },
+                        "_id": {"$in": list(linked_collection_ids)},
                         **get_default_permissions(user_only=False),
                     },
-                    projection={
-                        "item_id": 1,
-                        "name": 1,
-                        "type": 1,
-                        "relationships": 1,
-                        "blocks_obj": 1,
-                    },
+                    projection={"collection_id": 1, "title": 1, "type": 1},
                 )
-            )
-
-            for incoming_item in incoming_items:
-                if incoming_item["item_id"] not in node_ids:
-                    node_ids.add(incoming_item["item_id"])
-                    all_documents.append(incoming_item)
-                    add_related_items(incoming_item["item_id"], current_depth + 1)
-
-        add_related_items(item_id, 1)
-
-    nodes = []
-    edges = []
+            }
 
-    # Collect the elements that have already been added to the graph, to avoid duplication
-    drawn_elements = set()
-    node_collections: set[str] = set()
     for document in all_documents:
         # for some reason, document["relationships"] is sometimes equal to None, so we
         # need this `or` statement.
@@ -149,13 +203,7 @@ def get_graph_cy_format(
             if relationship.get("type") == "collections" and not collection_id:
                 if hide_collections:
                     continue
-                collection_data = flask_mongo.db.collections.find_one(
-                    {
-                        "_id": relationship["immutable_id"],
-                        **get_default_permissions(user_only=False),
-                    },
-                    projection={"collection_id": 1, "title": 1, "type": 1},
-                )
+                collection_data = collections_data.get(relationship["immutable_id"])
                 if collection_data:
                     if relationship["immutable_id"] not in node_collections:
                         _id = f"Collection: {collection_data['collection_id']}"
@@ -268,4 +316,4 @@ def get_graph_cy_format(
         or node["data"]["id"].startswith("Collection:")
     ]
 
-    return (jsonify(status="success", nodes=nodes, edges=edges), 200)
+    return (jsonify(status="success", nodes=nodes, edges=edges, truncated=truncated), 200)
@@ -1,19 +1,29 @@
+import base64
 import copy
 import datetime
 import json
 import secrets
+from collections.abc import Iterator
 from hashlib import sha512
 
-from bson import ObjectId
+from bson import ObjectId, json_util
 from bson.errors import InvalidId
-from deepdiff import DeepDiff
-from flask import Blueprint, jsonify, redirect, request
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    redirect,
+    request,
+    stream_with_context,
+)
 from flask_login import current_user
 from pydantic import ValidationError
 from pymongo.errors import DuplicateKeyError
 from werkzeug.exceptions import BadRequest, Conflict, NotFound
 
 from pydatalab.apps import BLOCK_TYPES
+from pydatalab.block_outputs import load_block_outputs, store_block_outputs
 from pydatalab.config import CONFIG
 from pydatalab.logger import LOGGER
 from pydatalab.models import ITEM_MODELS, ItemVersion
@@ -25,7 +35,13 @@ from pydatalab.models.versions import (
     RestoreVersionRequest,
     VersionAction,
 )
-from pydatalab.mongo import ITEMS_FTS_FIELDS, build_search_pipeline, flask_mongo
+from pydatalab.mongo import (
+    ITEMS_FTS_FIELDS,
+    ITEMS_SEARCH_NGRAMS_FIELD,
+    build_search_pipeline,
+    flask_mongo,
+    generate_search_ngrams,
+)
 from pydatalab.permissions import (
     PUBLIC_USER_ID,
     AccessToken,
@@ -34,11 +50,25 @@ from pydatalab.permissions import (
     check_access_token,
     get_default_permissions,
 )
+from pydatalab.summaries import (
+    ITEM_SUMMARIES_COLLECTION,
+    delete_item_summaries,
+    refresh_item_summaries,
+    sync_item_summaries,
+)
 from pydatalab.versioning import (
+    VERSION_CHUNKS_COLLECTION,
     apply_protected_fields,
     check_version_access,
+    delete_version_snapshot,
+    diff_versions,
+    expand_version,
     get_next_version_number,
+    insert_version,
+    make_snapshot,
+    restore_regenerable_fields,
     save_version_snapshot,
+    strip_regenerable_fields,
 )
 
 ITEMS = Blueprint("items", __name__)
@@ -50,16 +80,38 @@ ACCESSIBLE_TYPES = ("equipment", "starting_materials")
 # creation time embedded in their ObjectId.
 LAST_MODIFIED_PROJECTION = {"$ifNull": ["$last_modified", {"$toDate": "$_id"}]}
 
+# List endpoints are sorted newest first, with the `_id` breaking ties so that
+# `(date, _id)` can be used as a keyset pagination cursor.
+PAGE_SORT = [("date", -1), ("_id", -1)]
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
 
 @ITEMS.before_request
 @active_users_or_get_only
 def _(): ...
 
 
+def _page_stages(limit: int | None, after: dict | None) -> list[dict]:
+    """Return the aggregation stages that sort by descending `(date, _id)` and
+    select the requested page, as parsed by `_get_page_args`."""
+    stages: list[dict] = []
+    if after:
+        stages.append({"$match": after})
+    stages.append({"$sort": dict(PAGE_SORT)})
+    if limit:
+        stages.append({"$limit": limit})
+    return stages
+
+
 @ITEMS.route("/equipment/", methods=["GET"])
 def get_equipment_summary():
+    """Return a summary of all equipment, newest first, optionally paginated
+    with the `limit` and `cursor` GET parameters (see `get_samples`)."""
+    limit, after = _get_page_args()
+
     _project = {
-        "_id": 0,
+        "_id": 1,
         "item_id": 1,
         "name": 1,
         "type": 1,
@@ -70,170 +122,357 @@ def get_equipment_summary():
         "status": 1,
     }
 
-    items = [
-        doc
-        for doc in flask_mongo.db.items.aggregate(
-            [
-                {
-                    "$match": {
-                        "type": "equipment",
-                    }
-                },
-                {"$project": _project},
-            ]
-        )
-    ]
-    return jsonify({"status": "success", "items": items})
+    items = flask_mongo.db.items.aggregate(
+        [
+            {
+                "$match": {
+                    "type": "equipment",
+                }
+            },
+            *_page_stages(limit, after),
+            {"$project": _project},
+        ]
+    )
+    return _list_response("items", items, limit)
 
 
 @ITEMS.route("/starting-materials/", methods=["GET"])
 def get_starting_materials():
-    items = [
-        doc
-        for doc in flask_mongo.db.items.aggregate(
-            [
-                {
-                    "$match": {
-                        "type": "starting_materials",
-                        **get_default_permissions(user_only=False, inherit_from_collections=False),
-                    }
-                },
-                {"$lookup": collections_lookup()},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "item_id": 1,
-                        "blocks": {
-                            "$map": {
-                                "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
-                                "as": "b",
-                                "in": {
-                                    "blocktype": "$$b.v.blocktype",
-                                    "title": "$$b.v.title",
-                                },
-                            }
-                        },
-                        "collections": {
-                            "collection_id": 1,
-                        },
-                        "nblocks": {"$size": "$display_order"},
-                        "nfiles": {"$size": "$file_ObjectIds"},
-                        "date": 1,
-                        "last_modified": LAST_MODIFIED_PROJECTION,
-                        "chemform": 1,
-                        "smiles": 1,
-                        "inchi_key": 1,
-                        "GHS_codes": 1,
-                        "molar_mass": 1,
-                        "name": 1,
-                        "type": 1,
-                        "chemical_purity": 1,
-                        "barcode": 1,
-                        "refcode": 1,
-                        "supplier": 1,
-                        "location": 1,
-                        "status": 1,
-                        "CAS": 1,
-                    }
-                },
-                {
-                    "$sort": {
-                        "date": -1,
+    """Return a summary of the starting materials accessible to the current user,
+    newest first, optionally paginated with the `limit` and `cursor` GET parameters
+    (see `get_samples`)."""
+    limit, after = _get_page_args()
+
+    items = flask_mongo.db.items.aggregate(
+        [
+            {
+                "$match": {
+                    "type": "starting_materials",
+                    **get_default_permissions(user_only=False, inherit_from_collections=False),
+                }
+            },
+            *_page_stages(limit, after),
+            {"$lookup": collections_lookup()},
+            {
+                "$project": {
+                    "_id": 1,
+                    "item_id": 1,
+                    "blocks": {
+                        "$map": {
+                            "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
+                            "as": "b",
+                            "in": {
+                                "blocktype": "$$b.v.blocktype",
+                                "title": "$$b.v.title",
+                            },
+                        }
                     },
-                },
-            ]
-        )
-    ]
-    return jsonify({"status": "success", "items": items})
+                    "collections": {
+                        "collection_id": 1,
+                    },
+                    "nblocks": {"$size": "$display_order"},
+                    "nfiles": {"$size": "$file_ObjectIds"},
+                    "date": 1,
+                    "last_modified": LAST_MODIFIED_PROJECTION,
+                    "chemform": 1,
+                    "smiles": 1,
+                    "inchi_key": 1,
+                    "GHS_codes": 1,
+                    "molar_mass": 1,
+                    "name": 1,
+                    "type": 1,
+                    "chemical_purity": 1,
+                    "barcode": 1,
+                    "refcode": 1,
+                    "supplier": 1,
+                    "location": 1,
+                    "status": 1,
+                    "CAS": 1,
+                }
+            },
+        ]
+    )
+    return _list_response("items", items, limit)
 
 
 get_starting_materials.methods = ("GET",)  # type: ignore
 
 
-def get_items_summary(match: dict | None = None, project: dict | None = None) -> list[dict]:
-    """Return a summary of item entries that match some criteria.
+ITEMS_SUMMARY_PROJECTION = {
+    "blocks.block_id": 1,
+    "blocks.blocktype": 1,
+    "blocks.title": 1,
+    "creators.display_name": 1,
+    "creators.gravatar_hash": 1,
+    "groups.display_name": 1,
+    "groups.group_id": 1,
+    "collections": 1,
+    "item_id": 1,
+    "name": 1,
+    "chemform": 1,
+    "smiles": 1,
+    "inchi_key": 1,
+    "GHS_codes": 1,
+    "molar_mass": 1,
+    "nblocks": 1,
+    "nfiles": 1,
+    "characteristic_chemical_formula": 1,
+    "type": 1,
+    "date": 1,
+    "last_modified": 1,
+    "refcode": 1,
+    "status": 1,
+}
+"""The default projection of the materialized item summaries returned by `get_items_summary`."""
+
+SAMPLES_SUMMARY_PROJECTION = {
+    "blocks.blocktype": 1,
+    "blocks.title": 1,
+    "creators.display_name": 1,
+    "creators.gravatar_hash": 1,
+    "groups.display_name": 1,
+    "groups.group_id": 1,
+    "collections": 1,
+    "item_id": 1,
+    "name": 1,
+    "chemform": 1,
+    "GHS_codes": 1,
+    "smiles": 1,
+    "molar_mass": 1,
+    "CAS": 1,
+    "nblocks": 1,
+    "nfiles": 1,
+    "characteristic_chemical_formula": 1,
+    "type": 1,
+    "date": 1,
+    "last_modified": 1,
+    "refcode": 1,
+    "status": 1,
+}
+"""The default projection of the materialized item summaries returned by `get_samples_summary`."""
+
+
+def encode_page_cursor(doc: dict) -> str:
+    """Encode the sort key of the last document in a page as an opaque cursor
+    that can be passed back to fetch the following page.
 
     Parameters:
-        match: A MongoDB aggregation match query to filter the results.
-        project: A MongoDB aggregation project query to filter the results, relative
-            to the default included below.
+        doc: The last document of the page, including its `date` and `_id`.
+
+    Returns:
+        A URL-safe string encoding the `(date, _id)` keyset position.
 
     """
-    if not match:
-        match = {}
-    match.update(get_default_permissions(user_only=False))
+    payload = json_util.dumps([doc.get("date"), doc["_id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
 
-    _project = {
-        "_id": 0,
-        "blocks": {
-            "$map": {
-                "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
-                "as": "b",
-                "in": {
-                    "block_id": "$$b.k",
-                    "blocktype": "$$b.v.blocktype",
-                    "title": "$$b.v.title",
-                },
-            }
-        },
-        "creators": {
-            "display_name": 1,
-            "gravatar_hash": 1,
-        },
-        "groups": {
-            "display_name": 1,
-            "group_id": 1,
-        },
-        "collections": {
-            "collection_id": 1,
-            "title": 1,
-        },
-        "item_id": 1,
-        "name": 1,
-        "chemform": 1,
-        "smiles": 1,
-        "inchi_key": 1,
-        "GHS_codes": 1,
-        "molar_mass": 1,
-        "nblocks": {"$size": "$display_order"},
-        "nfiles": {"$size": "$file_ObjectIds"},
-        "characteristic_chemical_formula": 1,
-        "type": 1,
-        "date": 1,
-        "last_modified": LAST_MODIFIED_PROJECTION,
-        "refcode": 1,
-        "status": 1,
+
+def decode_page_cursor(cursor: str) -> dict:
+    """Decode a cursor created by `encode_page_cursor` into the MongoDB query
+    that selects all documents after it in descending `(date, _id)` order.
+
+    Documents without a date sort after all dated documents.
+
+    Parameters:
+        cursor: The opaque cursor string.
+
+    Raises:
+        BadRequest: If the cursor could not be decoded.
+
+    Returns:
+        A MongoDB query matching the documents after the cursor.
+
+    """
+    try:
+        date, _id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError) as exc:
+        raise BadRequest(f"Invalid pagination cursor {cursor!r}") from exc
+
+    if date is None:
+        return {"date": None, "_id": {"$lt": _id}}
+
+    return {
+        "$or": [
+            {"date": {"$lt": date}},
+            {"date": date, "_id": {"$lt": _id}},
+            {"date": None},
+        ]
     }
 
+
+def _get_page_args() -> tuple[int | None, dict | None]:
+    """Parse the optional `limit` and `cursor` query parameters of a list request.
+
+    Raises:
+        BadRequest: If the limit is not a positive integer or the cursor is invalid.
+
+    Returns:
+        The page size (or `None` for all results) and the query selecting the documents
+        after the cursor (or `None` to start from the beginning).
+
+    """
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 1:
+        raise BadRequest(f"Invalid page limit {limit!r}; must be a positive integer.")
+
+    cursor = request.args.get("cursor")
+    return limit, decode_page_cursor(cursor) if cursor else None
+
+
+def _list_response(key: str, docs: Iterator[dict], limit: int | None) -> Response:
+    """Serialize a stream of documents sorted by descending `(date, _id)` as
+    a list response, without holding the full result set in memory.
+
+    When a `limit` is given, the (bounded) page is returned along with a `next_cursor`
+    for the following page, or `None` if this was the last page. Otherwise, the
+    documents are streamed to the client as they are read from the database.
+
+    If the client accepts `application/x-ndjson`, the documents are instead sent as
+    newline-delimited JSON, with any next cursor given in the `X-Next-Cursor` header.
+
+    Parameters:
+        key: The key under which to return the documents in the JSON response.
+        docs: The documents to return, each including its `_id`.
+        limit: The requested page size, if any.
+
+    """
+    ndjson = (
+        request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        == NDJSON_MIMETYPE
+    )
+    headers = {}
+    next_cursor = None
+
+    if limit is not None:
+        page = list(docs)
+        if len(page) == limit:
+            next_cursor = encode_page_cursor(page[-1])
+            headers["X-Next-Cursor"] = next_cursor
+        for doc in page:
+            doc.pop("_id", None)
+        if not ndjson:
+            return jsonify({"status": "success", key: page, "next_cursor": next_cursor})
+        docs = iter(page)
+
+    def _generate_ndjson():
+        for doc in docs:
+            doc.pop("_id", None)
+            yield current_app.json.dumps(doc) + "\n"
+
+    def _generate_json():
+        yield f'{{"status": "success", "{key}": ['
+        for ind, doc in enumerate(docs):
+            doc.pop("_id", None)
+            yield ("," if ind else "") + current_app.json.dumps(doc)
+        yield "]}"
+
+    if ndjson:
+        return Response(
+            stream_with_context(_generate_ndjson()), mimetype=NDJSON_MIMETYPE, headers=headers
+        )
+    return Response(stream_with_context(_generate_json()), mimetype="application/json")
+
+
+def _find_item_summaries(
+    match: dict,
+    projection: dict,
+    project: dict | None = None,
+    limit: int | None = None,
+    after: dict | None = None,
+) -> Iterator[dict]:
+    """Query the materialized `item_summaries` collection (see `pydatalab.summaries`),
+    yielding the summaries (including their `_id`) in descending `(date, _id)` order.
+
+    Parameters:
+        match: A MongoDB query, including permissions, to filter the summaries.
+        projection: The default projection to apply to the summaries.
+        project: A MongoDB projection to modify the default one, where keys set to
+            0 are removed (along with any of their sub-keys) and all others are added.
+        limit: The maximum number of summaries to return.
+        after: A query from `decode_page_cursor` selecting the summaries after a cursor.
+
+    """
+    projection = {**projection, "_id": 1}
+
     # Cannot mix 0 and 1 keys in MongoDB project so must loop and check
     if project:
         for key in project:
             if project[key] == 0:
-                _project.pop(key, None)
+                for existing in list(projection):
+                    if existing == key or existing.startswith(f"{key}."):
+                        projection.pop(existing)
             else:
-                _project[key] = 1
+                projection[key] = 1
 
-    return list(
-        flask_mongo.db.items.aggregate(
-            [
-                {"$match": match},
-                {"$lookup": creators_lookup()},
-                {"$lookup": groups_lookup()},
-                {"$lookup": collections_lookup()},
-                {"$project": _project},
-                {"$sort": {"date": -1}},
-            ]
-        )
+    if after:
+        match = {"$and": [match, after]}
+
+    sync_item_summaries()
+
+    # Collection membership is stored unfiltered, so hide any collections
+    # that the current user cannot see
+    visible_collections: set[ObjectId] | None = None
+    if collection_permissions := get_default_permissions(user_only=False):
+        visible_collections = {
+            doc["_id"]
+            for doc in flask_mongo.db.collections.find(
+                {"type": "collections", **collection_permissions}, {"_id": 1}
+            )
+        }
+
+    cursor = flask_mongo.db[ITEM_SUMMARIES_COLLECTION].find(
+        match, projection, sort=PAGE_SORT, limit=limit or 0
     )
 
+    def _filter_collections(summaries):
+        for summary in summaries:
+            if "collections" in summary:
+                summary["collections"] = [
+                    {"collection_id": collection.get("collection_id")}
+                    for collection in summary["collections"]
+                    if visible_collections is None or collection["_id"] in visible_collections
+                ]
+            yield summary
+
+    return _filter_collections(cursor)
+
+
+def get_items_summary(match: dict | None = None, project: dict | None = None) -> list[dict]:
+    """Return a summary of item entries that match some criteria.
+
+    Parameters:
+        match: A MongoDB query to filter the results.
+        project: A MongoDB projection to filter the results, relative
+            to the default included in `ITEMS_SUMMARY_PROJECTION`.
+
+    """
+    if not match:
+        match = {}
+    match.update(get_default_permissions(user_only=False))
+
+    summaries = list(_find_item_summaries(match, ITEMS_SUMMARY_PROJECTION, project))
+    for summary in summaries:
+        summary.pop("_id")
+    return summaries
+
 
-def get_samples_summary(match: dict | None = None, project: dict | None = None) -> list[dict]:
+def get_samples_summary(
+    match: dict | None = None,
+    project: dict | None = None,
+    limit: int | None = None,
+    after: dict | None = None,
+) -> Iterator[dict]:
     """Return a summary of samples/cells entries that match some criteria.
 
+    Summaries are yielded in descending `(date, _id)` order and include their
+    `_id`, so that they can be paginated with `encode_page_cursor`.
+
     Parameters:
-        match: A MongoDB aggregation match query to filter the results.
-        project: A MongoDB aggregation project query to filter the results, relative
-            to the default included below.
+        match: A MongoDB query to filter the results.
+        project: A MongoDB projection to filter the results, relative
+            to the default included in `SAMPLES_SUMMARY_PROJECTION`.
+        limit: The maximum number of summaries to return.
+        after: A query from `decode_page_cursor` selecting the summaries after a cursor.
 
     """
     if not match:
@@ -241,67 +480,7 @@ def get_samples_summary(match: dict | None = None, project: dict | None = None)
     match.update(get_default_permissions(user_only=False, inherit_from_collections=False))
     match["type"] = {"$in": ["samples", "cells"]}
 
-    _project = {
-        "_id": 0,
-        "blocks": {
-            "$map": {
-                "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
-                "as": "b",
-                "in": {
-                    "blocktype": "$$b.v.blocktype",
-                    "title": "$$b.v.title",
-                },
-            }
-        },
-        "creators": {
-            "display_name": 1,
-            "gravatar_hash": 1,
-        },
-        "groups": {
-            "display_name": 1,
-            "group_id": 1,
-        },
-        "collections": {
-            "collection_id": 1,
-            "title": 1,
-        },
-        "item_id": 1,
-        "name": 1,
-        "chemform": 1,
-        "GHS_codes": 1,
-        "smiles": 1,
-        "molar_mass": 1,
-        "CAS": 1,
-        "nblocks": {"$size": "$display_order"},
-        "nfiles": {"$size": "$file_ObjectIds"},
-        "characteristic_chemical_formula": 1,
-        "type": 1,
-        "date": 1,
-        "last_modified": LAST_MODIFIED_PROJECTION,
-        "refcode": 1,
-        "status": 1,
-    }
-
-    # Cannot mix 0 and 1 keys in MongoDB project so must loop and check
-    if project:
-        for key in project:
-            if project[key] == 0:
-                _project.pop(key, None)
-            else:
-                _project[key] = 1
-
-    return list(
-        flask_mongo.db.items.aggregate(
-            [
-                {"$match": match},
-                {"$lookup": creators_lookup()},
-                {"$lookup": groups_lookup()},
-                {"$lookup": collections_lookup()},
-                {"$project": _project},
-                {"$sort": {"date": -1}},
-            ]
-        )
-    )
+    return _find_item_summaries(match, SAMPLES_SUMMARY_PROJECTION, project, limit, after)
 
 
 def creators_lookup() -> dict:
@@ -501,7 +680,17 @@ def _scrub_collections_for_save(sample_dict: dict) -> list[dict[str, str]]:
 
 @ITEMS.route("/samples/", methods=["GET"])
 def get_samples():
-    return jsonify({"status": "success", "samples": list(get_samples_summary())})
+    """Return the summaries of the samples and cells accessible to the current user,
+    newest first.
+
+    GET parameters:
+        limit: The maximum number of samples to return; if provided, the response
+            includes a `next_cursor` to fetch the following page with.
+        cursor: The `next_cursor` returned for the previous page.
+
+    """
+    limit, after = _get_page_args()
+    return _list_response("samples", get_samples_summary(limit=limit, after=after), limit)
 
 
 @ITEMS.route("/search-items/", methods=["GET"])
@@ -528,7 +717,9 @@ def search_items():
         return jsonify({"status": "error", "message": "No query provided."}), 400
 
     permissions = get_default_permissions(user_only=False)
-    pipeline = build_search_pipeline(query, ITEMS_FTS_FIELDS, permissions)
+    pipeline = build_search_pipeline(
+        query, ITEMS_FTS_FIELDS, permissions, ngram_field=ITEMS_SEARCH_NGRAMS_FIELD
+    )
 
     if types is not None:
         if pipeline and "$match" in pipeline[0]:
@@ -730,10 +921,10 @@ def _create_sample(
     # via joins for a specific query.
     # TODO: encode this at the model level, via custom schema properties or hard-coded `.store()` methods
     # the `Entry` model.
+    new_doc = data_model.dict(exclude={"creators", "collections", "groups"})
+    new_doc[ITEMS_SEARCH_NGRAMS_FIELD] = generate_search_ngrams(new_doc, ITEMS_FTS_FIELDS)
     try:
-        result = flask_mongo.db.items.insert_one(
-            data_model.dict(exclude={"creators", "collections", "groups"})
-        )
+        result = flask_mongo.db.items.insert_one(new_doc)
     except DuplicateKeyError as error:
         raise Conflict(f"Duplicate key error: {str(error)}.")
 
@@ -764,6 +955,8 @@ def _create_sample(
             str(e),
         )
 
+    refresh_item_summaries({"_id": result.inserted_id})
+
     data = {
         "status": "success",
         "item_id": data_model.item_id,
@@ -1010,6 +1203,8 @@ def _process_item_permissions(
             {"refcode": refcode}, {"$set": {"version": version_response["version"]}}
         )
 
+    refresh_item_summaries({"refcode": refcode})
+
     return {"status": "success"}, 200
 
 
@@ -1116,6 +1311,7 @@ def delete_sample():
         )
 
     flask_mongo.db.api_keys.delete_many({"refcode": item["refcode"], "type": "access_token"})
+    delete_item_summaries({"item_id": item_id})
 
     return jsonify({"status": "success"}), 200
 
@@ -1195,6 +1391,8 @@ def get_item_data(
     if not doc.get("last_modified") and isinstance(doc.get("_id"), ObjectId):
         doc["last_modified"] = doc["_id"].generation_time
 
+    load_block_outputs((doc.get("blocks_obj") or {}).values())
+
     # determine the item type and validate according to the appropriate schema
     try:
         ItemModel = ITEM_MODELS[doc["type"]]
@@ -1332,6 +1530,25 @@ def list_versions(refcode):
                 # $lookup always yields an array; collapse the (0 or 1) match
                 # to a single-valued creator, leaving it null when absent.
                 {"$set": {"creator": {"$arrayElemAt": ["$creator", 0]}}},
+                # Chunked snapshots only hold the hash of the item's `version` field
+                {
+                    "$lookup": {
+                        "from": VERSION_CHUNKS_COLLECTION,
+                        "localField": "fields.version",
+                        "foreignField": "_id",
+                        "as": "version_chunk",
+                    }
+                },
+                {
+                    "$set": {
+                        "data.version": {
+                            "$ifNull": [
+                                "$data.version",
+                                {"$arrayElemAt": ["$version_chunk.data", 0]},
+                            ]
+                        }
+                    }
+                },
                 {
                     "$project": {
                         "_id": 1,
@@ -1394,13 +1611,10 @@ def get_version(refcode, version_id):
         )
     )
 
-    if len(version) >= 1:
-        version = version[0]
-
     if not version:
         return jsonify({"status": "error", "message": "Version not found"}), 404
 
-    return jsonify({"status": "success", "version": version}), 200
+    return jsonify({"status": "success", "version": expand_version(version[0])}), 200
 
 
 @ITEMS.route("/items/<refcode>/compare-versions/", methods=["GET"])
@@ -1435,22 +1649,18 @@ def compare_versions(refcode):
     except (InvalidId, TypeError) as e:
         return jsonify({"status": "error", "message": f"Invalid version ID format: {str(e)}"}), 400
 
-    v1 = flask_mongo.db.item_versions.find_one({"_id": v1_object_id, "refcode": refcode})
-    v2 = flask_mongo.db.item_versions.find_one({"_id": v2_object_id, "refcode": refcode})
+    # Chunked versions are compared by their chunk hashes, so their data is not loaded here
+    projection = {"refcode": 1, "version": 1, "timestamp": 1, "fields": 1, "blocks": 1}
+    v1 = flask_mongo.db.item_versions.find_one(
+        {"_id": v1_object_id, "refcode": refcode}, projection
+    )
+    v2 = flask_mongo.db.item_versions.find_one(
+        {"_id": v2_object_id, "refcode": refcode}, projection
+    )
     if not v1 or not v2:
         return jsonify({"status": "error", "message": "One or both versions not found"}), 404
 
-    # Use DeepDiff for proper nested structure comparison
-    # This handles nested dicts, lists, type changes, and provides detailed change information
-    deep_diff = DeepDiff(
-        v1["data"],
-        v2["data"],
-        ignore_order=False,  # Preserve list order in comparisons
-        verbose_level=2,  # Include detailed change information
-    )
-
-    # Convert DeepDiff result to a JSON-serializable dict
-    diff = json.loads(deep_diff.to_json()) if deep_diff else {}
+    diff = diff_versions(v1, v2)
 
     return jsonify(
         {
@@ -1507,10 +1717,12 @@ def restore_version(refcode):
     if not version:
         return jsonify({"status": "error", "message": "Version not found"}), 404
 
-    restored_data = version["data"].copy()
+    restored_data = expand_version(version)["data"].copy()
 
     # Protect critical fields from being overwritten during restore
     restored_data = apply_protected_fields(restored_data, current_item)
+    # Keep the rendered outputs of any blocks left unchanged by the restore
+    restored_data = restore_regenerable_fields(restored_data, current_item)
 
     # Ensure type consistency
     if restored_data.get("type") != current_item.get("type"):
@@ -1546,7 +1758,16 @@ def restore_version(refcode):
         ), 400
 
     # Perform the restore first
-    flask_mongo.db.items.update_one({"refcode": refcode}, {"$set": restored_data})
+    flask_mongo.db.items.update_one(
+        {"refcode": refcode},
+        {
+            "$set": {
+                **restored_data,
+                ITEMS_SEARCH_NGRAMS_FIELD: generate_search_ngrams(restored_data, ITEMS_FTS_FIELDS),
+            }
+        },
+    )
+    refresh_item_summaries({"refcode": refcode})
 
     # Extract user information for hybrid storage approach
     user_id = None
@@ -1568,7 +1789,7 @@ def restore_version(refcode):
         "restored_from_version": version_object_id,
         "user_id": user_id,  # ObjectId for efficient querying
         "datalab_version": software_version,
-        "data": restored_data,  # Store the complete snapshot of the restored state
+        "data": strip_regenerable_fields(restored_data),  # Snapshot of the restored state
     }
 
     # Validate with Pydantic before inserting
@@ -1589,8 +1810,9 @@ def restore_version(refcode):
         ), 400
 
     # Insert validated data
-    flask_mongo.db.item_versions.insert_one(
-        validated_restored_version.dict(by_alias=True, exclude_none=True)
+    insert_version(
+        validated_restored_version.dict(by_alias=True, exclude_none=True, exclude={"data"}),
+        make_snapshot(restored_version_entry["data"]),
     )
 
     return jsonify(
@@ -1623,8 +1845,7 @@ def delete_version(refcode, version_id):
     except (InvalidId, TypeError):
         return jsonify({"status": "error", "message": f"Invalid version_id: {version_id}"}), 400
 
-    result = flask_mongo.db.item_versions.delete_one({"_id": version_object_id, "refcode": refcode})
-    if result.deleted_count == 1:
+    if delete_version_snapshot({"_id": version_object_id, "refcode": refcode}):
         return jsonify({"status": "success"}), 200
     else:
         return jsonify({"status": "error", "message": "Version not found"}), 404
@@ -1726,6 +1947,7 @@ def save_item():
         )
 
     stored_blocks = item.get("blocks_obj", {})
+    load_block_outputs(stored_blocks.values())
     for block_id, block_data in updated_data.get("blocks_obj", {}).items():
         blocktype = block_data["blocktype"]
 
@@ -1733,7 +1955,7 @@ def save_item():
             block_data, stored_data=stored_blocks.get(block_id)
         )
 
-        updated_data["blocks_obj"][block_id] = block.to_db()
+        updated_data["blocks_obj"][block_id] = store_block_outputs(block.to_db())
 
     if "collections" in updated_data:
         requested_collections = updated_data["collections"]
@@ -1813,6 +2035,8 @@ def save_item():
     if isinstance(existing_last_modified, datetime.datetime):
         existing_last_modified = existing_last_modified.isoformat()
 
+    item[ITEMS_SEARCH_NGRAMS_FIELD] = generate_search_ngrams(item, ITEMS_FTS_FIELDS)
+
     # Update the item FIRST (transaction safety: item update before version save)
     result = flask_mongo.db.items.update_one(
         {"item_id": item_id, **get_default_permissions(user_only=True)},
@@ -1857,6 +2081,8 @@ def save_item():
 
     # Report the freshly-minted timestamp when content changed. If no version was minted
     # the item was unchanged, so flag it as a no-op and echo back the existing timestamp
+    refresh_item_summaries({"item_id": item_id})
+
     if new_last_modified:
         return jsonify(status="success", last_modified=new_last_modified), 200
 
@@ -10,6 +10,7 @@ from pydatalab.permissions import active_users_or_get_only
 from pydatalab.remote_filesystems import (
     get_directory_structure,
     get_directory_structures,
+    get_remote_subtree,
 )
 
 
@@ -92,6 +93,11 @@ def get_remote_directory(remote_id: str):
     """Returns the directory structure from the server for the
     given configured remote name.
 
+    If the `path` (relative to the root of the remote) or `depth` query
+    parameters are given, only the entries of that directory are returned,
+    along with those of its subdirectories down to `depth` levels (default 1),
+    such that the tree can be expanded lazily.
+
     """
     if not current_user.is_authenticated and not CONFIG.TESTING:
         return (
@@ -135,7 +141,25 @@ def get_remote_directory(remote_id: str):
             404,
         )
 
-    directory_structure = get_directory_structure(remote_obj, invalidate_cache=invalidate_cache)
+    if "path" in request.args or "depth" in request.args:
+        # Return a single subtree, e.g., to lazily expand one directory at a time
+        try:
+            depth = int(request.args.get("depth", 1))
+            directory_structure = get_remote_subtree(
+                remote_obj,
+                path=request.args.get("path", ""),
+                depth=depth,
+                invalidate_cache=invalidate_cache,
+            )
+        except ValueError as e:
+            return (
+                jsonify({"status": "error", "title": "Invalid Argument", "detail": str(e)}),
+                400,
+            )
+        except FileNotFoundError as e:
+            return jsonify({"status": "error", "title": "Not Found", "detail": str(e)}), 404
+    else:
+        directory_structure = get_directory_structure(remote_obj, invalidate_cache=invalidate_cache)
 
     response: dict[str, Any] = {}
     response["meta"] = {}
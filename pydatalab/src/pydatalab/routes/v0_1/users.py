@@ -19,6 +19,7 @@ from pydatalab.mongo import (
 )
 from pydatalab.permissions import active_users_or_get_only
 from pydatalab.routes.v0_1.auth import _generate_and_store_token, _send_magic_link_email
+from pydatalab.summaries import refresh_item_summaries
 
 USERS = Blueprint("users", __name__)
 
@@ -142,6 +143,9 @@ def save_user(user_id):
     if update_result.matched_count != 1:
         raise BadRequest("Unable to update user.")
 
+    if "display_name" in update or "gravatar_hash" in update:
+        refresh_item_summaries({"creator_ids": ObjectId(user_id)})
+
     if trigger_email_verification:
         return (
             jsonify(
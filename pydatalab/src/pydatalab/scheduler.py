@@ -1,5 +1,11 @@
 import contextvars
-from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from enum import IntEnum
 from functools import wraps
 
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -7,13 +13,193 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from pydatalab.logger import LOGGER, request_id_var
 
 
+class JobPriority(IntEnum):
+    """Priorities for one-shot jobs; lower values are dispatched first."""
+
+    INTERACTIVE = 0
+    """Jobs that a user is actively waiting on, e.g., a block event from the UI."""
+
+    NORMAL = 10
+    """Jobs triggered by a user action that do not need an immediate response."""
+
+    BULK = 20
+    """Bulk work such as reprocessing many blocks or generating exports."""
+
+
+class _Job:
+    __slots__ = (
+        "fn",
+        "args",
+        "job_id",
+        "task_id",
+        "priority",
+        "limit_key",
+        "serial_key",
+        "queued_at",
+        "future",
+    )
+
+    def __init__(self, fn, args, job_id, task_id, priority, limit_key, serial_key):
+        self.fn = fn
+        self.args = args
+        self.job_id = job_id
+        self.task_id = task_id
+        self.priority = priority
+        self.limit_key = limit_key
+        self.serial_key = serial_key
+        self.queued_at = time.monotonic()
+        self.future: Future = Future()
+
+
+class PriorityWorkerPool:
+    """A fixed-size pool of worker threads that dispatches jobs in priority order
+    (FIFO within a priority), while never running more than the configured number
+    of jobs that share a `limit_key` at once, and running jobs that share a
+    `serial_key` one at a time, in the order they were submitted.
+
+    A job whose `limit_key` is at capacity, or whose `serial_key` is held by a
+    running or earlier job, is skipped over, so that it does not hold up jobs of
+    other kinds queued behind it.
+
+    Parameters:
+        max_workers: The number of worker threads.
+        limits: A mapping from `limit_key` to the maximum number of concurrent jobs
+            with that key. Keys without an entry are only limited by `max_workers`.
+        on_start: An optional callback, called with the job and its wait time in
+            seconds just before the job runs.
+
+    """
+
+    def __init__(self, max_workers: int, limits: dict[str, int] | None = None, on_start=None):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, not {max_workers}")
+        self.max_workers = max_workers
+        self.limits = dict(limits or {})
+        self._on_start = on_start
+        self._queue: list[tuple[int, int, _Job]] = []
+        self._counter = itertools.count()
+        self._running: dict[str | None, int] = {}
+        self._running_serial: set[str] = set()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of jobs waiting to be started."""
+        with self._condition:
+            return len(self._queue)
+
+    def submit(
+        self,
+        fn,
+        *args,
+        job_id: str | None = None,
+        task_id: str | None = None,
+        priority: int = JobPriority.NORMAL,
+        limit_key: str | None = None,
+        serial_key: str | None = None,
+    ) -> Future:
+        """Queue a job and return a future for its result."""
+        job = _Job(fn, args, job_id, task_id, int(priority), limit_key, serial_key)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit jobs after shutdown")
+            heapq.heappush(self._queue, (job.priority, next(self._counter), job))
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"datalab-worker-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._condition.notify_all()
+        return job.future
+
+    def _has_capacity(self, limit_key: str | None) -> bool:
+        limit = self.limits.get(limit_key) if limit_key is not None else None
+        return limit is None or self._running.get(limit_key, 0) < limit
+
+    def _next_job(self) -> _Job | None:
+        """Pop the highest-priority job that can run, blocking until one is available.
+        Returns `None` once the pool has been shut down and its queue has drained."""
+        with self._condition:
+            while self._queue or not self._shutdown:
+                # The earliest queued job of each serial key, which must run first
+                first_serial: dict[str, int] = {}
+                for _, count, job in self._queue:
+                    if job.serial_key is not None:
+                        first_serial[job.serial_key] = min(
+                            count, first_serial.get(job.serial_key, count)
+                        )
+                for entry in sorted(self._queue):
+                    _, count, job = entry
+                    if job.serial_key is not None and (
+                        job.serial_key in self._running_serial
+                        or first_serial[job.serial_key] != count
+                    ):
+                        continue
+                    if self._has_capacity(job.limit_key):
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                        self._running[job.limit_key] = self._running.get(job.limit_key, 0) + 1
+                        if job.serial_key is not None:
+                            self._running_serial.add(job.serial_key)
+                        return job
+                self._condition.wait()
+            return None
+
+    def _work(self) -> None:
+        while (job := self._next_job()) is not None:
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                if self._on_start is not None:
+                    try:
+                        self._on_start(job, time.monotonic() - job.queued_at)
+                    except Exception as exc:
+                        LOGGER.warning("Could not record start of job %s: %s", job.job_id, exc)
+                try:
+                    result = job.fn(*job.args)
+                except BaseException as exc:
+                    job.future.set_exception(exc)
+                else:
+                    job.future.set_result(result)
+            finally:
+                with self._condition:
+                    self._running[job.limit_key] -= 1
+                    self._running_serial.discard(job.serial_key)
+                    self._condition.notify_all()
+
+    def shutdown(self, cancel_futures: bool = False) -> None:
+        """Stop accepting jobs; the workers exit once the queued jobs have run.
+
+        Parameters:
+            cancel_futures: Whether to cancel the queued jobs instead of running them.
+
+        """
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for _, _, job in self._queue:
+                    job.future.cancel()
+                self._queue.clear()
+            self._condition.notify_all()
+
+
 class TaskScheduler:
-    """Manages one-shot background jobs via a ThreadPoolExecutor and
+    """Manages one-shot background jobs via a priority worker pool and
     periodic jobs via APScheduler (in-memory job store only).
 
-    One-shot jobs (block processing, exports) are submitted directly to the
-    thread pool — no pickling, no MongoDB coordination, no cross-worker races.
-    The tasks collection in MongoDB is the source of truth for queue state.
+    One-shot jobs (block processing, exports) are submitted directly to a
+    [`PriorityWorkerPool`][pydatalab.scheduler.PriorityWorkerPool] of
+    `CONFIG.TASK_WORKERS` threads — no pickling, no MongoDB coordination, no
+    cross-worker races. Jobs are dispatched by priority, so interactive block
+    events are not stuck behind bulk work, `CONFIG.ASYNC_BLOCK_CONCURRENCY`
+    caps how many blocks of a given type are processed at once, and updates of
+    the same block are processed one at a time, in order. The tasks
+    collection in MongoDB is the source of truth for queue state: when a job is
+    linked to a task, its queue depth on submission and its wait time before
+    starting are recorded on the task document.
 
     Periodic jobs (e.g. stale task cleanup) use APScheduler's interval trigger
     with a MemoryJobStore. Each gunicorn worker runs its own cleanup
@@ -29,9 +215,15 @@ class TaskScheduler:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def _get_executor(self):
+    def _get_executor(self) -> PriorityWorkerPool:
         if self._executor is None:
-            self._executor = ThreadPoolExecutor(max_workers=1)
+            from pydatalab.config import CONFIG
+
+            self._executor = PriorityWorkerPool(
+                max_workers=CONFIG.TASK_WORKERS,
+                limits=CONFIG.ASYNC_BLOCK_CONCURRENCY,
+                on_start=_record_job_start,
+            )
         return self._executor
 
     def _get_scheduler(self):
@@ -41,32 +233,70 @@ class TaskScheduler:
             self._scheduler.start()
         return self._scheduler
 
-    def add_job(self, func, args, job_id=None):
-        """Submit a one-shot job to the thread pool.
+    def add_job(
+        self,
+        func,
+        args,
+        job_id=None,
+        task_id: str | None = None,
+        priority: int = JobPriority.NORMAL,
+        limit_key: str | None = None,
+        serial_key: str | None = None,
+    ):
+        """Submit a one-shot job to the worker pool.
 
         Queue depth is logged on each submission by counting PENDING/PROCESSING
-        tasks in MongoDB.
+        tasks in MongoDB, and stored on the task document if `task_id` is given.
+
+        Parameters:
+            func: The function to run.
+            args: The positional arguments to pass to `func`.
+            job_id: An identifier for the job, used in log messages.
+            task_id: The `task_id` of the document in the tasks collection that
+                tracks this job, if any.
+            priority: The [`JobPriority`][pydatalab.scheduler.JobPriority] of the job.
+            limit_key: The key (typically a block type) under which to apply
+                the concurrency caps from `CONFIG.ASYNC_BLOCK_CONCURRENCY`.
+            serial_key: A key (typically identifying a block) shared by jobs that
+                must not run concurrently; they run in the order they were submitted.
+
+        Returns:
+            A `concurrent.futures.Future` for the result of the job.
+
         """
         executor = self._get_executor()
 
         try:
-            from pydatalab.mongo import flask_mongo
+            from pydatalab.mongo import get_database
 
-            pending = flask_mongo.db.tasks.count_documents(
-                {"status": {"$in": ["pending", "processing"]}}
-            )
+            tasks = get_database().tasks
+            pending = tasks.count_documents({"status": {"$in": ["pending", "processing"]}})
             LOGGER.info(
                 "Submitting job %s to executor (queue depth: %d pending/processing tasks)",
                 job_id or func.__name__,
                 pending,
             )
+            if task_id is not None:
+                tasks.update_one(
+                    {"task_id": task_id},
+                    {"$set": {"queue_depth": pending, "priority": int(priority)}},
+                )
         except Exception:
             LOGGER.info("Submitting job %s to executor", job_id or func.__name__)
 
         # Run the job in a copy of the current context, so that its log
         # lines carry the request ID of the request that spawned it
         ctx = contextvars.copy_context()
-        return executor.submit(ctx.run, func, *args)
+        return executor.submit(
+            ctx.run,
+            func,
+            *args,
+            job_id=job_id or func.__name__,
+            task_id=task_id,
+            priority=priority,
+            limit_key=limit_key,
+            serial_key=serial_key,
+        )
 
     def add_periodic_job(self, func, job_id, hours, replace_existing=True):
         """Register a periodic job via APScheduler (MemoryJobStore)."""
@@ -88,9 +318,25 @@ class TaskScheduler:
 
     def shutdown(self):
         if self._executor:
-            self._executor.shutdown(wait=False)
+            self._executor.shutdown()
         if self._scheduler and self._scheduler.running:
             self._scheduler.shutdown()
 
 
+def _record_job_start(job: _Job, wait_seconds: float) -> None:
+    """Store when a job linked to a task started, and how long it was queued for."""
+    LOGGER.info("Starting job %s after waiting %.2f s", job.job_id, wait_seconds)
+    if job.task_id is None:
+        return
+
+    from pydatalab.mongo import get_database
+    from pydatalab.task_events import task_notifier
+
+    get_database().tasks.update_one(
+        {"task_id": job.task_id},
+        {"$set": {"started_at": datetime.now(tz=timezone.utc), "wait_seconds": wait_seconds}},
+    )
+    task_notifier.notify(job.task_id)
+
+
 task_scheduler = TaskScheduler()
@@ -0,0 +1,303 @@
+"""Maintenance of the denormalized `item_summaries` read model.
+
+The item tables in the UI list a fixed projection of every accessible item,
+together with the display names of its creators and groups and the
+collections it belongs to. Assembling that from `items` requires several
+`$lookup` stages per request, so the same projection is instead materialized
+into `item_summaries` (keyed by the item `_id`) whenever one of its inputs
+changes, and the list routes read it with a single indexed `find`.
+
+Each summary stores the raw `creator_ids`, `group_ids` and collection
+`relationships` of its item so that the usual permission filters from
+[`get_default_permissions`][pydatalab.permissions.get_default_permissions]
+can be applied to it directly.
+
+"""
+
+import threading
+import time
+from typing import Any
+
+from pymongo.database import Database
+
+from pydatalab.config import CONFIG
+from pydatalab.logger import LOGGER
+from pydatalab.mongo import flask_mongo, refresh_item_search_ngrams
+
+__all__ = (
+    "ITEM_SUMMARIES_COLLECTION",
+    "refresh_item_summaries",
+    "refresh_collection_item_summaries",
+    "delete_item_summaries",
+    "sync_item_summaries",
+    "rebuild_item_summaries",
+)
+
+ITEM_SUMMARIES_COLLECTION = "item_summaries"
+"""The name of the MongoDB collection holding the materialized item summaries."""
+
+SUMMARY_ITEM_FIELDS = (
+    "item_id",
+    "name",
+    "chemform",
+    "smiles",
+    "inchi_key",
+    "GHS_codes",
+    "molar_mass",
+    "CAS",
+    "characteristic_chemical_formula",
+    "type",
+    "date",
+    "refcode",
+    "status",
+)
+"""Fields that are copied verbatim from the item into its summary."""
+
+
+def _summary_pipeline(match: dict[str, Any]) -> list[dict[str, Any]]:
+    """Build the aggregation pipeline that (re)computes the summaries of all items
+    matching `match` and merges them into the summary collection.
+
+    Collection membership is stored unfiltered; the routes only expose the
+    collections that the current user can read.
+
+    """
+    from pydatalab.routes.v0_1.items import (
+        LAST_MODIFIED_PROJECTION,
+        creators_lookup,
+        groups_lookup,
+    )
+
+    return [
+        {"$match": match},
+        {"$lookup": creators_lookup()},
+        {"$lookup": groups_lookup()},
+        {
+            "$lookup": {
+                "from": "collections",
+                "let": {"collection_ids": "$relationships.immutable_id"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {"$in": ["$_id", {"$ifNull": ["$$collection_ids", []]}]},
+                            "type": "collections",
+                        }
+                    },
+                    {"$project": {"_id": 1, "collection_id": 1}},
+                ],
+                "as": "collections",
+            }
+        },
+        {
+            "$project": {
+                "_id": 1,
+                "creator_ids": 1,
+                "group_ids": 1,
+                "relationships": {
+                    "$filter": {
+                        "input": {"$ifNull": ["$relationships", []]},
+                        "as": "r",
+                        "cond": {"$eq": ["$$r.type", "collections"]},
+                    }
+                },
+                "blocks": {
+                    "$map": {
+                        "input": {"$objectToArray": {"$ifNull": ["$blocks_obj", {}]}},
+                        "as": "b",
+                        "in": {
+                            "block_id": "$$b.k",
+                            "blocktype": "$$b.v.blocktype",
+                            "title": "$$b.v.title",
+                        },
+                    }
+                },
+                "creators": {"display_name": 1, "gravatar_hash": 1},
+                "groups": {"display_name": 1, "group_id": 1},
+                "collections": 1,
+                "nblocks": {"$size": {"$ifNull": ["$display_order", []]}},
+                "nfiles": {"$size": {"$ifNull": ["$file_ObjectIds", []]}},
+                "last_modified": LAST_MODIFIED_PROJECTION,
+                **{field: 1 for field in SUMMARY_ITEM_FIELDS},
+            }
+        },
+        {
+            "$merge": {
+                "into": ITEM_SUMMARIES_COLLECTION,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def refresh_item_summaries(match: dict[str, Any], db: Database | None = None) -> None:
+    """Recompute the summaries of all items matching the given query.
+
+    Should be called after any write that changes a summarized field of an item,
+    or the user, group or collection data that is denormalized into it. The search
+    tokens of the items are refreshed along with their summaries, see
+    [`refresh_item_search_ngrams`][pydatalab.mongo.refresh_item_search_ngrams].
+
+    Parameters:
+        match: A MongoDB query on the `items` collection selecting the items to refresh.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+    refresh_item_search_ngrams(match, db=db)
+    db.items.aggregate(_summary_pipeline(match))
+
+
+def refresh_collection_item_summaries(immutable_id, db: Database | None = None) -> None:
+    """Recompute the summaries of every item that is, or was until the last
+    refresh, a member of the given collection.
+
+    Parameters:
+        immutable_id: The `_id` of the collection whose membership has changed.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+    membership = {"relationships.immutable_id": immutable_id}
+    item_ids = {doc["_id"] for doc in db.items.find(membership, {"_id": 1})}
+    item_ids.update(
+        doc["_id"] for doc in db[ITEM_SUMMARIES_COLLECTION].find(membership, {"_id": 1})
+    )
+    if item_ids:
+        refresh_item_summaries({"_id": {"$in": list(item_ids)}}, db=db)
+
+
+def delete_item_summaries(match: dict[str, Any], db: Database | None = None) -> None:
+    """Remove the summaries matching the given query, e.g., after the
+    corresponding items have been deleted.
+
+    Parameters:
+        match: A MongoDB query on the summary collection.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+    db[ITEM_SUMMARIES_COLLECTION].delete_many(match)
+
+
+def _latest_id(collection) -> Any:
+    latest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return latest["_id"] if latest else None
+
+
+def _delete_orphaned_summaries(db: Database, batch_size: int = 1000) -> int:
+    """Delete the summaries whose item no longer exists, found by joining the
+    summaries back onto `items` rather than by listing every item ID.
+
+    Returns:
+        The number of deleted summaries.
+
+    """
+    summaries = db[ITEM_SUMMARIES_COLLECTION]
+    orphans = summaries.aggregate(
+        [
+            {"$project": {"_id": 1}},
+            {
+                "$lookup": {
+                    "from": "items",
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "item",
+                }
+            },
+            {"$match": {"item": {"$size": 0}}},
+            {"$project": {"_id": 1}},
+        ]
+    )
+    deleted = 0
+    batch: list[Any] = []
+    for doc in orphans:
+        batch.append(doc["_id"])
+        if len(batch) >= batch_size:
+            deleted += summaries.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        deleted += summaries.delete_many({"_id": {"$in": batch}}).deleted_count
+    return deleted
+
+
+_last_sync: float | None = None
+_sync_lock = threading.Lock()
+
+
+def sync_item_summaries(db: Database | None = None, force: bool = False) -> None:
+    """Check whether the summary collection has drifted from `items` (e.g., due to
+    items being inserted or deleted outside of the API) and, if so, add any missing
+    summaries and remove any orphaned ones.
+
+    The check only compares the document counts and newest `_id` of the two
+    collections, and is made at most once every
+    [`ITEM_SUMMARY_SYNC_INTERVAL`][pydatalab.config.ServerConfig.ITEM_SUMMARY_SYNC_INTERVAL]
+    seconds per process unless `force` is set. In-place edits made outside of
+    the API will only be picked up by
+    [`rebuild_item_summaries`][pydatalab.summaries.rebuild_item_summaries].
+
+    Parameters:
+        db: The database to use, defaulting to that of the current Flask app.
+        force: Whether to check regardless of when the last check was made.
+
+    """
+    global _last_sync
+
+    with _sync_lock:
+        now = time.monotonic()
+        if (
+            not force
+            and _last_sync is not None
+            and now - _last_sync < CONFIG.ITEM_SUMMARY_SYNC_INTERVAL
+        ):
+            return
+        _last_sync = now
+
+    if db is None:
+        db = flask_mongo.db
+    summaries = db[ITEM_SUMMARIES_COLLECTION]
+    if db.items.estimated_document_count() == summaries.estimated_document_count() and _latest_id(
+        db.items
+    ) == _latest_id(summaries):
+        return
+
+    # Summarize only the items without a summary, found via a join so that
+    # no list of IDs is ever built in Python or sent to the server
+    db.items.aggregate(
+        [
+            {
+                "$lookup": {
+                    "from": ITEM_SUMMARIES_COLLECTION,
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "_summary",
+                }
+            },
+            {"$match": {"_summary": {"$size": 0}}},
+            *_summary_pipeline({}),
+        ]
+    )
+    orphaned = _delete_orphaned_summaries(db)
+    LOGGER.debug("Synced item summaries: removed %d orphaned", orphaned)
+
+
+def rebuild_item_summaries(db: Database | None = None) -> int:
+    """Recompute the summaries of all items from scratch and remove any orphaned ones.
+
+    Parameters:
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Returns:
+        The number of summaries in the collection after the rebuild.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+    refresh_item_summaries({}, db=db)
+    _delete_orphaned_summaries(db)
+    return db[ITEM_SUMMARIES_COLLECTION].count_documents({})
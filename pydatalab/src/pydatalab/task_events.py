@@ -0,0 +1,388 @@
+"""Push notifications of the progress of background tasks (block processing and exports).
+
+Clients previously learned about the progress of a task by polling its status
+endpoint on a fixed interval, which both delays the delivery of results and
+issues many redundant queries. Instead, the code that updates a task document
+calls [`task_notifier.notify`][pydatalab.task_events.TaskNotifier.notify], which
+wakes any request handler waiting on that task in the same process, so that the
+update can be pushed to the client immediately, either as a Server-Sent Event
+(see [`task_event_stream`][pydatalab.task_events.task_event_stream]) or as the
+response to a long-poll (see
+[`wait_for_task_update`][pydatalab.task_events.wait_for_task_update]).
+
+As a task may be run by a worker in a different process to the one serving the
+client, each process also runs a single [`TaskWatcher`][pydatalab.task_events.TaskWatcher]
+thread while any handler is waiting, which checks the status and number of
+stages of all waited-on tasks with one query every `FALLBACK_POLL_SECONDS` and
+notifies those that have changed; waiting handlers themselves only query their
+task when notified.
+
+Handlers waiting on a task hold their connection (and thread) open, so the
+server must be run with a threaded worker class (e.g., gunicorn's `gthread`, as
+in the provided Docker image); streams and long-polls are capped well below the
+default gunicorn worker timeout.
+
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from werkzeug.exceptions import BadRequest
+
+from pydatalab.logger import LOGGER
+from pydatalab.models.tasks import TaskStatus
+from pydatalab.utils import CustomJSONEncoder
+
+__all__ = (
+    "TaskNotifier",
+    "task_notifier",
+    "TaskWatcher",
+    "task_watcher",
+    "task_event_stream",
+    "wait_for_task_update",
+    "parse_long_poll_args",
+    "last_event_id",
+    "TASK_EVENT_STREAM_MIMETYPE",
+    "MAX_LONG_POLL_SECONDS",
+)
+
+TASK_EVENT_STREAM_MIMETYPE = "text/event-stream"
+
+FALLBACK_POLL_SECONDS = 2.0
+"""How often the `TaskWatcher` of each process re-checks the waited-on tasks, in
+case they are being run in another process."""
+
+HEARTBEAT_SECONDS = 15.0
+"""How often a comment is sent on an otherwise idle event stream, to stop proxies
+from closing the connection."""
+
+MAX_STREAM_SECONDS = 60.0
+"""The maximum duration of a single event stream; clients reconnect afterwards.
+Kept well below the gunicorn worker timeout."""
+
+MAX_LONG_POLL_SECONDS = 25.0
+"""The maximum time a status request may wait for an update."""
+
+RETRY_MILLISECONDS = 1000
+"""The reconnection delay requested from `EventSource` clients."""
+
+_FINISHED_STATUSES = (TaskStatus.READY, TaskStatus.ERROR)
+
+
+class TaskNotifier:
+    """Wakes threads waiting for updates to a given task.
+
+    Each task has a version number that is incremented by every call to
+    `notify`; waiters record the version before checking the task document and
+    then wait for it to change, so that no update made in between is missed.
+    Only the versions of the most recently notified tasks are kept.
+
+    Parameters:
+        max_tasks: The maximum number of task versions to keep track of.
+
+    """
+
+    def __init__(self, max_tasks: int = 10_000):
+        self.max_tasks = max_tasks
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._condition = threading.Condition()
+
+    def version(self, task_id: str) -> int:
+        """Return the current version of the given task."""
+        with self._condition:
+            return self._versions.get(task_id, 0)
+
+    def notify(self, task_id: str) -> None:
+        """Record an update to the given task and wake any threads waiting on it."""
+        with self._condition:
+            self._versions[task_id] = self._versions.pop(task_id, 0) + 1
+            while len(self._versions) > self.max_tasks:
+                self._versions.popitem(last=False)
+            self._condition.notify_all()
+
+    def wait(self, task_id: str, version: int, timeout: float) -> int:
+        """Block until the version of the given task differs from `version`, or
+        until `timeout` seconds have passed.
+
+        Returns:
+            The version of the task when the wait ended.
+
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._versions.get(task_id, 0) != version, timeout=timeout
+            )
+            return self._versions.get(task_id, 0)
+
+
+task_notifier = TaskNotifier()
+
+
+def _fetch_task_signatures(task_ids: list[str]) -> dict[str, tuple]:
+    from pydatalab.mongo import get_database
+
+    return {
+        doc["task_id"]: (doc.get("status"), doc.get("num_stages"))
+        for doc in get_database().tasks.find(
+            {"task_id": {"$in": task_ids}},
+            {
+                "_id": 0,
+                "task_id": 1,
+                "status": 1,
+                "num_stages": {"$size": {"$ifNull": ["$spec.stages", []]}},
+            },
+        )
+    }
+
+
+class TaskWatcher:
+    """Notifies the tasks waited on in this process when they are updated by another process.
+
+    While any task is being watched, a single background thread fetches the
+    status and number of stages of every watched task with one query every
+    `interval` seconds, and calls `notifier.notify` for each task whose values
+    changed (or that is seen for the first time), such that the cost of waiting
+    does not grow with the number of waiting handlers. The thread exits once no
+    task is watched.
+
+    Parameters:
+        notifier: The notifier to wake waiters through.
+        fetch: A callable returning a signature (e.g., status and number of stages)
+            for each of the given task IDs that exists.
+        interval: The time between two checks, in seconds.
+
+    """
+
+    def __init__(
+        self,
+        notifier: TaskNotifier,
+        fetch: Callable[[list[str]], dict[str, tuple]] = _fetch_task_signatures,
+        interval: float = FALLBACK_POLL_SECONDS,
+    ):
+        self.notifier = notifier
+        self.fetch = fetch
+        self.interval = interval
+        self._watched: Counter[str] = Counter()
+        self._signatures: dict[str, tuple | None] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def watch(self, task_id: str) -> Iterator[None]:
+        """Watch the given task for the duration of the context."""
+        with self._lock:
+            self._watched[task_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-watcher", daemon=True)
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._watched[task_id] -= 1
+                if self._watched[task_id] <= 0:
+                    del self._watched[task_id]
+                    self._signatures.pop(task_id, None)
+
+    def _check(self, task_ids: Iterable[str]) -> None:
+        task_ids = list(task_ids)
+        signatures = self.fetch(task_ids)
+        for task_id in task_ids:
+            signature = signatures.get(task_id)
+            if task_id not in self._signatures or self._signatures[task_id] != signature:
+                self._signatures[task_id] = signature
+                self.notifier.notify(task_id)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                task_ids = list(self._watched)
+                if not task_ids:
+                    self._thread = None
+                    self._signatures.clear()
+                    return
+            try:
+                self._check(task_ids)
+            except Exception as exc:
+                LOGGER.warning("Unable to check the status of tasks %s: %s", task_ids, exc)
+
+
+task_watcher = TaskWatcher(task_notifier)
+
+
+@contextmanager
+def _watching(watcher: TaskWatcher | None, task_id: str) -> Iterator[None]:
+    if watcher is None:
+        yield
+    else:
+        with watcher.watch(task_id):
+            yield
+
+
+def _has_progressed(task: dict | None, since: int) -> bool:
+    return (
+        task is None
+        or task["status"] in _FINISHED_STATUSES
+        or len((task.get("spec") or {}).get("stages") or []) > since
+    )
+
+
+def wait_for_task_update(
+    task_id: str,
+    load_task: Callable[[], dict | None],
+    since: int,
+    timeout: float,
+    watcher: TaskWatcher | None = None,
+) -> dict | None:
+    """Wait until a task has finished or has more than `since` processing stages,
+    re-checking it whenever the task is notified, for at most `timeout` seconds
+    (capped at `MAX_LONG_POLL_SECONDS`).
+
+    Parameters:
+        task_id: The ID of the task to wait on.
+        load_task: A callable returning the current task document, or `None` if
+            it does not exist (or is not accessible to the user).
+        since: The number of stages the client has already received.
+        timeout: The maximum time to wait, in seconds.
+        watcher: The watcher to register the task with, such that updates made by
+            other processes are also noticed (e.g., `task_watcher`).
+
+    Returns:
+        The last loaded task document.
+
+    """
+    notifier = watcher.notifier if watcher is not None else task_notifier
+    deadline = time.monotonic() + min(timeout, MAX_LONG_POLL_SECONDS)
+    with _watching(watcher, task_id):
+        while True:
+            version = notifier.version(task_id)
+            task = load_task()
+            remaining = deadline - time.monotonic()
+            if _has_progressed(task, since) or remaining <= 0:
+                return task
+            notifier.wait(task_id, version, remaining)
+
+
+def parse_long_poll_args(args) -> tuple[float, int]:
+    """Parse the `wait` (seconds) and `since` (number of stages already seen)
+    query parameters of a long-poll status request.
+
+    Returns:
+        A tuple of the time to wait (0 if not requested) and the number of stages seen.
+
+    """
+    try:
+        wait = float(args.get("wait", 0))
+        since = int(args.get("since", 0))
+    except ValueError:
+        raise BadRequest("`wait` and `since` must be numbers")
+    if not math.isfinite(wait):
+        raise BadRequest("`wait` must be a finite number of seconds")
+    return min(max(wait, 0.0), MAX_LONG_POLL_SECONDS), max(since, 0)
+
+
+def last_event_id(request) -> int:
+    """Return the number of stages already received by a reconnecting event stream
+    client, from its `Last-Event-ID` header or the `since` query parameter."""
+    value = request.headers.get("Last-Event-ID", request.args.get("since", "0"))
+    return int(value) if value.isdigit() else 0
+
+
+def _format_event(event: str, data: Any, event_id: int | None = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, cls=CustomJSONEncoder)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def task_event_stream(
+    task_id: str,
+    load_task: Callable[[], dict | None],
+    completion: Callable[[dict], dict],
+    since: int = 0,
+    max_seconds: float = MAX_STREAM_SECONDS,
+    watcher: TaskWatcher | None = None,
+) -> Iterator[str]:
+    """Generate the Server-Sent Events describing the progress of a task.
+
+    The stream consists of a `stage` event for every processing stage after the
+    first `since` (with the 1-based index of the stage as the event ID, so that
+    a reconnecting `EventSource` resumes via its `Last-Event-ID` header), a
+    `status` event whenever the status of the task changes and, once the task
+    has finished, a final `complete` event, after which the stream ends. If the
+    task cannot be found, a single `error` event is sent.
+
+    Parameters:
+        task_id: The ID of the task.
+        load_task: A callable returning the current task document, or `None` if
+            it does not exist (or is not accessible to the user).
+        completion: A callable returning the data of the `complete` event for
+            the finished task document (e.g., the URL of the results).
+        since: The number of stages the client has already received.
+        max_seconds: The maximum duration of the stream.
+        watcher: The watcher to register the task with, such that updates made by
+            other processes are also noticed (e.g., `task_watcher`).
+
+    """
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    with _watching(watcher, task_id):
+        notifier = watcher.notifier if watcher is not None else task_notifier
+        yield from _task_events(notifier, task_id, load_task, completion, since, max_seconds)
+
+
+def _task_events(
+    notifier: TaskNotifier,
+    task_id: str,
+    load_task: Callable[[], dict | None],
+    completion: Callable[[dict], dict],
+    since: int,
+    max_seconds: float,
+) -> Iterator[str]:
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    sent_stages = since
+    last_status = None
+
+    while True:
+        version = notifier.version(task_id)
+        task = load_task()
+        if task is None:
+            yield _format_event("error", {"status": "error", "message": "Task not found"})
+            return
+
+        stages = (task.get("spec") or {}).get("stages") or []
+        for index in range(sent_stages, len(stages)):
+            yield _format_event("stage", stages[index], event_id=index + 1)
+            last_sent = time.monotonic()
+        sent_stages = max(sent_stages, len(stages))
+
+        if task["status"] != last_status:
+            last_status = task["status"]
+            status = {"status": task["status"]}
+            for key in ("queue_depth", "wait_seconds", "started_at"):
+                if task.get(key) is not None:
+                    status[key] = task[key]
+            yield _format_event("status", status)
+            last_sent = time.monotonic()
+
+        if task["status"] in _FINISHED_STATUSES:
+            yield _format_event("complete", completion(task))
+            return
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+
+        timeout = min(HEARTBEAT_SECONDS, remaining)
+        if notifier.wait(task_id, version, timeout) == version:
+            if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
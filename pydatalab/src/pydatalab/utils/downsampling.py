@@ -0,0 +1,251 @@
+"""Feature-preserving downsampling of data series for plotting.
+
+Thinning a series with a fixed stride (as in
+[`reduce_df_size`][pydatalab.utils.reduce_df_size]) drops narrow peaks
+unless a large number of points is kept. The functions in this module instead
+select the indices of the points to keep from the NumPy arrays of the series,
+either with the Largest-Triangle-Three-Buckets (LTTB) algorithm, which keeps
+the points that best preserve the visual shape of the curve, or by keeping the
+minimum and maximum of each bucket of points, which guarantees that every
+extremum survives. Only the selected rows of a `DataFrame` are ever copied.
+
+"""
+
+from collections.abc import Sequence
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+__all__ = (
+    "DownsamplingMode",
+    "lttb_indices",
+    "minmax_indices",
+    "downsample_indices",
+    "downsample_df",
+    "select_x_window",
+)
+
+DownsamplingMode = Literal["lttb", "minmax"]
+
+
+def _finite_positions(*arrays: np.ndarray) -> np.ndarray | None:
+    """Return the positions at which all arrays are finite, or `None` if they all are."""
+    finite = np.ones(len(arrays[0]), dtype=bool)
+    for array in arrays:
+        finite &= np.isfinite(array)
+    return None if finite.all() else np.flatnonzero(finite)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Select the indices of at most `n_out` points of the series with the
+    Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. The remaining points are split
+    into `n_out - 2` buckets of consecutive points, and from each bucket the point
+    forming the largest triangle with the point kept from the previous bucket and
+    the average of the next bucket is kept. Points with non-finite coordinates
+    are never selected.
+
+    Parameters:
+        x: The x-values of the series.
+        y: The y-values of the series.
+        n_out: The maximum number of points to keep (at least 3).
+
+    Returns:
+        The sorted indices of the points to keep.
+
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    positions = _finite_positions(x, y)
+    if positions is not None:
+        return positions[lttb_indices(x[positions], y[positions], n_out)]
+
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError(f"LTTB requires at least 3 output points, not {n_out}")
+
+    # Bucket i spans edges[i]:edges[i + 1]; the first and last points are their own buckets
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(int)
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    # The average of each bucket, with the last point acting as the bucket after the last one
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int, group_starts: np.ndarray | None = None) -> np.ndarray:
+    """Select the indices of the first, last, minimum and maximum points of equally
+    sized buckets of consecutive points, such that at most `n_out` points are kept.
+
+    Parameters:
+        y: The values of the series.
+        n_out: The maximum number of points to keep (per group, if `group_starts` is given).
+        group_starts: Optionally, the boundaries of contiguous groups of points to
+            downsample independently (e.g., half cycles), as an array of length
+            `num_groups + 1` where group `i` spans `group_starts[i]:group_starts[i + 1]`.
+
+    Returns:
+        The sorted indices of the points to keep.
+
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if group_starts is None:
+        group_starts = np.array([0, n])
+    group_starts = np.asarray(group_starts, dtype=int)
+    lengths = np.diff(group_starts)
+
+    # Split every group into (up to) `n_buckets` buckets of consecutive points
+    n_buckets = max((n_out - 2) // 2, 1)
+    buckets_per_group = np.minimum(lengths, n_buckets)
+    group = np.repeat(np.arange(len(lengths)), buckets_per_group)
+    rank = np.arange(buckets_per_group.sum()) - np.repeat(
+        np.cumsum(buckets_per_group) - buckets_per_group, buckets_per_group
+    )
+    bucket_starts = group_starts[:-1][group] + rank * lengths[group] // buckets_per_group[group]
+    if not len(bucket_starts):
+        return np.arange(0)
+
+    # Sort the points by bucket and then by value, such that the first and last
+    # finite point of each bucket (in the sorted order) are its minimum and maximum
+    bucket = np.repeat(np.arange(len(bucket_starts)), np.diff(np.append(bucket_starts, n)))
+    finite = np.isfinite(y)
+    order = np.lexsort((y, ~finite, bucket))
+    finite_counts = np.bincount(bucket[finite], minlength=len(bucket_starts))
+    bucket_first = np.searchsorted(bucket[order], np.arange(len(bucket_starts)))
+    has_finite = finite_counts > 0
+    minima = order[bucket_first[has_finite]]
+    maxima = order[bucket_first[has_finite] + finite_counts[has_finite] - 1]
+
+    group_ends = group_starts[1:][lengths > 0] - 1
+    return np.unique(np.concatenate((group_starts[:-1][lengths > 0], minima, maxima, group_ends)))
+
+
+def downsample_indices(
+    x: np.ndarray | None,
+    ys: np.ndarray | Sequence[np.ndarray],
+    n_out: int,
+    mode: DownsamplingMode = "lttb",
+) -> np.ndarray:
+    """Select the indices of at most `n_out` points that preserve the features of
+    one or more series sharing the same x-values.
+
+    When several y-series are given (e.g., the different y-axes that can be selected
+    for a plot), the point budget is split evenly between them and the union of the
+    selected indices is returned.
+
+    Parameters:
+        x: The shared x-values, or `None` to use the position of each point.
+        ys: A single y-series or a sequence of them.
+        n_out: The maximum total number of points to keep.
+        mode: Either `"lttb"` (Largest-Triangle-Three-Buckets) or `"minmax"`
+            (minimum and maximum of each bucket).
+
+    Returns:
+        The sorted indices of the points to keep.
+
+    """
+    if isinstance(ys, np.ndarray) and ys.ndim == 1:
+        ys = [ys]
+    n = len(ys[0])
+    if n <= n_out:
+        return np.arange(n)
+
+    budget = max(n_out // len(ys), 3)
+    if x is None:
+        x = np.arange(n, dtype=float)
+
+    if mode == "lttb":
+        selections = [lttb_indices(x, y, budget) for y in ys]
+    elif mode == "minmax":
+        selections = [minmax_indices(y, budget) for y in ys]
+    else:
+        raise ValueError(f"Unknown downsampling mode {mode!r}, must be one of 'lttb' or 'minmax'")
+
+    return np.unique(np.concatenate(selections))
+
+
+def downsample_df(
+    df: pd.DataFrame,
+    n_out: int,
+    x: str | None = None,
+    y: str | Sequence[str] | None = None,
+    mode: DownsamplingMode = "lttb",
+) -> pd.DataFrame:
+    """Downsample a dataframe for plotting to at most `n_out` rows, preserving the
+    features of the given columns.
+
+    Parameters:
+        df: The dataframe to downsample.
+        n_out: The maximum number of rows to keep.
+        x: The column holding the x-values, or `None` to use the row positions.
+        y: The column(s) whose features should be preserved; defaults to all numeric
+            columns other than `x`.
+        mode: Either `"lttb"` or `"minmax"`, see
+            [`downsample_indices`][pydatalab.utils.downsampling.downsample_indices].
+
+    Returns:
+        The input dataframe if it already has at most `n_out` rows, otherwise a new
+        dataframe holding only the selected rows.
+
+    """
+    if len(df) <= n_out:
+        return df
+
+    if y is None:
+        y = [c for c in df.select_dtypes(include="number").columns if c != x]
+    elif isinstance(y, str):
+        y = [y]
+    if not y:
+        return df
+
+    x_values = None
+    if x is not None and pd.api.types.is_numeric_dtype(df[x]):
+        x_values = df[x].to_numpy(dtype=float)
+
+    indices = downsample_indices(
+        x_values, [df[column].to_numpy(dtype=float) for column in y], n_out, mode=mode
+    )
+    return df.take(indices)
+
+
+def select_x_window(df: pd.DataFrame, x: str, start: float, end: float) -> pd.DataFrame:
+    """Select the rows of a dataframe whose `x` values lie within the given window,
+    along with their immediate neighbours, such that lines drawn through the points
+    extend to the edges of the window.
+
+    Parameters:
+        df: The dataframe to select from.
+        x: The column holding the x-values.
+        start: One end of the window.
+        end: The other end of the window.
+
+    Returns:
+        A new dataframe holding only the selected rows.
+
+    """
+    lo, hi = sorted((start, end))
+    x_values = df[x].to_numpy(dtype=float)
+    inside = (x_values >= lo) & (x_values <= hi)
+    selected = inside.copy()
+    selected[:-1] |= inside[1:]
+    selected[1:] |= inside[:-1]
+    return df.take(np.flatnonzero(selected))
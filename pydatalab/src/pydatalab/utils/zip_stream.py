@@ -0,0 +1,362 @@
+"""An append-only zip archive writer for entries compressed ahead of time.
+
+The standard library `zipfile` compresses each entry as it is written, so entries
+can only be compressed one after the other, on the thread writing the archive.
+[`ZipStreamWriter`][pydatalab.utils.zip_stream.ZipStreamWriter] instead accepts
+entries that were already deflated elsewhere (e.g., by
+[`deflate_file`][pydatalab.utils.zip_stream.deflate_file] in a pool of threads),
+alongside entries stored as-is. It never seeks in its output, so the archive can
+be written to a pipe or a network response as it is produced. Archives larger
+than 4 GiB, or with more than 65535 entries, use the ZIP64 extensions.
+
+"""
+
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from typing import IO, NamedTuple
+
+__all__ = ("ZipStreamWriter", "DeflatedFile", "deflate_file")
+
+DEFLATE_LEVEL = 6
+"""The zlib compression level of deflated entries."""
+
+SPOOL_SIZE = 16 * 1024 * 1024
+"""Deflated data larger than this many bytes is spooled to a temporary file
+rather than held in memory until it is written to the archive."""
+
+BUFFER_SIZE = 1024 * 1024
+
+# Sizes, offsets and entry counts from these limits are recorded in the ZIP64
+# extensions, with the marker values in their place in the standard fields
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_ZIP64_MARKER = 0xFFFFFFFF
+_ZIP64_COUNT_MARKER = 0xFFFF
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+
+
+class DeflatedFile(NamedTuple):
+    """A file deflated ahead of being written to an archive."""
+
+    data: IO[bytes]
+    """The deflated data, positioned at its start."""
+
+    crc: int
+    """The CRC-32 of the uncompressed file."""
+
+    size: int
+    """The size of the uncompressed file in bytes."""
+
+    compressed_size: int
+    """The size of the deflated data in bytes."""
+
+
+def deflate_file(path: str | os.PathLike, level: int = DEFLATE_LEVEL) -> DeflatedFile:
+    """Deflate a file into a (spooled) temporary file, ready to be written to an
+    archive with [`ZipStreamWriter.write_deflated`][pydatalab.utils.zip_stream.ZipStreamWriter.write_deflated].
+
+    zlib releases the GIL while compressing, so several files can be deflated
+    concurrently in threads.
+
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)  # noqa: SIM115
+    crc = 0
+    size = 0
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(BUFFER_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                output.write(compressor.compress(chunk))
+        output.write(compressor.flush())
+    except BaseException:
+        output.close()
+        raise
+    compressed_size = output.tell()
+    output.seek(0)
+    return DeflatedFile(output, crc, size, compressed_size)  # type: ignore[arg-type]
+
+
+def _dos_date_time(timestamp: float | None) -> tuple[int, int]:
+    # As in `zipfile`, entries are dated in local time
+    t = time.localtime(timestamp)
+    # The DOS format cannot represent dates before 1980
+    if t.tm_year < 1980:
+        return (1 << 5 | 1, 0)
+    return (
+        (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday,
+        t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2,
+    )
+
+
+class _CentralRecord(NamedTuple):
+    name: bytes
+    flags: int
+    method: int
+    dos_date: int
+    dos_time: int
+    crc: int
+    size: int
+    compressed_size: int
+    offset: int
+
+
+class ZipStreamWriter:
+    """Writes a zip archive sequentially to a binary stream.
+
+    Entries whose contents are known up front (deflated files and in-memory
+    data) are written with their sizes and CRC in their local header; files
+    stored as-is are copied in a single pass, followed by a data descriptor.
+    Call [`close`][pydatalab.utils.zip_stream.ZipStreamWriter.close] to write the
+    central directory once all entries have been added.
+
+    Parameters:
+        output: The stream to write the archive to; it only needs a `write` method.
+
+    """
+
+    def __init__(self, output: IO[bytes]):
+        self.output = output
+        self.offset = 0
+        self._records: list[_CentralRecord] = []
+
+    def __enter__(self) -> "ZipStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+    def _write(self, data: bytes) -> None:
+        self.output.write(data)
+        self.offset += len(data)
+
+    def _write_local_header(
+        self,
+        arcname: str,
+        method: int,
+        timestamp: float | None,
+        crc: int,
+        size: int,
+        compressed_size: int,
+        flags: int = 0,
+        zip64: bool = False,
+    ) -> _CentralRecord:
+        try:
+            name = arcname.encode("ascii")
+        except UnicodeEncodeError:
+            name = arcname.encode("utf-8")
+            flags |= _FLAG_UTF8
+        dos_date, dos_time = _dos_date_time(timestamp)
+        record = _CentralRecord(
+            name, flags, method, dos_date, dos_time, crc, size, compressed_size, self.offset
+        )
+
+        extra = b""
+        header_sizes = (compressed_size, size)
+        if zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, size, compressed_size)
+            header_sizes = (_ZIP64_MARKER, _ZIP64_MARKER)
+        self._write(
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT,
+                flags,
+                method,
+                dos_time,
+                dos_date,
+                crc,
+                *header_sizes,
+                len(name),
+                len(extra),
+            )
+            + name
+            + extra
+        )
+        return record
+
+    def _copy(self, source: IO[bytes], crc: int | None = None) -> tuple[int, int]:
+        size = 0
+        while chunk := source.read(BUFFER_SIZE):
+            if crc is not None:
+                crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            self._write(chunk)
+        return size, crc or 0
+
+    def write_bytes(
+        self,
+        arcname: str,
+        data: bytes,
+        compress_type: int = zipfile.ZIP_DEFLATED,
+        timestamp: float | None = None,
+    ) -> None:
+        """Add an entry holding the given data, deflated unless `compress_type` is
+        `zipfile.ZIP_STORED`, with the given (or the current) modification time."""
+        crc = zlib.crc32(data)
+        size = len(data)
+        if compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+            data = compressor.compress(data) + compressor.flush()
+        elif compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Unsupported compression type {compress_type!r}")
+        zip64 = max(size, len(data)) >= _ZIP64_LIMIT
+        record = self._write_local_header(
+            arcname, compress_type, timestamp, crc, size, len(data), zip64=zip64
+        )
+        self._write(data)
+        self._records.append(record)
+
+    def write_deflated(
+        self, arcname: str, deflated: DeflatedFile, timestamp: float | None = None
+    ) -> None:
+        """Add an entry from data deflated ahead of time, e.g., by
+        [`deflate_file`][pydatalab.utils.zip_stream.deflate_file]."""
+        zip64 = max(deflated.size, deflated.compressed_size) >= _ZIP64_LIMIT
+        record = self._write_local_header(
+            arcname,
+            zipfile.ZIP_DEFLATED,
+            timestamp,
+            deflated.crc,
+            deflated.size,
+            deflated.compressed_size,
+            zip64=zip64,
+        )
+        written, _ = self._copy(deflated.data)
+        if written != deflated.compressed_size:
+            raise RuntimeError(
+                f"Expected {deflated.compressed_size} bytes of deflated data for {arcname!r}, got {written}"
+            )
+        self._records.append(record)
+
+    def write_file(
+        self, arcname: str, path: str | os.PathLike, timestamp: float | None = None
+    ) -> None:
+        """Add an entry storing the file at `path` as-is, reading it only once.
+
+        Parameters:
+            arcname: The name of the entry in the archive.
+            path: The file to store.
+            timestamp: The modification time of the entry; defaults to that of the file.
+
+        """
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if timestamp is None:
+                timestamp = stat.st_mtime
+            # Sizes are only known once the file has been copied, and the ZIP64
+            # extension must be declared up front for any file that may need it
+            # (allowing for live files that grow while being archived)
+            zip64 = stat.st_size >= _ZIP64_LIMIT // 2
+            record = self._write_local_header(
+                arcname,
+                zipfile.ZIP_STORED,
+                timestamp,
+                0,
+                0,
+                0,
+                flags=_FLAG_DATA_DESCRIPTOR,
+                zip64=zip64,
+            )
+            size, crc = self._copy(f, crc=0)
+
+        if size >= _ZIP64_LIMIT and not zip64:
+            raise RuntimeError(f"{path} grew beyond 4 GiB while being archived")
+        self._write(struct.pack("<IIQQ" if zip64 else "<IIII", 0x08074B50, crc, size, size))
+        self._records.append(record._replace(crc=crc, size=size, compressed_size=size))
+
+    def close(self) -> None:
+        """Write the central directory that completes the archive."""
+        start = self.offset
+        for record in self._records:
+            zip64_fields = []
+            size, compressed_size, offset = record.size, record.compressed_size, record.offset
+            if size >= _ZIP64_LIMIT:
+                zip64_fields.append(size)
+                size = _ZIP64_MARKER
+            if compressed_size >= _ZIP64_LIMIT:
+                zip64_fields.append(compressed_size)
+                compressed_size = _ZIP64_MARKER
+            if offset >= _ZIP64_LIMIT:
+                zip64_fields.append(offset)
+                offset = _ZIP64_MARKER
+            extra = b""
+            if zip64_fields:
+                extra = struct.pack(
+                    f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields
+                )
+            version = _VERSION_ZIP64 if zip64_fields else _VERSION_DEFAULT
+            self._write(
+                struct.pack(
+                    "<IHHHHHHIIIHHHHHII",
+                    0x02014B50,
+                    # Made by UNIX, such that the permissions in the external attributes apply
+                    3 << 8 | version,
+                    version,
+                    record.flags,
+                    record.method,
+                    record.dos_time,
+                    record.dos_date,
+                    record.crc,
+                    compressed_size,
+                    size,
+                    len(record.name),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    0o100644 << 16,
+                    offset,
+                )
+                + record.name
+                + extra
+            )
+
+        end = self.offset
+        count = len(self._records)
+        directory_size = end - start
+        zip64 = (
+            count >= _ZIP64_COUNT_LIMIT or start >= _ZIP64_LIMIT or directory_size >= _ZIP64_LIMIT
+        )
+        if zip64:
+            self._write(
+                struct.pack(
+                    "<IQHHIIQQQQ",
+                    0x06064B50,
+                    44,
+                    _VERSION_ZIP64,
+                    _VERSION_ZIP64,
+                    0,
+                    0,
+                    count,
+                    count,
+                    directory_size,
+                    start,
+                )
+            )
+            self._write(struct.pack("<IIQI", 0x07064B50, 0, end, 1))
+        self._write(
+            struct.pack(
+                "<IHHHHIIH",
+                0x06054B50,
+                0,
+                0,
+                _ZIP64_COUNT_MARKER if zip64 else count,
+                _ZIP64_COUNT_MARKER if zip64 else count,
+                _ZIP64_MARKER if zip64 else directory_size,
+                _ZIP64_MARKER if zip64 else start,
+                0,
+            )
+        )
+        self._records = []
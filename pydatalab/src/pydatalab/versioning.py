@@ -1,16 +1,62 @@
-"""Version control utilities for item versioning, for use in item routes."""
+"""Version control utilities for item versioning, for use in item routes.
+
+Version snapshots are not stored whole in `item_versions`. Each snapshot is
+split into chunks -- one per top-level field of the item, and one per block in
+its `blocks_obj` -- that are stored once in the `item_version_chunks`
+collection, keyed by the SHA-256 hash of their (canonically ordered) BSON
+encoding. A version document only holds the hashes of its chunks (`fields` and
+`blocks`), such that successive versions of an item share every chunk that did
+not change between them, along with a `content_hash` summarising the content
+fields of the item, against which new snapshots are compared to detect changes.
+Chunks are reference-counted by the versions using them and removed along with
+the last of those versions.
+
+The fields of blocks that are regenerated whenever a block is rendered (see
+`REGENERABLE_BLOCK_FIELDS`) are left out of snapshots altogether.
+
+Use [`expand_version`][pydatalab.versioning.expand_version] to reassemble the
+`data` of a version document; documents written before snapshots were chunked,
+which hold their `data` in full, are returned unchanged.
+
+Two versions are compared by [`diff_versions`][pydatalab.versioning.diff_versions],
+which only loads (and diffs) the chunks whose hashes differ between them, and
+keeps the most recent results in memory, as versions never change once saved.
 
-import datetime
+"""
 
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+import bson
+from deepdiff import DeepDiff
 from flask import request
 from flask_login import current_user
 from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.database import Database
 from werkzeug.exceptions import NotFound
 
+from pydatalab.block_outputs import BLOCK_OUTPUTS_FIELD, GENERATED_BLOCK_FIELDS
 from pydatalab.logger import LOGGER
 from pydatalab.models import ItemVersion
 from pydatalab.models.versions import VersionAction, VersionCounter
-from pydatalab.mongo import flask_mongo
+from pydatalab.mongo import ITEMS_SEARCH_NGRAMS_FIELD, flask_mongo
+
+VERSION_CHUNKS_COLLECTION = "item_version_chunks"
+"""The name of the MongoDB collection holding the content-addressed chunks of version snapshots."""
+
+REGENERABLE_BLOCK_FIELDS = (*GENERATED_BLOCK_FIELDS, BLOCK_OUTPUTS_FIELD)
+"""Fields of the blocks of an item that are regenerated from the block's inputs
+and files whenever it is rendered (or reference such outputs stored outside of the
+item), which are excluded from version snapshots (and from the detection of
+changes between them)."""
+
+VERSION_DIFF_CACHE_SIZE = 512
+"""The number of comparisons between versions kept in memory by each server process."""
 
 KNOWN_USER_AGENTS = ["Datalab Python API", "datalab-beholder", "datalab-cheminventory-plugin"]
 """User agents that are treated as special values for versioning purposes,
@@ -80,6 +126,385 @@ a change of ownership is recorded in an item's history like any other edit.
 """
 
 
+class Snapshot(NamedTuple):
+    """A version snapshot of an item, split into content-addressed chunks."""
+
+    fields: dict[str, str]
+    """The hash of the value of each top-level field of the item, other than `blocks_obj`."""
+
+    blocks: dict[str, str] | None
+    """The hash of each block in `blocks_obj`, by block ID, or `None` if the item has no
+    `blocks_obj` mapping."""
+
+    chunks: dict[str, Any]
+    """The value of each distinct chunk, by hash."""
+
+    content_hash: str
+    """A hash of the chunks of every field not in `MECHANICAL_FIELDS`, which is
+    equal for two snapshots if and only if their content is."""
+
+
+def _canonical(value: Any) -> Any:
+    """Return a copy of `value` with the keys of all (nested) mappings sorted, such
+    that equal values have the same BSON encoding."""
+    if isinstance(value, dict):
+        return {key: _canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def strip_regenerable_fields(data: dict) -> dict:
+    """Return a shallow copy of item data without the `REGENERABLE_BLOCK_FIELDS` of its blocks."""
+    blocks = data.get("blocks_obj")
+    if not isinstance(blocks, dict):
+        return data
+    return {
+        **data,
+        "blocks_obj": {
+            block_id: {k: v for k, v in block.items() if k not in REGENERABLE_BLOCK_FIELDS}
+            if isinstance(block, dict)
+            else block
+            for block_id, block in blocks.items()
+        },
+    }
+
+
+def make_snapshot(data: dict) -> Snapshot:
+    """Split item data (without its regenerable block fields) into a `Snapshot`."""
+    chunks: dict[str, Any] = {}
+
+    def add_chunk(value: Any) -> str:
+        value = _canonical(value)
+        chunk_hash = hashlib.sha256(bson.encode({"value": value})).hexdigest()
+        chunks[chunk_hash] = value
+        return chunk_hash
+
+    fields: dict[str, str] = {}
+    blocks: dict[str, str] | None = None
+    for key, value in data.items():
+        if key == "blocks_obj" and isinstance(value, dict):
+            blocks = {block_id: add_chunk(block) for block_id, block in value.items()}
+        else:
+            fields[key] = add_chunk(value)
+
+    content = hashlib.sha256()
+    for key in sorted(fields):
+        if key not in MECHANICAL_FIELDS:
+            content.update(f"{key}={fields[key]}\n".encode())
+    if blocks is not None:
+        content.update(b"blocks_obj\n")
+        for block_id in sorted(blocks):
+            content.update(f"blocks_obj.{block_id}={blocks[block_id]}\n".encode())
+
+    return Snapshot(fields, blocks, chunks, content.hexdigest())
+
+
+def _content_hash(version: dict) -> str:
+    """Return the content hash of a stored version, computing it for versions stored in full."""
+    if version.get("content_hash"):
+        return version["content_hash"]
+    return make_snapshot(strip_regenerable_fields(version.get("data") or {})).content_hash
+
+
+def _store_chunks(snapshot: Snapshot, db: Database) -> None:
+    if snapshot.chunks:
+        db[VERSION_CHUNKS_COLLECTION].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": chunk_hash},
+                    {"$setOnInsert": {"data": value}, "$inc": {"refs": 1}},
+                    upsert=True,
+                )
+                for chunk_hash, value in snapshot.chunks.items()
+            ],
+            ordered=False,
+        )
+
+
+def _release_chunks(hashes: list[str], db: Database) -> None:
+    """Drop one reference to each of the given chunks, deleting those no longer referenced."""
+    if hashes:
+        chunks = db[VERSION_CHUNKS_COLLECTION]
+        chunks.update_many({"_id": {"$in": hashes}}, {"$inc": {"refs": -1}})
+        chunks.delete_many({"_id": {"$in": hashes}, "refs": {"$lte": 0}})
+
+
+def _chunked_version(version_doc: dict, snapshot: Snapshot) -> dict:
+    version_doc = {k: v for k, v in version_doc.items() if k != "data"}
+    version_doc["fields"] = snapshot.fields
+    if snapshot.blocks is not None:
+        version_doc["blocks"] = snapshot.blocks
+    version_doc["content_hash"] = snapshot.content_hash
+    return version_doc
+
+
+def insert_version(version_doc: dict, snapshot: Snapshot, db: Database | None = None) -> None:
+    """Store a version document, replacing its `data` by the chunks of the given snapshot.
+
+    Parameters:
+        version_doc: The (validated) version document, with or without its `data`.
+        snapshot: The snapshot of the item data of the version.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+
+    # The chunks are stored first so that a version never references missing chunks,
+    # and their references are dropped again if the version cannot be inserted
+    _store_chunks(snapshot, db)
+    try:
+        db.item_versions.insert_one(_chunked_version(version_doc, snapshot))
+    except Exception:
+        _release_chunks(list(snapshot.chunks), db)
+        raise
+
+
+def _version_chunk_hashes(version: dict) -> set[str]:
+    return set((version.get("fields") or {}).values()) | set((version.get("blocks") or {}).values())
+
+
+def expand_version(version: dict, db: Database | None = None) -> dict:
+    """Return a version document with its `data` reassembled from its chunks (and
+    without the chunk hashes), or unchanged if it was stored in full.
+
+    Raises:
+        RuntimeError: If any of the chunks of the version is missing.
+
+    """
+    if "fields" not in version:
+        return version
+
+    if db is None:
+        db = flask_mongo.db
+
+    hashes = _version_chunk_hashes(version)
+    chunks = {
+        chunk["_id"]: chunk["data"]
+        for chunk in db[VERSION_CHUNKS_COLLECTION].find({"_id": {"$in": list(hashes)}})
+    }
+    if missing := hashes - chunks.keys():
+        raise RuntimeError(
+            f"Version {version.get('_id')} of {version.get('refcode')} is missing {len(missing)} chunks"
+        )
+
+    data = {key: chunks[chunk_hash] for key, chunk_hash in version["fields"].items()}
+    if version.get("blocks") is not None:
+        data["blocks_obj"] = {
+            block_id: chunks[chunk_hash] for block_id, chunk_hash in version["blocks"].items()
+        }
+
+    expanded = {k: v for k, v in version.items() if k not in ("fields", "blocks", "content_hash")}
+    expanded["data"] = data
+    return expanded
+
+
+def delete_version_snapshot(match: dict, db: Database | None = None) -> bool:
+    """Delete a version document matching the given query, and any of its chunks
+    that are not used by another version.
+
+    Returns:
+        Whether a version was deleted.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+
+    version = db.item_versions.find_one_and_delete(match, {"fields": 1, "blocks": 1})
+    if version is None:
+        return False
+    _diff_cache.discard(version["_id"])
+
+    _release_chunks(list(_version_chunk_hashes(version)), db)
+    return True
+
+
+class _VersionDiffCache:
+    """A thread-safe LRU cache of the differences between pairs of versions,
+    keyed by the refcode of the item and the IDs of both versions."""
+
+    def __init__(self, max_size: int = VERSION_DIFF_CACHE_SIZE):
+        self.max_size = max_size
+        self._diffs: OrderedDict[tuple[str, Any, Any], dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, Any, Any]) -> dict | None:
+        with self._lock:
+            diff = self._diffs.get(key)
+            if diff is not None:
+                self._diffs.move_to_end(key)
+            return diff
+
+    def put(self, key: tuple[str, Any, Any], diff: dict) -> None:
+        with self._lock:
+            self._diffs[key] = diff
+            self._diffs.move_to_end(key)
+            while len(self._diffs) > self.max_size:
+                self._diffs.popitem(last=False)
+
+    def discard(self, version_id: Any) -> None:
+        """Forget every comparison involving the given version."""
+        with self._lock:
+            for key in [key for key in self._diffs if version_id in key[1:]]:
+                del self._diffs[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._diffs.clear()
+
+
+_diff_cache = _VersionDiffCache()
+
+
+def _snapshot_hashes(
+    version: dict, db: Database
+) -> tuple[dict[str, str], dict[str, str] | None, dict[str, Any]]:
+    """Return the field hashes, block hashes and any chunks already in memory of a version,
+    loading and splitting the `data` of versions stored in full."""
+    if "fields" in version:
+        return version["fields"], version.get("blocks"), {}
+    data = version.get("data")
+    if data is None:
+        data = (db.item_versions.find_one({"_id": version["_id"]}, {"data": 1}) or {}).get(
+            "data"
+        ) or {}
+    snapshot = make_snapshot(strip_regenerable_fields(data))
+    return snapshot.fields, snapshot.blocks, snapshot.chunks
+
+
+def diff_versions(v1: dict, v2: dict, db: Database | None = None) -> dict:
+    """Compute the differences between the data of two versions of an item.
+
+    The chunk hashes of both versions are compared first, such that only the
+    top-level fields and blocks that differ are loaded and passed on to
+    `DeepDiff`. The result is identical to diffing the full snapshots, with paths
+    relative to the item data (e.g., `root['blocks_obj']['<block_id>']['title']`),
+    except that the `REGENERABLE_BLOCK_FIELDS` of blocks are never compared.
+
+    Parameters:
+        v1: The earlier version document, which needs at least its `_id`, `refcode`
+            and, for chunked versions, `fields` and `blocks`.
+        v2: The later version document, as for `v1`.
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Raises:
+        RuntimeError: If any of the chunks to compare is missing.
+
+    Returns:
+        The JSON-serializable `DeepDiff` result (at `verbose_level=2`), which is empty
+        if the versions have the same content.
+
+    """
+    key = (v1.get("refcode"), v1["_id"], v2["_id"])
+    diff = _diff_cache.get(key)
+    if diff is not None:
+        return diff
+
+    if db is None:
+        db = flask_mongo.db
+
+    fields1, blocks1, chunks = _snapshot_hashes(v1, db)
+    fields2, blocks2, chunks2 = _snapshot_hashes(v2, db)
+    chunks.update(chunks2)
+
+    # The hashes of the subtrees that differ, laid out as in the item data
+    changed1: dict[str, Any] = {}
+    changed2: dict[str, Any] = {}
+    for field in fields1.keys() | fields2.keys():
+        if fields1.get(field) != fields2.get(field):
+            if field in fields1:
+                changed1[field] = fields1[field]
+            if field in fields2:
+                changed2[field] = fields2[field]
+
+    if blocks1 is not None and blocks2 is not None:
+        changed_blocks = {
+            block_id
+            for block_id in blocks1.keys() | blocks2.keys()
+            if blocks1.get(block_id) != blocks2.get(block_id)
+        }
+        if changed_blocks:
+            changed1["blocks_obj"] = {b: blocks1[b] for b in changed_blocks if b in blocks1}
+            changed2["blocks_obj"] = {b: blocks2[b] for b in changed_blocks if b in blocks2}
+    elif blocks1 is not None:
+        changed1["blocks_obj"] = dict(blocks1)
+    elif blocks2 is not None:
+        changed2["blocks_obj"] = dict(blocks2)
+
+    def hashes(changed: dict) -> set[str]:
+        return {h for v in changed.values() for h in (v.values() if isinstance(v, dict) else [v])}
+
+    wanted = (hashes(changed1) | hashes(changed2)) - chunks.keys()
+    if wanted:
+        chunks.update(
+            (chunk["_id"], chunk["data"])
+            for chunk in db[VERSION_CHUNKS_COLLECTION].find({"_id": {"$in": list(wanted)}})
+        )
+        if missing := wanted - chunks.keys():
+            raise RuntimeError(f"{len(missing)} chunks of versions of {key[0]} are missing")
+
+    def resolve(changed: dict) -> dict:
+        return {
+            k: {b: chunks[h] for b, h in v.items()} if isinstance(v, dict) else chunks[v]
+            for k, v in changed.items()
+        }
+
+    deep_diff = DeepDiff(resolve(changed1), resolve(changed2), ignore_order=False, verbose_level=2)
+    diff = json.loads(deep_diff.to_json()) if deep_diff else {}
+    _diff_cache.put(key, diff)
+    return diff
+
+
+def restore_regenerable_fields(restored_data: dict, current_item: dict) -> dict:
+    """Copy the `REGENERABLE_BLOCK_FIELDS` of the current item's blocks onto those
+    blocks of restored data that are otherwise identical, such that restoring a
+    version keeps the rendered outputs of the blocks it does not change."""
+    restored_blocks = restored_data.get("blocks_obj")
+    current_blocks = current_item.get("blocks_obj")
+    if not isinstance(restored_blocks, dict) or not isinstance(current_blocks, dict):
+        return restored_data
+
+    for block_id, block in restored_blocks.items():
+        current_block = current_blocks.get(block_id)
+        if not isinstance(block, dict) or not isinstance(current_block, dict):
+            continue
+        stripped = {k: v for k, v in current_block.items() if k not in REGENERABLE_BLOCK_FIELDS}
+        if _canonical(stripped) == _canonical(block):
+            restored_blocks[block_id] = current_block
+
+    return restored_data
+
+
+def compact_version_snapshots(db: Database | None = None) -> int:
+    """Convert any versions stored with their full `data` into chunked snapshots.
+
+    Parameters:
+        db: The database to use, defaulting to that of the current Flask app.
+
+    Returns:
+        The number of versions converted.
+
+    """
+    if db is None:
+        db = flask_mongo.db
+
+    count = 0
+    for version in db.item_versions.find({"data": {"$exists": True}}):
+        snapshot = make_snapshot(strip_regenerable_fields(version["data"]))
+        _store_chunks(snapshot, db)
+        result = db.item_versions.replace_one(
+            {"_id": version["_id"], "data": {"$exists": True}}, _chunked_version(version, snapshot)
+        )
+        if result.matched_count:
+            count += 1
+        else:
+            # Converted by a concurrent compaction (or deleted) in the meantime, in
+            # which case the references taken above are not held by any version
+            _release_chunks(list(snapshot.chunks), db)
+    return count
+
+
 def get_next_version_number(refcode: str) -> int:
     """Atomically get and increment the version counter for an item.
 
@@ -148,23 +573,22 @@ def save_version_snapshot(
     if permission_filter:
         query.update(permission_filter)
 
-    item = flask_mongo.db.items.find_one(query)
+    # The search tokens are derived from the other fields, so are not part of the snapshot
+    item = flask_mongo.db.items.find_one(query, {ITEMS_SEARCH_NGRAMS_FIELD: 0})
     if not item:
         raise NotFound(f"Item {refcode} not found.")
 
-    # Skip creating a new version if content is identical to the last snapshot.
-    # Excludes fields that change mechanically on every save and don't reflect real edits.
+    item = strip_regenerable_fields(item)
+    snapshot = make_snapshot(item)
+
+    # Skip creating a new version if content is identical to the last snapshot, by
+    # comparing content hashes (which ignore the fields in `MECHANICAL_FIELDS`).
     last_version = flask_mongo.db.item_versions.find_one(
-        {"refcode": refcode}, sort=[("version", -1)]
+        {"refcode": refcode}, {"content_hash": 1, "data": 1}, sort=[("version", -1)]
     )
-    if last_version:
-        current_data = {k: v for k, v in item.items() if k not in MECHANICAL_FIELDS}
-        last_data = {k: v for k, v in last_version["data"].items() if k not in MECHANICAL_FIELDS}
-        if current_data == last_data:
-            LOGGER.debug(
-                "No changes detected for %s, skipping version save: %s", refcode, current_data
-            )
-            return {"status": "success", "message": "No changes detected, version not saved."}, 200
+    if last_version and _content_hash(last_version) == snapshot.content_hash:
+        LOGGER.debug("No changes detected for %s, skipping version save", refcode)
+        return {"status": "success", "message": "No changes detected, version not saved."}, 200
 
     # Extract user information for hybrid storage approach
     user_id = None
@@ -220,9 +644,9 @@ def save_version_snapshot(
     next_version_number = get_next_version_number(refcode)
 
     # Insert validated data (convert to dict and exclude None values)
-    version_doc = validated_version.dict(by_alias=True, exclude_none=True)
+    version_doc = validated_version.dict(by_alias=True, exclude_none=True, exclude={"data"})
     version_doc["version"] = next_version_number
-    flask_mongo.db.item_versions.insert_one(version_doc)
+    insert_version(version_doc, snapshot)
     return (
         {"status": "success", "message": "Version saved.", "version": next_version_number},
         200,
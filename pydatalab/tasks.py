@@ -126,6 +126,64 @@ def generate_schemas(_):
 dev.add_task(generate_schemas)
 
 
+@task(
+    help={
+        "cycles": "Comma-separated numbers of half cycles to benchmark.",
+        "points_per_cycle": "The number of raw data points in each half cycle.",
+        "num_samples": "The number of samples kept per half cycle by the reduction.",
+        "differential": "Whether to also benchmark the computation of dQ/dV.",
+    }
+)
+def benchmark_echem(
+    _,
+    cycles: str = "10,100,1000,5000",
+    points_per_cycle: int = 500,
+    num_samples: int = 100,
+    differential: bool = True,
+):
+    """This task times the echem reduction and differential utilities on synthetic
+    cycling data with an increasing number of half cycles, to check that they scale
+    linearly with the size of the data."""
+    import time
+
+    import numpy as np
+    import pandas as pd
+
+    from pydatalab.apps.echem.utils import compute_gpcl_differential, reduce_echem_cycle_sampling
+
+    def _timed(func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+    print(f"{'half cycles':>12} {'rows':>10} {'reduce (s)':>11} {'dQ/dV (s)':>10} {'µs/cycle':>9}")
+    for num_cycles in (int(n) for n in cycles.split(",")):
+        half_cycle = np.repeat(np.arange(1, num_cycles + 1), points_per_cycle)
+        ramp = np.tile(np.linspace(0, 1, points_per_cycle), num_cycles)
+        charging = half_cycle % 2 == 1
+        df = pd.DataFrame(
+            {
+                "half cycle": half_cycle,
+                "full cycle": (half_cycle + 1) // 2,
+                "capacity (mAh)": ramp,
+                "voltage (V)": np.where(charging, 2 + 1.8 * ramp**0.5, 3.8 - 1.8 * ramp**0.5),
+            }
+        )
+
+        reduced, reduce_time = _timed(reduce_echem_cycle_sampling, df, num_samples)
+        differential_time = float("nan")
+        if differential:
+            _, differential_time = _timed(compute_gpcl_differential, reduced)
+
+        per_cycle = 1e6 * (reduce_time + (differential_time if differential else 0)) / num_cycles
+        print(
+            f"{num_cycles:>12} {len(df):>10} {reduce_time:>11.3f} {differential_time:>10.3f} {per_cycle:>9.0f}"
+        )
+
+
+dev.add_task(benchmark_echem)
+
+
 @task(
     help={
         "host": "Host to bind",
@@ -285,6 +343,43 @@ def create_mongo_indices(_):
 admin.add_task(create_mongo_indices)
 
 
+@task
+def rebuild_item_summaries(_):
+    """This task recomputes the materialized item summaries used by the item list
+    endpoints, e.g., after items have been modified directly in the database."""
+    from pydatalab.mongo import get_database
+    from pydatalab.summaries import rebuild_item_summaries as rebuild
+
+    count = rebuild(db=get_database())
+    print(f"Rebuilt {count} item summaries")
+
+
+admin.add_task(rebuild_item_summaries)
+
+
+@task
+def check_query_plans(_):
+    """This task runs `explain()` on the query shapes used by the app and reports
+    any that would fall back to a full collection scan (COLLSCAN), e.g., due to a
+    missing index (see `invoke admin.create-mongo-indices`)."""
+    from pydatalab.mongo import explain_query_shapes
+
+    reports = explain_query_shapes()
+    for report in reports:
+        status = "COLLSCAN" if report["collscan"] else "ok"
+        indexes = ", ".join(report["indexes"]) or "-"
+        sort = f" sort={report['sort']}" if report["sort"] else ""
+        print(
+            f"[{status:>8}] {report['collection']}: {report['filter']}{sort} (indexes: {indexes})"
+        )
+
+    collscans = sum(report["collscan"] for report in reports)
+    print(f"{collscans} of {len(reports)} query shapes fall back to a collection scan.")
+
+
+admin.add_task(check_query_plans)
+
+
 @task
 def change_user_role(_, display_name: str, role: "UserRole"):
     """This task takes a user's name and gives them the desired role."""
@@ -412,20 +507,62 @@ admin.add_task(repair_files)
 def add_missing_refcodes(_):
     """Generates refcodes for any items that are missing them."""
     from pydatalab.models.utils import generate_unique_refcode
-    from pydatalab.mongo import get_database
+    from pydatalab.mongo import (
+        ITEMS_FTS_FIELDS,
+        ITEMS_SEARCH_NGRAMS_FIELD,
+        generate_search_ngrams,
+        get_database,
+    )
 
     db = get_database()
 
-    for item in db.items.find({"refcode": None}, projection={"refcode": 1, "_id": 1}):
+    for item in db.items.find(
+        {"refcode": None}, projection={"_id": 1, **{field: 1 for field in ITEMS_FTS_FIELDS}}
+    ):
         if item.get("refcode") is None:
             refcode = generate_unique_refcode()
             print(f"Assigning {item['_id']} with {refcode}")
-            db.items.update_one({"_id": item["_id"]}, {"$set": {"refcode": refcode}})
+            item["refcode"] = refcode
+            db.items.update_one(
+                {"_id": item["_id"]},
+                {
+                    "$set": {
+                        "refcode": refcode,
+                        ITEMS_SEARCH_NGRAMS_FIELD: generate_search_ngrams(item, ITEMS_FTS_FIELDS),
+                    }
+                },
+            )
 
 
 migration.add_task(add_missing_refcodes)
 
 
+@task
+def compact_version_snapshots(_):
+    """Converts item versions stored as full snapshots into deduplicated chunks."""
+    from pydatalab.mongo import get_database
+    from pydatalab.versioning import compact_version_snapshots as compact
+
+    count = compact(db=get_database())
+    print(f"Compacted {count} version snapshots")
+
+
+migration.add_task(compact_version_snapshots)
+
+
+@task
+def offload_block_outputs(_):
+    """Moves large generated block outputs stored within items into their own collection."""
+    from pydatalab.block_outputs import offload_inline_block_outputs
+    from pydatalab.mongo import get_database
+
+    count = offload_inline_block_outputs(db=get_database())
+    print(f"Moved the outputs of {count} blocks out of their items")
+
+
+migration.add_task(offload_block_outputs)
+
+
 def _check_id(id=None, base_url=None, api_key=None):
     from pydatalab.logger import setup_log
 
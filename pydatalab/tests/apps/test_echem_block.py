@@ -47,6 +47,31 @@ def test_reduce_size(echem_dataframe):
         assert reduced_df.shape[1] == echem_dataframe.shape[1]
 
 
+def test_reduce_size_matches_per_cycle_reduction(echem_dataframe):
+    """Checks the vectorised reduction against reducing each half cycle separately."""
+    import pandas as pd
+
+    from pydatalab.utils import reduce_df_size
+
+    shuffled_df = pd.DataFrame({"half cycle": [3, 3, 1, 2, 2, 2, 1, 5], "x": range(8)})
+    for df in (echem_dataframe, shuffled_df):
+        for size in (1, 2, 3, 100):
+            expected = pd.concat(
+                reduce_df_size(half_cycle, size, endpoint=True)
+                for _, half_cycle in df.groupby("half cycle")
+            )
+            pd.testing.assert_frame_equal(reduce_echem_cycle_sampling(df, size), expected)
+
+
+def test_reduce_size_minmax(echem_dataframe):
+    reduced_df = reduce_echem_cycle_sampling(echem_dataframe, 10, mode="minmax")
+    grouped = echem_dataframe.groupby("half cycle")["voltage (V)"]
+    reduced_grouped = reduced_df.groupby("half cycle")["voltage (V)"]
+    assert (reduced_grouped.size() <= 10).all()
+    assert (reduced_grouped.max() == grouped.max()).all()
+    assert (reduced_grouped.min() == grouped.min()).all()
+
+
 def test_compute_gpcl_differential(reduced_and_filtered_echem_dataframe):
     df = reduced_and_filtered_echem_dataframe
 
@@ -178,6 +203,131 @@ def test_load_and_cache_bdf_csv_source_caches_parquet_but_skips_csv(tmp_path):
     assert len(raw_df) > 0
 
 
+def test_load_live_file_incrementally(tmp_path, monkeypatch):
+    """Test that a growing .bdf.csv file parsed incrementally matches a full parse by navani
+    of its complete lines, and that rewriting the file resets the stored state."""
+    import pandas as pd
+    from navani import echem as ec
+
+    from pydatalab.apps.echem import incremental
+
+    monkeypatch.setattr(incremental, "MAX_PARTS", 2)
+    lines = BDF_CSV_FILE.read_bytes().splitlines(keepends=True)
+    live_path = tmp_path / "live.bdf.csv"
+    reference_path = tmp_path / "reference.bdf.csv"
+    cache_path = tmp_path / "live_cache"
+
+    for num_lines in (2, 50, 51, 400, 1000, 1500, len(lines) - 1, len(lines)):
+        partial_line = lines[num_lines][:10] if num_lines < len(lines) else b""
+        live_path.write_bytes(b"".join(lines[:num_lines]) + partial_line)
+        reference_path.write_bytes(b"".join(lines[:num_lines]))
+
+        raw_df = incremental.load_live_echem_file(live_path, ".bdf.csv", cache_path)
+        pd.testing.assert_frame_equal(raw_df, ec.echem_file_loader(str(reference_path)))
+
+    assert len(list(cache_path.glob("part-*.parquet"))) <= 2
+
+    rewritten = b"".join(lines[:100]).replace(b"3", b"4")
+    live_path.write_bytes(rewritten)
+    reference_path.write_bytes(rewritten)
+    raw_df = incremental.load_live_echem_file(live_path, ".bdf.csv", cache_path)
+    pd.testing.assert_frame_equal(raw_df, ec.echem_file_loader(str(reference_path)))
+
+
+def _live_echem_source(tmp_path, ext):
+    """Write the example .mpr data as a Biologic text export or a navani-processed CSV."""
+    import pandas as pd
+    from galvani import BioLogic
+    from navani import echem as ec
+
+    path = tmp_path / f"source{ext}"
+    if ext == ".csv":
+        ec.echem_file_loader(str(MPR_FILE)).to_csv(path, index=False)
+        return path
+
+    raw = pd.DataFrame(BioLogic.MPRfile(str(MPR_FILE)).data)
+    columns = ["Ns", "time/s", "Ewe/V", "I/mA", "Q charge/discharge/mA.h", "mode"]
+    body = raw[[column for column in columns if column in raw.columns]].to_csv(
+        sep="\t", index=False, lineterminator="\t\r\n"
+    )
+    header = "EC-Lab ASCII FILE\r\nNb header lines : 5\r\n\r\nSome meta : x\t\r\n"
+    path.write_text(header + body, encoding="latin1")
+    return path
+
+
+@pytest.mark.parametrize("ext", [".mpt", ".csv"])
+def test_load_live_text_file_incrementally(tmp_path, monkeypatch, ext):
+    """Test that growing Biologic text exports and navani CSV files parsed incrementally
+    match a full parse by navani of their complete lines."""
+    import pandas as pd
+    from navani import echem as ec
+
+    from pydatalab.apps.echem import incremental
+
+    monkeypatch.setattr(incremental, "MAX_PARTS", 3)
+    lines = _live_echem_source(tmp_path, ext).read_bytes().splitlines(keepends=True)
+    num_header_lines = 5 if ext == ".mpt" else 1
+    live_path = tmp_path / f"live{ext}"
+    reference_path = tmp_path / f"reference{ext}"
+    cache_path = tmp_path / "live_cache"
+
+    step = len(lines) // 12
+    for num_lines in [*range(num_header_lines + 1, len(lines), step), len(lines)]:
+        partial_line = lines[num_lines][:5] if num_lines < len(lines) else b""
+        live_path.write_bytes(b"".join(lines[:num_lines]) + partial_line)
+        reference_path.write_bytes(b"".join(lines[:num_lines]))
+
+        raw_df = incremental.load_live_echem_file(live_path, ext, cache_path)
+        pd.testing.assert_frame_equal(
+            raw_df, ec.echem_file_loader(str(reference_path)), check_dtype=False
+        )
+
+
+def test_load_live_file_concurrently(tmp_path, monkeypatch):
+    """Test that concurrent refreshes of a growing live file do not lose or duplicate rows."""
+    import threading
+    import time
+
+    import pandas as pd
+    from navani import echem as ec
+
+    from pydatalab.apps.echem import incremental
+
+    monkeypatch.setattr(incremental, "MAX_PARTS", 2)
+    lines = BDF_CSV_FILE.read_bytes().splitlines(keepends=True)
+    live_path = tmp_path / "live.bdf.csv"
+    cache_path = tmp_path / "live_cache"
+    live_path.write_bytes(b"".join(lines[:2]))
+
+    done = threading.Event()
+    errors = []
+
+    def refresh():
+        while not done.is_set():
+            try:
+                incremental.load_live_echem_file(live_path, ".bdf.csv", cache_path)
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    with open(live_path, "ab") as f:
+        for start in range(2, len(lines), 20):
+            f.write(b"".join(lines[start : start + 20]))
+            f.flush()
+            time.sleep(0.01)
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    pd.testing.assert_frame_equal(
+        incremental.load_live_echem_file(live_path, ".bdf.csv", cache_path),
+        ec.echem_file_loader(str(live_path)),
+    )
+
+
 def test_load_and_cache_multi_file_stitch(tmp_path):
     """Test that stitching an .mpr and a .bdf.csv produces a merged .bdf.csv and .bdf.parquet."""
     import shutil
@@ -211,6 +361,53 @@ def test_load_and_cache_multi_file_stitch(tmp_path):
     assert not cache_location.with_suffix(".RAW_PARSED.pkl").exists()
 
 
+def test_multi_file_stitch_only_parses_new_files(tmp_path, monkeypatch):
+    """Test that stitching parses each file on its own through the parse cache, such that
+    adding a file to those being stitched only parses the new file, and that the result
+    matches stitching by navani."""
+    import shutil
+
+    import pandas as pd
+    from navani import echem as ec
+
+    from pydatalab.apps.echem import blocks
+    from pydatalab.config import CONFIG
+
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_DIRECTORY", tmp_path / "cache")
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_MAX_SIZE_MB", 100)
+
+    block = CycleBlock(item_id="test")
+    file_infos = []
+    for index, source in enumerate(
+        (MPR_FILE, BDF_CSV_FILE, ECHEM_DATA_DIR / "jdb11-1_e1_s3_squidTest_data_C15.mpr")
+    ):
+        location = Path(shutil.copy(source, tmp_path / f"{index}_{source.name}"))
+        file_infos.append({"name": location.name, "location": str(location)})
+    locations = [Path(file_info["location"]) for file_info in file_infos]
+
+    # Parsed concurrently in the shared pool of worker processes, which are not forked
+    block._parse_each_echem_file(file_infos[:2])
+    pool = blocks._get_parse_pool()
+    assert pool._mp_context.get_start_method() != "fork"
+    assert blocks._get_parse_pool() is pool
+    assert not blocks._IN_FLIGHT_PARSES
+
+    parsed = []
+
+    def parse(location):
+        parsed.append(Path(location).name)
+        return ec.echem_file_loader(location)
+
+    monkeypatch.setattr(blocks, "_parse_echem_file", parse)
+    raw_df, _ = block._load_and_cache_echem(
+        tmp_path / "merged", None, None, reload=True, locations=locations, file_infos=file_infos
+    )
+
+    assert parsed == [locations[2].name]
+    expected = ec.multi_echem_file_loader([str(location) for location in locations])
+    pd.testing.assert_frame_equal(raw_df, expected)
+
+
 def test_save_bdf_build_failure_logs_warning_and_returns_none(tmp_path, caplog):
     """Test that _save_bdf returns None and logs a warning when build_bdf_df fails."""
     import logging
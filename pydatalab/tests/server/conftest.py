@@ -61,6 +61,8 @@ def app_config(secret_key, files_directory):
         "ROOT_PATH": "/",
         "SECRET_KEY": secret_key,
         "AUTO_ACTIVATE_ACCOUNTS": False,
+        # Fixtures insert items directly, so always check for missing summaries
+        "ITEM_SUMMARY_SYNC_INTERVAL": 0,
         "EMAIL_AUTO_ACTIVATE_ACCOUNTS": False,
         "EMAIL_AUTH_SMTP_SETTINGS": {
             "MAIL_SERVER": "smtp.example.com",
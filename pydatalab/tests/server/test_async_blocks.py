@@ -4,6 +4,7 @@ Tests the full async pipeline: task creation, status polling, GridFS
 transfer buffer, stage tracking, cleanup, and config-driven opt-in.
 """
 
+import gzip
 import json
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
@@ -250,6 +251,136 @@ class TestBlockTaskStatus:
         database.tasks.delete_one({"task_id": task_id})
         database.items.delete_one({"item_id": item_id})
 
+    def test_data_endpoint_streams_gridfs_data(self, client, user_id, database):
+        """With `inline=false`, the status endpoint should only point to the data
+        endpoint, which streams the stored (compressed) block data as-is and cleans it up."""
+        from pydatalab.mongo import get_database
+        from pydatalab.routes.v0_1.blocks import _store_block_data
+
+        task_id = "test-block-ready-data-endpoint"
+        item_id = "test_item_data_endpoint"
+        block_id = "test_block_data_endpoint"
+
+        database.items.insert_one(
+            {
+                "item_id": item_id,
+                "type": "samples",
+                "creator_ids": [user_id],
+                "blocks_obj": {block_id: {"blocktype": "comment", "block_id": block_id}},
+            }
+        )
+        task = Task(
+            task_id=task_id,
+            type=TaskType.BLOCK_PROCESSING,
+            creator_id=user_id,
+            status=TaskStatus.READY,
+            completed_at=datetime.now(tz=timezone.utc),
+            spec=BlockProcessingTaskSpec(item_id=item_id, block_id=block_id),
+        )
+        database.tasks.insert_one(task.dict())
+
+        column_data = {"x": list(range(100))}
+        _store_block_data(
+            task_id,
+            {
+                "blocktype": "comment",
+                "block_id": block_id,
+                "bokeh_plot_data": {
+                    "doc": {
+                        "roots": {
+                            "references": [
+                                {"type": "ColumnDataSource", "attributes": {"data": column_data}}
+                            ]
+                        }
+                    }
+                },
+            },
+        )
+
+        response = client.get(f"/blocks/{task_id}/status?inline=false")
+        assert response.status_code == 200
+        assert "block_data" not in response.json
+        assert response.json["block_data_url"] == f"/blocks/{task_id}/data"
+
+        response = client.get(response.json["block_data_url"], headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        block_data = json.loads(gzip.decompress(response.data))
+        assert block_data["blocktype"] == "comment"
+        # Numeric plot columns are stored as typed binary arrays
+        plot_column = block_data["bokeh_plot_data"]["doc"]["roots"]["references"][0]
+        assert plot_column["attributes"]["data"]["x"]["dtype"] == "int32"
+
+        bucket = gridfs.GridFSBucket(get_database(), bucket_name="block_data")
+        assert list(bucket.find({"filename": task_id})) == []
+        assert client.get(f"/blocks/{task_id}/data").status_code == 404
+
+        database.tasks.delete_one({"task_id": task_id})
+        database.items.delete_one({"item_id": item_id})
+
+    def test_events_and_long_poll(self, client, user_id, database):
+        """The events endpoint should stream the stages and completion of a task,
+        and a long-poll status request should return as soon as the task is notified."""
+        import threading
+
+        from pydatalab.task_events import task_notifier
+
+        task_id = "test-block-events"
+        item_id = "test_item_events"
+        block_id = "test_block_events"
+
+        database.items.insert_one(
+            {
+                "item_id": item_id,
+                "type": "samples",
+                "creator_ids": [user_id],
+                "blocks_obj": {block_id: {"blocktype": "comment", "block_id": block_id}},
+            }
+        )
+        task = Task(
+            task_id=task_id,
+            type=TaskType.BLOCK_PROCESSING,
+            creator_id=user_id,
+            status=TaskStatus.PROCESSING,
+            spec=BlockProcessingTaskSpec(
+                item_id=item_id,
+                block_id=block_id,
+                stages=[TaskStage(timestamp=datetime.now(tz=timezone.utc), message="Started")],
+            ),
+        )
+        database.tasks.insert_one(task.dict())
+
+        def finish():
+            database.tasks.update_one({"task_id": task_id}, {"$set": {"status": TaskStatus.READY}})
+            task_notifier.notify(task_id)
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        response = client.get(f"/blocks/{task_id}/status?inline=false&wait=20&since=1")
+        timer.join()
+        assert response.status_code == 200
+        assert response.json["status"] == "ready"
+        assert response.json["block_data_url"] == f"/blocks/{task_id}/data"
+
+        response = client.get(f"/blocks/{task_id}/events")
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        body = response.get_data(as_text=True)
+        assert "event: stage\nid: 1\n" in body
+        assert "event: complete" in body
+        assert f'"block_data_url": "/blocks/{task_id}/data"' in body
+
+        # A reconnecting client does not receive the stages it has already seen
+        body = client.get(f"/blocks/{task_id}/events", headers={"Last-Event-ID": "1"}).get_data(
+            as_text=True
+        )
+        assert "event: stage" not in body
+
+        assert client.get("/blocks/nonexistent-task-id/events").status_code == 404
+
+        database.tasks.delete_one({"task_id": task_id})
+        database.items.delete_one({"item_id": item_id})
+
     def test_status_ready_no_gridfs_data(self, client, user_id, database):
         """When a task is READY but the GridFS file is missing, block_data should be None."""
         task_id = "test-block-ready-no-gridfs"
@@ -449,7 +580,8 @@ class TestProcessBlockAsync:
 
         bucket = gridfs.GridFSBucket(get_database(), bucket_name="block_data")
         stream = bucket.open_download_stream_by_name(task_id)
-        gridfs_data = json.loads(stream.read())
+        assert stream.metadata["content_encoding"] == "gzip"
+        gridfs_data = json.loads(gzip.decompress(stream.read()))
         assert gridfs_data["blocktype"] == "comment"
 
         # Clean up
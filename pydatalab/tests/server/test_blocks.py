@@ -591,6 +591,249 @@ def test_xrd_block_lifecycle(admin_client, client, user_id, default_sample_dict,
     assert "peak_data" in block["computed"]
     assert block["wavelength"] == 1.5
 
+    # Zooming the plot re-renders it, but is not written to the database
+    response = admin_client.post(
+        "/update-block/",
+        json={
+            "block_data": {"block_id": block_id, "item_id": sample_id, "blocktype": "xrd"},
+            "event_data": {
+                "block_id": block_id,
+                "event_name": "set_plot_x_range",
+                "plot_x_range": {"axis": "2θ (°)", "start": 10, "end": 20},
+            },
+        },
+    )
+    assert response.status_code == 200
+    assert response.json["new_block_data"]["plot_x_range"]["start"] == 10.0
+
+    response = admin_client.get(f"/get-item-data/{sample_id}")
+    assert "plot_x_range" not in response.json["item_data"]["blocks_obj"][block_id]
+
+
+def test_block_render_cache(admin_client, default_sample_dict, example_data_dir, database):
+    from unittest.mock import patch
+
+    from pydatalab.apps.xrd import XRDBlock
+    from pydatalab.render_cache import RENDER_CACHE_COLLECTION
+
+    sample_id = "test_sample_with_cached_render"
+    sample_data = default_sample_dict.copy()
+    sample_data["item_id"] = sample_id
+    response = admin_client.post("/new-sample/", json=sample_data)
+    assert response.status_code == 201
+
+    response = admin_client.post(
+        "/add-data-block/", json={"block_type": "xrd", "item_id": sample_id, "index": 0}
+    )
+    assert response.status_code == 200
+    block_id = response.json["new_block_obj"]["block_id"]
+
+    example_file = example_data_dir / "XRD" / "cod_9004112.cif"
+    with open(example_file, "rb") as f:
+        response = admin_client.post(
+            "/upload-file/",
+            buffered=True,
+            content_type="multipart/form-data",
+            data={
+                "item_id": sample_id,
+                "file": [(f, example_file.name)],
+                "type": "application/octet-stream",
+                "replace_file": "null",
+                "relativePath": "null",
+            },
+        )
+    assert response.status_code == 201
+    file_id = response.json["file_id"]
+
+    block_data = admin_client.get(f"/get-item-data/{sample_id}").json["item_data"]["blocks_obj"][
+        block_id
+    ]
+    block_data["file_id"] = file_id
+
+    original_plot = XRDBlock.generate_xrd_plot
+    with patch.object(
+        XRDBlock, "generate_xrd_plot", autospec=True, side_effect=original_plot
+    ) as plot:
+        first = admin_client.post("/update-block/", json={"block_data": block_data})
+        assert first.status_code == 200
+        assert plot.call_count == 1
+
+        # Re-rendering an unchanged block, or the block as saved after rendering,
+        # is served from the cache
+        second = admin_client.post("/update-block/", json={"block_data": block_data})
+        assert plot.call_count == 1
+        assert (
+            second.json["new_block_data"]["bokeh_plot_data"]
+            == first.json["new_block_data"]["bokeh_plot_data"]
+        )
+        assert second.json["new_block_data"]["computed"] == first.json["new_block_data"]["computed"]
+
+        saved_block = admin_client.get(f"/get-item-data/{sample_id}").json["item_data"][
+            "blocks_obj"
+        ][block_id]
+        admin_client.post("/update-block/", json={"block_data": saved_block})
+        assert plot.call_count == 1
+
+        # Changing a user-controllable parameter re-renders the block
+        block_data["wavelength"] = 2.0
+        response = admin_client.post("/update-block/", json={"block_data": block_data})
+        assert response.json["new_block_data"]["wavelength"] == 2.0
+        assert plot.call_count == 2
+
+    assert database[RENDER_CACHE_COLLECTION].count_documents({"blocktype": "xrd"}) >= 2
+
+
+def test_cycle_block_render_cache_follows_comparison_files(
+    admin_client, default_sample_dict, example_data_dir
+):
+    from unittest.mock import patch
+
+    from pydatalab.apps.echem import CycleBlock
+
+    sample_id = "test_sample_with_cached_comparison"
+    sample_data = default_sample_dict.copy()
+    sample_data["item_id"] = sample_id
+    response = admin_client.post("/new-sample/", json=sample_data)
+    assert response.status_code == 201
+
+    response = admin_client.post(
+        "/add-data-block/", json={"block_type": "cycle", "item_id": sample_id, "index": 0}
+    )
+    assert response.status_code == 200
+    block_id = response.json["new_block_obj"]["block_id"]
+
+    example_files = sorted((example_data_dir / "echem").glob("*.mpr"))[:2]
+    file_ids = []
+    for example_file in example_files:
+        with open(example_file, "rb") as f:
+            response = admin_client.post(
+                "/upload-file/",
+                buffered=True,
+                content_type="multipart/form-data",
+                data={
+                    "item_id": sample_id,
+                    "file": [(f, example_file.name)],
+                    "type": "application/octet-stream",
+                    "replace_file": "null",
+                    "relativePath": "null",
+                },
+            )
+        assert response.status_code == 201
+        file_ids.append(response.json["file_id"])
+
+    block_data = admin_client.get(f"/get-item-data/{sample_id}").json["item_data"]["blocks_obj"][
+        block_id
+    ]
+    block_data["mode"] = "single"
+    block_data["file_ids"] = [file_ids[0]]
+    block_data["comparison_file_ids"] = [file_ids[1]]
+
+    original_plot = CycleBlock.plot_cycle
+    with patch.object(CycleBlock, "plot_cycle", autospec=True, side_effect=original_plot) as plot:
+        response = admin_client.post("/update-block/", json={"block_data": block_data})
+        assert response.status_code == 200
+        assert plot.call_count == 1
+
+        admin_client.post("/update-block/", json={"block_data": block_data})
+        assert plot.call_count == 1
+
+        # Replacing the content of the comparison file (keeping its ID) re-renders the block
+        with open(example_files[0], "rb") as f:
+            response = admin_client.post(
+                "/upload-file/",
+                buffered=True,
+                content_type="multipart/form-data",
+                data={
+                    "item_id": sample_id,
+                    "file": [(f, example_files[1].name)],
+                    "type": "application/octet-stream",
+                    "replace_file": file_ids[1],
+                    "relativePath": "null",
+                },
+            )
+        assert response.status_code == 201
+        assert response.json["file_id"] == file_ids[1]
+
+        response = admin_client.post("/update-block/", json={"block_data": block_data})
+        assert response.status_code == 200
+        assert plot.call_count == 2
+
+
+def test_block_outputs_stored_outside_item(
+    admin_client, default_sample_dict, example_data_dir, database, monkeypatch
+):
+    from pydatalab.block_outputs import (
+        BLOCK_OUTPUTS_COLLECTION,
+        BLOCK_OUTPUTS_FIELD,
+        cleanup_block_outputs,
+    )
+    from pydatalab.config import CONFIG
+
+    monkeypatch.setattr(CONFIG, "BLOCK_OUTPUTS_INLINE_SIZE", 0)
+
+    sample_id = "test_sample_with_stored_outputs"
+    sample_data = default_sample_dict.copy()
+    sample_data["item_id"] = sample_id
+    response = admin_client.post("/new-sample/", json=sample_data)
+    assert response.status_code == 201
+
+    response = admin_client.post(
+        "/add-data-block/", json={"block_type": "xrd", "item_id": sample_id, "index": 0}
+    )
+    assert response.status_code == 200
+    block_id = response.json["new_block_obj"]["block_id"]
+
+    example_file = example_data_dir / "XRD" / "cod_9004112.cif"
+    with open(example_file, "rb") as f:
+        response = admin_client.post(
+            "/upload-file/",
+            buffered=True,
+            content_type="multipart/form-data",
+            data={
+                "item_id": sample_id,
+                "file": [(f, example_file.name)],
+                "type": "application/octet-stream",
+                "replace_file": "null",
+                "relativePath": "null",
+            },
+        )
+    assert response.status_code == 201
+
+    block_data = admin_client.get(f"/get-item-data/{sample_id}").json["item_data"]["blocks_obj"][
+        block_id
+    ]
+    block_data["file_id"] = response.json["file_id"]
+    response = admin_client.post("/update-block/", json={"block_data": block_data})
+    assert "peak_data" in response.json["new_block_data"]["computed"]
+
+    # The item only holds a reference to the generated outputs
+    stored_block = database.items.find_one({"item_id": sample_id})["blocks_obj"][block_id]
+    assert "computed" not in stored_block
+    outputs = database[BLOCK_OUTPUTS_COLLECTION].find_one(
+        {"_id": stored_block[BLOCK_OUTPUTS_FIELD]}
+    )
+    assert "peak_data" in outputs["outputs"]["computed"]
+
+    # ...which is resolved when the item is loaded, and kept when it is saved again
+    item_data = admin_client.get(f"/get-item-data/{sample_id}").json["item_data"]
+    block = item_data["blocks_obj"][block_id]
+    assert BLOCK_OUTPUTS_FIELD not in block
+    assert block["computed"] == outputs["outputs"]["computed"]
+
+    response = admin_client.post("/save-item/", json={"item_id": sample_id, "data": item_data})
+    assert response.status_code == 200
+    stored_block = database.items.find_one({"item_id": sample_id})["blocks_obj"][block_id]
+    assert stored_block[BLOCK_OUTPUTS_FIELD] == outputs["_id"]
+
+    # Outputs are only removed once no block references them
+    assert cleanup_block_outputs(db=database) == 0
+    admin_client.post("/delete-block/", json={"item_id": sample_id, "block_id": block_id})
+    database[BLOCK_OUTPUTS_COLLECTION].update_one(
+        {"_id": outputs["_id"]},
+        {"$set": {"last_stored": datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)}},
+    )
+    assert cleanup_block_outputs(db=database) == 1
+
 
 def test_comment_block_manipulation(admin_client, default_sample_dict, database):
     """Create a test sample with a comment block and test it for
@@ -149,6 +149,36 @@ def test_get_export_status_error(client, user_id, database):
     database.tasks.delete_one({"task_id": task_id})
 
 
+def test_get_export_events(client, user_id, another_client, database):
+    task_id = "test-task-events"
+    task = Task(
+        type=TaskType.EXPORT,
+        task_id=task_id,
+        creator_id=user_id,
+        status=TaskStatus.ERROR,
+        error_message="Export failed",
+        completed_at=datetime.now(tz=timezone.utc),
+        spec=ExportTaskSpec(collection_id="test_collection", export_type="collection"),
+    )
+    database.tasks.insert_one(task.dict())
+
+    response = client.get(f"/exports/{task_id}/events")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    body = response.get_data(as_text=True)
+    assert "event: status" in body
+    assert "event: complete" in body
+    assert '"error_message": "Export failed"' in body
+
+    # Long-polling a finished task returns immediately
+    response = client.get(f"/exports/{task_id}/status?wait=20")
+    assert response.json["status"] == "error"
+
+    assert another_client.get(f"/exports/{task_id}/events").status_code == 404
+
+    database.tasks.delete_one({"task_id": task_id})
+
+
 def test_get_export_status_not_found(client):
     response = client.get("/exports/nonexistent-task/status")
     assert response.status_code == 404
@@ -259,6 +289,51 @@ def test_download_export_file_missing(client, user_id, database):
     database.tasks.delete_one({"task_id": task_id})
 
 
+def test_stream_exports(client, sample_collection, insert_default_sample):
+    import io
+    import zipfile
+
+    collection_id = sample_collection["collection_id"]
+    response = client.get(f"/collections/{collection_id}/export/stream")
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.eln+zip"
+    assert f'filename="{collection_id}.eln.zip"' in response.headers["Content-Disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == [f"{collection_id}/ro-crate-metadata.json"]
+
+    item_id = insert_default_sample.item_id
+    response = client.get(f"/items/{item_id}/export/stream")
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        root = insert_default_sample.refcode
+        assert f"{root}/{item_id}/metadata.json" in archive.namelist()
+        metadata = json.loads(archive.read(f"{root}/{item_id}/metadata.json"))
+        assert metadata["item_id"] == item_id
+
+    assert client.get("/collections/not_a_collection/export/stream").status_code == 404
+    assert client.get("/items/not_an_item/export/stream").status_code == 404
+
+
+def test_stream_exports_permissions(
+    client, unauthenticated_client, deactivated_client, insert_default_sample
+):
+    import io
+    import zipfile
+
+    item_id = insert_default_sample.item_id
+    for other_client in (unauthenticated_client, deactivated_client):
+        assert other_client.get(f"/items/{item_id}/export/stream").status_code == 401
+
+    # Related items that cannot be read are left out of the export
+    response = client.get(
+        f"/items/{item_id}/export/stream?related_item_ids=not_an_item&related_item_ids={item_id}"
+    )
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert not any("not_an_item" in name for name in archive.namelist())
+
+
 def test_do_export_success(database, sample_collection, insert_default_sample, user_id):
     from pydatalab.routes.v0_1.export import _do_export
 
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 
 import pytest
@@ -316,3 +317,174 @@ def test_upload_identical_file(client, default_filepath, insert_default_sample,
             },
         )
     assert response.status_code == 304
+
+
+def test_resumable_upload(client, default_filepath, insert_default_sample, default_sample):  # pylint: disable=unused-argument
+    """Test that a file uploaded in out-of-order chunks, with an interrupted and
+    resumed chunk, is attached to the item with the correct checksums."""
+    data = default_filepath.read_bytes()
+    response = client.post(
+        "/uploads/",
+        json={
+            "filename": default_filepath.name,
+            "size": len(data),
+            "item_id": default_sample.item_id,
+        },
+    )
+    assert response.status_code == 201
+    upload_url = response.json["upload_url"]
+    assert response.json["received"] == []
+
+    chunk = len(data) // 3
+    response = client.put(f"{upload_url}?offset={chunk}", data=data[chunk : 2 * chunk])
+    assert response.json["received"] == [[chunk, 2 * chunk]]
+    response = client.put(f"{upload_url}?offset=0", data=data[:chunk])
+    assert response.json["received"] == [[0, 2 * chunk]]
+
+    # Cannot finalize until every byte has been received
+    response = client.post(f"{upload_url}/finalize")
+    assert response.status_code == 409
+    assert client.get(upload_url).json["received"] == [[0, 2 * chunk]]
+
+    # Chunks must fit within the declared size
+    response = client.put(f"{upload_url}?offset={2 * chunk}", data=data[2 * chunk :] + b"extra")
+    assert response.status_code == 416
+
+    response = client.put(f"{upload_url}?offset={2 * chunk}", data=data[2 * chunk :])
+    assert response.json["received"] == [[0, len(data)]]
+
+    response = client.post(f"{upload_url}/finalize")
+    assert response.status_code == 201
+    file_information = response.json["file_information"]
+    assert file_information["size"] == len(data)
+    assert file_information["checksums"]["sha256"] == hashlib.sha256(data).hexdigest()
+
+    file_response = client.get(f"/files/{response.json['file_id']}/{default_filepath.name}")
+    assert file_response.data == data
+    file_response.close()
+
+    # The session is removed once finalized
+    assert client.get(upload_url).status_code == 404
+
+
+def test_resumable_upload_finalize_retry(
+    client, default_filepath, insert_default_sample, default_sample, monkeypatch
+):  # pylint: disable=unused-argument
+    """Test that a resumable upload is kept when saving it fails, such that
+    finalizing can be retried."""
+    import contextlib
+
+    from pydatalab import file_utils
+
+    data = default_filepath.read_bytes()
+    response = client.post(
+        "/uploads/",
+        json={
+            "filename": default_filepath.name,
+            "size": len(data),
+            "item_id": default_sample.item_id,
+        },
+    )
+    upload_url = response.json["upload_url"]
+    client.put(f"{upload_url}?offset=0", data=data)
+
+    def failing_save(*args, **kwargs):
+        raise OSError("Transient failure")
+
+    with monkeypatch.context() as m:
+        m.setattr(file_utils, "save_uploaded_file", failing_save)
+        with contextlib.suppress(OSError):
+            response = client.post(f"{upload_url}/finalize")
+            assert response.status_code >= 400
+
+    assert client.get(upload_url).json["received"] == [[0, len(data)]]
+
+    response = client.post(f"{upload_url}/finalize")
+    assert response.status_code == 201
+    file_response = client.get(f"/files/{response.json['file_id']}/{default_filepath.name}")
+    assert file_response.data == data
+    file_response.close()
+    assert client.get(upload_url).status_code == 404
+
+
+def test_get_file_conditional_and_ranges(
+    client, default_filepath, insert_default_sample, default_sample, monkeypatch
+):  # pylint: disable=unused-argument
+    """Test that downloads carry the SHA-256 of the file as a strong ETag, answer
+    `If-None-Match` with 304s, serve single and multiple byte ranges, and can be
+    handed off to nginx with `X-Accel-Redirect`."""
+    data = default_filepath.read_bytes()
+    with open(default_filepath, "rb") as f:
+        response = client.post(
+            "/upload-file/",
+            buffered=True,
+            content_type="multipart/form-data",
+            data={
+                "item_id": default_sample.item_id,
+                "file": [(f, default_filepath.name)],
+                "type": "application/octet-stream",
+                "replace_file": "null",
+                "relativePath": "null",
+            },
+        )
+    assert response.status_code == 201
+    url = f"/files/{response.json['file_id']}/{default_filepath.name}"
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{sha256}"'
+    assert response.data == data
+    response.close()
+
+    response = client.get(url, headers={"If-None-Match": f'"{sha256}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    response = client.get(url, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.data == data[10:20]
+    response.close()
+
+    response = client.get(url, headers={"Range": "bytes=0-4,8-9,2-6,-3"})
+    assert response.status_code == 206
+    assert response.mimetype == "multipart/byteranges"
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    boundary = response.mimetype_params["boundary"].encode()
+    parts = response.data.split(b"--" + boundary)[1:-1]
+    assert len(parts) == 3
+    assert [part.split(b"\r\n\r\n", 1)[1].removesuffix(b"\r\n") for part in parts] == [
+        data[0:7],
+        data[8:10],
+        data[-3:],
+    ]
+    assert f"Content-Range: bytes 0-6/{len(data)}".encode() in parts[0]
+
+    # A stale `If-Range` returns the whole file
+    response = client.get(url, headers={"Range": "bytes=0-4,8-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.data == data
+    response.close()
+
+    response = client.get(url, headers={"Range": f"bytes={len(data)}-,{len(data) + 5}-"})
+    assert response.status_code == 416
+
+    # A zero-length suffix range cannot be satisfied
+    response = client.get(url, headers={"Range": "bytes=-0"})
+    assert response.status_code == 416
+
+    # Offloading exports to nginx does not offload stored files
+    monkeypatch.setattr(CONFIG, "USE_X_ACCEL_REDIRECT", True)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "X-Accel-Redirect" not in response.headers
+    assert response.data == data
+    response.close()
+
+    monkeypatch.setattr(CONFIG, "USE_X_ACCEL_REDIRECT_FILES", True)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == b""
+    assert response.headers["X-Accel-Redirect"].endswith(url.removeprefix("/files"))
+    assert response.headers["X-Accel-Redirect"].startswith("/_protected_files/")
+    assert response.headers["ETag"] == f'"{sha256}"'
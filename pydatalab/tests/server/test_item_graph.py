@@ -153,3 +153,31 @@ def test_single_starting_material(admin_client, client):
     ).json
     assert len(admin_graph["nodes"]) == 4
     assert len(admin_graph["edges"]) == 3
+
+
+def test_item_graph_depth_and_node_budget(client, monkeypatch):
+    from pydatalab.routes.v0_1 import graphs
+
+    chain = ["depth-root", "depth-1", "depth-2", "depth-3"]
+    for parent_id, item_id in zip([None, *chain], chain):
+        sample = Sample(
+            item_id=item_id,
+            synthesis_constituents=[
+                {"item": {"item_id": parent_id, "type": "samples"}, "quantity": None}
+            ]
+            if parent_id
+            else [],
+        )
+        creation = client.post("/new-sample/", json={"new_sample_data": json.loads(sample.json())})
+        assert creation.status_code == 201
+
+    for depth, expected_nodes in ((1, 2), (2, 3), (3, 4), (100, 4)):
+        graph = client.get(f"/item-graph/depth-root?max_depth={depth}").json
+        assert {n["data"]["id"] for n in graph["nodes"]} == set(chain[:expected_nodes])
+        assert len(graph["edges"]) == expected_nodes - 1
+        assert not graph["truncated"]
+
+    monkeypatch.setattr(graphs, "MAX_GRAPH_NODES", 2)
+    graph = client.get("/item-graph/depth-root?max_depth=3").json
+    assert len(graph["nodes"]) == 2
+    assert graph["truncated"]
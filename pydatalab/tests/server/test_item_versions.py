@@ -913,6 +913,210 @@ class TestNoopVersionDeduplication:
         assert item["version"] == 2
 
 
+class TestChunkedSnapshots:
+    """Tests that version snapshots are stored as chunks shared between versions."""
+
+    def test_versions_share_unchanged_chunks(self, client, sample_with_version):
+        """Only the chunks of changed fields are stored again, regenerable block
+        fields are left out, and the full snapshot is reassembled when read."""
+        from pydatalab.mongo import flask_mongo
+        from pydatalab.versioning import VERSION_CHUNKS_COLLECTION
+
+        refcode = sample_with_version.refcode.split(":")[1]
+        full_refcode = sample_with_version.refcode
+        chunks = flask_mongo.db[VERSION_CHUNKS_COLLECTION]
+
+        block = {
+            "block_id": "b1",
+            "blocktype": "comment",
+            "freeform_comment": "A comment",
+            "bokeh_plot_data": {"data": list(range(100))},
+        }
+        flask_mongo.db.items.update_one(
+            {"refcode": full_refcode}, {"$set": {"blocks_obj": {"b1": block}}}
+        )
+        assert "version" in client.post(f"/items/{refcode}/save-version/").json
+
+        # A re-rendered plot is not a change to the item
+        flask_mongo.db.items.update_one(
+            {"refcode": full_refcode},
+            {"$set": {"blocks_obj.b1.bokeh_plot_data": {"data": [1, 2, 3]}}},
+        )
+        assert "version" not in client.post(f"/items/{refcode}/save-version/").json
+
+        flask_mongo.db.items.update_one(
+            {"refcode": full_refcode}, {"$set": {"description": "New description"}}
+        )
+        assert "version" in client.post(f"/items/{refcode}/save-version/").json
+
+        v1, v2 = flask_mongo.db.item_versions.find({"refcode": full_refcode}).sort("version", 1)
+        assert "data" not in v1 and "data" not in v2
+        assert {key for key in v1["fields"] if v1["fields"][key] != v2["fields"][key]} == {
+            "description"
+        }
+        assert v1["blocks"] == v2["blocks"]
+        block_chunk = chunks.find_one({"_id": v1["blocks"]["b1"]})
+        assert block_chunk["refs"] == 2
+        assert "bokeh_plot_data" not in block_chunk["data"]
+
+        version = client.get(f"/items/{refcode}/versions/{v1['_id']}/").json["version"]
+        assert version["data"]["description"] == "Initial description"
+        assert version["data"]["blocks_obj"]["b1"]["freeform_comment"] == "A comment"
+        assert "fields" not in version and "content_hash" not in version
+
+        diff = client.get(f"/items/{refcode}/compare-versions/?v1={v1['_id']}&v2={v2['_id']}").json[
+            "diff"
+        ]
+        assert list(diff["values_changed"]) == ["root['description']"]
+
+        # Chunks are removed along with the last version using them
+        assert client.delete(f"/items/{refcode}/versions/{v1['_id']}/").status_code == 200
+        assert chunks.find_one({"_id": v1["blocks"]["b1"]})["refs"] == 1
+        assert chunks.find_one({"_id": v1["fields"]["description"]}) is None
+        assert client.delete(f"/items/{refcode}/versions/{v2['_id']}/").status_code == 200
+        assert chunks.count_documents({"_id": {"$in": list(v2["fields"].values())}}) == 0
+
+    def test_full_snapshots_are_still_read_and_compacted(self, client, sample_with_version):
+        """Versions stored in full before snapshots were chunked can still be read,
+        are compared against by content, and can be converted to chunks."""
+        from unittest.mock import patch
+
+        from pymongo.collection import Collection
+        from pymongo.errors import DuplicateKeyError
+
+        from pydatalab.mongo import flask_mongo
+        from pydatalab.versioning import (
+            VERSION_CHUNKS_COLLECTION,
+            compact_version_snapshots,
+            insert_version,
+            make_snapshot,
+            strip_regenerable_fields,
+        )
+
+        refcode = sample_with_version.refcode.split(":")[1]
+        full_refcode = sample_with_version.refcode
+        item = flask_mongo.db.items.find_one({"refcode": full_refcode})
+
+        version_id = flask_mongo.db.item_versions.insert_one(
+            {
+                "refcode": full_refcode,
+                "version": 1,
+                "timestamp": datetime.datetime.now(tz=datetime.timezone.utc),
+                "action": "manual_save",
+                "datalab_version": "0.0.0",
+                "data": item,
+            }
+        ).inserted_id
+
+        assert "version" not in client.post(f"/items/{refcode}/save-version/").json
+
+        version = client.get(f"/items/{refcode}/versions/{version_id}/").json["version"]
+        assert version["data"]["name"] == "Version Test Sample"
+
+        listed = client.get(f"/items/{refcode}/versions/").json["versions"]
+        assert listed[0]["data"]["version"] == item["version"]
+
+        full_version = flask_mongo.db.item_versions.find_one({"_id": version_id})
+        assert compact_version_snapshots(db=flask_mongo.db) == 1
+        compacted = flask_mongo.db.item_versions.find_one({"_id": version_id})
+        assert "data" not in compacted and compacted["fields"]
+        version = client.get(f"/items/{refcode}/versions/{version_id}/").json["version"]
+        assert version["data"]["name"] == "Version Test Sample"
+
+        # The item version is still listed once only its chunk hash is stored
+        listed = client.get(f"/items/{refcode}/versions/").json["versions"]
+        assert listed[0]["data"]["version"] == item["version"]
+
+        # A compaction that lost the race to convert a version releases its chunk references
+        chunks = flask_mongo.db[VERSION_CHUNKS_COLLECTION]
+        refs = {
+            c["_id"]: c["refs"]
+            for c in chunks.find({"_id": {"$in": list(compacted["fields"].values())}})
+        }
+        find = Collection.find
+
+        def stale_find(collection, filter=None, *args, **kwargs):
+            if filter == {"data": {"$exists": True}}:
+                return [full_version]
+            return find(collection, filter, *args, **kwargs)
+
+        with patch.object(Collection, "find", stale_find):
+            assert compact_version_snapshots(db=flask_mongo.db) == 0
+        assert refs == {c["_id"]: c["refs"] for c in chunks.find({"_id": {"$in": list(refs)}})}
+
+        # ...as does a version that cannot be inserted
+        snapshot = make_snapshot(strip_regenerable_fields(full_version["data"]))
+        with pytest.raises(DuplicateKeyError):
+            insert_version(compacted, snapshot, db=flask_mongo.db)
+        assert refs == {c["_id"]: c["refs"] for c in chunks.find({"_id": {"$in": list(refs)}})}
+
+    def test_compare_only_loads_changed_chunks(self, client, sample_with_version):
+        """Versions are diffed on the chunks that differ between them, with the same
+        result as diffing their full data, and the result is cached."""
+        import json
+        from unittest.mock import patch
+
+        from deepdiff import DeepDiff
+
+        from pydatalab.mongo import flask_mongo
+        from pydatalab.versioning import _diff_cache, diff_versions, expand_version
+
+        refcode = sample_with_version.refcode.split(":")[1]
+        full_refcode = sample_with_version.refcode
+
+        flask_mongo.db.items.update_one(
+            {"refcode": full_refcode},
+            {
+                "$set": {
+                    "blocks_obj": {
+                        "b1": {"block_id": "b1", "blocktype": "comment", "title": "One"},
+                        "b2": {"block_id": "b2", "blocktype": "comment", "title": "Two"},
+                    }
+                }
+            },
+        )
+        assert "version" in client.post(f"/items/{refcode}/save-version/").json
+        flask_mongo.db.items.update_one(
+            {"refcode": full_refcode},
+            {
+                "$set": {"blocks_obj.b2.title": "Changed", "description": "New description"},
+                "$unset": {"blocks_obj.b1": ""},
+            },
+        )
+        assert "version" in client.post(f"/items/{refcode}/save-version/").json
+
+        v1, v2 = flask_mongo.db.item_versions.find({"refcode": full_refcode}).sort("version", 1)
+        expected = json.loads(
+            DeepDiff(
+                expand_version(v1)["data"],
+                expand_version(v2)["data"],
+                ignore_order=False,
+                verbose_level=2,
+            ).to_json()
+        )
+        assert "root['blocks_obj']['b1']" in expected["dictionary_item_removed"]
+        assert "root['blocks_obj']['b2']['title']" in expected["values_changed"]
+
+        _diff_cache.clear()
+        with patch("pydatalab.versioning.DeepDiff", wraps=DeepDiff) as deep_diff:
+            assert diff_versions(v1, v2) == expected
+            compared = deep_diff.call_args.args[0]
+            assert set(compared) == {"description", "blocks_obj"}
+            assert set(compared["blocks_obj"]) == {"b1", "b2"}
+
+            response = client.get(
+                f"/items/{refcode}/compare-versions/?v1={v1['_id']}&v2={v2['_id']}"
+            )
+            assert response.status_code == 200
+            assert response.json["diff"] == expected
+            assert deep_diff.call_count == 1
+
+        assert diff_versions(v1, v1) == {}
+
+        assert client.delete(f"/items/{refcode}/versions/{v1['_id']}/").status_code == 200
+        assert _diff_cache.get((full_refcode, v1["_id"], v2["_id"])) is None
+
+
 class TestVersionCounter:
     """Tests for atomic version counter functionality."""
 
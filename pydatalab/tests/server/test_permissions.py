@@ -851,3 +851,23 @@ def test_copy_from_collection_shared_item_is_allowed(client, another_client, gro
     assert response.status_code == 201, response.json
     assert response.json["status"] == "success"
     assert response.json["sample_list_entry"]["description"] == source_description
+
+
+def test_default_permissions_memoized_per_request(app):
+    """Repeated permission checks within a request should reuse the same filter,
+    without exposing the cached copy to mutation by callers."""
+    from flask import g
+
+    from pydatalab.permissions import get_default_permissions, invalidate_permissions_cache
+
+    with app.test_request_context("/samples/"):
+        permissions = get_default_permissions(user_only=False)
+        permissions["mutated"] = True
+        assert "mutated" not in get_default_permissions(user_only=False)
+        assert len(g.permissions_cache) == 1
+
+        get_default_permissions(user_only=True)
+        assert len(g.permissions_cache) == 2
+
+        invalidate_permissions_cache()
+        assert "permissions_cache" not in g
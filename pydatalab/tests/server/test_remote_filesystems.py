@@ -1,25 +1,15 @@
 import datetime
-import subprocess as sp
 import time
 from pathlib import Path
 
-import pytest
-
+import pydatalab.mongo
 from pydatalab.config import CONFIG, RemoteFilesystem
 from pydatalab.remote_filesystems import (
     get_directory_structure,
     get_directory_structures,
 )
 
-"""The Unix `tree` utility is required for many of these tests,
-this variable checks whether it is installed locally."""
-TREE_AVAILABLE = False
-_ = sp.call("tree -v", shell=True)  # noqa: S602,S607
-if _ == 0:
-    TREE_AVAILABLE = True
-
 
-@pytest.mark.skipif(not TREE_AVAILABLE, reason="`tree` utility not installed locally")
 def test_get_directory_structure_local(random_string):
     """Check that the file directory cache is used on the second
     attempt to query a directory.
@@ -74,7 +64,6 @@ def test_get_directory_structure_local(random_string):
     assert get_directory_structures([], invalidate_cache=True) == []
 
 
-@pytest.mark.skipif(not TREE_AVAILABLE, reason="`tree` utility not installed locally")
 def test_get_missing_directory_structure_local(random_string):
     """Check that missing directories do not crash everything, and that
     they still get cached.
@@ -91,7 +80,6 @@ def test_get_missing_directory_structure_local(random_string):
     assert last_updated_cached
 
 
-@pytest.mark.skipif(not TREE_AVAILABLE, reason="`tree` utility not installed locally")
 def test_get_directory_structure_remote(real_mongo_client, random_string):
     """Check that a fake ssh server initially fails, then successfully returns
     once the cache has been mocked.
@@ -137,3 +125,80 @@ def test_scp_escape_spaces():
         _escape_spaces_scp_path(r"ssh://host:path_without_spaces")
         == r"ssh://host:path_without_spaces"
     )
+
+
+def test_incremental_directory_index(client, tmp_path, random_string, monkeypatch):
+    """Check that updating the index of a remote only re-lists the directories
+    that have changed, and that single subtrees can be listed through the API."""
+    from pydatalab.remote_filesystems import REMOTE_DIRECTORIES_COLLECTION, update_directory_index
+
+    (tmp_path / "run 1" / "cycles").mkdir(parents=True)
+    (tmp_path / "run 2").mkdir()
+    (tmp_path / "run 1" / "cell.mpr").write_bytes(b"0" * 10)
+    (tmp_path / "run 1" / "cycles" / "cycle_1.csv").write_text("1")
+    (tmp_path / ".hidden").mkdir()
+    test_dir = RemoteFilesystem(name=random_string, path=tmp_path)
+    monkeypatch.setattr(CONFIG, "REMOTE_FILESYSTEMS", [test_dir])
+
+    dir_structure = get_directory_structure(test_dir)
+    assert dir_structure["status"] == "updated"
+    assert [entry["name"] for entry in dir_structure["contents"]] == ["run 1", "run 2"]
+    run_1 = dir_structure["contents"][0]
+    assert [entry["name"] for entry in run_1["contents"]] == ["cell.mpr", "cycles"]
+    assert run_1["contents"][0]["relative_path"] == r"/run\ 1/"
+    assert run_1["contents"][0]["size"] == 10
+
+    collection = pydatalab.mongo.get_database()[REMOTE_DIRECTORIES_COLLECTION]
+    scanned_at = {
+        doc["path"]: doc["scanned_at"] for doc in collection.find({"remote": random_string})
+    }
+    assert set(scanned_at) == {"", "run 1", "run 1/cycles", "run 2"}
+
+    time.sleep(0.01)
+    (tmp_path / "run 1" / "cycles" / "cycle_2.csv").write_text("2")
+    (tmp_path / "run 2").rmdir()
+    update_directory_index(test_dir)
+    rescanned = {
+        doc["path"]
+        for doc in collection.find({"remote": random_string})
+        if doc["scanned_at"] != scanned_at[doc["path"]]
+    }
+    assert rescanned == {"", "run 1/cycles"}
+    assert collection.count_documents({"remote": random_string, "path": "run 2"}) == 0
+
+    # Files modified in place are only picked up by re-listing every directory,
+    # or once their directory's listing is older than the re-list age
+    def indexed_size():
+        listing = collection.find_one({"remote": random_string, "path": "run 1"})
+        return next(entry["size"] for entry in listing["entries"] if entry["name"] == "cell.mpr")
+
+    (tmp_path / "run 1" / "cell.mpr").write_bytes(b"0" * 20)
+    update_directory_index(test_dir)
+    assert indexed_size() == 10
+    update_directory_index(test_dir, relist_all=True)
+    assert indexed_size() == 20
+
+    (tmp_path / "run 1" / "cell.mpr").write_bytes(b"0" * 30)
+    monkeypatch.setattr(CONFIG, "REMOTE_CACHE_RELIST_AGE", 0)
+    update_directory_index(test_dir)
+    assert indexed_size() == 30
+
+    response = client.get(f"/remotes/{random_string}", query_string={"path": r"run\ 1", "depth": 1})
+    assert response.status_code == 200
+    subtree = response.json["data"]
+    assert subtree["name"] == "run 1"
+    assert [entry["name"] for entry in subtree["contents"]] == ["cell.mpr", "cycles"]
+    assert "contents" not in subtree["contents"][1]
+
+    response = client.get(f"/remotes/{random_string}", query_string={"path": "run 1", "depth": 2})
+    assert [entry["name"] for entry in response.json["data"]["contents"][1]["contents"]] == [
+        "cycle_1.csv",
+        "cycle_2.csv",
+    ]
+
+    assert (
+        client.get(f"/remotes/{random_string}", query_string={"path": "../.."}).status_code == 400
+    )
+    assert (
+        client.get(f"/remotes/{random_string}", query_string={"path": "missing"}).status_code == 404
+    )
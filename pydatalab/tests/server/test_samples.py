@@ -3,6 +3,7 @@ import datetime
 import json
 
 import pytest
+from bson import ObjectId
 
 from pydatalab.models import Sample
 from pydatalab.models.relationships import RelationshipType, TypedRelationship
@@ -199,6 +200,45 @@ def test_last_modified_backfilled_from_object_id(client, database, default_sampl
     assert summary["last_modified"] is not None
 
 
+@pytest.mark.dependency(depends=["test_new_sample"])
+def test_sample_summary_follows_updates(client, database, default_sample_dict):
+    item_id = default_sample_dict["item_id"]
+    updated_sample = copy.deepcopy(default_sample_dict)
+    updated_sample["name"] = "Renamed summary sample"
+    response = client.post("/save-item/", json={"item_id": item_id, "data": updated_sample})
+    assert response.status_code == 200, response.json
+
+    response = client.get("/samples/")
+    assert response.status_code == 200, response.json
+    summary = next(d for d in response.json["samples"] if d["item_id"] == item_id)
+    assert summary["name"] == "Renamed summary sample"
+
+    response = client.post(
+        "/add-data-block/",
+        json={"block_type": "comment", "item_id": item_id, "index": 0},
+    )
+    assert response.status_code == 200, response.json
+
+    response = client.get("/samples/")
+    summary = next(d for d in response.json["samples"] if d["item_id"] == item_id)
+    assert summary["nblocks"] == 1
+    assert summary["blocks"][0]["blocktype"] == "comment"
+
+    # Summaries removed outside of the API are recreated on the next read
+    database.item_summaries.delete_many({"item_id": item_id})
+    response = client.get("/samples/")
+    assert item_id in {d["item_id"] for d in response.json["samples"]}
+
+    # ...and summaries of items deleted outside of the API are removed
+    orphan_id = ObjectId()
+    database.item_summaries.insert_one(
+        {"_id": orphan_id, "item_id": "orphaned-summary", "type": "samples"}
+    )
+    response = client.get("/samples/")
+    assert "orphaned-summary" not in {d["item_id"] for d in response.json["samples"]}
+    assert database.item_summaries.find_one({"_id": orphan_id}) is None
+
+
 @pytest.mark.dependency(depends=["test_new_sample"])
 def test_save_bad_sample(client, default_sample_dict):
     updated_sample = default_sample_dict.copy()
@@ -243,6 +283,18 @@ def test_create_indices(real_mongo_client):
     assert all(name in names for name in expected_index_names)
 
 
+@pytest.mark.dependency(depends=["test_create_indices"])
+def test_query_shapes_use_indexes(real_mongo_client):
+    from pydatalab.mongo import explain_query_shapes
+
+    if real_mongo_client is None:
+        pytest.skip("Skipping query plan tests, not connected to real MongoDB")
+
+    reports = explain_query_shapes(real_mongo_client)
+    assert reports
+    assert [report for report in reports if report["collscan"]] == []
+
+
 @pytest.mark.parametrize(
     "query,expected_result_ids",
     [
@@ -597,6 +649,38 @@ def test_create_multiple_samples(client, complicated_sample):
     )
 
 
+@pytest.mark.dependency(depends=["test_create_multiple_samples"])
+def test_paginated_samples(client):
+    response = client.get("/samples/")
+    assert response.status_code == 200, response.json
+    all_item_ids = [d["item_id"] for d in response.json["samples"]]
+    assert len(all_item_ids) > 2
+
+    paged_item_ids = []
+    cursor = None
+    while True:
+        response = client.get(
+            "/samples/", query_string={"limit": 2, **({"cursor": cursor} if cursor else {})}
+        )
+        assert response.status_code == 200, response.json
+        assert len(response.json["samples"]) <= 2
+        paged_item_ids += [d["item_id"] for d in response.json["samples"]]
+        cursor = response.json["next_cursor"]
+        if not cursor:
+            break
+
+    assert paged_item_ids == all_item_ids
+
+    response = client.get("/samples/", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.data.decode().splitlines()
+    assert [json.loads(line)["item_id"] for line in lines] == all_item_ids
+
+    response = client.get("/samples/", query_string={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
 @pytest.mark.dependency(depends=["test_create_multiple_samples"])
 def test_create_cell(client, default_cell):
     response = client.post("/new-sample/", json=json.loads(default_cell.json()))
@@ -73,3 +73,89 @@ def test_collection_regex_search(query, should_find, real_mongo_client, client,
         )
 
     client.delete(f"/collections/{test_collection['collection_id']}")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "v",
+        "van",
+        "oxid",
+        "vanadium oxide",
+        "oxide vanadium",
+        "vanadium(",
+        "anadium",
+        "dium",
+        "NaNiO2",
+        "grey:TEST4",
+        "-x",
+        "é",
+        "café",
+        "o2",
+    ],
+)
+def test_ngram_search_filter_is_superset_of_regex_search(query):
+    """Check that the precomputed search tokens never exclude an item that the
+    heuristic regex search would have matched.
+    """
+    import re
+
+    from pydatalab.mongo import (
+        generate_heuristic_regex_search,
+        generate_ngram_search_filter,
+        generate_search_ngrams,
+    )
+
+    fields = {"name", "description", "refcode"}
+    docs = [
+        {"name": "Vanadium oxide", "description": "A magic material", "refcode": "grey:TEST4"},
+        {"name": "NaNiO2", "description": "made in a-x glovebox", "refcode": "grey:TEST5"},
+        {"name": "Café au lait", "description": None, "refcode": "grey:TEST6"},
+        {"name": "sample", "description": "vanadium(III) o2", "refcode": "grey:TEST7"},
+    ]
+
+    match_obj = generate_heuristic_regex_search(query, fields)
+    ngram_filter = generate_ngram_search_filter(query, "search_ngrams")
+    assert ngram_filter is not None
+    tokens = set(ngram_filter["$or"][0]["search_ngrams"]["$all"])
+
+    for doc in docs:
+        regex_match = any(
+            all(
+                isinstance(doc.get(field), str)
+                and re.search(clause[field]["$regex"], doc[field], re.IGNORECASE)
+                for clause in or_clause["$and"]
+                for field in clause
+            )
+            for or_clause in match_obj["$or"]
+        )
+        if regex_match:
+            assert tokens <= set(generate_search_ngrams(doc, fields)), (
+                f"Tokens for {query=} exclude matching document {doc}"
+            )
+
+
+def test_search_ngrams_refreshed_with_summaries(database):
+    """Check that the search tokens follow updates made outside of `/save-item/`,
+    via the refresh of the item summaries that every write path makes."""
+    from pydatalab.mongo import (
+        ITEMS_FTS_FIELDS,
+        ITEMS_SEARCH_NGRAMS_FIELD,
+        generate_search_ngrams,
+    )
+    from pydatalab.summaries import ITEM_SUMMARIES_COLLECTION, refresh_item_summaries
+
+    item_id = "test_ngram_refresh"
+    database.items.insert_one({"item_id": item_id, "type": "samples", "name": "Old name"})
+    try:
+        refresh_item_summaries({"item_id": item_id}, db=database)
+        database.items.update_one({"item_id": item_id}, {"$set": {"name": "Vanadium oxide"}})
+        refresh_item_summaries({"item_id": item_id}, db=database)
+
+        item = database.items.find_one({"item_id": item_id})
+        assert item[ITEMS_SEARCH_NGRAMS_FIELD] == generate_search_ngrams(item, ITEMS_FTS_FIELDS)
+        assert "nad" in item[ITEMS_SEARCH_NGRAMS_FIELD]
+        assert "old" not in item[ITEMS_SEARCH_NGRAMS_FIELD]
+    finally:
+        database.items.delete_one({"item_id": item_id})
+        database[ITEM_SUMMARIES_COLLECTION].delete_many({"item_id": item_id})
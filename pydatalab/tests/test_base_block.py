@@ -1,4 +1,8 @@
-from pydatalab.blocks.base import DataBlock, generate_js_callback_single_float_parameter
+from pydatalab.blocks.base import (
+    DataBlock,
+    generate_js_callback_single_float_parameter,
+    generate_js_callback_x_range,
+)
 
 
 def test_base_block():
@@ -26,3 +30,32 @@ def test_callback():
 });
 document.dispatchEvent(block_event);"""
     )
+
+
+def test_set_plot_x_range():
+    block = DataBlock(item_id="test-id")
+    assert block.is_view_event({"event_name": "set_plot_x_range", "plot_x_range": None})
+    assert not block.is_view_event(
+        [{"event_name": "set_plot_x_range"}, {"event_name": "null_event", "kwargs": {}}]
+    )
+    assert not block.is_view_event(None)
+    block.process_events(
+        {"event_name": "set_plot_x_range", "plot_x_range": {"axis": "x", "start": "1", "end": 2}}
+    )
+    assert block.data["plot_x_range"] == {"axis": "x", "start": 1.0, "end": 2.0}
+    assert block._plot_x_range_kwargs()["x_window"] == block.data["plot_x_range"]
+
+    block.process_events({"event_name": "set_plot_x_range", "plot_x_range": {"start": 1, "end": 1}})
+    assert block.data["errors"]
+    assert block.data["plot_x_range"] == {"axis": "x", "start": 1.0, "end": 2.0}
+
+    block.process_events({"event_name": "set_plot_x_range", "plot_x_range": None})
+    assert "plot_x_range" not in block.data
+
+
+def test_x_range_callback():
+    callback = generate_js_callback_x_range("set_plot_x_range", "plot_x_range", block_id="test")
+    assert "block_id: 'test'" in callback
+    assert "event_name: 'set_plot_x_range'" in callback
+    assert "plot_x_range: x_range" in callback
+    assert "$" not in callback
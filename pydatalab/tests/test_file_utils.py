@@ -0,0 +1,126 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from pydatalab.file_utils import compute_file_hashes_and_sizes, copy_and_hash_file
+
+
+@pytest.fixture
+def payload():
+    # Spans several copy buffers, with a partial final chunk
+    return bytes(range(256)) * (70_000)
+
+
+def _spooled(data: bytes, max_size: int):
+    stream = tempfile.SpooledTemporaryFile(max_size=max_size, mode="rb+")
+    stream.write(data)
+    stream.seek(0)
+    return stream
+
+
+@pytest.mark.parametrize(
+    "make_source",
+    [
+        lambda data, path: str(path),
+        lambda data, path: io.BytesIO(data),
+        lambda data, path: FileStorage(_spooled(data, max_size=len(data) + 1), "upload.bin"),
+        lambda data, path: FileStorage(_spooled(data, max_size=1024), "upload.bin"),
+    ],
+    ids=["path", "bytesio", "spooled-in-memory", "spooled-on-disk"],
+)
+def test_copy_and_hash_file(tmp_path, payload, make_source):
+    source_path = tmp_path / "source.bin"
+    source_path.write_bytes(payload)
+    destination = tmp_path / "copies" / "copy.bin"
+    destination.parent.mkdir()
+
+    hashes, size = copy_and_hash_file(make_source(payload, source_path), destination)
+
+    assert destination.read_bytes() == payload
+    assert size == len(payload)
+    assert hashes == {
+        "md5": hashlib.md5(payload).hexdigest(),  # noqa: S324
+        "sha256": hashlib.sha256(payload).hexdigest(),
+    }
+    assert (hashes, size) == compute_file_hashes_and_sizes(source_path)
+    # Only the destination file is left behind
+    assert [p.name for p in destination.parent.iterdir()] == ["copy.bin"]
+
+
+def test_copy_and_hash_file_failure_leaves_destination(tmp_path):
+    destination = tmp_path / "copy.bin"
+    destination.write_bytes(b"old version")
+
+    class BrokenStream(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            raise OSError("connection reset")
+
+    with pytest.raises(OSError, match="connection reset"):
+        copy_and_hash_file(BrokenStream(), destination)
+
+    assert destination.read_bytes() == b"old version"
+    assert [p.name for p in tmp_path.iterdir()] == ["copy.bin"]
+
+
+def test_received_ranges_are_merged():
+    from pydatalab.resumable_uploads import received_ranges
+
+    session = {"received": [[10, 20], [0, 5], [5, 10], [30, 40], [35, 38], [50, 50]]}
+    assert received_ranges(session) == [[0, 20], [30, 40]]
+    assert received_ranges({"received": []}) == []
+
+
+@pytest.fixture
+def fake_ssh(tmp_path, monkeypatch):
+    """An `ssh` executable that runs the remote command locally, logging each command."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "ssh.log"
+    ssh = bin_dir / "ssh"
+    ssh.write_text(
+        "#!/bin/sh\n"
+        'while [ "$1" = "-o" ]; do shift 2; done\n'
+        "shift\n"
+        f'echo "$*" >> "{log}"\n'
+        'exec sh -c "$*"\n'
+    )
+    ssh.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+    return log
+
+
+def test_remote_sync_transfers_appended_bytes(tmp_path, payload, fake_ssh):
+    from pydatalab.remote_sync import fetch_remote_file, stat_remote_files
+
+    remote_file = tmp_path / "remote dir" / "cycler output.mpr"
+    remote_file.parent.mkdir()
+    remote_file.write_bytes(payload)
+    remote_path = f"ssh://fake.host:{remote_file}".replace(" ", r"\ ")
+    local_file = tmp_path / "local.mpr"
+
+    stats = stat_remote_files("fake.host", [str(remote_file), str(tmp_path / "missing")])
+    assert stats[str(remote_file)].size == len(payload)
+    assert stats[str(tmp_path / "missing")] is None
+
+    assert fetch_remote_file(remote_path, local_file) == compute_file_hashes_and_sizes(remote_file)
+
+    # Only the appended bytes are sent once the file grows
+    with open(remote_file, "ab") as f:
+        f.write(b"new cycle" * 1000)
+    fake_ssh.write_text("")
+    assert fetch_remote_file(remote_path, local_file) == compute_file_hashes_and_sizes(remote_file)
+    assert local_file.read_bytes() == remote_file.read_bytes()
+    assert "cat" not in fake_ssh.read_text()
+
+    # The whole file is sent again if it was rewritten
+    remote_file.write_bytes(payload[::-1])
+    assert fetch_remote_file(remote_path, local_file) == compute_file_hashes_and_sizes(remote_file)
+    assert local_file.read_bytes() == payload[::-1]
+    assert "cat" in fake_ssh.read_text()
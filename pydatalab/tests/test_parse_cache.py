@@ -0,0 +1,144 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pydatalab.config import CONFIG
+from pydatalab.parse_cache import cached_parse, clear_parse_cache, is_parse_cached
+
+
+@pytest.fixture
+def parse_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_DIRECTORY", cache_dir)
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_MAX_SIZE_MB", 1)
+    return cache_dir
+
+
+def _write(path, content):
+    path.write_text(content)
+    return {"location": str(path)}
+
+
+def test_cached_parse_is_content_addressed(parse_cache_dir, tmp_path):
+    calls = []
+
+    def parse():
+        calls.append(1)
+        warnings.warn("odd header")
+        # Mixed-type object columns (as produced by navani) must round-trip exactly
+        df = pd.DataFrame({"x": [1.0, 2.0], "y": [3.0, 4.0], "state": ["R", 0]})
+        df.attrs["header"] = "# data"
+        return df, {"y_options": ["y"], "peaks": (1, 2)}
+
+    first = _write(tmp_path / "a.xy", "1 3\n2 4\n")
+    # The same content under a different name should hit the same entry
+    copy = _write(tmp_path / "b.xy", "1 3\n2 4\n")
+
+    assert not is_parse_cached(first, "test.parser")
+    with pytest.warns(UserWarning, match="odd header"):
+        df, meta = cached_parse(first, "test.parser", parse)
+    assert is_parse_cached(copy, "test.parser")
+    assert not is_parse_cached(copy, "test.parser", version="2")
+    with pytest.warns(UserWarning, match="odd header"):
+        cached_df, cached_meta = cached_parse(copy, "test.parser", parse)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(df, cached_df)
+    assert cached_df.attrs == {"header": "# data"}
+    assert cached_meta == {"y_options": ["y"], "peaks": [1, 2]}
+
+    # A stored checksum is trusted over the file on disk
+    with pytest.warns(UserWarning):
+        cached_parse({**first, "checksums": {"sha256": "0" * 64}}, "test.parser", parse)
+    assert len(calls) == 2
+
+    # Changing the file content, parser version or options all miss the cache
+    changed = _write(tmp_path / "a.xy", "1 5\n2 6\n")
+    with pytest.warns(UserWarning):
+        cached_parse(changed, "test.parser", parse)
+        cached_parse(changed, "test.parser", parse, version="2")
+        cached_parse(changed, "test.parser", parse, options={"wavelength": 1.5})
+    assert len(calls) == 5
+
+    assert clear_parse_cache() == 5
+    assert not list(parse_cache_dir.glob("*/*.parquet"))
+
+
+def test_cached_parse_evicts_least_recently_used(parse_cache_dir, tmp_path, monkeypatch):
+    def parse():
+        # ~400 kB per entry, so that only two fit in the 1 MB cache
+        return pd.DataFrame({"x": np.random.default_rng(0).random(50_000)})
+
+    files = [_write(tmp_path / f"{i}.txt", str(i)) for i in range(3)]
+    cached_parse(files[0], "test.parser", parse)
+    cached_parse(files[1], "test.parser", parse)
+    assert len(list(parse_cache_dir.glob("*/*.parquet"))) == 2
+
+    cached_parse(files[2], "test.parser", parse)
+    assert len(list(parse_cache_dir.glob("*/*.parquet"))) == 2
+
+    calls = []
+
+    def counting_parse():
+        calls.append(1)
+        return parse()
+
+    # The most recent entry survived eviction
+    cached_parse(files[2], "test.parser", counting_parse)
+    assert not calls
+
+    # An entry evicted by another process after it was read is still a hit
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr("pydatalab.parse_cache.os.utime", evicted)
+    cached_parse(files[2], "test.parser", counting_parse)
+    assert not calls
+
+
+def test_cached_parse_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_DIRECTORY", tmp_path / "cache")
+    monkeypatch.setattr(CONFIG, "PARSE_CACHE_MAX_SIZE_MB", 0)
+    file_info = _write(tmp_path / "a.txt", "a")
+    calls = []
+
+    def parse():
+        calls.append(1)
+        return pd.DataFrame({"x": [1]})
+
+    cached_parse(file_info, "test.parser", parse)
+    cached_parse(file_info, "test.parser", parse)
+    assert len(calls) == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_cached_parse_concurrent_calls_parse_once(parse_cache_dir, tmp_path):
+    import threading
+    import time
+
+    calls = []
+
+    def parse():
+        calls.append(1)
+        time.sleep(0.2)
+        return pd.DataFrame({"x": [1.0, 2.0]})
+
+    file_info = _write(tmp_path / "a.xy", "1\n2\n")
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cached_parse(file_info, "test.parser", parse))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 4
+    for df in results:
+        pd.testing.assert_frame_equal(df, results[0])
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from pydatalab.scheduler import JobPriority, PriorityWorkerPool
+
+
+def test_priority_worker_pool_orders_by_priority():
+    order = []
+    started, gate = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        gate.wait()
+
+    pool = PriorityWorkerPool(max_workers=1)
+    try:
+        # Occupy the single worker so that the remaining jobs queue up
+        blocker = pool.submit(block)
+        assert started.wait(timeout=5)
+        futures = [
+            pool.submit(order.append, "bulk", priority=JobPriority.BULK),
+            pool.submit(order.append, "normal", priority=JobPriority.NORMAL),
+            pool.submit(order.append, "interactive-1", priority=JobPriority.INTERACTIVE),
+            pool.submit(order.append, "interactive-2", priority=JobPriority.INTERACTIVE),
+        ]
+        assert pool.queue_depth == 4
+        gate.set()
+        blocker.result(timeout=5)
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    assert order == ["interactive-1", "interactive-2", "normal", "bulk"]
+
+
+def test_priority_worker_pool_concurrency_limits():
+    lock = threading.Lock()
+    running = {"cycle": 0, "xrd": 0}
+    peak = {"cycle": 0, "xrd": 0}
+
+    def job(key):
+        with lock:
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+        time.sleep(0.05)
+        with lock:
+            running[key] -= 1
+
+    pool = PriorityWorkerPool(max_workers=4, limits={"cycle": 1})
+    try:
+        futures = [pool.submit(job, "cycle", limit_key="cycle") for _ in range(4)]
+        futures += [pool.submit(job, "xrd", limit_key="xrd") for _ in range(4)]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    assert peak["cycle"] == 1
+    # Capped jobs must not hold up other block types queued behind them
+    assert peak["xrd"] > 1
+
+
+def test_priority_worker_pool_reports_wait_and_errors():
+    waits = []
+    pool = PriorityWorkerPool(max_workers=2, on_start=lambda job, wait: waits.append(wait))
+    try:
+        assert pool.submit(sum, [1, 2]).result(timeout=5) == 3
+        with pytest.raises(ZeroDivisionError):
+            pool.submit(lambda: 1 / 0).result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    assert len(waits) == 2
+    assert all(wait >= 0 for wait in waits)
+
+    with pytest.raises(RuntimeError):
+        pool.submit(sum, [1])
+
+
+def test_priority_worker_pool_serializes_jobs_by_key():
+    lock = threading.Lock()
+    running = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+    order = []
+
+    def job(key, index):
+        with lock:
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+            order.append((key, index))
+        time.sleep(0.02)
+        with lock:
+            running[key] -= 1
+
+    pool = PriorityWorkerPool(max_workers=4)
+    try:
+        futures = [
+            pool.submit(
+                job,
+                key,
+                index,
+                serial_key=key,
+                # A later update of the same block must not jump the queue
+                priority=JobPriority.INTERACTIVE if index else JobPriority.BULK,
+            )
+            for index in range(3)
+            for key in ("a", "b")
+        ]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    assert peak == {"a": 1, "b": 1}
+    assert [index for key, index in order if key == "a"] == [0, 1, 2]
+
+
+def test_priority_worker_pool_shutdown_drains_queue():
+    started, gate = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        gate.wait()
+
+    pool = PriorityWorkerPool(max_workers=1)
+    blocker = pool.submit(block)
+    assert started.wait(timeout=5)
+    queued = pool.submit(sum, [1, 2])
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.submit(sum, [1])
+    gate.set()
+    blocker.result(timeout=5)
+    assert queued.result(timeout=5) == 3
+
+    pool = PriorityWorkerPool(max_workers=1)
+    started.clear()
+    gate.clear()
+    blocker = pool.submit(block)
+    assert started.wait(timeout=5)
+    queued = pool.submit(sum, [1, 2])
+    pool.shutdown(cancel_futures=True)
+    gate.set()
+    assert queued.cancelled()
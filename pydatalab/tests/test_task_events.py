@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from pydatalab.task_events import (
+    MAX_LONG_POLL_SECONDS,
+    TaskNotifier,
+    TaskWatcher,
+    parse_long_poll_args,
+    task_event_stream,
+    task_notifier,
+    wait_for_task_update,
+)
+
+
+def _parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        fields = dict(
+            line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":")
+        )
+        if "event" in fields:
+            events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+def test_task_notifier_wakes_waiters():
+    notifier = TaskNotifier(max_tasks=2)
+    version = notifier.version("a")
+    assert notifier.wait("a", version, timeout=0.01) == version
+
+    timer = threading.Timer(0.05, notifier.notify, args=("a",))
+    timer.start()
+    start = time.monotonic()
+    assert notifier.wait("a", version, timeout=5) == version + 1
+    assert time.monotonic() - start < 5
+
+    # Only the most recently notified tasks are tracked
+    notifier.notify("b")
+    notifier.notify("c")
+    assert notifier.version("a") == 0
+    assert notifier.version("c") == 1
+
+
+def test_task_event_stream_pushes_notified_updates():
+    task = {"status": "pending", "spec": {"stages": []}}
+
+    def worker():
+        for message in ("Processing started", "Done"):
+            time.sleep(0.05)
+            task["status"] = "processing"
+            task["spec"]["stages"].append({"message": message})
+            task_notifier.notify("stream-test")
+        task["status"] = "ready"
+        task_notifier.notify("stream-test")
+
+    thread = threading.Thread(target=worker)
+    start = time.monotonic()
+    thread.start()
+    chunks = list(
+        task_event_stream(
+            "stream-test",
+            load_task=lambda: task,
+            completion=lambda t: {"status": t["status"], "url": "/results"},
+        )
+    )
+    thread.join()
+
+    # Updates are pushed as soon as they are notified, well before the fallback poll
+    assert time.monotonic() - start < 1
+    assert chunks[0].startswith("retry:")
+    events = _parse_events(chunks)
+    assert [e[0] for e in events if e[0] == "stage"] == ["stage", "stage"]
+    assert [e[1] for e in events if e[0] == "stage"] == ["1", "2"]
+    assert events[-1] == ("complete", None, {"status": "ready", "url": "/results"})
+
+
+def test_task_event_stream_resumes_after_seen_stages():
+    task = {"status": "error", "spec": {"stages": [{"message": "a"}, {"message": "b"}]}}
+    events = _parse_events(
+        task_event_stream("resume-test", lambda: task, lambda t: {"status": t["status"]}, since=1)
+    )
+    assert events[0] == ("stage", "2", {"message": "b"})
+    assert events[-1][0] == "complete"
+
+    events = _parse_events(task_event_stream("missing", lambda: None, lambda t: {}))
+    assert events == [("error", None, {"status": "error", "message": "Task not found"})]
+
+
+def test_wait_for_task_update():
+    task = {"status": "processing", "spec": {"stages": [{"message": "a"}]}}
+    # Returns immediately when the client has not seen all stages
+    assert wait_for_task_update("wait-test", lambda: task, since=0, timeout=5) is task
+
+    start = time.monotonic()
+    wait_for_task_update("wait-test", lambda: task, since=1, timeout=0.1)
+    assert 0.1 <= time.monotonic() - start < 1
+
+    def finish():
+        task["status"] = "ready"
+        task_notifier.notify("wait-test")
+
+    threading.Timer(0.05, finish).start()
+    start = time.monotonic()
+    assert wait_for_task_update("wait-test", lambda: task, since=1, timeout=5)["status"] == "ready"
+    assert time.monotonic() - start < 1
+
+
+def test_parse_long_poll_args():
+    assert parse_long_poll_args({"wait": "5", "since": "2"}) == (5.0, 2)
+    assert parse_long_poll_args({"wait": "-1"}) == (0.0, 0)
+    assert parse_long_poll_args({"wait": "1e9"}) == (MAX_LONG_POLL_SECONDS, 0)
+    for wait in ("nan", "inf", "-inf", "abc"):
+        with pytest.raises(BadRequest):
+            parse_long_poll_args({"wait": wait})
+
+
+def test_task_watcher_checks_all_waiters_with_one_query():
+    """Updates made by another process are noticed by a single watcher thread, which
+    fetches all waited-on tasks at once rather than once per waiter."""
+    tasks = {"w1": ("processing", 0), "w2": ("processing", 0)}
+    fetches = []
+
+    def fetch(task_ids):
+        fetches.append(sorted(task_ids))
+        return {task_id: tasks[task_id] for task_id in task_ids}
+
+    notifier = TaskNotifier()
+    watcher = TaskWatcher(notifier, fetch=fetch, interval=0.02)
+    task = {"status": "processing", "spec": {"stages": []}}
+
+    def wait(task_id, results):
+        results.append(
+            wait_for_task_update(task_id, lambda: task, since=0, timeout=5, watcher=watcher)
+        )
+
+    results = []
+    threads = [
+        threading.Thread(target=wait, args=(task_id, results)) for task_id in ("w1", "w1", "w2")
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+
+    task["status"] = "ready"
+    tasks["w1"] = tasks["w2"] = ("ready", 0)
+    start = time.monotonic()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - start < 1
+    assert [result["status"] for result in results] == ["ready"] * 3
+    assert all(task_ids in (["w1"], ["w1", "w2"]) for task_ids in fetches)
+    # The watcher stops once nothing is waited on
+    time.sleep(0.1)
+    assert watcher._thread is None
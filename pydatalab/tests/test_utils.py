@@ -1,4 +1,18 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pydatalab.utils.downsampling import (
+    downsample_df,
+    lttb_indices,
+    minmax_indices,
+    select_x_window,
+)
 from pydatalab.utils.plotting import generate_unique_labels
+from pydatalab.utils.zip_stream import ZipStreamWriter, deflate_file
 
 
 def test_generate_unique_labels_single_file():
@@ -62,3 +76,105 @@ def test_generate_unique_labels_cif_pattern():
     filenames = ["CIF_00000001.cif", "CIF_00000002.cif"]
     result = generate_unique_labels(filenames)
     assert result == ["CIF...1.cif", "CIF...2.cif"]
+
+
+@pytest.fixture
+def peaked_series():
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 100, 100_000)
+    y = np.sin(x) + rng.normal(0, 0.01, len(x))
+    y[12_345] = 50
+    y[67_890] = -50
+    y[5] = np.nan
+    return x, y
+
+
+def test_lttb_indices(peaked_series):
+    x, y = peaked_series
+    indices = lttb_indices(x, y, 500)
+    assert len(indices) == 500
+    assert np.all(np.diff(indices) > 0)
+    assert {0, 12_345, 67_890, len(x) - 1} <= set(indices)
+    assert 5 not in indices
+    np.testing.assert_array_equal(lttb_indices(x[:10], y[10:20], 20), np.arange(10))
+
+
+def test_minmax_indices(peaked_series):
+    x, y = peaked_series
+    indices = minmax_indices(y, 500)
+    assert len(indices) <= 500
+    assert {0, 12_345, 67_890, len(x) - 1} <= set(indices)
+    assert 5 not in indices
+
+    # Groups are downsampled independently and always keep their endpoints
+    np.testing.assert_array_equal(
+        minmax_indices(np.arange(10.0), 4, group_starts=np.array([0, 1, 5, 5, 10])),
+        [0, 1, 4, 5, 9],
+    )
+
+
+@pytest.mark.parametrize("mode", ["lttb", "minmax"])
+def test_downsample_df(peaked_series, mode):
+    x, y = peaked_series
+    df = pd.DataFrame({"x": x, "y": y, "z": -y, "label": "a"})
+    reduced = downsample_df(df, 1000, x="x", y=["y", "z"], mode=mode)
+    assert len(reduced) <= 1000
+    assert list(reduced.columns) == list(df.columns)
+    assert reduced["y"].max() == 50 and reduced["y"].min() == -50
+    assert downsample_df(df, len(df)) is df
+
+
+def test_select_x_window():
+    df = pd.DataFrame({"x": [5.0, 4.0, 3.0, 2.0, 1.0, 0.0], "y": range(6)})
+    # Neighbouring points are kept so that lines extend to the edges of the window
+    assert select_x_window(df, "x", 2.5, 4.5)["y"].tolist() == [0, 1, 2, 3]
+    assert select_x_window(df, "x", 4.5, 2.5)["y"].tolist() == [0, 1, 2, 3]
+    assert select_x_window(df, "x", 10, 20).empty
+
+
+@pytest.mark.parametrize("zip64", [False, True])
+def test_zip_stream_writer(tmp_path, monkeypatch, zip64):
+    if zip64:
+        # Exercise the ZIP64 records without writing gigabytes
+        monkeypatch.setattr("pydatalab.utils.zip_stream._ZIP64_LIMIT", 100)
+        monkeypatch.setattr("pydatalab.utils.zip_stream._ZIP64_COUNT_LIMIT", 2)
+
+    text = tmp_path / "data.csv"
+    text.write_text("x,y\n" + "1,2\n" * 10_000)
+    binary = tmp_path / "image.png"
+    binary.write_bytes(np.random.default_rng(0).bytes(5_000))
+
+    deflated = deflate_file(text)
+    assert deflated.compressed_size < deflated.size == text.stat().st_size
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self):
+            self.data = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, b):
+            self.data += b
+            return len(b)
+
+    output = Unseekable()
+    with ZipStreamWriter(output) as writer:
+        writer.write_bytes("metadata.json", b'{"a": 1}')
+        writer.write_deflated("data/data.csv", deflated)
+        writer.write_file("data/image.png", binary)
+        writer.write_bytes("naïve.txt", b"stored", compress_type=zipfile.ZIP_STORED)
+
+    with zipfile.ZipFile(io.BytesIO(bytes(output.data))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [
+            "metadata.json",
+            "data/data.csv",
+            "data/image.png",
+            "naïve.txt",
+        ]
+        assert archive.read("data/data.csv") == text.read_bytes()
+        assert archive.read("data/image.png") == binary.read_bytes()
+        assert archive.getinfo("data/data.csv").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("data/image.png").compress_type == zipfile.ZIP_STORED
+        assert archive.read("naïve.txt") == b"stored"
@@ -62,17 +62,46 @@ export function construct_headers(additional_headers = null) {
   return headers;
 }
 
+const POLL_WAIT_S = 25;
+const POLL_MIN_DELAY_MS = 1000;
+const POLL_MAX_DELAY_MS = 30000;
+const POLL_MAX_ERRORS = 5;
+
 function pollBlockStatus(item_id, block_id, task_id) {
-  let attempt = 0;
+  let stagesSeen = 0;
+  let lastStatus = null;
+  // Delay before the next poll when the last one failed or returned early without
+  // progress (i.e., the server did not hold it open), doubled each time up to
+  // POLL_MAX_DELAY_MS and reset otherwise
+  let delay = 0;
+  let errors = 0;
+
+  function backoff() {
+    delay = Math.min(Math.max(2 * delay, POLL_MIN_DELAY_MS), POLL_MAX_DELAY_MS);
+    return delay;
+  }
 
   async function poll() {
-    attempt++;
-    const delay = attempt <= 5 ? 1000 : 10000;
-
     try {
-      const response = await fetch_get(`${API_URL}/blocks/${task_id}/status`);
+      // Long-poll: the server holds the request open until the task progresses
+      const started = Date.now();
+      const response = await fetch_get(
+        `${API_URL}/blocks/${task_id}/status?inline=false&wait=${POLL_WAIT_S}&since=${stagesSeen}`,
+      );
+      const waited = Date.now() - started >= POLL_MIN_DELAY_MS;
+
+      // Fetch the (potentially large) block data separately, streamed as stored
+      if (response.status === "ready" && response.block_data_url) {
+        response.block_data = await fetch_get(`${API_URL}${response.block_data_url}`);
+      }
+
+      errors = 0;
+      const progressed =
+        response.status !== lastStatus || (response.stages || []).length > stagesSeen;
+      lastStatus = response.status;
 
       if (response.stages && response.stages.length > 0) {
+        stagesSeen = response.stages.length;
         store.commit("setBlockInfo", {
           block_id,
           info: response.stages,
@@ -101,16 +130,26 @@ function pollBlockStatus(item_id, block_id, task_id) {
           block_id,
           error: response.error_message || "Block processing failed.",
         });
+      } else if (progressed || waited) {
+        // Poll again straight away, both after progress and after a long-poll
+        // that timed out, so that completion is seen as soon as it happens
+        delay = 0;
+        poll();
       } else {
-        setTimeout(poll, delay);
+        setTimeout(poll, backoff());
       }
     } catch (error) {
+      errors++;
+      if (errors < POLL_MAX_ERRORS) {
+        setTimeout(poll, backoff());
+        return;
+      }
       store.commit("setBlockNotUpdating", block_id);
       store.commit("setBlockError", { block_id, error: String(error) });
     }
   }
 
-  setTimeout(poll, 1000);
+  poll();
 }
 
 // eslint-disable-next-line no-unused-vars